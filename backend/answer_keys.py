@@ -0,0 +1,141 @@
+"""Quiz answer keys compiled to bitmasks, with a per-process cache.
+
+A quiz's stored answer key carries a version that every correction bumps, in
+whichever process makes it. Each lookup reads that version by primary key and
+only uses a cached key compiled at the same version, so attempts are graded
+with a correction as soon as it commits.
+"""
+
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Question, Quiz
+
+# Compiled answer keys kept per process; each costs a few bytes per question.
+ANSWER_KEY_CACHE_SIZE = 1024
+
+# Mask for a selection that can never be correct (e.g. a negative index)
+_INVALID_MASK = -1
+
+
+def answer_mask(indices: Iterable[int]) -> int:
+    """Encode a set of option indices as a bitmask (bit i = option i)."""
+    mask = 0
+    for index in indices:
+        if index < 0:
+            return _INVALID_MASK
+        mask |= 1 << index
+    return mask
+
+
+class AnswerKey:
+    """A quiz's answer key compiled to one bitmask per gradable question.
+
+    Only questions that still exist are included, matching how attempts have
+    always been graded against the questions that could be loaded.
+    """
+    __slots__ = ('quiz_id', 'question_ids', 'masks', 'version')
+
+    def __init__(self, quiz_id: int, question_ids: Sequence[int], masks: Sequence[int], version: int = 0):
+        self.quiz_id = quiz_id
+        self.question_ids = tuple(question_ids)
+        self.version = version
+        try:
+            self.masks = array('Q', masks)
+        except OverflowError:
+            # An answer index beyond 63; keep arbitrary-precision ints
+            self.masks = list(masks)
+
+    @property
+    def total_questions(self) -> int:
+        return len(self.question_ids)
+
+    def count_correct(self, selected_answers: Dict[int, List[int]]) -> int:
+        """Count the questions whose selected options exactly match the key."""
+        get = selected_answers.get
+        correct = 0
+        for question_id, mask in zip(self.question_ids, self.masks):
+            if answer_mask(get(question_id, ())) == mask:
+                correct += 1
+        return correct
+
+    def grade(self, selected_answers: Dict[int, List[int]]) -> List[Tuple[int, int, bool]]:
+        """Return ``(question_id, selected_mask, is_correct)`` for every graded question."""
+        get = selected_answers.get
+        graded = []
+        for question_id, mask in zip(self.question_ids, self.masks):
+            selected = answer_mask(get(question_id, ()))
+            graded.append((question_id, selected, selected == mask))
+        return graded
+
+
+def compile_answer_key(db: Session, quiz) -> AnswerKey:
+    """Build a quiz's answer key from its snapshot, or from its questions' correct answers alone."""
+    if quiz.answer_key is not None:
+        question_ids = sorted(int(question_id) for question_id in quiz.answer_key)
+        return AnswerKey(quiz.id, question_ids,
+                         [answer_mask(quiz.answer_key[str(question_id)]) for question_id in question_ids],
+                         quiz.answer_key_version)
+    rows = db.query(Question.id, Question.correct_answer).filter(
+        Question.id.in_(quiz.question_ids)
+    ).order_by(Question.id).all()
+    return AnswerKey(quiz.id, [row.id for row in rows], [answer_mask(row.correct_answer) for row in rows],
+                     quiz.answer_key_version)
+
+
+class AnswerKeyCache:
+    """LRU cache of compiled answer keys, checked against the quiz's key version.
+
+    A hit costs one primary-key read of ``quizzes.answer_key_version``. Quizzes
+    created before snapshots have no stored key and nothing versions their
+    questions' answers, so their keys are compiled on every lookup until the
+    snapshot backfill has run.
+    """
+
+    def __init__(self, maxsize: int = ANSWER_KEY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._keys: "OrderedDict[int, AnswerKey]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, quiz_id: int) -> Optional[AnswerKey]:
+        """Return the answer key for a quiz, or None if the quiz does not exist."""
+        version = db.query(Quiz.answer_key_version).filter(Quiz.id == quiz_id).scalar()
+        with self._lock:
+            key = self._keys.get(quiz_id)
+            if key is not None and key.version == version:
+                self._keys.move_to_end(quiz_id)
+                self.hits += 1
+                return key
+            self.misses += 1
+
+        quiz = db.query(Quiz.id, Quiz.question_ids, Quiz.answer_key, Quiz.answer_key_version).filter(
+            Quiz.id == quiz_id
+        ).first()
+        if quiz is None:
+            with self._lock:
+                self._keys.pop(quiz_id, None)
+            return None
+        key = compile_answer_key(db, quiz)
+        if quiz.answer_key is not None:
+            with self._lock:
+                self._keys[quiz_id] = key
+                self._keys.move_to_end(quiz_id)
+                while len(self._keys) > self.maxsize:
+                    self._keys.popitem(last=False)
+        return key
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+
+answer_key_cache = AnswerKeyCache()
@@ -0,0 +1,163 @@
+"""Per-question rows for quiz attempts, and a backfill for older attempts.
+
+Each graded question of an attempt is stored in ``attempt_answers`` alongside
+the attempt itself, so per-question analytics are plain SQL instead of
+parsing every attempt's ``selected_answers`` JSON.
+
+Attempts recorded before the table existed are converted by the backfill,
+which can run against a live database. It marks every attempt it has seen,
+including those that yield no rows (a deleted quiz, or one without
+gradable questions), so they are not reported as pending again:
+
+    python attempt_answers.py [--batch-size N] [--pause SECONDS]
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import exists, insert, update
+from sqlalchemy.orm import Session
+
+from models import AttemptAnswer, QuizAttempt
+from answer_keys import answer_key_cache
+from item_stats import record_item_stats
+
+# Attempts converted per transaction, and the pause between transactions that
+# lets live submissions take the write lock
+BACKFILL_BATCH_SIZE = 500
+BACKFILL_PAUSE_SECONDS = 0.05
+
+# selected_mask is a signed 64-bit column; a selection that cannot fit (an
+# option index above 62, which no parsed question has) is stored as -1
+_MAX_STORED_MASK = (1 << 63) - 1
+
+
+def storable_mask(mask: int) -> int:
+    return mask if 0 <= mask <= _MAX_STORED_MASK else -1
+
+
+def record_attempt_answers(db: Session, attempt: QuizAttempt, graded: Sequence[Tuple[int, int, bool]]):
+    """Insert an attempt's graded questions in the current transaction.
+
+    ``graded`` holds ``(question_id, selected_mask, is_correct)`` tuples as
+    returned by ``AnswerKey.grade``; the attempt must already be flushed.
+    """
+    if not graded:
+        return
+    db.execute(insert(AttemptAnswer), [
+        {
+            'attempt_id': attempt.id,
+            'question_id': question_id,
+            'user_id': attempt.user_id,
+            'selected_mask': storable_mask(selected_mask),
+            'is_correct': is_correct,
+        }
+        for question_id, selected_mask, is_correct in graded
+    ])
+
+
+def _pending_attempts_query(db: Session):
+    return db.query(QuizAttempt).filter(
+        QuizAttempt.answers_recorded == False,
+        ~exists().where(AttemptAnswer.attempt_id == QuizAttempt.id)
+    )
+
+
+def pending_attempt_count(db: Session) -> int:
+    """Count attempts that have no attempt_answers rows yet."""
+    return _pending_attempts_query(db).count()
+
+
+def backfill_attempt_answers(db: Session, batch_size: int = BACKFILL_BATCH_SIZE,
+                             pause: float = BACKFILL_PAUSE_SECONDS,
+                             progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Write attempt_answers rows for attempts that do not have them yet.
+
+    Attempts are converted in id order, one short transaction per batch, so
+    the database is never locked for long, and each one is also added to the
+    item statistics. Attempts that already have rows are skipped, which makes
+    the job safe to stop and run again. Older attempts are graded against the
+    questions' current answers.
+    """
+    last_id = 0
+    attempts_done = 0
+    rows_written = 0
+    while True:
+        attempts = _pending_attempts_query(db).with_entities(
+            QuizAttempt.id, QuizAttempt.user_id, QuizAttempt.quiz_id, QuizAttempt.selected_answers,
+            QuizAttempt.correct_answers, QuizAttempt.total_questions
+        ).filter(QuizAttempt.id > last_id).order_by(QuizAttempt.id).limit(batch_size).all()
+        if not attempts:
+            break
+
+        rows: List[Dict] = []
+        for attempt in attempts:
+            answer_key = answer_key_cache.get(db, attempt.quiz_id)
+            if answer_key is None:
+                continue
+            # JSON object keys come back as strings
+            selected_answers = {int(question_id): selected for question_id, selected in attempt.selected_answers.items()}
+            graded = answer_key.grade(selected_answers)
+            rows.extend(
+                {
+                    'attempt_id': attempt.id,
+                    'question_id': question_id,
+                    'user_id': attempt.user_id,
+                    'selected_mask': storable_mask(selected_mask),
+                    'is_correct': is_correct,
+                }
+                for question_id, selected_mask, is_correct in graded
+            )
+            score = attempt.correct_answers / attempt.total_questions if attempt.total_questions else 0.0
+            record_item_stats(db, graded, score)
+        if rows:
+            db.execute(insert(AttemptAnswer), rows)
+        db.execute(
+            update(QuizAttempt).where(QuizAttempt.id.in_([attempt.id for attempt in attempts]))
+            .values(answers_recorded=True)
+        )
+        db.commit()
+
+        last_id = attempts[-1].id
+        attempts_done += len(attempts)
+        rows_written += len(rows)
+        if progress:
+            progress(attempts_done, rows_written)
+        if len(attempts) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return {'attempts': attempts_done, 'answers': rows_written}
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Backfill attempt_answers from existing quiz attempts")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help="attempts per transaction")
+    parser.add_argument('--pause', type=float, default=BACKFILL_PAUSE_SECONDS,
+                        help="seconds to wait between transactions")
+    args = parser.parse_args(argv)
+
+    from models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        total = pending_attempt_count(db)
+        print(f"{total} attempts to convert")
+
+        def report(attempts_done, rows_written):
+            print(f"  {attempts_done}/{total} attempts, {rows_written} answers")
+
+        started = time.perf_counter()
+        result = backfill_attempt_answers(db, args.batch_size, args.pause, report)
+        print(f"Converted {result['attempts']} attempts ({result['answers']} answers) "
+              f"in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,317 @@
+"""Import many DOCX files at once, parsing them in parallel across CPU cores.
+
+Parsing is CPU-bound and independent per file, so files are fanned out over a
+process pool; the parsed questions are then written serially through the
+bulk import path, one transaction per file.
+
+Usage:
+    python batch_import.py [--workers N] [--user EMAIL] [--retire-removed] PATH...
+
+Each PATH may be a .docx file, a .zip of .docx files or a directory.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from docx_parser import DocxParser
+from importer import import_parsed_document, latest_import_report, unchanged_file_report
+from metrics import PARSE_QUEUE_DEPTH, PARSE_SECONDS
+
+# Upper bounds for a single batch, so one upload cannot exhaust the server
+MAX_BATCH_FILES = 500
+MAX_ARCHIVE_BYTES = 512 * 1024 * 1024
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+class BatchImportError(ValueError):
+    pass
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Return the shared parsing pool, sized to the CPU count.
+
+    Workers are spawned rather than forked so the pool is safe to create from
+    a running server with an event loop and database connections.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=default_workers(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
+        _parse_pool = None
+
+
+def expand_uploads(files: Sequence[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """Flatten uploaded .docx and .zip files into a list of .docx documents.
+
+    Archive members are named by their path inside the archive. Names must be
+    unique within a batch, since each one is diffed against its own previous
+    import.
+    """
+    documents = []
+    for filename, content in files:
+        lower = filename.lower()
+        if lower.endswith('.zip'):
+            documents.extend(_read_archive(filename, content))
+        elif lower.endswith('.docx'):
+            documents.append((filename, content))
+        else:
+            raise BatchImportError(f"Unsupported file type: {filename}")
+        if len(documents) > MAX_BATCH_FILES:
+            raise BatchImportError(f"A batch may contain at most {MAX_BATCH_FILES} documents")
+    seen = set()
+    for name, _ in documents:
+        if name in seen:
+            raise BatchImportError(f"{name} appears more than once in the batch")
+        seen.add(name)
+    return documents
+
+
+def _read_archive(filename: str, content: bytes) -> List[Tuple[str, bytes]]:
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(content))
+    except zipfile.BadZipFile:
+        raise BatchImportError(f"{filename} is not a valid zip archive")
+
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith('.docx')
+        and not info.filename.startswith('__MACOSX/')
+        and not Path(info.filename).name.startswith('~$')  # Word lock files
+    ]
+    if sum(info.file_size for info in members) > MAX_ARCHIVE_BYTES:
+        raise BatchImportError(f"{filename} is too large to import")
+    # Declared sizes can lie, so the limit also applies to the bytes actually decompressed
+    documents = []
+    remaining = MAX_ARCHIVE_BYTES
+    for info in members:
+        try:
+            with archive.open(info) as member:
+                data = member.read(remaining + 1)
+        except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError) as e:
+            raise BatchImportError(f"{filename} is not a valid zip archive: {e}")
+        if len(data) > remaining:
+            raise BatchImportError(f"{filename} is too large to import")
+        remaining -= len(data)
+        documents.append((info.filename, data))
+    return documents
+
+
+def parse_docx_bytes(filename: str, content: bytes) -> Dict:
+    """Parse one document; runs inside a pool worker, so it returns plain data."""
+    started = time.perf_counter()
+    parser = DocxParser()
+    try:
+        questions, errors = parser.parse_document(io.BytesIO(content))
+    except Exception as e:
+        questions, errors = [], [{
+            'line_number': 0,
+            'content': filename,
+            'error': f'Could not read document: {e}'
+        }]
+    return {
+        'filename': filename,
+        'questions': questions,
+        'errors': errors,
+        'total_lines': parser.total_lines,
+        'parse_seconds': time.perf_counter() - started,
+    }
+
+
+def parse_documents(documents: Sequence[Tuple[str, bytes]], workers: Optional[int] = None,
+                    progress: Optional[Callable[[int, int], None]] = None) -> List[Dict]:
+    """Parse documents in a process pool, preserving input order."""
+    workers = workers or default_workers()
+    if workers == 1 or len(documents) <= 1:
+        results = (parse_docx_bytes(name, content) for name, content in documents)
+        return _collect_results(results, len(documents), progress)
+    with ProcessPoolExecutor(max_workers=min(workers, len(documents)),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        return _collect_results(pool.map(parse_docx_bytes, *zip(*documents)), len(documents), progress)
+
+
+def _collect_results(results: Iterable[Dict], total: int,
+                     progress: Optional[Callable[[int, int], None]]) -> List[Dict]:
+    collected = []
+    for result in results:
+        collected.append(result)
+        if progress:
+            progress(len(collected), total)
+    return collected
+
+
+async def parse_documents_async(documents: Sequence[Tuple[str, bytes]]) -> List[Dict]:
+    """Parse documents on the shared pool without blocking the event loop."""
+    if len(documents) <= 1:
+        results = [parse_docx_bytes(name, content) for name, content in documents]
+        for result in results:
+            PARSE_SECONDS.observe(result['parse_seconds'])
+        return results
+    loop = asyncio.get_running_loop()
+    pool = get_parse_pool()
+
+    async def parse(name: str, content: bytes) -> Dict:
+        try:
+            result = await loop.run_in_executor(pool, parse_docx_bytes, name, content)
+        finally:
+            PARSE_QUEUE_DEPTH.dec()
+        PARSE_SECONDS.observe(result['parse_seconds'])
+        return result
+
+    PARSE_QUEUE_DEPTH.inc(amount=len(documents))
+    return await asyncio.gather(*[parse(name, content) for name, content in documents])
+
+
+def split_unchanged(db: Session, documents: Sequence[Tuple[str, bytes]], created_by: Optional[int]):
+    """Separate documents identical to their previous import from those to parse.
+
+    Returns ``(to_parse, unchanged_reports, previous)`` where ``previous`` maps
+    each filename (a path, for archive members) to its last import report.
+    """
+    to_parse = []
+    unchanged = []
+    previous = {}
+    for filename, content in documents:
+        file_hash = hashlib.sha256(content).hexdigest()
+        report = latest_import_report(db, filename, created_by)
+        previous[filename] = report
+        if report and report.file_hash == file_hash:
+            unchanged.append(unchanged_file_report(report, created_by))
+        else:
+            to_parse.append((filename, content))
+    return to_parse, unchanged, previous
+
+
+def import_parsed_results(db: Session, documents: Sequence[Tuple[str, bytes]], results: Sequence[Dict],
+                          previous: Dict, created_by: Optional[int], retire_removed: bool = False):
+    """Write parsed documents through the bulk import path, one commit per file."""
+    reports = []
+    for (filename, content), result in zip(documents, results):
+        report = import_parsed_document(
+            db,
+            filename=filename,
+            parsed_questions=result['questions'],
+            errors=result['errors'],
+            total_lines=result['total_lines'],
+            created_by=created_by,
+            file_hash=hashlib.sha256(content).hexdigest(),
+            previous=previous.get(filename),
+            retire_removed=retire_removed
+        )
+        db.commit()
+        reports.append(report)
+    return reports
+
+
+def summarize(reports: Sequence) -> Dict:
+    """Build the consolidated report for a batch from its per-file reports."""
+    return {
+        'total_files': len(reports),
+        'unchanged_files': sum(1 for r in reports if r.diff and r.diff.get('file_unchanged')),
+        'successful_imports': sum(r.successful_imports for r in reports),
+        'failed_imports': sum(r.failed_imports for r in reports),
+        'duplicate_imports': sum(r.duplicate_imports or 0 for r in reports),
+        'reports': list(reports),
+    }
+
+
+def describe_report(report) -> str:
+    if report.diff and report.diff.get('file_unchanged'):
+        return f"{report.filename}: unchanged"
+    return f"{report.filename}: {report.successful_imports} imported, {report.failed_imports} failed, " \
+        f"{report.duplicate_imports} duplicates"
+
+
+def run_batch(db: Session, documents: Sequence[Tuple[str, bytes]], created_by: Optional[int] = None,
+              retire_removed: bool = False, workers: Optional[int] = None,
+              progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Parse and import a batch synchronously (used by the CLI).
+
+    ``progress`` is called with the number of documents parsed so far.
+    """
+    to_parse, unchanged, previous = split_unchanged(db, documents, created_by)
+    for report in unchanged:
+        db.add(report)
+    db.commit()
+    results = parse_documents(to_parse, workers, progress)
+    reports = import_parsed_results(db, to_parse, results, previous, created_by, retire_removed)
+    return summarize(unchanged + reports)
+
+
+def collect_paths(paths: Sequence[str]) -> List[Tuple[str, bytes]]:
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend((str(p.relative_to(path)), p.read_bytes()) for p in sorted(path.rglob('*.docx')))
+        else:
+            files.append((path.name, path.read_bytes()))
+    return expand_uploads(files)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Import DOCX files, directories or zip archives")
+    parser.add_argument('paths', nargs='+', help=".docx files, .zip archives or directories")
+    parser.add_argument('--workers', type=int, default=default_workers(), help="parser processes")
+    parser.add_argument('--user', help="email of the user the imports are recorded for")
+    parser.add_argument('--retire-removed', action='store_true',
+                        help="retire questions removed since a document's last import")
+    args = parser.parse_args(argv)
+
+    from models import SessionLocal, User, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        created_by = None
+        if args.user:
+            user = db.query(User).filter(User.email == args.user).first()
+            if user is None:
+                parser.error(f"unknown user: {args.user}")
+            created_by = user.id
+
+        try:
+            documents = collect_paths(args.paths)
+        except BatchImportError as e:
+            parser.error(str(e))
+
+        started = time.perf_counter()
+        summary = run_batch(db, documents, created_by, args.retire_removed, args.workers)
+        elapsed = time.perf_counter() - started
+
+        for report in summary['reports']:
+            print(describe_report(report))
+        print(f"{summary['total_files']} files in {elapsed:.1f}s: "
+              f"{summary['successful_imports']} imported, {summary['failed_imports']} failed, "
+              f"{summary['duplicate_imports']} duplicates, {summary['unchanged_files']} unchanged files")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+End-to-end .docx parsing benchmark over a generated corpus.
+
+The corpus is a directory of large, varied documents written with python-docx:
+every question-start style the parser recognizes (``1.``, ``1)``, ``Q1.``,
+``Question 1``, in either case), multi-line stems, options labelled ``A.`` or
+``a)``, single and multiple answers written several ways (``Answer: B``,
+``Correct: A, C``, ``Solution: BD``, ``answer a c``), true/false
+questions with and without options, explanations and difficulty lines,
+malformed entries, and paragraphs split into several formatted runs. Headings,
+preamble text and tables of questions are mixed in as noise. Paragraphs inside
+tables are not read by the parser. The corpus is only regenerated when its
+parameters change.
+
+Each parser backend runs in its own process over the whole corpus, so peak
+RSS is measured per backend. The backends are:
+
+    legacy          the regex-per-line parser, via parse_document
+    parse_document  DocxParser.parse_document, which loads every paragraph
+    iter_questions  DocxParser.iter_questions, which streams body paragraphs
+    batch           batch_import.parse_documents across a process pool
+
+All backends must report the same questions and errors.
+
+Usage:
+    python benchmarks/bench_docx.py [--corpus DIR] [--files N] [--questions-per-file N] [--seed S]
+        [--backends legacy,parse_document,...] [--workers N] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from docx import Document
+from docx.enum.text import WD_BREAK
+
+BACKENDS = ('legacy', 'parse_document', 'iter_questions', 'batch')
+MANIFEST = 'corpus.json'
+# Bump when the generated documents change, so cached corpora are rebuilt
+CORPUS_VERSION = 1
+
+START_STYLES = [
+    lambda n: f"{n}. ",
+    lambda n: f"{n}) ",
+    lambda n: f"Q{n}. ",
+    lambda n: f"q{n}. ",
+    lambda n: f"Question {n}: ",
+    lambda n: f"Question {n} ",
+    lambda n: f"QUESTION {n} - ",
+]
+OPTION_STYLES = [lambda label: f"{label}. ", lambda label: f"{label}) ", lambda label: f"{label.lower()}) "]
+ANSWER_PREFIXES = ('Answer: ', 'Correct: ', 'Solution: ', 'answer ', 'CORRECT: ')
+WORDS = ('cell', 'matrix', 'enzyme', 'vector', 'protocol', 'theorem', 'market', 'circuit', 'lattice',
+         'poem', 'treaty', 'orbit', 'neuron', 'ledger', 'glacier', 'syntax', 'isotope', 'reflex')
+
+
+def sentence(rng, low, high):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def multiple_answer(rng, labels, prefix):
+    letters = sorted(rng.sample(labels, rng.randint(2, len(labels) - 1)))
+    joined = rng.choice([', '.join(letters), ''.join(letters), ' '.join(letters), ','.join(letters)])
+    return f"{prefix}{joined}"
+
+
+def question_lines(rng, n):
+    """Paragraph texts for question ``n``; a few are deliberately malformed."""
+    lines = [f"{rng.choice(START_STYLES)(n)}What does the {sentence(rng, 1, 2)} imply about {sentence(rng, 3, 12)}?"]
+    for _ in range(rng.choice((0, 0, 0, 1, 2, 3))):
+        lines.append(f"Consider that {sentence(rng, 6, 20)}.")
+
+    kind = rng.random()
+    prefix = rng.choice(ANSWER_PREFIXES)
+    if kind < 0.15:
+        # True/false, written with or without its options
+        if rng.random() < 0.5:
+            lines += ["A. True", "B. False"]
+        lines.append(f"{prefix}{rng.choice(('True', 'False', 'T', 'F', 'true'))}")
+    else:
+        labels = 'ABCDE'[:rng.randint(3, 5)]
+        option_style = rng.choice(OPTION_STYLES)
+        lines += [f"{option_style(label)}{sentence(rng, 1, 8)}" for label in labels]
+        if kind < 0.55:
+            lines.append(f"{prefix}{rng.choice(labels)}")
+        elif kind < 0.85:
+            lines.append(multiple_answer(rng, labels, prefix))
+        elif kind < 0.90:
+            pass  # Malformed: no answer line
+        elif kind < 0.95:
+            lines.append(f"{prefix}Z")  # Malformed: answer beyond the options
+        else:
+            lines.append(f"{prefix}none of these")  # Malformed: no answer letters
+
+    if rng.random() < 0.4:
+        lines.append(f"Explanation: {sentence(rng, 5, 25)}.")
+    if rng.random() < 0.2:
+        lines.append(f"Difficulty: {rng.choice(('easy', 'medium', 'hard'))}")
+    return lines
+
+
+def add_line(doc, rng, text):
+    """Add a paragraph, sometimes split into several formatted runs as Word does."""
+    if rng.random() < 0.8 or ' ' not in text:
+        doc.add_paragraph(text)
+        return
+    head, tail = text.split(' ', 1)
+    paragraph = doc.add_paragraph()
+    paragraph.add_run(head + ' ').bold = True
+    middle = len(tail) // 2
+    paragraph.add_run(tail[:middle])
+    paragraph.add_run(tail[middle:]).italic = True
+
+
+def write_document(path, rng, questions, first_number):
+    doc = Document()
+    doc.add_heading(f"Question set {sentence(rng, 1, 3)}", level=1)
+    doc.add_paragraph(f"Instructions: {sentence(rng, 10, 30)}.")
+    for n in range(first_number, first_number + questions):
+        if rng.random() < 0.02:
+            doc.add_heading(f"Section {sentence(rng, 1, 2)}", level=2)
+        if rng.random() < 0.01:
+            table = doc.add_table(rows=3, cols=2)
+            for row, text in zip(table.rows, question_lines(rng, n)):
+                row.cells[0].text = str(n)
+                row.cells[1].text = text
+        for text in question_lines(rng, n):
+            add_line(doc, rng, text)
+        if rng.random() < 0.3:
+            doc.add_paragraph("")
+        if rng.random() < 0.005:
+            doc.add_paragraph().add_run().add_break(WD_BREAK.PAGE)
+    doc.save(path)
+
+
+def ensure_corpus(directory, files, questions_per_file, seed):
+    """Generate the corpus into ``directory`` unless it already matches the parameters."""
+    directory = Path(directory)
+    params = {'version': CORPUS_VERSION, 'files': files, 'questions_per_file': questions_per_file, 'seed': seed}
+    manifest = directory / MANIFEST
+    if manifest.exists() and json.loads(manifest.read_text()).get('params') == params:
+        print(f"Corpus: {directory} (cached)")
+        return json.loads(manifest.read_text())
+
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob('*.docx'):
+        stale.unlink()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    for i in range(files):
+        write_document(directory / f"corpus-{i + 1:03d}.docx", rng, questions_per_file, i * questions_per_file + 1)
+    info = {
+        'params': params,
+        'questions': files * questions_per_file,
+        'bytes': sum(path.stat().st_size for path in directory.glob('*.docx')),
+        'generate_seconds': time.perf_counter() - started,
+    }
+    manifest.write_text(json.dumps(info, indent=2))
+    print(f"Corpus: {directory} (generated in {info['generate_seconds']:.1f}s)")
+    return info
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size of this process, or of its largest finished child."""
+    if who == resource.RUSAGE_SELF and os.path.exists('/proc/self/status'):
+        # Unlike ru_maxrss, VmHWM is not carried over from the parent across exec
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(who).ru_maxrss * scale / (1024 * 1024)
+
+
+def measure(backend, paths, workers):
+    """Parse ``paths`` with one backend in this process; return counts and timings."""
+    from docx_parser import DocxParser
+
+    baseline_rss = peak_rss_mb()
+    questions = errors = lines = 0
+    started = time.perf_counter()
+    if backend == 'batch':
+        from batch_import import parse_documents
+        documents = [(path.name, path.read_bytes()) for path in paths]
+        started = time.perf_counter()
+        for result in parse_documents(documents, workers=workers):
+            questions += len(result['questions'])
+            errors += len(result['errors'])
+            lines += result['total_lines']
+    elif backend == 'iter_questions':
+        for path in paths:
+            parser = DocxParser()
+            for item in parser.iter_questions(str(path)):
+                if isinstance(item, dict):
+                    errors += 1
+                else:
+                    questions += 1
+            lines += parser.total_lines
+    else:
+        if backend == 'legacy':
+            from bench_parser import LegacyDocxParser as parser_class
+        else:
+            parser_class = DocxParser
+        for path in paths:
+            parser = parser_class()
+            parsed, parse_errors = parser.parse_document(str(path))
+            questions += len(parsed)
+            errors += len(parse_errors)
+            lines += parser.total_lines
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'seconds': elapsed,
+        'questions': questions,
+        'errors': errors,
+        'lines': lines,
+        'questions_per_sec': questions / elapsed,
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    if backend == 'batch' and peak_rss_mb(resource.RUSAGE_CHILDREN):
+        # An upper bound: a spawned worker's ru_maxrss starts at its parent's
+        result['worker_peak_rss_mb'] = peak_rss_mb(resource.RUSAGE_CHILDREN)
+    return result
+
+
+def run_backend(backend, corpus, workers):
+    """Run ``measure`` for one backend in a fresh interpreter."""
+    command = [sys.executable, __file__, '--corpus', str(corpus), '--measure', backend]
+    if workers:
+        command += ['--workers', str(workers)]
+    output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark .docx parsing per parser backend")
+    arg_parser.add_argument('--corpus', default=os.path.join(tempfile.gettempdir(), 'questionbank-docx-corpus'),
+                            help="directory the corpus is generated into and read from")
+    arg_parser.add_argument('--files', type=int, default=20)
+    arg_parser.add_argument('--questions-per-file', type=int, default=5000)
+    arg_parser.add_argument('--seed', type=int, default=1)
+    arg_parser.add_argument('--backends', default=','.join(BACKENDS),
+                            help=f"comma-separated, from: {', '.join(BACKENDS)}")
+    arg_parser.add_argument('--workers', type=int, help="processes for the batch backend (default: CPU count)")
+    arg_parser.add_argument('--json', help="write the results to this file")
+    arg_parser.add_argument('--measure', choices=BACKENDS, help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    paths = sorted(Path(args.corpus).glob('*.docx'))
+    if args.measure:
+        print(json.dumps(measure(args.measure, paths, args.workers)))
+        return
+
+    backends = [name.strip() for name in args.backends.split(',') if name.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        arg_parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+
+    corpus = ensure_corpus(args.corpus, args.files, args.questions_per_file, args.seed)
+    print(f"{args.files} files, {corpus['questions']} questions, {corpus['bytes'] / (1024 * 1024):.1f} MB")
+
+    results = {'corpus': corpus, 'backends': {}}
+    for backend in backends:
+        result = run_backend(backend, args.corpus, args.workers)
+        results['backends'][backend] = result
+        print(f"{backend:>15}: {result['seconds']:7.2f}s  {result['questions_per_sec']:10,.0f} questions/sec  "
+              f"peak RSS {result['peak_rss_mb']:7.1f} MB (+{result['peak_rss_mb'] - result['baseline_rss_mb']:.1f})  "
+              f"({result['questions']} questions, {result['errors']} errors, {result['lines']} lines)")
+        if 'worker_peak_rss_mb' in result:
+            print(f"{'':>15}  pool workers peaked at {result['worker_peak_rss_mb']:.1f} MB each at most")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+    counts = {(result['questions'], result['errors']) for result in results['backends'].values()}
+    if len(counts) > 1:
+        print("ERROR: backends produced different question and error counts")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
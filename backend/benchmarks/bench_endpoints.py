@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for every API route over a large seeded bank.
+
+A corpus of questions (with options and tags), students, quizzes and graded
+attempts is seeded once through the bulk seeder and cached by its parameters.
+Each run works on a fresh copy of it, so mutating routes never change the
+fixture and runs stay comparable. Requests go through the ASGI app
+in-process via httpx, without a server or network in between. Each route
+gets a few warm-up calls and is then timed sequentially.
+
+Every API route in main.py must have a case here; routes without one are
+listed as uncovered in the report. Google sign-in is stubbed.
+
+Usage:
+    python benchmarks/bench_endpoints.py [--size 10k|100k|1m | --questions N] [--attempts N]
+        [--iterations N] [--only SUBSTRING] [--json FILE] [--compare BASELINE.json] [--threshold 1.25]
+
+``--compare`` prints each route's p50 against a previous report and exits
+with status 1 if any route got slower than ``--threshold`` times its baseline.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+# Bump when the seeded data changes, so cached corpora are rebuilt
+CORPUS_VERSION = 1
+REPORT_VERSION = 1
+
+ADMIN_EMAIL = "bench-admin@example.com"
+UPLOAD_QUESTIONS = 50
+
+
+class Case:
+    """One timed route. ``build(ctx, i)`` returns the httpx request arguments for call ``i``."""
+
+    __slots__ = ('method', 'path', 'name', 'build', 'iterations')
+
+    def __init__(self, method, path, build=None, name=None, iterations=None):
+        self.method = method
+        self.path = path
+        self.name = name or f"{method} {path}"
+        self.build = build or (lambda ctx, i: {})
+        self.iterations = iterations
+
+
+def corpus_path(data_dir, args):
+    name = (f"bank-v{CORPUS_VERSION}-q{args.questions}-u{args.users}-z{args.quizzes}"
+            f"-a{args.attempts}-s{args.seed}.db")
+    return Path(data_dir) / name
+
+
+def seed_corpus(path, args):
+    """Seed a corpus into ``path`` unless it is already cached there."""
+    if path.exists():
+        print(f"Corpus: {path} (cached)")
+        return {}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix('.partial')
+    if partial.exists():
+        partial.unlink()
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from models import User, create_tables
+    from seeding import seed_attempts, seed_questions, seed_quizzes, seed_users
+
+    engine = create_engine(f"sqlite:///{partial}")
+    create_tables(engine)
+    db = sessionmaker(bind=engine)()
+    timings = {}
+    try:
+        started = time.perf_counter()
+        seed_questions(db, args.questions, seed=args.seed)
+        timings['questions'] = time.perf_counter() - started
+
+        db.add(User(email=ADMIN_EMAIL, name="Bench Admin", google_id="bench-admin", is_admin=True))
+        db.commit()
+        started = time.perf_counter()
+        user_ids = seed_users(db, args.users)
+        quiz_ids = seed_quizzes(db, args.quizzes, seed=args.seed)
+        timings['quizzes'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        seed_attempts(db, args.attempts, quiz_ids, user_ids, seed=args.seed)
+        timings['attempts'] = time.perf_counter() - started
+    finally:
+        db.close()
+        engine.dispose()
+    partial.rename(path)
+    print(f"Corpus: {path} (seeded in {sum(timings.values()):.1f}s)")
+    return timings
+
+
+class Context:
+    """IDs from the working copy and helpers shared by the cases."""
+
+    def __init__(self, session_factory, create_access_token):
+        from sqlalchemy import func
+        from models import AttemptAnswer, Quiz, Tag, User
+
+        self.session_factory = session_factory
+        db = session_factory()
+        try:
+            admin = db.query(User).filter(User.email == ADMIN_EMAIL).one()
+            student = db.query(User).filter(User.is_admin == False).order_by(User.id).first()
+            self.admin_id = admin.id
+            self.student_email = student.email
+            self.admin_headers = {'Authorization': f"Bearer {create_access_token({'sub': admin.email})}"}
+            self.student_headers = {'Authorization': f"Bearer {create_access_token({'sub': student.email})}"}
+            self.quizzes = [
+                (quiz_id, {int(question_id): answer for question_id, answer in answer_key.items()})
+                for quiz_id, answer_key in db.query(Quiz.id, Quiz.answer_key).order_by(Quiz.id).limit(200)
+            ]
+            # Questions that have been answered, so statistics are not empty
+            self.question_ids = [row[0] for row in db.query(AttemptAnswer.question_id).group_by(
+                AttemptAnswer.question_id
+            ).order_by(func.count().desc()).limit(200)]
+            if not self.question_ids:
+                self.question_ids = sorted({qid for _, key in self.quizzes for qid in key})[:200]
+            self.tags = [row[0] for row in db.query(Tag.name).order_by(Tag.id).limit(3)]
+        finally:
+            db.close()
+        self.run_id = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+
+    def question_id(self, i):
+        return self.question_ids[i % len(self.question_ids)]
+
+    def quiz(self, i):
+        return self.quizzes[i % len(self.quizzes)]
+
+    def question_payload(self, i, stem=None):
+        return {
+            'stem': stem or f"Benchmark question {self.run_id}-{i}: which option is correct?",
+            'question_type': 'single',
+            'correct_answer': [i % 3],
+            'explanation': f"Benchmark explanation {i}",
+            'difficulty': ('easy', 'medium', 'hard')[i % 3],
+            'options': [{'text': f"Option {label} {i}", 'label': label, 'order_index': j}
+                        for j, label in enumerate('ABC')],
+            'tags': self.tags[:1],
+        }
+
+    def new_question_id(self, i):
+        """Insert a throwaway question, outside the timed call."""
+        from models import Option, Question
+        db = self.session_factory()
+        try:
+            question = Question(stem=f"Disposable question {self.run_id}-{i}", question_type='single',
+                                correct_answer=[0], difficulty='easy',
+                                options=[Option(text='Yes', label='A', order_index=0),
+                                         Option(text='No', label='B', order_index=1)])
+            db.add(question)
+            db.commit()
+            return question.id
+        finally:
+            db.close()
+
+    def rescore_job_id(self):
+        from rescoring import create_rescore_job, list_rescore_jobs
+        jobs = list_rescore_jobs()
+        return jobs[0].id if jobs else create_rescore_job(self.question_id(0)).id
+
+    def profile_name(self):
+        """A stored profile, saved outside the timed call if there is none."""
+        from main import profile_store
+        from profiling import profile_name
+        profiles = profile_store.list()
+        if profiles:
+            return profiles[0].name
+        name = profile_name('GET', '/api/benchmark')
+        profile_store.save(name, "bench.case 1\n")
+        return name
+
+    def edited_question(self, question_id, i):
+        from models import Question
+        db = self.session_factory()
+        try:
+            question = db.get(Question, question_id)
+            return {
+                'stem': question.stem,
+                'question_type': question.question_type,
+                'correct_answer': question.correct_answer,
+                'explanation': f"Edited by benchmark {i}",
+                'difficulty': question.difficulty,
+                'options': [{'text': option.text, 'label': option.label, 'order_index': option.order_index}
+                            for option in sorted(question.options, key=lambda o: o.order_index)],
+                'tags': [],
+            }
+        finally:
+            db.close()
+
+    def docx_bytes(self, i, part=0):
+        from docx import Document
+        from docx_parser import question_paragraphs
+        doc = Document()
+        for n in range(1, UPLOAD_QUESTIONS + 1):
+            for text in question_paragraphs(n, {
+                'stem': f"Uploaded question {self.run_id}-{i}-{part}-{n}: pick the right option",
+                'question_type': 'single',
+                'options': ['First', 'Second', 'Third'],
+                'correct_answer': [n % 3],
+            }):
+                doc.add_paragraph(text)
+        buffer = io.BytesIO()
+        doc.save(buffer)
+        return buffer.getvalue()
+
+    def jsonl_bytes(self, i):
+        return ''.join(json.dumps({
+            'stem': f"Structured question {self.run_id}-{i}-{n}",
+            'options': ['Yes', 'No', 'Maybe'],
+            'correct_answer': [n % 3],
+            'tags': self.tags[:2],
+        }) + '\n' for n in range(UPLOAD_QUESTIONS)).encode('utf-8')
+
+
+DOCX_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def _zip_of(documents):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in documents:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def build_cases():
+    admin = lambda ctx: ctx.admin_headers
+    student = lambda ctx: ctx.student_headers
+
+    def attempt(ctx, i):
+        quiz_id, key = ctx.quiz(i)
+        selected = {str(qid): answer if n % 3 else [0] for n, (qid, answer) in enumerate(key.items())}
+        return {'url': f"/api/quizzes/{quiz_id}/attempt", 'headers': student(ctx), 'json': {
+            'quiz_id': quiz_id, 'selected_answers': selected,
+            'score': 0, 'total_questions': 0, 'correct_answers': 0}}
+
+    return [
+        Case('POST', '/api/auth/google', lambda ctx, i: {'json': {'id_token': 'stub'}}),
+        Case('GET', '/api/auth/me', lambda ctx, i: {'headers': admin(ctx)}),
+
+        Case('GET', '/api/questions', lambda ctx, i: {'params': {'limit': 100}}),
+        Case('GET', '/api/questions', lambda ctx, i: {'params': {
+            'limit': 100, 'fields': 'id,stem', 'include': 'options,tags'}}, name='GET /api/questions (sparse)'),
+        Case('GET', '/api/questions', lambda ctx, i: {'params': {
+            'limit': 100, 'tag': ctx.tags[:2], 'tag_mode': 'all'}}, name='GET /api/questions (tag all)'),
+        Case('GET', '/api/questions/stats', lambda ctx, i: {'params': {'question_ids': ctx.question_ids[:100]}}),
+        Case('GET', '/api/questions/facets', lambda ctx, i: {'params': {'count': 20}}),
+        Case('GET', '/api/questions/facets', lambda ctx, i: {'params': {
+            'difficulty': 'hard', 'tag_ids': [1, 2], 'count': 20}}, name='GET /api/questions/facets (filtered)'),
+        Case('GET', '/api/questions/export', lambda ctx, i: {'headers': admin(ctx), 'params': {
+            'format': 'jsonl', 'tag': ctx.tags[:1], 'difficulty': 'easy', 'question_type': 'true_false'}},
+            iterations=10),
+        Case('GET', '/api/questions/{question_id}', lambda ctx, i: {
+            'url': f"/api/questions/{ctx.question_id(i)}"}),
+        Case('GET', '/api/questions/{question_id}/stats', lambda ctx, i: {
+            'url': f"/api/questions/{ctx.question_id(i)}/stats"}),
+        Case('POST', '/api/questions', lambda ctx, i: {'headers': admin(ctx), 'json': ctx.question_payload(i)}),
+        Case('PUT', '/api/questions/{question_id}', lambda ctx, i: {
+            'url': f"/api/questions/{ctx.question_id(i)}", 'headers': admin(ctx),
+            'json': ctx.edited_question(ctx.question_id(i), i)}),
+        Case('POST', '/api/questions/{question_id}/rescore', lambda ctx, i: {
+            'url': f"/api/questions/{ctx.question_id(i)}/rescore", 'headers': admin(ctx)}, iterations=10),
+        Case('DELETE', '/api/questions/{question_id}', lambda ctx, i: {
+            'url': f"/api/questions/{ctx.new_question_id(i)}", 'headers': admin(ctx)}),
+
+        Case('POST', '/api/upload-docx', lambda ctx, i: {'headers': admin(ctx), 'files': {
+            'file': (f"bench-{i}.docx", ctx.docx_bytes(i), DOCX_TYPE)}}, iterations=10),
+        Case('POST', '/api/upload-docx/batch', lambda ctx, i: {'headers': admin(ctx), 'files': {
+            'files': (f"bench-{i}.zip", _zip_of([(f"part-{part}.docx", ctx.docx_bytes(i, part))
+                                                 for part in range(2)]), 'application/zip')}},
+            iterations=5),
+        Case('POST', '/api/upload-questions', lambda ctx, i: {'headers': admin(ctx), 'files': {
+            'file': (f"bench-{i}.jsonl", ctx.jsonl_bytes(i), 'application/x-ndjson')}}, iterations=10),
+        Case('GET', '/api/import-reports', lambda ctx, i: {'headers': admin(ctx)}),
+
+        Case('POST', '/api/quizzes/generate', lambda ctx, i: {'headers': admin(ctx), 'json': {'count': 20}}),
+        Case('POST', '/api/quizzes/generate-forms', lambda ctx, i: {'headers': admin(ctx), 'json': {
+            'forms': 5, 'count': 20, 'seed': i}}, iterations=10),
+        Case('GET', '/api/quizzes', lambda ctx, i: {'params': {'limit': 100}}),
+        Case('GET', '/api/quizzes/{quiz_id}', lambda ctx, i: {'url': f"/api/quizzes/{ctx.quiz(i)[0]}"}),
+        Case('GET', '/api/quizzes/{quiz_id}/snapshot', lambda ctx, i: {
+            'url': f"/api/quizzes/{ctx.quiz(i)[0]}/snapshot", 'headers': {'Accept-Encoding': 'gzip'}}),
+        Case('POST', '/api/quizzes/{quiz_id}/attempt', attempt),
+
+        Case('GET', '/api/history', lambda ctx, i: {'headers': student(ctx)}),
+        Case('GET', '/api/history/summary', lambda ctx, i: {'headers': student(ctx), 'params': {'days': 365}}),
+        Case('GET', '/api/history/attempts', lambda ctx, i: {'headers': student(ctx)}),
+        Case('GET', '/api/rescore-jobs', lambda ctx, i: {'headers': admin(ctx)}),
+        Case('GET', '/api/rescore-jobs/{job_id}', lambda ctx, i: {
+            'url': f"/api/rescore-jobs/{ctx.rescore_job_id()}", 'headers': admin(ctx)}),
+        Case('GET', '/api/tags'),
+        Case('GET', '/metrics'),
+        Case('GET', '/api/profiles', lambda ctx, i: {'headers': admin(ctx)}),
+        Case('GET', '/api/profiles/{name}', lambda ctx, i: {
+            'url': f"/api/profiles/{ctx.profile_name()}", 'headers': admin(ctx)}),
+        Case('POST', '/api/tags', lambda ctx, i: {'headers': admin(ctx), 'json': {'name': f"bench-{ctx.run_id}-{i}"}}),
+    ]
+
+
+def api_routes(app):
+    from fastapi.routing import APIRoute
+    return {
+        (method, route.path) for route in app.routes if isinstance(route, APIRoute)
+        for method in route.methods
+    }
+
+
+def summarize(durations, statuses, elapsed):
+    ms = np.array(durations) * 1000
+    errors = sum(count for status, count in statuses.items() if int(status) >= 400)
+    return {
+        'iterations': len(durations),
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'min_ms': float(ms.min()),
+        'max_ms': float(ms.max()),
+        'requests_per_sec': len(durations) / elapsed if elapsed else None,
+        'statuses': statuses,
+        'errors': errors,
+    }
+
+
+async def run_case(client, ctx, case, iterations, warmup):
+    # Untimed warm-up calls fill caches (answer keys, facet index, parse pool)
+    for i in range(warmup):
+        await client.request(case.method, **{'url': case.path, **case.build(ctx, -1 - i)})
+
+    durations = []
+    statuses = {}
+    total = 0.0
+    for i in range(iterations):
+        request = {'url': case.path, **case.build(ctx, i)}
+        started = time.perf_counter()
+        response = await client.request(case.method, **request)
+        elapsed = time.perf_counter() - started
+        total += elapsed
+        durations.append(elapsed)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+    return summarize(durations, statuses, total)
+
+
+async def run_cases(app, ctx, cases, args):
+    import httpx
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for case in cases:
+            iterations = min(args.iterations, case.iterations or args.iterations)
+            result = await run_case(client, ctx, case, iterations, args.warmup)
+            results[case.name] = result
+            flag = f"  {result['errors']} errors {result['statuses']}" if result['errors'] else ""
+            print(f"{case.name:<52} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+                  f"{result['requests_per_sec']:8.1f} req/s{flag}")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print p50 ratios against a baseline report; return the routes over ``threshold``."""
+    baseline = json.loads(Path(baseline_path).read_text())['routes']
+    regressions = []
+    print(f"\nAgainst {baseline_path} (p50):")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name:<52} new")
+            continue
+        ratio = result['p50_ms'] / baseline[name]['p50_ms'] if baseline[name]['p50_ms'] else float('inf')
+        marker = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<52} {baseline[name]['p50_ms']:8.2f}ms -> {result['p50_ms']:8.2f}ms  {ratio:5.2f}x{marker}")
+        if ratio > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark every API route over a seeded bank")
+    arg_parser.add_argument('--size', choices=list(SIZES), default='10k', help="questions in the corpus")
+    arg_parser.add_argument('--questions', type=int, help="exact question count (overrides --size)")
+    arg_parser.add_argument('--users', type=int, default=500)
+    arg_parser.add_argument('--quizzes', type=int, default=1000)
+    arg_parser.add_argument('--attempts', type=int, help="graded attempts (default: questions / 2, at most 100k)")
+    arg_parser.add_argument('--seed', type=int, default=1)
+    arg_parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'questionbank-bench'),
+                            help="where seeded corpora are cached")
+    arg_parser.add_argument('--iterations', type=int, default=50, help="timed calls per route")
+    arg_parser.add_argument('--warmup', type=int, default=3, help="untimed calls per route")
+    arg_parser.add_argument('--only', help="run only routes whose name contains this")
+    arg_parser.add_argument('--json', help="write the report to this file")
+    arg_parser.add_argument('--compare', help="baseline report to compare p50 latencies against")
+    arg_parser.add_argument('--threshold', type=float, default=1.25,
+                            help="slowdown ratio counted as a regression")
+    args = arg_parser.parse_args()
+    args.questions = args.questions or SIZES[args.size]
+    if args.attempts is None:
+        args.attempts = min(args.questions // 2, 100_000)
+
+    workdir = tempfile.mkdtemp(prefix='questionbank-bench-')
+    working_copy = Path(workdir) / 'bank.db'
+    # The app's engine is created from DATABASE_URL when models is first
+    # imported, which seeding does too
+    os.environ['DATABASE_URL'] = f"sqlite:///{working_copy}"
+    os.environ['PROFILE_DIR'] = str(Path(workdir) / 'profiles')
+    try:
+        corpus = corpus_path(args.data_dir, args)
+        seed_seconds = seed_corpus(corpus, args)
+        shutil.copyfile(corpus, working_copy)
+
+        import main as app_module
+        from batch_import import shutdown_parse_pool
+        from models import SessionLocal
+
+        ctx = Context(SessionLocal, app_module.create_access_token)
+        verify = app_module.id_token.verify_oauth2_token
+        app_module.id_token.verify_oauth2_token = lambda token, request, audience: {
+            'email': ctx.student_email, 'name': 'Seed student', 'sub': 'bench-google-id'}
+
+        cases = build_cases()
+        covered = {(case.method, case.path) for case in cases}
+        uncovered = sorted(f"{method} {path}" for method, path in api_routes(app_module.app) - covered)
+        if args.only:
+            cases = [case for case in cases if args.only in case.name]
+        try:
+            results = asyncio.run(run_cases(app_module.app, ctx, cases, args))
+        finally:
+            app_module.id_token.verify_oauth2_token = verify
+            shutdown_parse_pool()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if uncovered:
+        print(f"\nRoutes without a benchmark case: {', '.join(uncovered)}")
+
+    report = {
+        'version': REPORT_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': {
+            'questions': args.questions, 'users': args.users, 'quizzes': args.quizzes,
+            'attempts': args.attempts, 'seed': args.seed, 'seed_seconds': seed_seconds,
+        },
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'routes': results,
+        'uncovered': uncovered,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} routes slower than {args.threshold}x baseline")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
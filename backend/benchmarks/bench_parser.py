@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Line-classification throughput benchmark for DocxParser.
+
+Generates a synthetic document (100k questions by default) covering every
+question-start style, options, answers, explanations, difficulty lines,
+multi-line stems and malformed entries, then feeds the same paragraphs to the
+current parser and to a frozen copy of the previous regex-per-line
+implementation. Both must produce identical questions and errors; the report
+gives lines/sec for each and the speedup.
+
+Usage:
+    python benchmarks/bench_parser.py [--questions N] [--repeat R] [--docx] [--json FILE]
+
+``--docx`` additionally writes the corpus to a real .docx file and times
+``parse_document`` end to end, including python-docx XML loading.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from docx import Document
+from docx_parser import DocxParser, ParsedQuestion
+
+
+class LegacyDocxParser(DocxParser):
+    """The line classifier as it was before precompiled single-pass dispatch."""
+
+    def _process_paragraphs(self, paragraphs):
+        for i, paragraph in enumerate(paragraphs):
+            self.total_lines = i + 1
+            text = paragraph.text.strip()
+            if not text:
+                continue
+
+            if self._is_question_start(text):
+                if self.current_question:
+                    self._finalize_current_question()
+                self.current_question = ParsedQuestion()
+                self.current_question.raw_lines.append((i+1, text))
+                self._parse_question_stem(text)
+            elif self.current_question:
+                self.current_question.raw_lines.append((i+1, text))
+                self._parse_legacy_content(text)
+
+    def _is_question_start(self, text):
+        patterns = [
+            r'^\d+\.\s+',
+            r'^\d+\)\s+',
+            r'^Question\s+\d+',
+            r'^Q\d+\.\s+',
+        ]
+        return any(re.match(pattern, text, re.IGNORECASE) for pattern in patterns)
+
+    def _parse_question_stem(self, text):
+        stem = re.sub(r'^(\d+\.|\d+\)|Question\s+\d+|Q\d+\.)\s*', '', text, flags=re.IGNORECASE)
+        self.current_question.stem = stem.strip()
+
+    def _parse_legacy_content(self, text):
+        option_match = re.match(r'^([A-Z])[\.\)]\s*(.+)', text, re.IGNORECASE)
+        if option_match:
+            self.current_question.options.append({
+                'label': option_match.group(1).upper(),
+                'text': option_match.group(2).strip()
+            })
+            return
+
+        answer_match = re.match(r'^(Answer|Correct|Solution)[:\s]+(.+)', text, re.IGNORECASE)
+        if answer_match:
+            self._parse_legacy_answer(answer_match.group(2).strip())
+            return
+
+        explanation_match = re.match(r'^(Explanation|Reasoning|Explain)[:\s]+(.+)', text, re.IGNORECASE)
+        if explanation_match:
+            self.current_question.explanation = explanation_match.group(2).strip()
+            return
+
+        difficulty_match = re.match(r'^(Difficulty|Level)[:\s]+(.+)', text, re.IGNORECASE)
+        if difficulty_match:
+            self.current_question.difficulty = difficulty_match.group(2).strip().lower()
+            return
+
+        if self.current_question.stem and not self.current_question.options:
+            self.current_question.stem += " " + text
+
+    def _parse_legacy_answer(self, answer_text):
+        if answer_text.upper() in ['TRUE', 'FALSE', 'T', 'F']:
+            self.current_question.question_type = 'true_false'
+            self.current_question.correct_answer = [0] if answer_text.upper() in ['TRUE', 'T'] else [1]
+            if not self.current_question.options:
+                self.current_question.options = [
+                    {'label': 'A', 'text': 'True'},
+                    {'label': 'B', 'text': 'False'}
+                ]
+            return
+        if re.match(r'^[A-Z]$', answer_text.upper()):
+            self.current_question.correct_answer = [ord(answer_text.upper()) - ord('A')]
+            self._determine_question_type()
+            return
+        letters = re.findall(r'[A-Z]', answer_text.upper())
+        if letters:
+            self.current_question.correct_answer = [ord(letter) - ord('A') for letter in letters]
+            self._determine_question_type()
+
+
+class Line:
+    """Stand-in for a python-docx paragraph; the parser only reads ``text``."""
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        self.text = text
+
+
+START_STYLES = [
+    lambda n: f"{n}. ",
+    lambda n: f"{n}) ",
+    lambda n: f"Question {n}: ",
+    lambda n: f"Q{n}. ",
+]
+
+
+def generate_lines(question_count):
+    """Yield paragraph texts for ``question_count`` varied questions."""
+    for n in range(1, question_count + 1):
+        start = START_STYLES[n % len(START_STYLES)](n)
+        kind = n % 10
+        yield f"{start}Which statement about topic {n} is correct?"
+        if kind == 1:
+            yield f"Consider the scenario described in case study {n}."
+            yield "Assume all values are measured in SI units."
+        if kind in (2, 3):
+            yield f"Answer: {'True' if kind == 2 else 'F'}"
+        elif kind == 4:
+            # Malformed: options but no answer line
+            yield "A. First option"
+            yield "B. Second option"
+        elif kind == 5:
+            # Malformed: answer beyond the available options
+            yield "A) Only option"
+            yield "Answer: D"
+        else:
+            for label in "ABCD":
+                yield f"{label}. Option {label.lower()} for question {n}"
+            yield "Answer: A, C" if kind == 6 else f"Correct: {'ABCD'[n % 4]}"
+        if n % 3 == 0:
+            yield f"Explanation: Because of rule {n}."
+        if n % 7 == 0:
+            yield f"Difficulty: {('easy', 'medium', 'hard')[n % 3]}"
+        yield ""
+
+
+def summarize(questions, errors):
+    """Reduce parser output to comparable plain data."""
+    return (
+        [(q.stem, q.question_type, q.options, q.correct_answer, q.explanation, q.difficulty, q.raw_lines)
+         for q in questions],
+        errors,
+    )
+
+
+def time_parser(parser_class, lines, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        parser = parser_class()
+        started = time.perf_counter()
+        parser._process_paragraphs(lines)
+        parser._finalize_current_question()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        result = (parser.questions, parser.errors)
+    return best, result
+
+
+def time_docx(parser_class, path):
+    started = time.perf_counter()
+    questions, errors = parser_class().parse_document(path)
+    return time.perf_counter() - started, (questions, errors)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark DocxParser line classification")
+    arg_parser.add_argument('--questions', type=int, default=100_000)
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per parser; the best is reported")
+    arg_parser.add_argument('--docx', action='store_true', help="also time parse_document on a real .docx")
+    arg_parser.add_argument('--json', help="write the results to this file")
+    args = arg_parser.parse_args()
+
+    texts = list(generate_lines(args.questions))
+    lines = [Line(text) for text in texts]
+    print(f"Corpus: {args.questions} questions, {len(lines)} lines")
+
+    results = {'questions': args.questions, 'lines': len(lines), 'parsers': {}}
+    outputs = {}
+    for name, parser_class in [('legacy', LegacyDocxParser), ('current', DocxParser)]:
+        elapsed, outputs[name] = time_parser(parser_class, lines, args.repeat)
+        results['parsers'][name] = {
+            'seconds': elapsed,
+            'lines_per_sec': len(lines) / elapsed,
+            'questions': len(outputs[name][0]),
+            'errors': len(outputs[name][1]),
+        }
+        print(f"{name:>8}: {elapsed:.3f}s  {len(lines) / elapsed:,.0f} lines/sec  "
+              f"({len(outputs[name][0])} questions, {len(outputs[name][1])} errors)")
+
+    if summarize(*outputs['legacy']) != summarize(*outputs['current']):
+        print("ERROR: parsers produced different results")
+        sys.exit(1)
+    results['speedup'] = results['parsers']['legacy']['seconds'] / results['parsers']['current']['seconds']
+    print(f" speedup: {results['speedup']:.2f}x (outputs identical)")
+
+    if args.docx:
+        doc = Document()
+        for text in texts:
+            doc.add_paragraph(text)
+        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
+            path = tmp.name
+        try:
+            doc.save(path)
+            results['docx'] = {}
+            for name, parser_class in [('legacy', LegacyDocxParser), ('current', DocxParser)]:
+                elapsed, _ = time_docx(parser_class, path)
+                results['docx'][name] = {'seconds': elapsed, 'lines_per_sec': len(lines) / elapsed}
+                print(f"{name:>8} (.docx end to end): {elapsed:.3f}s  {len(lines) / elapsed:,.0f} lines/sec")
+        finally:
+            os.unlink(path)
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
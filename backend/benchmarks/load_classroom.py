@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Classroom-burst load test: many students sign in, open the same quiz and
+submit it within a couple of minutes.
+
+``serve`` runs the app under uvicorn with Google sign-in stubbed out: an ID
+token of the form ``stub:<email>`` signs in as that address. Before starting
+it seeds questions if the bank has too few and creates the quiz the students
+take. Each worker also logs how long every SQLite write statement and commit
+took, tagged with the phase of the request that made it. Those statements are
+where SQLite waits for its write lock, so their durations are an upper bound
+on lock waits. ``database is locked`` errors are logged as well.
+
+``run`` simulates the students. Student sign-ins are spread evenly over
+``--ramp`` seconds. Each student then
+
+1. signs in (``POST /api/auth/google``),
+2. loads the quiz (``GET /api/quizzes/{id}``),
+3. loads each question in turn (``GET /api/questions/{id}``),
+4. answers for ``--think`` seconds (varying by 50% either way) and submits
+   (``POST /api/quizzes/{id}/attempt``).
+
+No more than ``--concurrency`` requests are in flight at once. Without
+``--url``, ``run`` starts a ``serve`` process on a fresh database and stops
+it afterwards. The report gives request counts, error rates, latency
+percentiles and SQLite waits for each phase.
+
+Usage:
+    python benchmarks/load_classroom.py run [--students 500] [--concurrency 100] [--ramp 30] [--think 60]
+        [--workers N] [--url URL --stats-dir DIR] [--quiz-id ID] [--json FILE]
+    python benchmarks/load_classroom.py serve [--port 8000] [--workers N] [--database FILE] [--stats-dir DIR]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+import numpy as np
+
+# Add backend directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+PHASES = ('login', 'quiz', 'questions', 'submit')
+PHASE_ROUTES = [
+    ('login', 'POST', re.compile(r'/api/auth/google$')),
+    ('quiz', 'GET', re.compile(r'/api/quizzes/\d+$')),
+    ('questions', 'GET', re.compile(r'/api/questions/\d+$')),
+    ('submit', 'POST', re.compile(r'/api/quizzes/\d+/attempt$')),
+]
+STUB_TOKEN_PREFIX = 'stub:'
+SETUP_FILE = 'setup.json'
+DEFAULT_STATS_DIR = os.path.join(tempfile.gettempdir(), 'questionbank-load')
+
+_request_phase = ContextVar('request_phase', default='other')
+
+
+def request_phase(method, path):
+    for phase, phase_method, pattern in PHASE_ROUTES:
+        if method == phase_method and pattern.match(path):
+            return phase
+    return 'other'
+
+
+# Server side
+
+def stub_verify_oauth2_token(token, request=None, audience=None):
+    """Accept ``stub:<email>`` in place of a Google ID token."""
+    if not token.startswith(STUB_TOKEN_PREFIX):
+        raise ValueError("Wrong number of segments in token")
+    email = token[len(STUB_TOKEN_PREFIX):]
+    return {'email': email, 'name': email.split('@')[0], 'sub': f"stub-{email}"}
+
+
+class SqliteWaitLog:
+    """Appends ``phase, kind, milliseconds`` lines to one file per worker process."""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / f"sqlite-{os.getpid()}.log"
+        self._file = None
+        self._lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        line = f"{_request_phase.get()}\t{kind}\t{seconds * 1000:.3f}\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', buffering=1)
+            self._file.write(line)
+
+
+def instrument_engine(engine, wait_log):
+    """Time write statements and commits, and count lock errors."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() != 'SELECT':
+            conn.info['write_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('write_started', None)
+        if started is not None:
+            wait_log.record('write', time.perf_counter() - started)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        if context.connection is not None:
+            context.connection.info.pop('write_started', None)
+        if 'database is locked' in str(context.original_exception):
+            wait_log.record('locked', 0.0)
+
+    # Committing is where a writer waits for readers to finish with the database
+    do_commit = engine.dialect.do_commit
+
+    def timed_commit(dbapi_connection):
+        started = time.perf_counter()
+        try:
+            do_commit(dbapi_connection)
+        finally:
+            wait_log.record('commit', time.perf_counter() - started)
+
+    engine.dialect.do_commit = timed_commit
+
+
+def create_app():
+    """The app with stubbed sign-in and SQLite wait logging; a uvicorn factory."""
+    import main
+    from models import engine
+
+    main.id_token.verify_oauth2_token = stub_verify_oauth2_token
+    instrument_engine(engine, SqliteWaitLog(os.environ.get('LOAD_STATS_DIR', DEFAULT_STATS_DIR)))
+
+    async def phased_app(scope, receive, send):
+        if scope['type'] != 'http':
+            return await main.app(scope, receive, send)
+        token = _request_phase.set(request_phase(scope['method'], scope['path']))
+        try:
+            await main.app(scope, receive, send)
+        finally:
+            _request_phase.reset(token)
+
+    return phased_app
+
+
+def prepare_quiz(questions, quiz_questions):
+    """Seed questions if the bank has too few, and create the quiz to take."""
+    from models import Question, SessionLocal, create_tables
+    from seeding import seed_questions, seed_quizzes
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        live = db.query(Question).filter(Question.retired == False).count()
+        if live < quiz_questions:
+            seed_questions(db, max(questions, quiz_questions) - live)
+        return seed_quizzes(db, 1, questions_per_quiz=quiz_questions)[0]
+    finally:
+        db.close()
+
+
+def serve(args):
+    import uvicorn
+
+    if args.database:
+        os.environ['DATABASE_URL'] = f"sqlite:///{Path(args.database).resolve()}"
+    stats_dir = Path(args.stats_dir)
+    stats_dir.mkdir(parents=True, exist_ok=True)
+    os.environ['LOAD_STATS_DIR'] = str(stats_dir)
+
+    quiz_id = prepare_quiz(args.questions, args.quiz_questions)
+    (stats_dir / SETUP_FILE).write_text(json.dumps({'quiz_id': quiz_id}))
+    print(f"Quiz {quiz_id} ready; SQLite waits are logged to {stats_dir}", flush=True)
+    uvicorn.run('load_classroom:create_app', factory=True, host=args.host, port=args.port,
+                workers=args.workers, app_dir=str(Path(__file__).parent), log_level='warning')
+
+
+# Client side
+
+class PhaseRecorder:
+    def __init__(self):
+        self.durations = {phase: [] for phase in PHASES}
+        self.statuses = {phase: {} for phase in PHASES}
+
+    def record(self, phase, seconds, status):
+        self.durations[phase].append(seconds)
+        self.statuses[phase][status] = self.statuses[phase].get(status, 0) + 1
+
+
+async def timed_request(client, limit, recorder, phase, method, url, **kwargs):
+    async with limit:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            recorder.record(phase, time.perf_counter() - started, type(e).__name__)
+            return None
+        recorder.record(phase, time.perf_counter() - started, str(response.status_code))
+    return response if response.is_success else None
+
+
+async def student(client, limit, recorder, number, quiz_id, start_delay, think, rng):
+    await asyncio.sleep(start_delay)
+    response = await timed_request(client, limit, recorder, 'login', 'POST', '/api/auth/google',
+                                   json={'id_token': f"{STUB_TOKEN_PREFIX}load-student-{number}@example.com"})
+    if response is None:
+        return
+    headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    response = await timed_request(client, limit, recorder, 'quiz', 'GET', f"/api/quizzes/{quiz_id}")
+    if response is None:
+        return
+    selected = {}
+    for question_id in response.json()['question_ids']:
+        response = await timed_request(client, limit, recorder, 'questions', 'GET',
+                                       f"/api/questions/{question_id}")
+        if response is not None:
+            selected[str(question_id)] = [rng.randrange(len(response.json()['options']) or 1)]
+
+    await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+    await timed_request(client, limit, recorder, 'submit', 'POST', f"/api/quizzes/{quiz_id}/attempt",
+                        headers=headers, json={'quiz_id': quiz_id, 'selected_answers': selected,
+                                               'score': 0, 'total_questions': 0, 'correct_answers': 0})
+
+
+async def simulate(args, quiz_id):
+    import httpx
+
+    recorder = PhaseRecorder()
+    limit = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        await asyncio.gather(*(
+            student(client, limit, recorder, number, quiz_id, args.ramp * number / args.students,
+                    args.think, random.Random(rng.random()))
+            for number in range(args.students)
+        ))
+    return recorder
+
+
+def log_offsets(stats_dir):
+    return {path: path.stat().st_size for path in Path(stats_dir).glob('sqlite-*.log')}
+
+
+def read_waits(stats_dir, offsets):
+    """SQLite wait samples logged since ``offsets``, by phase and kind."""
+    waits = {}
+    for path in Path(stats_dir).glob('sqlite-*.log'):
+        with open(path) as f:
+            f.seek(offsets.get(path, 0))
+            for line in f:
+                phase, kind, ms = line.rstrip('\n').split('\t')
+                waits.setdefault(phase, {}).setdefault(kind, []).append(float(ms))
+    return waits
+
+
+def percentiles(ms):
+    ms = np.array(ms)
+    return {
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+    }
+
+
+def summarize_phase(durations, statuses, waits):
+    requests = len(durations)
+    errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+    summary = {
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests if requests else 0.0,
+        'statuses': statuses,
+    }
+    if durations:
+        summary.update(percentiles(np.array(durations) * 1000))
+    if waits is not None:
+        samples = waits.get('write', []) + waits.get('commit', [])
+        summary['sqlite'] = {
+            'writes': len(waits.get('write', [])),
+            'commits': len(waits.get('commit', [])),
+            'locked_errors': len(waits.get('locked', [])),
+            'wait_ms': float(sum(samples)),
+            **(percentiles(samples) if samples else {}),
+        }
+    return summary
+
+
+def print_report(report):
+    print(f"\n{report['students']} students in {report['elapsed_seconds']:.1f}s "
+          f"({report['requests_per_sec']:.1f} req/s)")
+    print(f"{'phase':<10} {'requests':>8} {'errors':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"
+          f"   SQLite waits (writes+commits: total, p95, max, locked)")
+    for phase, summary in report['phases'].items():
+        if not summary['requests'] and 'sqlite' not in summary:
+            continue
+        line = f"{phase:<10} {summary['requests']:>8} {summary['error_rate']:>6.1%}"
+        if summary['requests']:
+            line += ''.join(f" {summary[key]:>7.1f}ms" for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+        else:
+            line += ' ' * 40
+        sqlite = summary.get('sqlite')
+        if sqlite and (sqlite['writes'] or sqlite['commits']):
+            line += (f"   {sqlite['wait_ms']:.0f}ms, {sqlite['p95_ms']:.1f}ms, {sqlite['max_ms']:.1f}ms, "
+                     f"{sqlite['locked_errors']}")
+        print(line)
+        if summary['errors']:
+            print(f"{'':<10} statuses: {summary['statuses']}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir):
+    """Start ``serve`` on a fresh database and wait until it answers."""
+    import httpx
+
+    port = free_port()
+    command = [
+        sys.executable, __file__, 'serve', '--port', str(port), '--workers', str(args.workers),
+        '--database', str(Path(workdir) / 'bank.db'), '--stats-dir', args.stats_dir,
+        '--questions', str(args.questions), '--quiz-questions', str(args.quiz_questions),
+    ]
+    process = subprocess.Popen(command)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/api/tags").status_code == 200:
+                return process, url
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("Server did not start within 120s")
+
+
+def run(args):
+    process = None
+    workdir = tempfile.TemporaryDirectory(prefix='questionbank-load-')
+    if args.url is None:
+        args.stats_dir = workdir.name
+        process, args.url = start_server(args, workdir.name)
+    try:
+        quiz_id = args.quiz_id
+        if quiz_id is None:
+            setup = Path(args.stats_dir) / SETUP_FILE
+            if not setup.exists():
+                raise SystemExit(f"No {SETUP_FILE} in {args.stats_dir}; pass --quiz-id")
+            quiz_id = json.loads(setup.read_text())['quiz_id']
+
+        offsets = log_offsets(args.stats_dir)
+        started = time.perf_counter()
+        recorder = asyncio.run(simulate(args, quiz_id))
+        elapsed = time.perf_counter() - started
+        # Wait logs are line-buffered, so everything up to the last response is on disk
+        waits = read_waits(args.stats_dir, offsets)
+        # Against a server that is not `serve`, there is nothing to report
+        logged = bool(log_offsets(args.stats_dir))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        workdir.cleanup()
+
+    phases = {
+        phase: summarize_phase(recorder.durations[phase], recorder.statuses[phase],
+                               waits.get(phase, {}) if logged else None)
+        for phase in PHASES
+    }
+    if waits.get('other'):
+        phases['other'] = summarize_phase([], {}, waits['other'])
+    total_requests = sum(len(durations) for durations in recorder.durations.values())
+    report = {
+        'url': args.url,
+        'quiz_id': quiz_id,
+        'students': args.students,
+        'concurrency': args.concurrency,
+        'ramp_seconds': args.ramp,
+        'think_seconds': args.think,
+        'workers': args.workers if process is not None else None,
+        'elapsed_seconds': elapsed,
+        'requests_per_sec': total_requests / elapsed if elapsed else 0.0,
+        'phases': phases,
+    }
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Classroom-burst load test for the quiz lifecycle")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    def add_setup_arguments(command):
+        command.add_argument('--workers', type=int, default=1, help="uvicorn worker processes")
+        command.add_argument('--questions', type=int, default=2000, help="questions to seed into an empty bank")
+        command.add_argument('--quiz-questions', type=int, default=20, help="questions in the quiz")
+
+    command = commands.add_parser('serve', help="run the app with stubbed sign-in and SQLite wait logging")
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8000)
+    command.add_argument('--database', help="SQLite file to use instead of DATABASE_URL")
+    command.add_argument('--stats-dir', default=DEFAULT_STATS_DIR, help="where SQLite waits are logged")
+    add_setup_arguments(command)
+    command.set_defaults(handler=serve)
+
+    command = commands.add_parser('run', help="simulate the students")
+    command.add_argument('--url', help="a running `serve` (default: start one on a fresh database)")
+    command.add_argument('--stats-dir', default=DEFAULT_STATS_DIR, help="the --stats-dir given to `serve`")
+    command.add_argument('--quiz-id', type=int, help="quiz to take (default: the one `serve` created)")
+    command.add_argument('--students', type=int, default=500)
+    command.add_argument('--concurrency', type=int, default=100, help="maximum requests in flight")
+    command.add_argument('--ramp', type=float, default=30.0, help="seconds over which students sign in")
+    command.add_argument('--think', type=float, default=60.0, help="average seconds spent answering")
+    command.add_argument('--timeout', type=float, default=60.0, help="seconds before a request fails")
+    command.add_argument('--seed', type=int, default=1)
+    command.add_argument('--json', help="write the report to this file")
+    add_setup_arguments(command)
+    command.set_defaults(handler=run)
+
+    args = arg_parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
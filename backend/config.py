@@ -17,6 +17,13 @@ class Settings(BaseSettings):
     # CORS
     FRONTEND_URL: str = "http://localhost:5173"
     
+    # Log requests slower than this many milliseconds (0 turns the log off)
+    SLOW_REQUEST_MS: float = 0
+    
+    # Request profiles taken for admins, and how many are kept
+    PROFILE_DIR: str = "./profiles"
+    MAX_PROFILES: int = 20
+    
     class Config:
         env_file = ".env"
 
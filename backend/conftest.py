@@ -0,0 +1,75 @@
+import itertools
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Base, Question, Option, Quiz, User
+from docx_parser import ParsedQuestion
+from answer_keys import answer_key_cache
+from facets import facet_index
+from quiz_snapshots import materialize_snapshots
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+@pytest.fixture
+def session_factory(engine):
+    # The process-wide caches would otherwise carry keys from another test's database
+    answer_key_cache.clear()
+    facet_index.clear()
+    yield sessionmaker(bind=engine)
+    answer_key_cache.clear()
+    facet_index.clear()
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+_student_numbers = itertools.count(1)
+
+def make_quiz(db, answers, options="ABCD"):
+    """A student and a quiz of new questions with these correct answers, snapshotted as on creation."""
+    user = User(email=f"student{next(_student_numbers)}@example.com", name="Student")
+    questions = [
+        Question(
+            stem=f"Question {i}",
+            question_type='single' if len(answer) == 1 else 'multiple',
+            correct_answer=answer,
+            options=[Option(text=label, label=label, order_index=j) for j, label in enumerate(options)]
+        )
+        for i, answer in enumerate(answers)
+    ]
+    db.add(user)
+    db.add_all(questions)
+    db.flush()
+    quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+    return user, quiz, questions
+
+def add_quiz(db, question_ids, snapshot=False):
+    quiz = Quiz(title="Quiz", question_ids=question_ids)
+    db.add(quiz)
+    db.flush()
+    if snapshot:
+        materialize_snapshots(db, [quiz])
+    db.commit()
+    return quiz
+
+def make_parsed(stem, options, correct_answer, line_number=1, explanation=""):
+    parsed_q = ParsedQuestion()
+    parsed_q.stem = stem
+    parsed_q.options = [{'label': chr(ord('A') + i), 'text': text} for i, text in enumerate(options)]
+    parsed_q.correct_answer = correct_answer
+    parsed_q.question_type = 'single' if len(correct_answer) == 1 else 'multiple'
+    parsed_q.explanation = explanation
+    parsed_q.raw_lines = [(line_number, stem)]
+    return parsed_q
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import random
+import re
+import struct
+import unicodedata
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session, selectinload
+
+from models import Question, QuestionLSHBucket
+
+# MinHash / LSH parameters. 16 bands of 4 rows put the LSH threshold near a
+# Jaccard similarity of 0.5; candidates are then confirmed against the full
+# signature, so only pairs above NEAR_DUPLICATE_THRESHOLD are reported.
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+# Keeps IN (...) lists well below SQLite's bound-parameter limit.
+QUERY_CHUNK_SIZE = 500
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_SIGNATURE_FORMAT = f"<{NUM_PERMUTATIONS}I"
+
+_rng = random.Random(0x51A7E)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Normalize text so formatting-only differences hash identically."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def content_hash(stem: str, options: Sequence[str], correct_answer: Iterable[int]) -> str:
+    """Return the SHA-256 hex digest of a question's normalized content."""
+    payload = json.dumps(
+        [
+            normalize_text(stem),
+            [normalize_text(option) for option in options],
+            sorted(set(correct_answer)),
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def stem_key(stem: str) -> str:
+    """Identify a question across edits of its source document by its stem."""
+    return hashlib.sha256(normalize_text(stem).encode("utf-8")).hexdigest()
+
+
+def revision_hash(stem: str, options: Sequence[str], correct_answer: Iterable[int],
+                  explanation: Optional[str], difficulty: Optional[str], tags: Iterable[str] = ()) -> str:
+    """Hash every imported field, so any edit to a question changes it."""
+    fields = [content_hash(stem, options, correct_answer), normalize_text(explanation), normalize_text(difficulty),
+              sorted(set(tags))]
+    payload = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str) -> set:
+    words = _WORD_RE.findall(normalize_text(text))
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(stem: str, options: Sequence[str]) -> Tuple[int, ...]:
+    """Compute the MinHash signature of a question's stem and option text."""
+    text = " ".join([stem or ""] + list(options))
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in _shingles(text)]
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERMUTATIONS
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+def pack_signature(signature: Sequence[int]) -> bytes:
+    return struct.pack(_SIGNATURE_FORMAT, *signature)
+
+
+def unpack_signature(data: bytes) -> Tuple[int, ...]:
+    return struct.unpack(_SIGNATURE_FORMAT, data)
+
+
+def lsh_buckets(signature: Sequence[int]) -> List[Tuple[int, int]]:
+    """Split a signature into ``(band, bucket)`` keys for the LSH index."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f"<{LSH_ROWS}I", *rows), digest_size=8).digest()
+        # Keep the bucket within SQLite's signed 64-bit integer range
+        buckets.append((band, int.from_bytes(digest, "big") >> 1))
+    return buckets
+
+
+def estimate_similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimate the Jaccard similarity of two sets from their signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTATIONS
+
+
+def chunked(items: Sequence, size: int = QUERY_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_content_hashes(db: Session, hashes: Iterable[str]) -> Dict[str, int]:
+    """Map each hash already present in the bank to its question ID."""
+    found = {}
+    for chunk in chunked(list(set(hashes))):
+        rows = db.query(Question.content_hash, Question.id).filter(
+            Question.content_hash.in_(chunk)
+        ).all()
+        found.update(rows)
+    return found
+
+
+def _load_buckets(db: Session, keys: Iterable[Tuple[int, int]]) -> Dict[Tuple[int, int], List[int]]:
+    stored: Dict[Tuple[int, int], List[int]] = {}
+    for chunk in chunked(sorted(set(keys))):
+        buckets_by_band: Dict[int, List[int]] = {}
+        for band, bucket in chunk:
+            buckets_by_band.setdefault(band, []).append(bucket)
+        # One "band = ? AND bucket IN (...)" term per band is a seek on the
+        # (band, bucket, question_id) primary key; SQLite scans the table for
+        # a bucket-only filter or a row-value IN
+        rows = db.query(
+            QuestionLSHBucket.band, QuestionLSHBucket.bucket, QuestionLSHBucket.question_id
+        ).filter(or_(*(
+            and_(QuestionLSHBucket.band == band, QuestionLSHBucket.bucket.in_(buckets))
+            for band, buckets in buckets_by_band.items()
+        ))).all()
+        for band, bucket, question_id in rows:
+            stored.setdefault((band, bucket), []).append(question_id)
+    return stored
+
+
+def _load_signatures(db: Session, question_ids: Iterable[int]) -> Dict[int, Tuple[int, ...]]:
+    signatures = {}
+    for chunk in chunked(list(question_ids)):
+        rows = db.query(Question.id, Question.minhash_signature).filter(
+            Question.id.in_(chunk), Question.minhash_signature.isnot(None)
+        ).all()
+        for question_id, packed in rows:
+            signatures[question_id] = unpack_signature(packed)
+    return signatures
+
+
+def match_and_index(
+    db: Session,
+    question_ids: Sequence[int],
+    signatures: Sequence[Tuple[int, ...]],
+    threshold: float = NEAR_DUPLICATE_THRESHOLD,
+    replace: bool = False,
+) -> List[Optional[Tuple[int, float]]]:
+    """Find near-duplicates of flushed questions, then add them to the LSH index.
+
+    Candidates come from bucket-equality lookups, so the cost depends on the
+    number of colliding questions rather than on the size of the bank.
+    Questions in the same call are matched against each other as well. Pass
+    ``replace=True`` when the questions may already have buckets (edits).
+    Returns the best ``(question_id, similarity)`` match per question.
+    """
+    keys_per_question = [lsh_buckets(signature) for signature in signatures]
+    stored = _load_buckets(db, [key for keys in keys_per_question for key in keys])
+
+    stored_ids = {qid for ids in stored.values() for qid in ids} - set(question_ids)
+    known_signatures = _load_signatures(db, stored_ids)
+
+    matches = []
+    rows = []
+    for question_id, signature, keys in zip(question_ids, signatures, keys_per_question):
+        candidates = set()
+        for key in keys:
+            candidates.update(stored.get(key, ()))
+        candidates.discard(question_id)
+
+        best = None
+        for candidate in candidates:
+            other = known_signatures.get(candidate)
+            if other is None:
+                continue
+            similarity = estimate_similarity(signature, other)
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        matches.append(best)
+
+        known_signatures[question_id] = signature
+        for band, bucket in keys:
+            stored.setdefault((band, bucket), []).append(question_id)
+            rows.append({"band": band, "bucket": bucket, "question_id": question_id})
+
+    if replace:
+        for chunk in chunked(list(question_ids)):
+            db.query(QuestionLSHBucket).filter(QuestionLSHBucket.question_id.in_(chunk)).delete(
+                synchronize_session=False
+            )
+    if rows:
+        db.execute(insert(QuestionLSHBucket), rows)
+    return matches
+
+
+def question_fingerprint(question: Question) -> Tuple[str, Tuple[int, ...]]:
+    """Return the content hash and MinHash signature of a stored question."""
+    options = [option.text for option in sorted(question.options, key=lambda o: o.order_index)]
+    return (
+        content_hash(question.stem, options, question.correct_answer),
+        minhash_signature(question.stem, options),
+    )
+
+
+def index_question(db: Session, question: Question) -> Optional[Tuple[int, float]]:
+    """Refresh a question's content hash, signature and LSH buckets.
+
+    The caller is responsible for flushing ``question`` first so it has an ID.
+    Returns the closest near-duplicate match, if any.
+    """
+    digest, signature = question_fingerprint(question)
+    question.content_hash = digest
+    question.minhash_signature = pack_signature(signature)
+    return match_and_index(db, [question.id], [signature], replace=True)[0]
+
+
+def reindex_questions(db: Session, batch_size: int = 1000,
+                      progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+    """Backfill hashes and LSH buckets for questions stored before dedup existed.
+
+    Questions whose hash collides with an already indexed question are left
+    unhashed and counted as duplicates so they can be reviewed. ``progress``
+    is called with the number of questions examined after each batch.
+    """
+    stats = {"indexed": 0, "duplicates": 0, "near_duplicates": 0}
+    last_id = 0
+    while True:
+        questions = db.query(Question).options(selectinload(Question.options)).filter(
+            Question.id > last_id, Question.content_hash.is_(None)
+        ).order_by(Question.id).limit(batch_size).all()
+        if not questions:
+            break
+        last_id = questions[-1].id
+
+        fingerprints = [(question, question_fingerprint(question)) for question in questions]
+        taken = existing_content_hashes(db, [digest for _, (digest, _) in fingerprints])
+        indexed_ids, signatures = [], []
+        for question, (digest, signature) in fingerprints:
+            if digest in taken:
+                stats["duplicates"] += 1
+                continue
+            taken[digest] = question.id
+            question.content_hash = digest
+            question.minhash_signature = pack_signature(signature)
+            indexed_ids.append(question.id)
+            signatures.append(signature)
+
+        db.flush()
+        matches = match_and_index(db, indexed_ids, signatures, replace=True)
+        stats["indexed"] += len(indexed_ids)
+        stats["near_duplicates"] += sum(1 for match in matches if match)
+        db.commit()
+        if progress:
+            progress(stats["indexed"] + stats["duplicates"])
+    return stats
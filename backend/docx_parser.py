@@ -1,14 +1,34 @@
 import re
 import json
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional, Union
 from docx import Document
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.shared import Pt
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Every non-empty line is classified by a single precompiled match. Branches
+# are tried in order, so a question start wins over an option, an option over
+# an answer line, and so on; ``match.lastgroup`` names the branch that matched.
+_LINE_PATTERN = re.compile(
+    r'(?:\d+[.)]\s+|Q\d+\.\s+|Question\s+\d+)\s*(?P<stem>(?s:.*))'  # "1. ", "1) ", "Q1. ", "Question 1"
+    r'|(?P<label>[A-Z])[.)]\s*(?P<option>.+)'  # "A. ", "B) "
+    r'|(?:Answer|Correct|Solution)[:\s]+(?P<answer>.+)'
+    r'|(?:Explanation|Reasoning|Explain)[:\s]+(?P<explanation>.+)'
+    r'|(?:Difficulty|Level)[:\s]+(?P<difficulty>.+)',
+    re.IGNORECASE
+)
+_SINGLE_LETTER_PATTERN = re.compile(r'^[A-Z]$')
+_LETTER_PATTERN = re.compile(r'[A-Z]')
+_TRUE_FALSE_ANSWERS = frozenset(['TRUE', 'FALSE', 'T', 'F'])
+
 class ParsedQuestion:
+    __slots__ = ('stem', 'question_type', 'options', 'correct_answer',
+                 'explanation', 'difficulty', 'tags', 'raw_lines')
+
     def __init__(self):
         self.stem = ""
         self.question_type = None
@@ -24,9 +44,10 @@ class DocxParser:
         self.questions = []
         self.errors = []
         self.current_question = None
+        self.total_lines = 0
         
-    def parse_document(self, file_path: str) -> Tuple[List[ParsedQuestion], List[Dict]]:
-        """Parse a DOCX file and extract questions."""
+    def parse_document(self, file_path) -> Tuple[List[ParsedQuestion], List[Dict]]:
+        """Parse a DOCX file (path or file-like object) and extract questions."""
         try:
             doc = Document(file_path)
             self._process_paragraphs(doc.paragraphs)
@@ -36,82 +57,72 @@ class DocxParser:
             logger.error(f"Error parsing document: {e}")
             raise e
     
-    def _process_paragraphs(self, paragraphs):
-        """Process all paragraphs in the document."""
+    def iter_questions(self, file_path) -> Iterator[Union[ParsedQuestion, Dict]]:
+        """Parse a DOCX file, yielding each question or error dict once it is complete.
+        
+        Nothing is accumulated on the parser, so memory stays flat however long
+        the document is; ``total_lines`` is final once the generator is exhausted.
+        """
+        doc = Document(file_path)
+        body = doc._body
+        paragraphs = (Paragraph(p, body) for p in doc.element.body.iterchildren(qn('w:p')))
+        yield from self.iter_paragraphs(paragraphs)
+    
+    def iter_paragraphs(self, paragraphs) -> Iterator[Union[ParsedQuestion, Dict]]:
+        """Yield finalized questions and error dicts from an iterable of paragraphs."""
+        match_line = _LINE_PATTERN.match
         for i, paragraph in enumerate(paragraphs):
+            self.total_lines = i + 1
             text = paragraph.text.strip()
             if not text:
                 continue
-                
-            # Try to detect question patterns
-            if self._is_question_start(text):
+            
+            match = match_line(text)
+            kind = match.lastgroup if match else None
+            if kind == 'stem':
                 if self.current_question:
-                    self._finalize_current_question()
+                    yield self._take_current_question()
                 self.current_question = ParsedQuestion()
                 self.current_question.raw_lines.append((i+1, text))
-                self._parse_question_stem(text)
+                self.current_question.stem = match.group('stem').strip()
             elif self.current_question:
                 self.current_question.raw_lines.append((i+1, text))
-                self._parse_question_content(text)
-    
-    def _is_question_start(self, text: str) -> bool:
-        """Check if text starts a new question."""
-        patterns = [
-            r'^\d+\.\s+',  # "1. ", "2. ", etc.
-            r'^\d+\)\s+',  # "1) ", "2) ", etc.
-            r'^Question\s+\d+',  # "Question 1", "Question 2", etc.
-            r'^Q\d+\.\s+',  # "Q1. ", "Q2. ", etc.
-        ]
-        return any(re.match(pattern, text, re.IGNORECASE) for pattern in patterns)
-    
-    def _parse_question_stem(self, text: str):
-        """Parse the question stem."""
-        # Remove question number
-        stem = re.sub(r'^(\d+\.|\d+\)|Question\s+\d+|Q\d+\.)\s*', '', text, flags=re.IGNORECASE)
-        self.current_question.stem = stem.strip()
-    
-    def _parse_question_content(self, text: str):
-        """Parse options, answers, and explanations."""
-        # Check if it's an option
-        option_match = re.match(r'^([A-Z])[\.\)]\s*(.+)', text, re.IGNORECASE)
-        if option_match:
-            label = option_match.group(1).upper()
-            option_text = option_match.group(2).strip()
-            self.current_question.options.append({
-                'label': label,
-                'text': option_text
-            })
-            return
-        
-        # Check if it's an answer line
-        answer_match = re.match(r'^(Answer|Correct|Solution)[:\s]+(.+)', text, re.IGNORECASE)
-        if answer_match:
-            answer_text = answer_match.group(2).strip()
-            self._parse_answer(answer_text)
-            return
-        
-        # Check if it's an explanation
-        explanation_match = re.match(r'^(Explanation|Reasoning|Explain)[:\s]+(.+)', text, re.IGNORECASE)
-        if explanation_match:
-            self.current_question.explanation = explanation_match.group(2).strip()
-            return
+                self._parse_question_content(kind, match, text)
         
-        # Check if it's a difficulty indicator
-        difficulty_match = re.match(r'^(Difficulty|Level)[:\s]+(.+)', text, re.IGNORECASE)
-        if difficulty_match:
-            self.current_question.difficulty = difficulty_match.group(2).strip().lower()
-            return
-        
-        # If none of the above, append to stem (multi-line question)
-        if self.current_question.stem and not self.current_question.options:
-            self.current_question.stem += " " + text
+        if self.current_question:
+            yield self._take_current_question()
+    
+    def _process_paragraphs(self, paragraphs):
+        """Process all paragraphs in the document."""
+        for item in self.iter_paragraphs(paragraphs):
+            self._collect(item)
+    
+    def _parse_question_content(self, kind: Optional[str], match, text: str):
+        """Apply an option, answer, explanation or stem continuation line."""
+        question = self.current_question
+        if kind == 'option':
+            question.options.append({
+                'label': match.group('label').upper(),
+                'text': match.group('option').strip()
+            })
+        elif kind == 'answer':
+            self._parse_answer(match.group('answer').strip())
+        elif kind == 'explanation':
+            question.explanation = match.group('explanation').strip()
+        elif kind == 'difficulty':
+            question.difficulty = match.group('difficulty').strip().lower()
+        elif question.stem and not question.options:
+            # Unmarked line before the options continues a multi-line stem
+            question.stem += " " + text
     
     def _parse_answer(self, answer_text: str):
         """Parse the answer text to determine correct options."""
+        upper = answer_text.upper()
+        
         # True/False answers
-        if answer_text.upper() in ['TRUE', 'FALSE', 'T', 'F']:
+        if upper in _TRUE_FALSE_ANSWERS:
             self.current_question.question_type = 'true_false'
-            if answer_text.upper() in ['TRUE', 'T']:
+            if upper in ('TRUE', 'T'):
                 self.current_question.correct_answer = [0]
             else:
                 self.current_question.correct_answer = [1]
@@ -125,13 +136,13 @@ class DocxParser:
         
         # Handle various answer formats
         # Single letter: "A", "B", etc.
-        if re.match(r'^[A-Z]$', answer_text.upper()):
-            self.current_question.correct_answer = [ord(answer_text.upper()) - ord('A')]
+        if _SINGLE_LETTER_PATTERN.match(upper):
+            self.current_question.correct_answer = [ord(upper) - ord('A')]
             self._determine_question_type()
             return
         
         # Multiple letters: "A, C", "A and C", etc.
-        letters = re.findall(r'[A-Z]', answer_text.upper())
+        letters = _LETTER_PATTERN.findall(upper)
         if letters:
             self.current_question.correct_answer = [ord(letter) - ord('A') for letter in letters]
             self._determine_question_type()
@@ -147,18 +158,29 @@ class DocxParser:
     
     def _finalize_current_question(self):
         """Finalize the current question and add to the list."""
-        if not self.current_question:
-            return
-        
+        if self.current_question:
+            self._collect(self._take_current_question())
+    
+    def _collect(self, item: Union[ParsedQuestion, Dict]):
+        if isinstance(item, ParsedQuestion):
+            self.questions.append(item)
+        else:
+            self.errors.append(item)
+    
+    def _question_error(self, message: str) -> Dict:
+        raw_lines = self.current_question.raw_lines
+        self.current_question = None
+        return {
+            'line_number': raw_lines[0][0] if raw_lines else 0,
+            'content': ' '.join([line[1] for line in raw_lines]),
+            'error': message
+        }
+    
+    def _take_current_question(self) -> Union[ParsedQuestion, Dict]:
+        """Validate the current question, returning it or an error dict."""
         # Validation checks
         if not self.current_question.stem:
-            self.errors.append({
-                'line_number': self.current_question.raw_lines[0][0] if self.current_question.raw_lines else 0,
-                'content': ' '.join([line[1] for line in self.current_question.raw_lines]),
-                'error': 'Missing question stem'
-            })
-            self.current_question = None
-            return
+            return self._question_error('Missing question stem')
         
         # Auto-create True/False options if type is true_false but no options exist
         if self.current_question.question_type == 'true_false' and not self.current_question.options:
@@ -168,69 +190,60 @@ class DocxParser:
             ]
         
         if not self.current_question.options and self.current_question.question_type != 'true_false':
-            self.errors.append({
-                'line_number': self.current_question.raw_lines[0][0] if self.current_question.raw_lines else 0,
-                'content': ' '.join([line[1] for line in self.current_question.raw_lines]),
-                'error': 'Missing options for non-true/false question'
-            })
-            self.current_question = None
-            return
+            return self._question_error('Missing options for non-true/false question')
         
         if not self.current_question.correct_answer:
-            self.errors.append({
-                'line_number': self.current_question.raw_lines[0][0] if self.current_question.raw_lines else 0,
-                'content': ' '.join([line[1] for line in self.current_question.raw_lines]),
-                'error': 'Missing correct answer'
-            })
-            self.current_question = None
-            return
+            return self._question_error('Missing correct answer')
         
         # Validate correct answer indices
         max_index = len(self.current_question.options) - 1
         for answer_idx in self.current_question.correct_answer:
             if answer_idx > max_index:
-                self.errors.append({
-                    'line_number': self.current_question.raw_lines[0][0] if self.current_question.raw_lines else 0,
-                    'content': ' '.join([line[1] for line in self.current_question.raw_lines]),
-                    'error': f'Correct answer index {answer_idx} exceeds options count'
-                })
-                self.current_question = None
-                return
+                return self._question_error(f'Correct answer index {answer_idx} exceeds options count')
         
         # Set default question type if not determined
         if not self.current_question.question_type:
             self.current_question.question_type = 'single'
         
-        self.questions.append(self.current_question)
+        question = self.current_question
         self.current_question = None
+        return question
+
+def question_paragraphs(number: int, q_data: Dict) -> List[str]:
+    """Paragraph texts for one question, in the layout ``DocxParser`` reads."""
+    # Question number and stem
+    paragraphs = [f"{number}. {q_data['stem']}"]
+    
+    # Options
+    for j, option in enumerate(q_data['options']):
+        label = chr(ord('A') + j)
+        paragraphs.append(f"{label}. {option}")
+    
+    # Answer
+    if q_data['question_type'] == 'true_false':
+        answer_text = "True" if q_data['correct_answer'] == [0] else "False"
+    else:
+        answer_labels = [chr(ord('A') + idx) for idx in q_data['correct_answer']]
+        answer_text = ", ".join(answer_labels)
+    
+    paragraphs.append(f"Answer: {answer_text}")
+    
+    # Explanation and difficulty (if provided)
+    if q_data.get('explanation'):
+        paragraphs.append(f"Explanation: {q_data['explanation']}")
+    if q_data.get('difficulty'):
+        paragraphs.append(f"Difficulty: {q_data['difficulty']}")
+    
+    # Add spacing between questions
+    paragraphs.append("")
+    return paragraphs
 
-def create_sample_docx(file_path: str, questions_data: List[Dict]):
+def create_sample_docx(file_path, questions_data: List[Dict]):
     """Create a sample DOCX file with questions for testing."""
     doc = Document()
     
     for i, q_data in enumerate(questions_data, 1):
-        # Question number and stem
-        p = doc.add_paragraph(f"{i}. {q_data['stem']}")
-        
-        # Options
-        for j, option in enumerate(q_data['options']):
-            label = chr(ord('A') + j)
-            doc.add_paragraph(f"{label}. {option}")
-        
-        # Answer
-        if q_data['question_type'] == 'true_false':
-            answer_text = "True" if q_data['correct_answer'] == [0] else "False"
-        else:
-            answer_labels = [chr(ord('A') + idx) for idx in q_data['correct_answer']]
-            answer_text = ", ".join(answer_labels)
-        
-        doc.add_paragraph(f"Answer: {answer_text}")
-        
-        # Explanation (if provided)
-        if q_data.get('explanation'):
-            doc.add_paragraph(f"Explanation: {q_data['explanation']}")
-        
-        # Add spacing between questions
-        doc.add_paragraph("")
+        for text in question_paragraphs(i, q_data):
+            doc.add_paragraph(text)
     
     doc.save(file_path)
\ No newline at end of file
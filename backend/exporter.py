@@ -0,0 +1,154 @@
+"""Stream the question bank out as JSONL, CSV or DOCX.
+
+Questions are read in ``id`` order through a server-side cursor in batches
+of ``EXPORT_BATCH_SIZE``; each batch loads its options and tags with one IN
+query apiece and is written out before the next is fetched, so JSONL and CSV
+exports use constant memory however large the bank is.
+
+A DOCX file can only be written once complete, so the document is built
+paragraph by paragraph and spooled to a temporary file (on disk past
+``DOCX_SPOOL_BYTES``) before it is streamed. It uses the
+``create_sample_docx`` layout and imports back through ``DocxParser``.
+
+JSONL lines and CSV rows carry the same fields: ``id``, ``stem``,
+``question_type``, ``difficulty``, ``options`` (option texts in display
+order), ``correct_answer`` (option indices), ``explanation`` and ``tags``
+(names). In CSV the list columns hold JSON arrays.
+"""
+
+import csv
+import io
+import json
+import tempfile
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.text.paragraph import Paragraph
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import Question
+from docx_parser import question_paragraphs
+from projection import load_options, load_tags
+from question_filters import tag_condition
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+EXPORT_FIELDS = ('id', 'stem', 'question_type', 'difficulty', 'options', 'correct_answer', 'explanation', 'tags')
+
+DOCX_SPOOL_BYTES = 16 * 1024 * 1024
+DOCX_CHUNK_BYTES = 64 * 1024
+
+
+def export_statement(question_type: Optional[str] = None, difficulty: Optional[str] = None,
+                     tags: Optional[Sequence[str]] = None, tag_mode: str = 'any',
+                     include_retired: bool = False):
+    statement = select(Question.id, Question.stem, Question.question_type, Question.difficulty,
+                       Question.correct_answer, Question.explanation)
+    if not include_retired:
+        statement = statement.where(Question.retired == False)
+    if question_type:
+        statement = statement.where(Question.question_type == question_type)
+    if difficulty:
+        statement = statement.where(Question.difficulty == difficulty)
+    if tags:
+        statement = statement.where(tag_condition(tags, tag_mode, by_name=True))
+    return statement.order_by(Question.id)
+
+
+def iter_question_batches(db: Session, statement, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Yield exported question dicts, one cursor batch at a time."""
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        ids = [row.id for row in rows]
+        options = load_options(db, ids)
+        tags = load_tags(db, ids)
+        yield [
+            {
+                'id': row.id,
+                'stem': row.stem,
+                'question_type': row.question_type,
+                'difficulty': row.difficulty,
+                'options': [option['text'] for option in options.get(row.id, [])],
+                'correct_answer': row.correct_answer,
+                'explanation': row.explanation,
+                'tags': tags.get(row.id, []),
+            }
+            for row in rows
+        ]
+
+
+def iter_jsonl(batches: Iterator[List[Dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in batch).encode('utf-8')
+
+
+def iter_csv(batches: Iterator[List[Dict]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        for item in batch:
+            writer.writerow([
+                json.dumps(item[field], ensure_ascii=False) if field in ('options', 'correct_answer', 'tags')
+                else item[field]
+                for field in EXPORT_FIELDS
+            ])
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_docx(batches: Iterator[List[Dict]]) -> Iterator[bytes]:
+    doc = Document()
+    body = doc.element.body
+    # Appending after the section properties and moving them back once at the
+    # end avoids Document.add_paragraph's search for them on every call
+    section_properties = body.sectPr
+    if section_properties is not None:
+        body.remove(section_properties)
+
+    number = 0
+    for batch in batches:
+        for item in batch:
+            number += 1
+            for text in question_paragraphs(number, item):
+                element = OxmlElement('w:p')
+                body.append(element)
+                if text:
+                    Paragraph(element, doc._body).add_run(text)
+
+    if section_properties is not None:
+        body.append(section_properties)
+    with tempfile.SpooledTemporaryFile(max_size=DOCX_SPOOL_BYTES) as spool:
+        doc.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(DOCX_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+
+EXPORT_WRITERS = {'jsonl': iter_jsonl, 'csv': iter_csv, 'docx': iter_docx}
+
+
+def export_questions(session_factory: Callable[[], Session], export_format: str, statement,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Stream an export from a session of its own.
+
+    The session is opened when streaming starts, after the request handler
+    has returned, and closed when the stream ends or is abandoned.
+    """
+    db = session_factory()
+    try:
+        yield from EXPORT_WRITERS[export_format](iter_question_batches(db, statement, batch_size))
+    finally:
+        db.close()
@@ -0,0 +1,300 @@
+"""In-memory facet counts for quiz generation.
+
+Every facet value (question type, difficulty, tag) keeps a bitmap of the
+question IDs that have it, as a Python int with bit ``id`` set. Counting the
+questions for a filter combination is a few big-int ANDs and a popcount, so
+the quiz generator can show what is available before asking for a quiz.
+
+The index is built on first use. Questions written through any session are
+marked stale when the write commits and reloaded on the next lookup. Each
+process keeps its own index, so every question or tag write also increments
+a ``change_counters`` row in the same transaction. Lookups read the counter
+by primary key; when it has moved by more than this process's own writes,
+another worker has written, and the index is rebuilt on a background thread
+while the current one keeps serving.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, sessionmaker
+
+from models import ChangeCounter, Question, Tag, question_tags
+from dedup import chunked
+from item_stats import upsert_increments
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_COUNTER = 'questions'
+
+# Stale questions reloaded one by one up to this many; beyond it, rebuild
+MAX_INCREMENTAL_REFRESH = 5000
+
+
+def _bitmap(ids: Iterable[int]) -> int:
+    """Pack question IDs into an int bitmap in linear time."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buffer = bytearray(max(ids) // 8 + 1)
+    for question_id in ids:
+        buffer[question_id >> 3] |= 1 << (question_id & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def questions_version(db: Session) -> int:
+    """Number of committed question and tag writes, across all workers."""
+    return db.query(ChangeCounter.value).filter(ChangeCounter.name == QUESTIONS_COUNTER).scalar() or 0
+
+
+def record_question_changes(db: Session, count: int = 1):
+    """Count writes made outside the ORM, such as bulk inserts, in the session's transaction."""
+    upsert_increments(db, ChangeCounter, [{'name': QUESTIONS_COUNTER, 'value': count}],
+                      key=['name'], increments=['value'])
+
+
+class FacetIndex:
+    """Bitmaps of question IDs per facet value, refreshed from the database."""
+
+    def __init__(self):
+        self.live = 0  # Questions that are not retired
+        self.by_type: Dict[str, int] = {}
+        self.by_difficulty: Dict[str, int] = {}
+        self.by_tag: Dict[int, int] = {}
+        self.tag_names: Dict[int, str] = {}
+        self.version: Optional[int] = None  # Change counter the index reflects
+        self.built_at: Optional[float] = None
+        self.hits = 0
+        self.misses = 0  # Lookups that had to build the index or reload questions
+        self._stale: set = set()
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by clear(), so an older rebuild is discarded
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self._changed_during_rebuild: Optional[set] = None
+        self._writes_during_rebuild = 0
+
+    def invalidate_questions(self, question_ids: Iterable[int], writes: int = 0):
+        """Mark questions stale after this process committed ``writes`` counted changes."""
+        with self._lock:
+            question_ids = set(question_ids)
+            self._stale.update(question_ids)
+            if self.version is not None:
+                self.version += writes
+            if self._changed_during_rebuild is not None:
+                self._changed_during_rebuild.update(question_ids)
+                self._writes_during_rebuild += writes
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.built_at = None
+            self.version = None
+            self._stale.clear()
+
+    def refresh(self, db: Session):
+        """Bring the index up to date: reload stale questions, or build it on first use.
+
+        Writes by other workers start a rebuild in the background, and the
+        current index keeps serving until it is done.
+        """
+        version = questions_version(db)
+        with self._lock:
+            if self.built_at is None:
+                self.misses += 1
+                self._build(db, version)
+                return
+            if (version != self.version or len(self._stale) > MAX_INCREMENTAL_REFRESH) \
+                    and self._rebuild_thread is None:
+                self._start_rebuild(db.get_bind())
+            if self._stale and len(self._stale) <= MAX_INCREMENTAL_REFRESH:
+                self.misses += 1
+                stale, self._stale = self._stale, set()
+                self._reload(db, sorted(stale))
+            else:
+                self.hits += 1
+
+    def _start_rebuild(self, bind):
+        self._changed_during_rebuild = set()
+        self._writes_during_rebuild = 0
+        self._rebuild_thread = threading.Thread(
+            target=self._rebuild, args=(sessionmaker(bind=bind), self._generation),
+            name='facet-index-rebuild', daemon=True
+        )
+        self._rebuild_thread.start()
+
+    def _rebuild(self, session_factory, generation: int):
+        """Build a fresh index in its own session and swap it in."""
+        fresh = FacetIndex()
+        db = session_factory()
+        try:
+            fresh._build(db, questions_version(db))
+        except Exception:
+            logger.exception("Facet index rebuild failed")
+            fresh = None
+        finally:
+            db.close()
+        with self._lock:
+            if fresh is not None and generation == self._generation:
+                self.live = fresh.live
+                self.by_type = fresh.by_type
+                self.by_difficulty = fresh.by_difficulty
+                self.by_tag = fresh.by_tag
+                self.tag_names = fresh.tag_names
+                self.version = fresh.version + self._writes_during_rebuild
+                self.built_at = fresh.built_at
+                # Earlier writes are in the new bitmaps; later ones may not be
+                self._stale = self._changed_during_rebuild
+            self._changed_during_rebuild = None
+            self._rebuild_thread = None
+
+    def _build(self, db: Session, version: int):
+        # Writes committed from here on are reloaded on the next refresh
+        self._stale.clear()
+        self.version = version
+        self.built_at = time.monotonic()
+        ids_by_type = defaultdict(list)
+        ids_by_difficulty = defaultdict(list)
+        live = []
+        rows = db.query(Question.id, Question.question_type, Question.difficulty).filter(
+            Question.retired == False
+        ).yield_per(10000)
+        for question_id, question_type, difficulty in rows:
+            live.append(question_id)
+            ids_by_type[question_type].append(question_id)
+            ids_by_difficulty[difficulty].append(question_id)
+
+        ids_by_tag = defaultdict(list)
+        for question_id, tag_id in db.query(question_tags.c.question_id, question_tags.c.tag_id).yield_per(10000):
+            ids_by_tag[tag_id].append(question_id)
+
+        self.live = _bitmap(live)
+        self.by_type = {value: _bitmap(ids) for value, ids in ids_by_type.items()}
+        self.by_difficulty = {value: _bitmap(ids) for value, ids in ids_by_difficulty.items()}
+        self.by_tag = {tag_id: _bitmap(ids) for tag_id, ids in ids_by_tag.items()}
+        self.tag_names = dict(db.query(Tag.id, Tag.name).all())
+
+    def _reload(self, db: Session, question_ids: Sequence[int]):
+        keep = ~_bitmap(question_ids)
+        self.live &= keep
+        for bitmaps in (self.by_type, self.by_difficulty, self.by_tag):
+            for value in bitmaps:
+                bitmaps[value] &= keep
+
+        for chunk in chunked(question_ids):
+            rows = db.query(Question.id, Question.question_type, Question.difficulty).filter(
+                Question.id.in_(chunk), Question.retired == False
+            ).all()
+            for question_id, question_type, difficulty in rows:
+                bit = 1 << question_id
+                self.live |= bit
+                self.by_type[question_type] = self.by_type.get(question_type, 0) | bit
+                self.by_difficulty[difficulty] = self.by_difficulty.get(difficulty, 0) | bit
+
+            tag_rows = db.query(question_tags.c.question_id, Tag.id, Tag.name).join(
+                Tag, Tag.id == question_tags.c.tag_id
+            ).filter(question_tags.c.question_id.in_(chunk)).all()
+            for question_id, tag_id, name in tag_rows:
+                self.by_tag[tag_id] = self.by_tag.get(tag_id, 0) | (1 << question_id)
+                self.tag_names[tag_id] = name
+
+    def facets(self, db: Session, question_type: Optional[str] = None, difficulty: Optional[str] = None,
+               tag_ids: Optional[Sequence[int]] = None, tag_mode: str = 'any') -> Dict:
+        """Counts of available questions for a filter combination.
+
+        ``total`` matches every filter, as ``generate_quiz`` applies them
+        (``tag_mode`` decides whether a question needs any, all or none
+        of ``tag_ids``). Each
+        facet's counts apply the other facets' filters but not its own, so
+        they show how many questions each alternative value would give.
+        """
+        self.refresh(db)
+        with self._lock:
+            type_filter = self.by_type.get(question_type, 0) if question_type else -1
+            difficulty_filter = self.by_difficulty.get(difficulty, 0) if difficulty else -1
+            tag_filter = -1
+            if tag_ids:
+                tag_bitmaps = [self.by_tag.get(tag_id, 0) for tag_id in tag_ids]
+                if tag_mode == 'all':
+                    for bitmap in tag_bitmaps:
+                        tag_filter &= bitmap
+                else:
+                    tag_filter = 0
+                    for bitmap in tag_bitmaps:
+                        tag_filter |= bitmap
+                    if tag_mode == 'none':
+                        tag_filter = ~tag_filter
+
+            def counts(bitmaps: Dict, base: int) -> List:
+                return sorted(
+                    ((value, (bitmap & base).bit_count()) for value, bitmap in bitmaps.items()),
+                    key=lambda item: (-item[1], str(item[0]))
+                )
+
+            return {
+                'total': (self.live & type_filter & difficulty_filter & tag_filter).bit_count(),
+                'question_types': [
+                    {'value': value, 'count': count}
+                    for value, count in counts(self.by_type, self.live & difficulty_filter & tag_filter)
+                    if count
+                ],
+                'difficulties': [
+                    {'value': value, 'count': count}
+                    for value, count in counts(self.by_difficulty, self.live & type_filter & tag_filter)
+                    if count
+                ],
+                'tags': [
+                    {'id': tag_id, 'name': self.tag_names.get(tag_id, ''), 'count': count}
+                    for tag_id, count in counts(self.by_tag, self.live & type_filter & difficulty_filter)
+                    if count
+                ],
+            }
+
+
+facet_index = FacetIndex()
+
+
+# Questions added, edited, retired, retagged or deleted by any session are
+# reloaded once the change commits, and counted for the other workers.
+_PENDING_KEY = 'facet_index_invalidations'
+_WRITES_KEY = 'facet_index_writes'
+_REBUILD_KEY = 'facet_index_rebuild'
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_question_changes(session, flush_context):
+    changed = {
+        obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Question)
+    }
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+    # Deleted or renamed tags are rare; the whole index is rebuilt for them
+    if any(isinstance(obj, Tag) for obj in session.deleted) or any(
+        isinstance(obj, Tag) and inspect(obj).attrs.name.history.has_changes() for obj in session.dirty
+    ):
+        session.info[_REBUILD_KEY] = True
+    # Counted once per transaction
+    if (changed or session.info.get(_REBUILD_KEY)) and not session.info.get(_WRITES_KEY):
+        record_question_changes(session)
+        session.info[_WRITES_KEY] = 1
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_changes(session):
+    changed = session.info.pop(_PENDING_KEY, None)
+    writes = session.info.pop(_WRITES_KEY, 0)
+    if session.info.pop(_REBUILD_KEY, False):
+        facet_index.clear()
+    elif changed:
+        facet_index.invalidate_questions(changed, writes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_WRITES_KEY, None)
+    session.info.pop(_REBUILD_KEY, None)
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import Date, cast, func
+from sqlalchemy.orm import Session
+
+from models import Quiz, QuizAttempt
+
+HISTORY_BUCKETS = ('day', 'week')
+
+# Longest trend window a summary request may ask for
+MAX_TREND_DAYS = 730
+
+
+def _bucket_start(db: Session, bucket: str):
+    """SQL expression for the (UTC) start date of an attempt's day or week."""
+    completed_at = QuizAttempt.completed_at
+    if db.get_bind().dialect.name == 'sqlite':
+        if bucket == 'day':
+            return func.date(completed_at)
+        # Back up six days, then forward to the next Monday: the week's Monday
+        return func.date(completed_at, '-6 days', 'weekday 1')
+    return cast(func.date_trunc(bucket, completed_at), Date)
+
+
+def history_summary(db: Session, user_id: int, bucket: str = 'week', days: int = 90) -> Dict:
+    """Aggregate a user's attempts, with a score trend over the last ``days``.
+
+    Both queries are answered from the (user_id, completed_at) index range
+    for the user, without loading any attempt rows into Python.
+    """
+    totals = db.query(
+        func.count(QuizAttempt.id),
+        func.avg(QuizAttempt.score),
+        func.max(QuizAttempt.score),
+        func.coalesce(func.sum(QuizAttempt.total_questions), 0),
+        func.coalesce(func.sum(QuizAttempt.correct_answers), 0),
+        func.max(QuizAttempt.completed_at),
+    ).filter(QuizAttempt.user_id == user_id).one()
+
+    period_start = _bucket_start(db, bucket).label('period_start')
+    since = datetime.utcnow() - timedelta(days=days)
+    trend = db.query(
+        period_start,
+        func.count(QuizAttempt.id).label('attempts'),
+        func.avg(QuizAttempt.score).label('average_score'),
+        func.max(QuizAttempt.score).label('best_score'),
+    ).filter(
+        QuizAttempt.user_id == user_id,
+        QuizAttempt.completed_at >= since
+    ).group_by(period_start).order_by(period_start).all()
+
+    attempts, average_score, best_score, total_questions, correct_answers, last_attempt_at = totals
+    return {
+        'attempts': attempts,
+        'average_score': average_score,
+        'best_score': best_score,
+        'total_questions': total_questions,
+        'correct_answers': correct_answers,
+        'last_attempt_at': last_attempt_at,
+        'bucket': bucket,
+        'trend': [
+            {
+                'period_start': row.period_start,
+                'attempts': row.attempts,
+                'average_score': row.average_score,
+                'best_score': row.best_score,
+            }
+            for row in trend
+        ],
+    }
+
+
+def attempt_summaries(db: Session, user_id: int, skip: int = 0, limit: int = 50) -> List:
+    """A user's attempts, newest first, with only the columns a history list shows."""
+    return db.query(
+        QuizAttempt.id,
+        QuizAttempt.quiz_id,
+        Quiz.title.label('quiz_title'),
+        QuizAttempt.score,
+        QuizAttempt.total_questions,
+        QuizAttempt.correct_answers,
+        QuizAttempt.started_at,
+        QuizAttempt.completed_at,
+    ).join(Quiz, Quiz.id == QuizAttempt.quiz_id).filter(
+        QuizAttempt.user_id == user_id
+    ).order_by(QuizAttempt.completed_at.desc()).offset(skip).limit(limit).all()
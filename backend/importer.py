@@ -0,0 +1,420 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from sqlalchemy.orm import Session, selectinload
+
+from models import Question, Option, ImportReport, Tag
+from docx_parser import ParsedQuestion
+from dedup import (
+    chunked,
+    content_hash,
+    existing_content_hashes,
+    match_and_index,
+    minhash_signature,
+    pack_signature,
+    revision_hash,
+    stem_key,
+)
+
+# Length of the stem excerpt stored with each duplicate match or change
+STEM_EXCERPT_LENGTH = 200
+
+# Parsed questions written and committed per transaction by import_stream
+IMPORT_CHUNK_SIZE = 500
+
+
+def parsed_line_number(parsed_q: ParsedQuestion) -> int:
+    return parsed_q.raw_lines[0][0] if parsed_q.raw_lines else 0
+
+
+def latest_import_report(db: Session, filename: str, created_by: Optional[int]) -> Optional[ImportReport]:
+    """Return the most recent fingerprinted import of ``filename`` by a user."""
+    return db.query(ImportReport).filter(
+        ImportReport.filename == filename,
+        ImportReport.created_by == created_by,
+        ImportReport.fingerprints.isnot(None)
+    ).order_by(ImportReport.created_at.desc(), ImportReport.id.desc()).first()
+
+
+def unchanged_file_report(previous: ImportReport, created_by: Optional[int]) -> ImportReport:
+    """Report a re-upload whose bytes match the previous import exactly."""
+    return ImportReport(
+        filename=previous.filename,
+        total_lines=previous.total_lines,
+        successful_imports=0,
+        failed_imports=0,
+        errors=[],
+        duplicate_imports=0,
+        duplicates=[],
+        file_hash=previous.file_hash,
+        fingerprints=previous.fingerprints,
+        diff={
+            'file_unchanged': True,
+            'added': 0,
+            'updated': 0,
+            'unchanged': len(previous.fingerprints),
+            'removed': 0,
+            'retired': 0,
+            'changes': []
+        },
+        created_by=created_by
+    )
+
+
+def import_stream(importer: "BulkImporter", items: Iterable[Union[ParsedQuestion, Dict]],
+                  chunk_size: int = IMPORT_CHUNK_SIZE) -> List[Dict]:
+    """Feed parser output to ``importer`` in chunks, committing after each one.
+
+    ``items`` may mix parsed questions with parse error dicts, as yielded by
+    ``DocxParser.iter_questions``, so questions become visible while a long
+    document is still being parsed. Returns the errors for the import report.
+    """
+    errors = []
+    chunk = []
+    for item in items:
+        if not isinstance(item, ParsedQuestion):
+            errors.append(item)
+            continue
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            importer.add(chunk)
+            importer.db.commit()
+            chunk = []
+    if chunk:
+        importer.add(chunk)
+        importer.db.commit()
+    return errors
+
+
+def finish_import(importer: "BulkImporter", filename: str, total_lines: int, errors: Sequence[Dict],
+                  created_by: Optional[int] = None, file_hash: Optional[str] = None,
+                  retire_removed: bool = False) -> ImportReport:
+    """Handle removed questions and add the import report to the session."""
+    importer.finish(retire_removed=retire_removed)
+    report = importer.build_report(
+        filename=filename,
+        total_lines=total_lines,
+        errors=errors,
+        created_by=created_by,
+        file_hash=file_hash
+    )
+    importer.db.add(report)
+    return report
+
+
+def import_parsed_document(db: Session, filename: str, parsed_questions: Sequence[ParsedQuestion],
+                           errors: Sequence[Dict], total_lines: int, created_by: Optional[int] = None,
+                           file_hash: Optional[str] = None, previous: Optional[ImportReport] = None,
+                           retire_removed: bool = False) -> ImportReport:
+    """Import one parsed document and add its report to the session.
+
+    ``previous`` is the last import of the same document, if any; its
+    fingerprints turn this import into an incremental update. Questions are
+    committed chunk by chunk; the report is left for the caller to commit.
+    """
+    importer = BulkImporter(db, previous.fingerprints if previous else None)
+    import_stream(importer, parsed_questions)
+    return finish_import(importer, filename, total_lines, errors, created_by, file_hash, retire_removed)
+
+
+class _Prepared:
+    __slots__ = ('parsed', 'option_texts', 'digest', 'key', 'revision')
+
+    def __init__(self, parsed, option_texts, digest, key, revision):
+        self.parsed = parsed
+        self.option_texts = option_texts
+        self.digest = digest
+        self.key = key
+        self.revision = revision
+
+
+class BulkImporter:
+    """Insert parsed questions in bulk, skipping exact duplicates.
+
+    Each batch is checked against the bank with one hash lookup, so re-importing
+    a file does not duplicate its questions. Near-duplicates are still inserted
+    but recorded in ``duplicates`` for the import report.
+
+    When ``previous_fingerprints`` from an earlier import of the same document
+    are given, questions are matched to the rows they created by stem: unchanged
+    questions are left alone, edited ones are updated in place and only new ones
+    are inserted. Call ``finish`` after the last batch to handle questions that
+    were removed from the document.
+    """
+
+    def __init__(self, db: Session, previous_fingerprints: Optional[Dict[str, Dict]] = None):
+        self.db = db
+        self.previous = previous_fingerprints or {}
+        self.imported_ids: List[int] = []
+        self.updated_ids: List[int] = []
+        self.duplicate_count = 0
+        self.duplicates: List[Dict] = []
+        self.fingerprints: Dict[str, Dict] = {}
+        self.changes: List[Dict] = []
+        self.unchanged_count = 0
+        self.removed_count = 0
+        self.retired_count = 0
+        self._imported_hashes: Dict[str, int] = {}
+        self._key_counts: Dict[str, int] = {}
+        self._tags: Dict[str, Tag] = {}
+
+    def add(self, parsed_questions: Sequence[ParsedQuestion]) -> List[Question]:
+        """Flush a batch of parsed questions and return the inserted rows."""
+        prepared = []
+        for parsed_q in parsed_questions:
+            option_texts = [option['text'] for option in parsed_q.options]
+            prepared.append(_Prepared(
+                parsed_q,
+                option_texts,
+                content_hash(parsed_q.stem, option_texts, parsed_q.correct_answer),
+                self._question_key(parsed_q.stem),
+                revision_hash(parsed_q.stem, option_texts, parsed_q.correct_answer,
+                              parsed_q.explanation, parsed_q.difficulty, parsed_q.tags),
+            ))
+
+        tracked = self._load_tracked(prepared)
+        fresh = []
+        edited = []
+        for item in prepared:
+            question = tracked.get(item.key)
+            if question is None:
+                fresh.append(item)
+            elif self.previous[item.key]['revision'] == item.revision and not question.retired:
+                self.unchanged_count += 1
+                self._track(item, question.id)
+            else:
+                edited.append((item, question))
+
+        self._update(edited)
+        return self._insert(fresh)
+
+    def finish(self, retire_removed: bool = False):
+        """Record questions missing from the document, optionally retiring them."""
+        kept_ids = {entry['question_id'] for entry in self.fingerprints.values()}
+        removed = [
+            entry['question_id'] for key, entry in self.previous.items()
+            if key not in self.fingerprints and entry['question_id'] not in kept_ids
+        ]
+        if not removed:
+            return
+
+        stems = {}
+        for chunk in chunked(removed):
+            for question in self.db.query(Question).filter(Question.id.in_(chunk)).all():
+                stems[question.id] = question.stem
+                if retire_removed and not question.retired:
+                    question.retired = True
+                    self.retired_count += 1
+
+        for question_id in removed:
+            if question_id not in stems:
+                # Deleted from the bank since the previous import
+                continue
+            self.removed_count += 1
+            self.changes.append({
+                'change': 'retired' if retire_removed else 'removed',
+                'question_id': question_id,
+                'line_number': None,
+                'stem': stems[question_id][:STEM_EXCERPT_LENGTH],
+            })
+        self.db.flush()
+
+    def _question_key(self, stem: str) -> str:
+        # Repeated stems within one document get an ordinal suffix
+        base = stem_key(stem)
+        occurrence = self._key_counts.get(base, 0)
+        self._key_counts[base] = occurrence + 1
+        return base if occurrence == 0 else f"{base}:{occurrence}"
+
+    def _load_tracked(self, prepared: Sequence[_Prepared]) -> Dict[str, Question]:
+        ids_by_key = {
+            item.key: self.previous[item.key]['question_id']
+            for item in prepared if item.key in self.previous
+        }
+        if not ids_by_key:
+            return {}
+        questions = {}
+        for chunk in chunked(list(set(ids_by_key.values()))):
+            rows = self.db.query(Question).options(
+                selectinload(Question.options), selectinload(Question.tags)
+            ).filter(
+                Question.id.in_(chunk)
+            ).all()
+            questions.update((question.id, question) for question in rows)
+        return {
+            key: questions[question_id]
+            for key, question_id in ids_by_key.items() if question_id in questions
+        }
+
+    def _load_tags(self, items: Sequence[_Prepared]):
+        """Look up the tags named by a batch, creating the missing ones."""
+        names = list(dict.fromkeys(
+            name for item in items for name in item.parsed.tags if name not in self._tags
+        ))
+        for chunk in chunked(names):
+            for tag in self.db.query(Tag).filter(Tag.name.in_(chunk)):
+                self._tags[tag.name] = tag
+        for name in names:
+            if name not in self._tags:
+                self._tags[name] = Tag(name=name)
+                self.db.add(self._tags[name])
+
+    def _track(self, item: _Prepared, question_id: int):
+        self.fingerprints[item.key] = {'revision': item.revision, 'question_id': question_id}
+
+    def _record_change(self, change: str, item: _Prepared, question_id: int):
+        self.changes.append({
+            'change': change,
+            'question_id': question_id,
+            'line_number': parsed_line_number(item.parsed),
+            'stem': item.parsed.stem[:STEM_EXCERPT_LENGTH],
+        })
+
+    def _update(self, edited):
+        if not edited:
+            return
+        owners = existing_content_hashes(self.db, [item.digest for item, _ in edited])
+        updated = []
+        signatures = []
+        for item, question in edited:
+            owner = owners.get(item.digest)
+            if owner is not None and owner != question.id:
+                # The edit made this question identical to another one; keep the
+                # old revision so the edit is retried on the next import
+                self._record_duplicate(item.parsed, owner, 1.0, exact=True)
+                self.fingerprints[item.key] = dict(self.previous[item.key])
+                continue
+
+            parsed_q = item.parsed
+            signature = minhash_signature(parsed_q.stem, item.option_texts)
+            question.stem = parsed_q.stem
+            question.question_type = parsed_q.question_type
+            question.correct_answer = parsed_q.correct_answer
+            question.explanation = parsed_q.explanation
+            question.difficulty = parsed_q.difficulty
+            question.content_hash = item.digest
+            question.minhash_signature = pack_signature(signature)
+            question.retired = False
+            question.options = [
+                Option(text=option['text'], label=option['label'], order_index=i)
+                for i, option in enumerate(parsed_q.options)
+            ]
+            owners[item.digest] = question.id
+            updated.append((item, question))
+            signatures.append(signature)
+
+        if not updated:
+            return
+        self._load_tags([item for item, _ in updated])
+        for item, question in updated:
+            question.tags = [self._tags[name] for name in item.parsed.tags]
+        self.db.flush()
+
+        matches = match_and_index(self.db, [q.id for _, q in updated], signatures, replace=True)
+        for (item, question), match in zip(updated, matches):
+            self.updated_ids.append(question.id)
+            self._track(item, question.id)
+            self._record_change('updated', item, question.id)
+            if match:
+                self._record_duplicate(item.parsed, match[0], match[1], exact=False)
+
+    def _insert(self, fresh: Sequence[_Prepared]) -> List[Question]:
+        existing = existing_content_hashes(self.db, [item.digest for item in fresh])
+        existing.update(self._imported_hashes)
+
+        new_questions = []
+        signatures = []
+        batch_duplicates = []
+        for item in fresh:
+            if item.digest in existing:
+                if existing[item.digest] is None:
+                    # Copy of a question earlier in this batch, not yet flushed
+                    batch_duplicates.append(item)
+                else:
+                    self._record_duplicate(item.parsed, existing[item.digest], 1.0, exact=True)
+                    self._track(item, existing[item.digest])
+                continue
+
+            parsed_q = item.parsed
+            signature = minhash_signature(parsed_q.stem, item.option_texts)
+            db_question = Question(
+                stem=parsed_q.stem,
+                question_type=parsed_q.question_type,
+                correct_answer=parsed_q.correct_answer,
+                explanation=parsed_q.explanation,
+                difficulty=parsed_q.difficulty,
+                content_hash=item.digest,
+                minhash_signature=pack_signature(signature),
+                options=[
+                    Option(text=option['text'], label=option['label'], order_index=i)
+                    for i, option in enumerate(parsed_q.options)
+                ],
+            )
+            existing[item.digest] = None
+            new_questions.append((item, db_question))
+            signatures.append(signature)
+
+        if not new_questions:
+            return []
+
+        # Only rows that are inserted create tags, not the duplicates skipped above
+        self._load_tags([item for item, _ in new_questions])
+        for item, db_question in new_questions:
+            db_question.tags = [self._tags[name] for name in item.parsed.tags]
+        self.db.add_all([db_question for _, db_question in new_questions])
+        self.db.flush()
+
+        question_ids = [db_question.id for _, db_question in new_questions]
+        matches = match_and_index(self.db, question_ids, signatures)
+        for (item, db_question), match in zip(new_questions, matches):
+            self._imported_hashes[item.digest] = db_question.id
+            self._track(item, db_question.id)
+            self._record_change('added', item, db_question.id)
+            if match:
+                self._record_duplicate(item.parsed, match[0], match[1], exact=False)
+        for item in batch_duplicates:
+            question_id = self._imported_hashes[item.digest]
+            self._record_duplicate(item.parsed, question_id, 1.0, exact=True)
+            self._track(item, question_id)
+
+        self.imported_ids.extend(question_ids)
+        return [db_question for _, db_question in new_questions]
+
+    def _record_duplicate(self, parsed_q: ParsedQuestion, question_id: int,
+                          similarity: float, exact: bool):
+        if exact:
+            self.duplicate_count += 1
+        self.duplicates.append({
+            'line_number': parsed_line_number(parsed_q),
+            'stem': parsed_q.stem[:STEM_EXCERPT_LENGTH],
+            'question_id': question_id,
+            'similarity': round(similarity, 3),
+            'exact': exact,
+        })
+
+    def build_report(self, filename: str, total_lines: int, errors: Sequence[Dict],
+                     created_by: Optional[int] = None, file_hash: Optional[str] = None) -> ImportReport:
+        return ImportReport(
+            filename=filename,
+            total_lines=total_lines,
+            successful_imports=len(self.imported_ids) + len(self.updated_ids),
+            failed_imports=len(errors),
+            errors=[{
+                'line_number': error['line_number'],
+                'content': error['content'],
+                'error': error['error']
+            } for error in errors],
+            duplicate_imports=self.duplicate_count,
+            duplicates=self.duplicates,
+            file_hash=file_hash,
+            fingerprints=self.fingerprints,
+            diff={
+                'file_unchanged': False,
+                'added': len(self.imported_ids),
+                'updated': len(self.updated_ids),
+                'unchanged': self.unchanged_count,
+                'removed': self.removed_count,
+                'retired': self.retired_count,
+                'changes': self.changes
+            },
+            created_by=created_by
+        )
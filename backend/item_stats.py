@@ -0,0 +1,311 @@
+"""Item analysis: per-question difficulty, discrimination and option counts.
+
+Each submitted attempt adds to running sums kept per question (responses,
+correct responses and the sums of attempt scores needed for the point-biserial
+correlation) and per selected option, so reading a question's statistics is a
+primary-key lookup however many attempts there are.
+
+``recompute_item_stats`` rebuilds the same numbers from ``attempt_answers``
+with NumPy, to verify the running sums and repair them if they drift:
+
+    python item_stats.py [--repair]
+"""
+
+import argparse
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import AttemptAnswer, QuestionOptionStats, QuestionStats, QuizAttempt
+from dedup import chunked
+
+# Rows of attempt_answers read per round trip by the recompute
+RECOMPUTE_CHUNK_SIZE = 50000
+
+# Most questions fetched by one bulk stats request
+MAX_BULK_STATS = 500
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def upsert_increments(db: Session, model, rows: List[Dict], key: Sequence[str], increments: Sequence[str]):
+    """Insert rows, adding ``increments`` onto any row that already exists."""
+    stmt = _UPSERT_DIALECTS[db.get_bind().dialect.name](model)
+    table = model.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: table.c[name] + stmt.excluded[name] for name in increments}
+    )
+    db.execute(stmt, rows)
+
+
+def option_indices(mask: int) -> Iterable[int]:
+    """Yield the option indices set in a selection mask."""
+    index = 0
+    while mask > 0:
+        if mask & 1:
+            yield index
+        mask >>= 1
+        index += 1
+
+
+def record_item_stats(db: Session, graded: Sequence[Tuple[int, int, bool]], score: float):
+    """Add one graded attempt to the running statistics of its questions.
+
+    ``graded`` holds ``(question_id, selected_mask, is_correct)`` tuples as
+    returned by ``AnswerKey.grade``; ``score`` is the attempt's fraction correct.
+    Increments are applied by the database, so concurrent submissions of the
+    same questions cannot overwrite each other.
+    """
+    if not graded:
+        return
+    upsert_increments(db, QuestionStats, [
+        {
+            'question_id': question_id,
+            'responses': 1,
+            'answered': 1 if selected_mask != 0 else 0,
+            'correct': 1 if is_correct else 0,
+            'sum_score': score,
+            'sum_score_sq': score * score,
+            'sum_score_correct': score if is_correct else 0.0,
+        }
+        for question_id, selected_mask, is_correct in graded
+    ], key=['question_id'],
+       increments=['responses', 'answered', 'correct', 'sum_score', 'sum_score_sq', 'sum_score_correct'])
+
+    option_rows = [
+        {'question_id': question_id, 'option_index': index, 'selected_count': 1}
+        for question_id, selected_mask, _ in graded
+        for index in option_indices(selected_mask)
+    ]
+    if option_rows:
+        upsert_increments(db, QuestionOptionStats, option_rows,
+                          key=['question_id', 'option_index'], increments=['selected_count'])
+
+
+def point_biserial(responses: int, correct: int, sum_score: float, sum_score_sq: float,
+                   sum_score_correct: float) -> Optional[float]:
+    """Pearson correlation between item score (0/1) and attempt score.
+
+    Undefined (None) until both the item and the attempt scores vary.
+    """
+    item_variance = responses * correct - correct * correct
+    score_variance = responses * sum_score_sq - sum_score * sum_score
+    if item_variance <= 0 or score_variance <= 1e-12:
+        return None
+    covariance = responses * sum_score_correct - correct * sum_score
+    return covariance / math.sqrt(item_variance * score_variance)
+
+
+def stats_payload(question_id: int, stats: Optional[QuestionStats],
+                  options: Sequence[QuestionOptionStats]) -> Dict:
+    if stats is None or not stats.responses:
+        return {
+            'question_id': question_id,
+            'responses': 0,
+            'answered': 0,
+            'correct': 0,
+            'p_value': None,
+            'point_biserial': None,
+            'options': [],
+        }
+    return {
+        'question_id': question_id,
+        'responses': stats.responses,
+        'answered': stats.answered,
+        'correct': stats.correct,
+        'p_value': stats.correct / stats.responses,
+        'point_biserial': point_biserial(stats.responses, stats.correct, stats.sum_score,
+                                         stats.sum_score_sq, stats.sum_score_correct),
+        'options': [
+            {'option_index': option.option_index, 'selected_count': option.selected_count}
+            for option in sorted(options, key=lambda o: o.option_index)
+        ],
+    }
+
+
+def get_question_stats(db: Session, question_ids: Sequence[int]) -> List[Dict]:
+    """Return the statistics of each question, in the order given."""
+    stats = {}
+    options: Dict[int, List[QuestionOptionStats]] = {}
+    for chunk in chunked(list(set(question_ids))):
+        stats.update(
+            (row.question_id, row)
+            for row in db.query(QuestionStats).filter(QuestionStats.question_id.in_(chunk))
+        )
+        for row in db.query(QuestionOptionStats).filter(QuestionOptionStats.question_id.in_(chunk)):
+            options.setdefault(row.question_id, []).append(row)
+    return [
+        stats_payload(question_id, stats.get(question_id), options.get(question_id, []))
+        for question_id in question_ids
+    ]
+
+
+class _Accumulator:
+    """Dense per-question arrays, indexed by question id, grown as needed."""
+
+    def __init__(self):
+        self.responses = np.zeros(0, dtype=np.int64)
+        self.answered = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.sum_score = np.zeros(0)
+        self.sum_score_sq = np.zeros(0)
+        self.sum_score_correct = np.zeros(0)
+        self.options = np.zeros((0, 0), dtype=np.int64)
+
+    def _grow(self, size: int, option_count: int = 0):
+        for name in ('responses', 'answered', 'correct', 'sum_score', 'sum_score_sq', 'sum_score_correct'):
+            array = getattr(self, name)
+            if len(array) < size:
+                setattr(self, name, np.concatenate([array, np.zeros(size - len(array), dtype=array.dtype)]))
+        rows, columns = self.options.shape
+        if rows < size or columns < option_count:
+            grown = np.zeros((max(rows, size), max(columns, option_count)), dtype=np.int64)
+            grown[:rows, :columns] = self.options
+            self.options = grown
+
+    def add(self, question_ids: np.ndarray, masks: np.ndarray, is_correct: np.ndarray, scores: np.ndarray):
+        valid = masks > 0
+        option_count = int(masks[valid].max()).bit_length() if valid.any() else 0
+        size = int(question_ids.max()) + 1
+        self._grow(size, option_count)
+
+        correct = is_correct.astype(np.float64)
+        self.responses[:size] += np.bincount(question_ids, minlength=size)
+        self.answered[:size] += np.bincount(question_ids[masks != 0], minlength=size)
+        self.correct[:size] += np.bincount(question_ids, weights=correct, minlength=size).astype(np.int64)
+        self.sum_score[:size] += np.bincount(question_ids, weights=scores, minlength=size)
+        self.sum_score_sq[:size] += np.bincount(question_ids, weights=scores * scores, minlength=size)
+        self.sum_score_correct[:size] += np.bincount(question_ids, weights=scores * correct, minlength=size)
+
+        selected_ids = question_ids[valid]
+        selected_masks = masks[valid]
+        for index in range(option_count):
+            bit = ((selected_masks >> index) & 1).astype(np.float64)
+            self.options[:size, index] += np.bincount(selected_ids, weights=bit, minlength=size).astype(np.int64)
+
+
+def _load_stored(db: Session) -> _Accumulator:
+    stored = _Accumulator()
+    rows = db.query(QuestionStats).all()
+    option_rows = db.query(QuestionOptionStats).all()
+    size = max([row.question_id for row in rows] + [row.question_id for row in option_rows] + [-1]) + 1
+    option_count = max([row.option_index for row in option_rows] + [-1]) + 1
+    stored._grow(size, option_count)
+    for row in rows:
+        for name in ('responses', 'answered', 'correct', 'sum_score', 'sum_score_sq', 'sum_score_correct'):
+            getattr(stored, name)[row.question_id] = getattr(row, name)
+    for row in option_rows:
+        stored.options[row.question_id, row.option_index] = row.selected_count
+    return stored
+
+
+def _mismatched_questions(computed: _Accumulator, stored: _Accumulator) -> List[int]:
+    size = max(len(computed.responses), len(stored.responses))
+    option_count = max(computed.options.shape[1], stored.options.shape[1])
+    computed._grow(size, option_count)
+    stored._grow(size, option_count)
+    differs = (
+        (computed.responses != stored.responses)
+        | (computed.answered != stored.answered)
+        | (computed.correct != stored.correct)
+        | ~np.isclose(computed.sum_score, stored.sum_score)
+        | ~np.isclose(computed.sum_score_sq, stored.sum_score_sq)
+        | ~np.isclose(computed.sum_score_correct, stored.sum_score_correct)
+        | (computed.options != stored.options).any(axis=1)
+    )
+    return np.flatnonzero(differs).tolist()
+
+
+def _write_stats(db: Session, computed: _Accumulator):
+    db.execute(delete(QuestionOptionStats))
+    db.execute(delete(QuestionStats))
+    question_ids = np.flatnonzero(computed.responses)
+    rows = [
+        {
+            'question_id': int(question_id),
+            'responses': int(computed.responses[question_id]),
+            'answered': int(computed.answered[question_id]),
+            'correct': int(computed.correct[question_id]),
+            'sum_score': float(computed.sum_score[question_id]),
+            'sum_score_sq': float(computed.sum_score_sq[question_id]),
+            'sum_score_correct': float(computed.sum_score_correct[question_id]),
+        }
+        for question_id in question_ids
+    ]
+    for chunk in chunked(rows, RECOMPUTE_CHUNK_SIZE):
+        db.execute(insert(QuestionStats), chunk)
+    option_rows = [
+        {'question_id': int(question_id), 'option_index': int(index), 'selected_count': int(count)}
+        for (question_id, index), count in np.ndenumerate(computed.options) if count
+    ]
+    for chunk in chunked(option_rows, RECOMPUTE_CHUNK_SIZE):
+        db.execute(insert(QuestionOptionStats), chunk)
+
+
+def recompute_item_stats(db: Session, repair: bool = False,
+                         chunk_size: int = RECOMPUTE_CHUNK_SIZE) -> Dict:
+    """Rebuild every question's statistics from attempt_answers.
+
+    Returns the ids of questions whose stored statistics differ from the
+    recomputed ones; with ``repair`` the stored statistics are replaced in one
+    transaction. Attempts submitted while a repair runs may be missed, so
+    verify again afterwards if the server was live.
+    """
+    computed = _Accumulator()
+    rows_read = 0
+    stmt = select(
+        AttemptAnswer.question_id,
+        AttemptAnswer.selected_mask,
+        AttemptAnswer.is_correct,
+        QuizAttempt.correct_answers,
+        QuizAttempt.total_questions,
+    ).join(QuizAttempt, QuizAttempt.id == AttemptAnswer.attempt_id)
+    for partition in db.execute(stmt.execution_options(yield_per=chunk_size)).partitions():
+        question_ids, masks, is_correct, correct_answers, total_questions = (np.asarray(column) for column in zip(*partition))
+        scores = correct_answers.astype(np.float64) / np.maximum(total_questions, 1)
+        computed.add(question_ids.astype(np.int64), masks.astype(np.int64), is_correct.astype(bool), scores)
+        rows_read += len(partition)
+
+    mismatched = _mismatched_questions(computed, _load_stored(db))
+    if repair and mismatched:
+        _write_stats(db, computed)
+        db.commit()
+    return {
+        'attempt_answers': rows_read,
+        'questions': int(np.count_nonzero(computed.responses)),
+        'mismatched': mismatched,
+        'repaired': bool(repair and mismatched),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Verify (and optionally repair) item statistics")
+    parser.add_argument('--repair', action='store_true', help="replace stored statistics that do not match")
+    args = parser.parse_args(argv)
+
+    from models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        result = recompute_item_stats(db, repair=args.repair)
+        print(f"Recomputed {result['questions']} questions from {result['attempt_answers']} answers")
+        if not result['mismatched']:
+            print("Stored statistics match")
+        else:
+            shown = ", ".join(map(str, result['mismatched'][:20]))
+            more = "..." if len(result['mismatched']) > 20 else ""
+            print(f"{len(result['mismatched'])} questions differ: {shown}{more}")
+            print("Repaired" if result['repaired'] else "Run with --repair to fix them")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
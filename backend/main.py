@@ -1,23 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload, sessionmaker
 from typing import List, Optional
-import os
-import tempfile
+import io
 import json
+import gzip
+import hashlib
+import numpy as np
 from datetime import datetime, timedelta
 import jwt
 from google.auth.transport import requests as google_requests
 from google.oauth2 import id_token
 
 from config import settings
-from models import get_db, create_tables, User, Question, Option, Tag, Quiz, QuizAttempt, ImportReport
+import models
+from models import get_db, create_tables
 from schemas import *
 from docx_parser import DocxParser, ParsedQuestion
+from dedup import content_hash, index_question
+from answer_keys import answer_key_cache
+from attempt_answers import record_attempt_answers
+from item_stats import MAX_BULK_STATS, get_question_stats, record_item_stats
+from projection import ATTEMPT_RESOURCE, QUESTION_RESOURCE, QUIZ_RESOURCE, fetch_projected, parse_projection
+from facets import facet_index
+from question_filters import TAG_MODES, tag_condition
+from parallel_forms import MAX_FORMS, assign_forms, form_titles, load_candidates, overlap_stats
+from quiz_snapshots import committed_answer_changes, materialize_snapshots, quiz_snapshot
+from exporter import EXPORT_FORMATS, export_questions, export_statement
+from structured_import import import_structured_file, structured_format
+from metrics import METRICS_CONTENT_TYPE, IMPORT_SECONDS, MetricsMiddleware, instrument_engine, render_metrics
+from server_timing import ServerTimingMiddleware, TimedRoute, phase, time_queries, timed_iter
+from profiling import ProfileStore, ProfilingMiddleware, start_requested_profile
+from history import HISTORY_BUCKETS, MAX_TREND_DAYS, attempt_summaries, history_summary
+from rescoring import create_rescore_job, get_rescore_job, list_rescore_jobs, run_rescore_job
+from importer import BulkImporter, finish_import, import_stream, latest_import_report, unchanged_file_report
+from batch_import import (
+    BatchImportError,
+    expand_uploads,
+    import_parsed_results,
+    parse_documents_async,
+    shutdown_parse_pool,
+    split_unchanged,
+    summarize,
+)
 
 # Initialize FastAPI app
 app = FastAPI(title="Question Bank & Quiz System", version="1.0.0")
+app.router.route_class = TimedRoute
 
 # CORS middleware
 app.add_middleware(
@@ -28,6 +60,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request, query and pool metrics for GET /metrics
+app.add_middleware(MetricsMiddleware)
+instrument_engine(models.engine)
+
+# Per-request auth, SQL, parse and serialization times in a Server-Timing header
+app.add_middleware(ServerTimingMiddleware, slow_request_ms=settings.SLOW_REQUEST_MS)
+time_queries(models.engine)
+
+# Sampling profiles of requests that admins flag with X-Profile: 1
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.MAX_PROFILES)
+app.add_middleware(ProfilingMiddleware, store=profile_store)
+
 # Security
 security = HTTPBearer()
 
@@ -36,6 +80,10 @@ security = HTTPBearer()
 async def startup_event():
     create_tables()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    shutdown_parse_pool()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,7 +96,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(credentials.credentials, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        with phase('auth'):
+            payload = jwt.decode(credentials.credentials, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
             raise HTTPException(
@@ -64,12 +113,87 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def ensure_not_duplicate(db: Session, question: QuestionCreate, question_id: Optional[int] = None):
+    options = [option.text for option in sorted(question.options, key=lambda o: o.order_index)]
+    digest = content_hash(question.stem, options, question.correct_answer)
+    query = db.query(models.Question.id).filter(models.Question.content_hash == digest)
+    if question_id is not None:
+        query = query.filter(models.Question.id != question_id)
+    duplicate = query.first()
+    if duplicate:
+        raise HTTPException(status_code=409, detail=f"Duplicate of question {duplicate.id}")
+
+def schedule_rescore(background_tasks: BackgroundTasks, db: Session, question_id: int):
+    """Queue a job that regrades existing attempts for a question, in its own session."""
+    job = create_rescore_job(question_id)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    background_tasks.add_task(run_rescore_job, job, session_factory)
+    return job
+
+def schedule_changed_answer_rescores(background_tasks: BackgroundTasks, db: Session):
+    """Queue rescoring for every question whose correct answer the session has committed a change to."""
+    for question_id in committed_answer_changes(db):
+        schedule_rescore(background_tasks, db, question_id)
+
+def projection_or_400(resource, fields: Optional[str], include: Optional[str]):
+    try:
+        return parse_projection(resource, fields, include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def projected_response(db: Session, query, projection):
+    """Sparse items are returned as-is, without response-model validation."""
+    return JSONResponse(content=jsonable_encoder(fetch_projected(db, query, projection)))
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip; ``gzip;q=0`` refuses it."""
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding] = weight
+    for coding in ('gzip', 'x-gzip', '*'):
+        if coding in weights:
+            return weights[coding] > 0
+    return False
+
+def check_tag_mode(tag_mode: str):
+    if tag_mode not in TAG_MODES:
+        raise HTTPException(status_code=400, detail=f"tag_mode must be one of: {', '.join(TAG_MODES)}")
+
+def get_or_create_tags(db: Session, names: List[str]) -> List[models.Tag]:
+    """Tags by name in one query, adding the missing ones to the session."""
+    names = list(dict.fromkeys(names))
+    tags = {tag.name: tag for tag in db.query(models.Tag).filter(models.Tag.name.in_(names))} if names else {}
+    for name in names:
+        if name not in tags:
+            tags[name] = models.Tag(name=name)
+            db.add(tags[name])
+    return [tags[name] for name in names]
+
 def get_current_user(email: str = Depends(verify_token), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+    with phase('auth'):
+        user = db.query(models.User).filter(models.User.email == email).first()
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+    start_requested_profile(user)
     return user
 
+def get_admin_user(current_user: User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
 # Auth endpoints
 @app.post("/api/auth/google", response_model=Token)
 async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db)):
@@ -87,9 +211,9 @@ async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db))
         google_id = idinfo['sub']
         
         # Create or get user
-        user = db.query(User).filter(User.email == email).first()
+        user = db.query(models.User).filter(models.User.email == email).first()
         if not user:
-            user = User(
+            user = models.User(
                 email=email,
                 name=name,
                 picture=picture,
@@ -118,38 +242,22 @@ async def create_question(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_question = Question(
+    ensure_not_duplicate(db, question)
+    db_question = models.Question(
         stem=question.stem,
         question_type=question.question_type,
         correct_answer=question.correct_answer,
         explanation=question.explanation,
-        difficulty=question.difficulty
+        difficulty=question.difficulty,
+        options=[
+            models.Option(text=option_data.text, label=option_data.label, order_index=option_data.order_index)
+            for option_data in question.options
+        ],
+        tags=get_or_create_tags(db, question.tags or [])
     )
     db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
-    
-    # Add options
-    for option_data in question.options:
-        db_option = Option(
-            question_id=db_question.id,
-            text=option_data.text,
-            label=option_data.label,
-            order_index=option_data.order_index
-        )
-        db.add(db_option)
-    
-    # Add tags if provided
-    if question.tags:
-        for tag_name in question.tags:
-            tag = db.query(Tag).filter(Tag.name == tag_name).first()
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.add(tag)
-                db.commit()
-                db.refresh(tag)
-            db_question.tags.append(tag)
-    
+    db.flush()
+    index_question(db, db_question)
     db.commit()
     db.refresh(db_question)
     return db_question
@@ -160,38 +268,113 @@ async def get_questions(
     limit: int = 100,
     question_type: Optional[str] = None,
     difficulty: Optional[str] = None,
-    tag: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = 'any',
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(Question)
+    check_tag_mode(tag_mode)
+    projection = projection_or_400(QUESTION_RESOURCE, fields, include)
+    query = db.query(models.Question).filter(models.Question.retired == False)
     
     if question_type:
-        query = query.filter(Question.question_type == question_type)
+        query = query.filter(models.Question.question_type == question_type)
     if difficulty:
-        query = query.filter(Question.difficulty == difficulty)
+        query = query.filter(models.Question.difficulty == difficulty)
     if tag:
-        query = query.join(Question.tags).filter(Tag.name == tag)
+        query = query.filter(tag_condition(tag, tag_mode, by_name=True))
+    
+    query = query.offset(skip).limit(limit)
+    if projection:
+        return projected_response(db, query, projection)
+    return query.options(selectinload(models.Question.options)).all()
+
+@app.get("/api/questions/stats", response_model=List[QuestionStats])
+async def get_questions_stats(
+    question_ids: Optional[List[int]] = Query(None),
+    min_responses: int = 1,
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """Item statistics for the given questions, or for every question with responses."""
+    if question_ids:
+        if len(question_ids) > MAX_BULK_STATS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_STATS} questions per request")
+        return get_question_stats(db, question_ids)
     
-    questions = query.offset(skip).limit(limit).all()
-    return questions
+    rows = db.query(models.QuestionStats.question_id).filter(
+        models.QuestionStats.responses >= min_responses
+    ).order_by(models.QuestionStats.question_id).offset(skip).limit(min(limit, MAX_BULK_STATS)).all()
+    return get_question_stats(db, [row.question_id for row in rows])
+
+@app.get("/api/questions/facets", response_model=QuestionFacets)
+async def get_question_facets(
+    question_type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    tag_ids: Optional[List[int]] = Query(None),
+    tag_mode: str = 'any',
+    count: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Available question counts for a quiz generation request, without generating."""
+    check_tag_mode(tag_mode)
+    facets = facet_index.facets(db, question_type, difficulty, tag_ids, tag_mode)
+    if count is not None:
+        facets['enough'] = facets['total'] >= count
+    return facets
+
+@app.get("/api/questions/export")
+async def export_question_bank(
+    format: str = 'jsonl',
+    question_type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = 'any',
+    include_retired: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stream matching questions as JSONL, CSV or a re-importable DOCX file."""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    check_tag_mode(tag_mode)
+    statement = export_statement(question_type, difficulty, tag, tag_mode, include_retired)
+    # The request's session is closed before the body streams
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+    return StreamingResponse(
+        export_questions(session_factory, format, statement),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="questions.{format}"'}
+    )
 
 @app.get("/api/questions/{question_id}", response_model=Question)
 async def get_question(question_id: int, db: Session = Depends(get_db)):
-    question = db.query(Question).filter(Question.id == question_id).first()
+    question = db.query(models.Question).filter(models.Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     return question
 
+@app.get("/api/questions/{question_id}/stats", response_model=QuestionStats)
+async def get_question_item_stats(question_id: int, db: Session = Depends(get_db)):
+    if db.query(models.Question.id).filter(models.Question.id == question_id).first() is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return get_question_stats(db, [question_id])[0]
+
 @app.put("/api/questions/{question_id}", response_model=Question)
 async def update_question(
     question_id: int,
     question_update: QuestionCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    question = db.query(Question).filter(Question.id == question_id).first()
+    question = db.query(models.Question).filter(models.Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
+    ensure_not_duplicate(db, question_update, question_id)
+    answer_changed = set(question.correct_answer) != set(question_update.correct_answer)
     
     # Update question fields
     question.stem = question_update.stem
@@ -202,9 +385,9 @@ async def update_question(
     question.updated_at = datetime.utcnow()
     
     # Update options (delete old ones, create new ones)
-    db.query(Option).filter(Option.question_id == question_id).delete()
+    db.query(models.Option).filter(models.Option.question_id == question_id).delete()
     for option_data in question_update.options:
-        db_option = Option(
+        db_option = models.Option(
             question_id=question_id,
             text=option_data.text,
             label=option_data.label,
@@ -212,17 +395,35 @@ async def update_question(
         )
         db.add(db_option)
     
+    db.flush()
+    db.expire(question, ["options"])
+    index_question(db, question)
     db.commit()
     db.refresh(question)
+    
+    # Attempts graded against the old answer are corrected after the response
+    if answer_changed:
+        schedule_rescore(background_tasks, db, question_id)
     return question
 
+@app.post("/api/questions/{question_id}/rescore", response_model=RescoreJob, status_code=status.HTTP_202_ACCEPTED)
+async def rescore_question_attempts(
+    question_id: int,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if db.query(models.Question.id).filter(models.Question.id == question_id).first() is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return schedule_rescore(background_tasks, db, question_id)
+
 @app.delete("/api/questions/{question_id}")
 async def delete_question(
     question_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    question = db.query(Question).filter(Question.id == question_id).first()
+    question = db.query(models.Question).filter(models.Question.id == question_id).first()
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
@@ -233,69 +434,99 @@ async def delete_question(
 # File upload and parsing
 @app.post("/api/upload-docx", response_model=ImportReport)
 async def upload_docx(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
+    retire_removed: bool = Form(False),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     if not file.filename.endswith('.docx'):
         raise HTTPException(status_code=400, detail="Only .docx files are supported")
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.docx') as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+    content = await file.read()
+    file_hash = hashlib.sha256(content).hexdigest()
     
-    try:
-        # Parse the document
-        parser = DocxParser()
-        parsed_questions, errors = parser.parse_document(tmp_file_path)
-        
-        # Create import report
-        import_report = ImportReport(
-            filename=file.filename,
-            total_lines=len(parser.current_question.raw_lines) if parser.current_question else 0,
-            successful_imports=len(parsed_questions),
-            failed_imports=len(errors),
-            errors=[{
-                'line_number': error['line_number'],
-                'content': error['content'],
-                'error': error['error']
-            } for error in errors],
-            created_by=current_user.id
-        )
-        
-        # Save successful questions to database
-        for parsed_q in parsed_questions:
-            db_question = Question(
-                stem=parsed_q.stem,
-                question_type=parsed_q.question_type,
-                correct_answer=parsed_q.correct_answer,
-                explanation=parsed_q.explanation,
-                difficulty=parsed_q.difficulty
-            )
-            db.add(db_question)
-            db.flush()  # Get the ID without committing
-            
-            # Add options
-            for i, option in enumerate(parsed_q.options):
-                db_option = Option(
-                    question_id=db_question.id,
-                    text=option['text'],
-                    label=option['label'],
-                    order_index=i
-                )
-                db.add(db_option)
-        
+    # A re-upload of the same document only applies what changed since the last import
+    previous = latest_import_report(db, file.filename, current_user.id)
+    if previous and previous.file_hash == file_hash:
+        import_report = unchanged_file_report(previous, current_user.id)
         db.add(import_report)
         db.commit()
         db.refresh(import_report)
-        
         return import_report
     
-    finally:
-        # Clean up temporary file
-        os.unlink(tmp_file_path)
+    # Stream questions out of the parser and commit them in chunks, so a long
+    # document is neither held in memory nor invisible until the end
+    parser = DocxParser()
+    importer = BulkImporter(db, previous.fingerprints if previous else None)
+    with IMPORT_SECONDS.time('docx'):
+        errors = import_stream(importer, timed_iter(parser.iter_questions(io.BytesIO(content)), 'parse'))
+        import_report = finish_import(
+            importer,
+            filename=file.filename,
+            total_lines=parser.total_lines,
+            errors=errors,
+            created_by=current_user.id,
+            file_hash=file_hash,
+            retire_removed=retire_removed
+        )
+        db.commit()
+    db.refresh(import_report)
+    
+    # Re-imports can change correct answers; regrade those questions' attempts
+    schedule_changed_answer_rescores(background_tasks, db)
+    return import_report
+
+@app.post("/api/upload-docx/batch", response_model=BatchImportReport)
+async def upload_docx_batch(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    retire_removed: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        documents = expand_uploads([(file.filename, await file.read()) for file in files])
+    except BatchImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    to_parse, unchanged_reports, previous = split_unchanged(db, documents, current_user.id)
+    for report in unchanged_reports:
+        db.add(report)
+    db.commit()
+    
+    # Parse across CPU cores, then import serially through the bulk insert path
+    with phase('parse'):
+        results = await parse_documents_async(to_parse)
+    reports = import_parsed_results(db, to_parse, results, previous, current_user.id, retire_removed)
+    
+    for report in unchanged_reports + reports:
+        db.refresh(report)
+    schedule_changed_answer_rescores(background_tasks, db)
+    return summarize(unchanged_reports + reports)
+
+@app.post("/api/upload-questions", response_model=ImportReport)
+async def upload_questions(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    retire_removed: bool = Form(False),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    file_format = structured_format(file.filename or '')
+    if file_format is None:
+        raise HTTPException(status_code=400, detail="Only .jsonl and .csv files are supported")
+
+    # The upload is spooled by the server, so it is hashed and read in place
+    try:
+        with IMPORT_SECONDS.time(file_format):
+            report = import_structured_file(
+                db, file.file, file.filename, file_format, current_user.id, retire_removed
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    schedule_changed_answer_rescores(background_tasks, db)
+    return report
 
 # Quiz endpoints
 @app.post("/api/quizzes/generate", response_model=Quiz)
@@ -304,26 +535,31 @@ async def generate_quiz(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Question)
+    check_tag_mode(request.tag_mode)
+    query = db.query(models.Question).filter(models.Question.retired == False)
     
     # Apply filters
     if request.question_type:
-        query = query.filter(Question.question_type == request.question_type)
+        query = query.filter(models.Question.question_type == request.question_type)
     if request.difficulty:
-        query = query.filter(Question.difficulty == request.difficulty)
+        query = query.filter(models.Question.difficulty == request.difficulty)
     if request.tag_ids:
-        query = query.join(Question.tags).filter(Tag.id.in_(request.tag_ids))
+        query = query.filter(tag_condition(request.tag_ids, request.tag_mode))
     
     # Get random questions
     questions = query.limit(request.count * 2).all()  # Get more to allow for randomness
     if len(questions) < request.count:
-        raise HTTPException(status_code=400, detail="Not enough questions matching criteria")
+        available = facet_index.facets(
+            db, request.question_type, request.difficulty, request.tag_ids, request.tag_mode
+        )['total']
+        raise HTTPException(status_code=400,
+                            detail=f"Not enough questions matching criteria ({available} available)")
     
     import random
     selected_questions = random.sample(questions, min(request.count, len(questions)))
     question_ids = [q.id for q in selected_questions]
     
-    quiz = Quiz(
+    quiz = models.Quiz(
         title=f"Quiz - {request.topic or 'General'}",
         description=f"Generated quiz with {len(selected_questions)} questions",
         question_ids=question_ids,
@@ -331,10 +567,58 @@ async def generate_quiz(
     )
     
     db.add(quiz)
+    db.flush()
+    materialize_snapshots(db, [quiz])
     db.commit()
     db.refresh(quiz)
     return quiz
 
+@app.post("/api/quizzes/generate-forms", response_model=ParallelForms)
+async def generate_parallel_forms(
+    request: ParallelFormsRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Generate several balanced, minimally overlapping forms of one quiz."""
+    check_tag_mode(request.tag_mode)
+    if not 1 <= request.forms <= MAX_FORMS:
+        raise HTTPException(status_code=400, detail=f"forms must be between 1 and {MAX_FORMS}")
+    if request.count < 1:
+        raise HTTPException(status_code=400, detail="count must be at least 1")
+    
+    ids, strata = load_candidates(db, request.question_type, request.difficulty,
+                                  request.tag_ids, request.tag_mode)
+    try:
+        assignment = assign_forms(ids, strata, request.forms, request.count,
+                                  np.random.default_rng(request.seed))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stats = overlap_stats(assignment)
+    if request.max_shared_questions is not None and stats['max_shared_questions'] > request.max_shared_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough questions for {request.forms} forms sharing at most "
+                   f"{request.max_shared_questions} questions ({len(ids)} available)"
+        )
+    
+    titles = form_titles(f"Quiz - {request.topic or 'General'}", request.forms)
+    quizzes = [
+        models.Quiz(
+            title=title,
+            description=f"Parallel form {i} of {request.forms} with {request.count} questions",
+            question_ids=form.tolist(),
+            created_by=current_user.id
+        )
+        for i, (title, form) in enumerate(zip(titles, assignment), start=1)
+    ]
+    db.add_all(quizzes)
+    db.flush()
+    materialize_snapshots(db, quizzes)
+    db.commit()
+    for quiz in quizzes:
+        db.refresh(quiz)
+    return {'quizzes': quizzes, 'strata': int(strata.max()) + 1, **stats}
+
 @app.post("/api/quizzes/{quiz_id}/attempt", response_model=QuizAttempt)
 async def submit_quiz_attempt(
     quiz_id: int,
@@ -342,35 +626,32 @@ async def submit_quiz_attempt(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
-    if not quiz:
+    # Grade against the quiz's cached answer key; no questions are loaded
+    answer_key = answer_key_cache.get(db, quiz_id)
+    if answer_key is None:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    # Get questions for this quiz
-    questions = db.query(Question).filter(Question.id.in_(quiz.question_ids)).all()
-    
-    # Calculate score
-    correct_count = 0
-    for question in questions:
-        correct_answers = question.correct_answer
-        selected_answers = attempt.selected_answers.get(question.id, [])
-        
-        if set(correct_answers) == set(selected_answers):
-            correct_count += 1
-    
-    score = (correct_count / len(questions)) * 100 if questions else 0
+    graded = answer_key.grade(attempt.selected_answers)
+    correct_count = sum(1 for _, _, is_correct in graded if is_correct)
+    total_questions = answer_key.total_questions
+    score = (correct_count / total_questions) * 100 if total_questions else 0
     
-    quiz_attempt = QuizAttempt(
+    quiz_attempt = models.QuizAttempt(
         user_id=current_user.id,
         quiz_id=quiz_id,
         selected_answers=attempt.selected_answers,
         score=score,
-        total_questions=len(questions),
+        total_questions=total_questions,
         correct_answers=correct_count,
+        answer_key_version=answer_key.version,
+        answers_recorded=True,
         completed_at=datetime.utcnow()
     )
     
     db.add(quiz_attempt)
+    db.flush()
+    record_attempt_answers(db, quiz_attempt, graded)
+    record_item_stats(db, graded, correct_count / total_questions if total_questions else 0.0)
     db.commit()
     db.refresh(quiz_attempt)
     
@@ -380,15 +661,38 @@ async def submit_quiz_attempt(
 
 @app.get("/api/quizzes/{quiz_id}", response_model=Quiz)
 async def get_quiz(quiz_id: int, db: Session = Depends(get_db)):
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    quiz = db.query(models.Quiz).filter(models.Quiz.id == quiz_id).first()
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     return quiz
 
+@app.get("/api/quizzes/{quiz_id}/snapshot", response_class=Response)
+async def get_quiz_snapshot(quiz_id: int, request: Request, db: Session = Depends(get_db)):
+    """The quiz's questions as issued, without answers, served from its stored snapshot.
+
+    Read-only: quizzes older than snapshots are rendered until the backfill stores theirs.
+    """
+    snapshot = quiz_snapshot(db, quiz_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    headers = {"Cache-Control": "private, max-age=3600", "Vary": "Accept-Encoding"}
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(snapshot), media_type="application/json", headers=headers)
+
 @app.get("/api/quizzes", response_model=List[Quiz])
-async def get_quizzes(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    quizzes = db.query(Quiz).offset(skip).limit(limit).all()
-    return quizzes
+async def get_quizzes(
+    skip: int = 0,
+    limit: int = 50,
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    projection = projection_or_400(QUIZ_RESOURCE, fields, None)
+    query = db.query(models.Quiz).offset(skip).limit(limit)
+    if projection:
+        return projected_response(db, query, projection)
+    return query.all()
 
 # History endpoints
 @app.get("/api/history", response_model=List[QuizAttempt])
@@ -396,18 +700,59 @@ async def get_user_history(
     current_user: User = Depends(get_current_user),
     skip: int = 0,
     limit: int = 50,
+    fields: Optional[str] = None,
+    include: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    attempts = db.query(QuizAttempt).filter(
-        QuizAttempt.user_id == current_user.id
-    ).order_by(QuizAttempt.completed_at.desc()).offset(skip).limit(limit).all()
-    
-    return attempts
+    projection = projection_or_400(ATTEMPT_RESOURCE, fields, include)
+    query = db.query(models.QuizAttempt).filter(
+        models.QuizAttempt.user_id == current_user.id
+    ).order_by(models.QuizAttempt.completed_at.desc()).offset(skip).limit(limit)
+    if projection:
+        return projected_response(db, query, projection)
+    return query.all()
+
+@app.get("/api/history/summary", response_model=HistorySummary)
+async def get_user_history_summary(
+    bucket: str = 'week',
+    days: int = 90,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    if bucket not in HISTORY_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of: {', '.join(HISTORY_BUCKETS)}")
+    if not 1 <= days <= MAX_TREND_DAYS:
+        raise HTTPException(status_code=400, detail=f"days must be between 1 and {MAX_TREND_DAYS}")
+    return history_summary(db, current_user.id, bucket, days)
+
+@app.get("/api/history/attempts", response_model=List[AttemptSummary])
+async def get_user_attempt_summaries(
+    current_user: User = Depends(get_current_user),
+    skip: int = 0,
+    limit: int = 50,
+    db: Session = Depends(get_db)
+):
+    return attempt_summaries(db, current_user.id, skip, limit)
+
+# Rescoring job endpoints
+@app.get("/api/rescore-jobs", response_model=List[RescoreJob])
+async def get_rescore_jobs(
+    question_id: Optional[int] = None,
+    current_user: User = Depends(get_current_user)
+):
+    return list_rescore_jobs(question_id)
+
+@app.get("/api/rescore-jobs/{job_id}", response_model=RescoreJob)
+async def get_rescore_job_progress(job_id: int, current_user: User = Depends(get_current_user)):
+    job = get_rescore_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Rescoring job not found")
+    return job
 
 # Tags endpoints
 @app.get("/api/tags", response_model=List[Tag])
 async def get_tags(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    tags = db.query(Tag).offset(skip).limit(limit).all()
+    tags = db.query(models.Tag).offset(skip).limit(limit).all()
     return tags
 
 @app.post("/api/tags", response_model=Tag)
@@ -416,7 +761,7 @@ async def create_tag(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    db_tag = Tag(name=tag.name)
+    db_tag = models.Tag(name=tag.name)
     db.add(db_tag)
     db.commit()
     db.refresh(db_tag)
@@ -430,12 +775,31 @@ async def get_import_reports(
     limit: int = 50,
     db: Session = Depends(get_db)
 ):
-    reports = db.query(ImportReport).filter(
-        ImportReport.created_by == current_user.id
-    ).order_by(ImportReport.created_at.desc()).offset(skip).limit(limit).all()
+    reports = db.query(models.ImportReport).filter(
+        models.ImportReport.created_by == current_user.id
+    ).order_by(models.ImportReport.created_at.desc()).offset(skip).limit(limit).all()
     
     return reports
 
+# Request profiles
+@app.get("/api/profiles", response_model=List[RequestProfile])
+async def get_profiles(admin: User = Depends(get_admin_user)):
+    """Stored request profiles, newest first."""
+    return profile_store.list()
+
+@app.get("/api/profiles/{name}")
+async def download_profile(name: str, admin: User = Depends(get_admin_user)):
+    """One profile in the folded-stack format read by flame graph tools."""
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Metrics of this worker process, in the Prometheus text format."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
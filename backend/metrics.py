@@ -0,0 +1,312 @@
+"""Prometheus metrics, kept in process memory and served by ``GET /metrics``.
+
+Counters, gauges and histograms are rendered in the Prometheus text
+exposition format, so no client library is needed. Recording a value takes a
+lock, a dict lookup and (for histograms) a bisect, which is cheap enough to
+leave on. Cache, pool and job figures are read when the endpoint is scraped.
+
+Every worker process keeps its own values, like the caches it reports on; run
+one worker per scrape target, or scrape each worker separately.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds, for requests and for single SQL statements
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+PARSE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_metrics: List["Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        """``(suffix, label values, value)`` for every series."""
+        with self._lock:
+            return [('', labels, value) for labels, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            extra = ''
+            if suffix == '_bucket':
+                labels, bound = labels[:-1], labels[-1]
+                extra = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} "
+                         f"{_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket counts (the last is +Inf), then the sum
+                series = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._values.items())
+        samples = []
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                samples.append(('_bucket', labels + (bound,), cumulative))
+            samples.append(('_sum', labels, values[-1]))
+            samples.append(('_count', labels, cumulative))
+        return samples
+
+
+class Collected(Metric):
+    """A metric whose series are read from ``collect()`` at scrape time."""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Dict[Tuple, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        return [('', labels, value) for labels, value in sorted(self.collect().items())]
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_SECONDS = Histogram(
+    'questionbank_http_request_duration_seconds',
+    'Time to handle a request, by route template and status.',
+    ('method', 'route', 'status'),
+)
+REQUESTS_IN_FLIGHT = Gauge('questionbank_http_requests_in_flight', 'Requests being handled.')
+QUERY_SECONDS = Histogram(
+    'questionbank_db_query_duration_seconds',
+    'Time to execute one SQL statement, by operation.',
+    ('operation',), buckets=QUERY_BUCKETS,
+)
+QUERY_ERRORS = Counter('questionbank_db_query_errors_total', 'SQL statements that raised.', ('operation',))
+POOL_WAIT_SECONDS = Histogram(
+    'questionbank_db_pool_wait_seconds',
+    'Time spent waiting for a connection from the pool.',
+    buckets=QUERY_BUCKETS,
+)
+PARSE_QUEUE_DEPTH = Gauge('questionbank_parse_queue_depth', 'Documents waiting for or being parsed in the pool.')
+PARSE_SECONDS = Histogram(
+    'questionbank_document_parse_duration_seconds',
+    'Time to parse one document in the parse pool.',
+    buckets=PARSE_BUCKETS,
+)
+IMPORT_SECONDS = Histogram(
+    'questionbank_import_duration_seconds',
+    'Time to parse and store one uploaded file, by format.',
+    ('format',), buckets=PARSE_BUCKETS,
+)
+
+
+# Requests
+
+class MetricsMiddleware:
+    """Time every HTTP request by its route template, so IDs do not create series."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # Unless a response is started
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router records the matched route in the scope
+            route = getattr(scope.get('route'), 'path', 'unmatched')
+            REQUEST_SECONDS.observe(time.perf_counter() - started, scope['method'], route, str(status))
+
+
+# Database
+
+_OPERATIONS = frozenset(['select', 'insert', 'update', 'delete'])
+_STARTED_KEY = 'metrics_query_started'
+
+
+def statement_operation(statement: str) -> str:
+    operation = statement[:6].lower()
+    return operation if operation in _OPERATIONS else 'other'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info[_STARTED_KEY].pop()
+    QUERY_SECONDS.observe(time.perf_counter() - started, statement_operation(statement))
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get(_STARTED_KEY):
+        context.connection.info[_STARTED_KEY].pop()
+    QUERY_ERRORS.inc(statement_operation(context.statement or ''))
+
+
+def _timed_checkout(do_get):
+    def timed_do_get():
+        started = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+    return timed_do_get
+
+
+_pools = []
+
+
+def instrument_engine(engine: Engine):
+    """Record statement timings, pool waits and pool usage for ``engine``."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+    pool = engine.pool
+    # _do_get is the pool's checkout hook; there is no event before a checkout
+    pool._do_get = _timed_checkout(pool._do_get)
+    if hasattr(pool, 'checkedout'):
+        _pools.append(pool)
+
+
+def _pool_connections() -> Dict[Tuple, float]:
+    counts = {('checked_out',): 0, ('idle',): 0, ('overflow',): 0}
+    for pool in _pools:
+        counts[('checked_out',)] += pool.checkedout()
+        counts[('idle',)] += pool.checkedin()
+        counts[('overflow',)] += max(pool.overflow(), 0)
+    return counts
+
+
+# Caches and background jobs
+
+def _cache_requests() -> Dict[Tuple, float]:
+    from answer_keys import answer_key_cache
+    from facets import facet_index
+    return {
+        ('answer_keys', 'hit'): answer_key_cache.hits,
+        ('answer_keys', 'miss'): answer_key_cache.misses,
+        ('facet_index', 'hit'): facet_index.hits,
+        ('facet_index', 'miss'): facet_index.misses,
+    }
+
+
+def _rescore_jobs() -> Dict[Tuple, float]:
+    from rescoring import list_rescore_jobs
+    counts = {(status,): 0 for status in ('pending', 'running')}
+    for job in list_rescore_jobs():
+        if job.status in ('pending', 'running'):
+            counts[(job.status,)] += 1
+    return counts
+
+
+Collected('questionbank_cache_requests_total',
+          'Cache lookups by result; the hit ratio is hits over all lookups.',
+          'counter', ('cache', 'result'), _cache_requests)
+Collected('questionbank_db_pool_connections', 'Pooled connections by state.', 'gauge', ('state',),
+          _pool_connections)
+Collected('questionbank_rescore_jobs', 'Rescoring jobs waiting or running.', 'gauge', ('status',), _rescore_jobs)
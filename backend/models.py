@@ -1,8 +1,10 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float, JSON
+from sqlalchemy import create_engine, inspect, text, Column, Index, Integer, BigInteger, String, Text, Boolean, DateTime, ForeignKey, Float, JSON, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import deferred, sessionmaker, relationship
 from datetime import datetime
 
+from config import settings
+
 Base = declarative_base()
 
 class User(Base):
@@ -36,23 +38,59 @@ class Question(Base):
     correct_answer = Column(JSON, nullable=False)  # Array of correct option indices
     explanation = Column(Text)
     difficulty = Column(String, default="medium")
+    content_hash = Column(String(64), unique=True, index=True)  # Normalized stem + options + answer
+    minhash_signature = Column(LargeBinary)  # Packed MinHash values for near-duplicate checks
+    retired = Column(Boolean, nullable=False, default=False, server_default="0")  # Removed from its source document
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     options = relationship("Option", back_populates="question", cascade="all, delete-orphan")
     tags = relationship("Tag", secondary="question_tags", back_populates="questions")
+    lsh_buckets = relationship("QuestionLSHBucket", cascade="all, delete-orphan")
+    stats = relationship("QuestionStats", cascade="all, delete-orphan")
+    option_stats = relationship("QuestionOptionStats", cascade="all, delete-orphan")
 
 class Option(Base):
     __tablename__ = "options"
     
     id = Column(Integer, primary_key=True, index=True)
-    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False, index=True)
     text = Column(Text, nullable=False)
     label = Column(String, nullable=False)  # A, B, C, D
     order_index = Column(Integer, nullable=False)
     
     question = relationship("Question", back_populates="options")
 
+class QuestionLSHBucket(Base):
+    __tablename__ = "question_lsh_buckets"
+    
+    # One row per (band, bucket) of a question's MinHash signature; the primary
+    # key doubles as the lookup index for near-duplicate candidates.
+    band = Column(Integer, primary_key=True)
+    bucket = Column(BigInteger, primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True, index=True)
+
+class QuestionStats(Base):
+    __tablename__ = "question_stats"
+    
+    # Running sufficient statistics over graded responses. The attempt's score
+    # (fraction correct) is the criterion for point-biserial discrimination.
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    responses = Column(Integer, nullable=False, default=0)
+    answered = Column(Integer, nullable=False, default=0)  # Responses with any option selected
+    correct = Column(Integer, nullable=False, default=0)
+    sum_score = Column(Float, nullable=False, default=0.0)
+    sum_score_sq = Column(Float, nullable=False, default=0.0)
+    sum_score_correct = Column(Float, nullable=False, default=0.0)  # Score summed over correct responses
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class QuestionOptionStats(Base):
+    __tablename__ = "question_option_stats"
+    
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    option_index = Column(Integer, primary_key=True)
+    selected_count = Column(Integer, nullable=False, default=0)
+
 class Quiz(Base):
     __tablename__ = "quizzes"
     
@@ -63,9 +101,25 @@ class Quiz(Base):
     time_limit_minutes = Column(Integer)
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    snapshot = deferred(Column(LargeBinary))  # Gzipped JSON of the questions as issued, without answers
+    answer_key = Column(JSON)  # Map of question ID to correct option indices, as issued or corrected
+    answer_key_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped by each correction
     
     attempts = relationship("QuizAttempt", back_populates="quiz")
 
+class QuizQuestion(Base):
+    __tablename__ = "quiz_questions"
+    
+    # One row per question in a quiz's stored answer key, written with the
+    # snapshot, so the quizzes holding a question are found by index when its
+    # answer is corrected.
+    quiz_id = Column(Integer, ForeignKey("quizzes.id"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    
+    __table_args__ = (
+        Index("ix_quiz_questions_question", "question_id", "quiz_id"),
+    )
+
 class QuizAttempt(Base):
     __tablename__ = "quiz_attempts"
     
@@ -76,11 +130,35 @@ class QuizAttempt(Base):
     score = Column(Float, nullable=False)
     total_questions = Column(Integer, nullable=False)
     correct_answers = Column(Integer, nullable=False)
+    answer_key_version = Column(Integer)  # Quiz answer key version it was graded with
+    answers_recorded = Column(Boolean, nullable=False, default=False, server_default="0")  # attempt_answers written or backfilled
     started_at = Column(DateTime, default=datetime.utcnow)
     completed_at = Column(DateTime)
     
     user = relationship("User", back_populates="quiz_attempts")
     quiz = relationship("Quiz", back_populates="attempts")
+    answers = relationship("AttemptAnswer", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index("ix_quiz_attempts_user_completed", "user_id", "completed_at"),
+    )
+
+class AttemptAnswer(Base):
+    __tablename__ = "attempt_answers"
+    
+    # One row per graded question of an attempt, written with the attempt.
+    # user_id is copied from the attempt so per-user queries need no join.
+    attempt_id = Column(Integer, ForeignKey("quiz_attempts.id"), primary_key=True)
+    question_id = Column(Integer, ForeignKey("questions.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    selected_mask = Column(BigInteger, nullable=False)  # Bit i set when option i was selected
+    is_correct = Column(Boolean, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_attempt_answers_question", "question_id", "is_correct"),
+        Index("ix_attempt_answers_user_question", "user_id", "question_id"),
+        Index("ix_attempt_answers_question_attempt", "question_id", "attempt_id"),  # Rescoring walks a question's attempts in order
+    )
 
 class ImportReport(Base):
     __tablename__ = "import_reports"
@@ -91,22 +169,35 @@ class ImportReport(Base):
     successful_imports = Column(Integer, nullable=False)
     failed_imports = Column(Integer, nullable=False)
     errors = Column(JSON)  # Array of error messages
+    duplicate_imports = Column(Integer, nullable=False, default=0, server_default="0")
+    duplicates = Column(JSON)  # Array of exact (skipped) and near-duplicate matches
+    file_hash = Column(String(64), index=True)  # SHA-256 of the uploaded file
+    fingerprints = Column(JSON)  # Map of question key to revision hash and question ID
+    diff = Column(JSON)  # Per-question changes relative to the previous import
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+    
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)  # Incremented by each committed change
+
 # Association table for many-to-many relationship between questions and tags
 from sqlalchemy import Table
 question_tags = Table(
     'question_tags',
     Base.metadata,
     Column('question_id', Integer, ForeignKey('questions.id'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # The primary key serves lookups by question; this one serves tag filters
+    Index('ix_question_tags_tag_question', 'tag_id', 'question_id')
 )
 
 # Database setup
 engine = create_engine(
-    "sqlite:///./question_bank.db", 
-    connect_args={"check_same_thread": False}
+    settings.DATABASE_URL,
+    connect_args={"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -117,5 +208,29 @@ def get_db():
     finally:
         db.close()
 
-def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def create_tables(bind=None):
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    migrate_schema(bind)
+
+def migrate_schema(bind):
+    """Add columns and indexes introduced after a table was first created.
+
+    ``create_all`` only creates missing tables, so existing databases would
+    otherwise be left without newer columns.
+    """
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(bind.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
\ No newline at end of file
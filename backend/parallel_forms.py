@@ -0,0 +1,112 @@
+"""Build several equivalent quiz forms from one candidate pool.
+
+Candidates are grouped into strata by difficulty, question type and primary
+tag (the lowest tag ID, among the requested tags when filtering by tag).
+Each stratum gets a share of the ``forms * count`` question slots in
+proportion to its size. Those slots are dealt out to the forms in turn, so
+every form gets the same number of questions and each stratum's share of a
+form differs by at most one between forms.
+
+Within a stratum, each form takes the next contiguous run of the shuffled
+members, wrapping around. A question therefore never repeats within a form,
+is used by at most one more form than any other question in its stratum,
+and two forms only share questions once a stratum has wrapped around.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import Question, question_tags
+from question_filters import tag_condition
+
+MAX_FORMS = 100
+
+
+def load_candidates(db: Session, question_type: Optional[str] = None, difficulty: Optional[str] = None,
+                    tag_ids: Optional[Sequence[int]] = None, tag_mode: str = 'any'):
+    """IDs of matching questions and the stratum each belongs to."""
+    primary_tag = select(func.min(question_tags.c.tag_id)).where(question_tags.c.question_id == Question.id)
+    if tag_ids and tag_mode != 'none':
+        primary_tag = primary_tag.where(question_tags.c.tag_id.in_(tag_ids))
+
+    query = db.query(Question.id, Question.difficulty, Question.question_type,
+                     primary_tag.scalar_subquery()).filter(Question.retired == False)
+    if question_type:
+        query = query.filter(Question.question_type == question_type)
+    if difficulty:
+        query = query.filter(Question.difficulty == difficulty)
+    if tag_ids:
+        query = query.filter(tag_condition(tag_ids, tag_mode))
+
+    rows = query.order_by(Question.id).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    ids, difficulties, types, tags = zip(*rows)
+    codes = np.column_stack([
+        np.unique(np.array([str(value) for value in column]), return_inverse=True)[1]
+        for column in (difficulties, types, tags)
+    ])
+    strata = np.unique(codes, axis=0, return_inverse=True)[1].ravel()
+    return np.array(ids, dtype=np.int64), strata
+
+
+def _largest_remainder(weights: np.ndarray, total: int) -> np.ndarray:
+    """Integers proportional to ``weights`` that sum to ``total``."""
+    exact = weights * total / weights.sum()
+    shares = np.floor(exact).astype(np.int64)
+    short = total - shares.sum()
+    if short:
+        shares[np.argsort(shares - exact, kind='stable')[:short]] += 1
+    return shares
+
+
+def assign_forms(ids: np.ndarray, strata: np.ndarray, forms: int, count: int,
+                 rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """A ``forms x count`` array of question IDs, balanced across strata."""
+    if count > len(ids):
+        raise ValueError(f"Not enough questions matching criteria ({len(ids)} available)")
+    rng = rng or np.random.default_rng()
+
+    # Members of each stratum, shuffled, laid out stratum by stratum
+    order = np.lexsort((rng.random(len(ids)), strata))
+    members = ids[order]
+    sizes = np.bincount(strata)
+    first_member = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    # Slots per stratum over all forms, dealt to the forms in turn
+    slots_per_stratum = _largest_remainder(sizes, forms * count)
+    slot_strata = np.repeat(np.arange(len(sizes)), slots_per_stratum)
+    slot_forms = np.arange(forms * count) % forms
+
+    # Each form's slots in a stratum take the next run of that stratum's members
+    by_stratum = np.lexsort((slot_forms, slot_strata))
+    slot_strata = slot_strata[by_stratum]
+    slot_forms = slot_forms[by_stratum]
+    first_slot = np.concatenate(([0], np.cumsum(slots_per_stratum)[:-1]))
+    position = np.arange(forms * count) - first_slot[slot_strata]
+    member = first_member[slot_strata] + position % sizes[slot_strata]
+
+    # Group by form, with the questions of each form in random order
+    by_form = np.lexsort((rng.random(forms * count), slot_forms))
+    return members[member[by_form]].reshape(forms, count)
+
+
+def overlap_stats(assignment: np.ndarray) -> Dict[str, int]:
+    """Most uses of one question, and most questions shared by two forms."""
+    forms = assignment.shape[0]
+    question_ids, columns = np.unique(assignment, return_inverse=True)
+    incidence = np.zeros((forms, len(question_ids)), dtype=np.int64)
+    incidence[np.repeat(np.arange(forms), assignment.shape[1]), columns.ravel()] = 1
+    shared = incidence @ incidence.T
+    np.fill_diagonal(shared, 0)
+    return {
+        'max_question_uses': int(incidence.sum(axis=0).max()),
+        'max_shared_questions': int(shared.max()),
+    }
+
+
+def form_titles(base: str, forms: int) -> List[str]:
+    return [f"{base} - Form {i}" for i in range(1, forms + 1)]
@@ -0,0 +1,213 @@
+"""Sampling profiles of single requests, taken on demand for admins.
+
+An admin sends ``X-Profile: 1`` (or ``?profile=1``) with any authenticated
+request. Once ``get_current_user`` has found an admin, a thread samples the
+stack of the thread running the request every millisecond until the response
+is finished. The samples are written in the folded-stack format
+(``main.get_questions;sqlalchemy.orm.query.Query.all 42`` per line), which
+``flamegraph.pl``, speedscope and most flame graph viewers read. The file name
+is returned in an ``X-Profile-Id`` header.
+
+Sampling is by wall clock on the event loop thread, so time spent waiting,
+including for sync dependencies run in the thread pool, shows up as the frame
+that awaits it. Other requests served at the same time can appear too. While
+Python code runs without releasing the GIL, the sampler only gets a turn at
+each thread switch (``sys.getswitchinterval()``, 5ms by default).
+
+Requests without the flag pay for a header check and nothing else; no
+thread is started and nothing is recorded. Flagged requests from anyone who
+is not an admin run normally, unprofiled.
+"""
+
+import os
+import re
+import secrets
+import sys
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+PROFILE_HEADER = b'x-profile'
+PROFILE_PARAM = 'profile'
+
+# Seconds between samples
+SAMPLE_INTERVAL = 0.001
+
+# Deepest stack recorded; deeper frames nearest the root are dropped
+MAX_STACK_DEPTH = 200
+
+_NAME_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{6}-[A-Z]+-[A-Za-z0-9_]*-[0-9a-f]{8}\.folded$')
+
+
+class Sampler(threading.Thread):
+    """Counts the distinct stacks of one thread, sampled at an interval."""
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Dict[Tuple[str, ...], int] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_stack(frame)] += 1
+
+    def stop(self) -> Dict[Tuple[str, ...], int]:
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{frame.f_globals.get('__name__', '?')}.{name}".replace(';', ':').replace(' ', '_')
+
+
+def _stack(frame) -> Tuple[str, ...]:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+def folded(stacks: Dict[Tuple[str, ...], int]) -> str:
+    """Stacks in the folded format: frames root first, joined by ``;``, then the count."""
+    return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+# Stored profiles
+
+class ProfileInfo:
+    __slots__ = ('name', 'size', 'created_at')
+
+    def __init__(self, name: str, size: int, created_at: datetime):
+        self.name = name
+        self.size = size
+        self.created_at = created_at
+
+
+class ProfileStore:
+    """A directory holding the most recent ``max_profiles`` profiles."""
+
+    def __init__(self, directory: str, max_profiles: int = 20):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, name: str, content: str):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        partial = self.directory / f".{name}.tmp"
+        partial.write_text(content, encoding='utf-8')
+        os.replace(partial, self.directory / name)
+        with self._lock:
+            for info in self.list()[self.max_profiles:]:
+                (self.directory / info.name).unlink(missing_ok=True)
+
+    def list(self) -> List[ProfileInfo]:
+        """Stored profiles, newest first."""
+        if not self.directory.is_dir():
+            return []
+        profiles = []
+        for path in self.directory.iterdir():
+            if _NAME_PATTERN.match(path.name):
+                stat = path.stat()
+                profiles.append(ProfileInfo(path.name, stat.st_size, datetime.utcfromtimestamp(stat.st_mtime)))
+        return sorted(profiles, key=lambda info: info.created_at, reverse=True)
+
+    def path(self, name: str) -> Optional[Path]:
+        """The file of a stored profile, or None; other names never reach the filesystem."""
+        if not _NAME_PATTERN.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+
+def profile_name(method: str, route: str) -> str:
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_')[:60]
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{method.upper()}-{slug}-{secrets.token_hex(4)}.folded"
+
+
+# Requests
+
+class ProfileRequest:
+    """A flagged request; profiling starts once the user is known to be an admin."""
+
+    __slots__ = ('thread_id', 'interval', 'sampler', 'name')
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.sampler: Optional[Sampler] = None
+        self.name: Optional[str] = None
+
+    def start(self):
+        if self.sampler is None:
+            self.sampler = Sampler(self.thread_id, self.interval)
+            self.sampler.start()
+
+
+_requested: ContextVar[Optional[ProfileRequest]] = ContextVar('profile_request', default=None)
+
+
+def start_requested_profile(user):
+    """Start profiling the current request if it asked to be and ``user`` is an admin."""
+    request = _requested.get()
+    if request is not None and user.is_admin:
+        request.start()
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope['headers']:
+        if name == PROFILE_HEADER:
+            return value not in (b'', b'0', b'false')
+    query = scope.get('query_string', b'')
+    if PROFILE_PARAM.encode() in query:
+        values = parse_qs(query.decode('latin-1')).get(PROFILE_PARAM, [])
+        return any(value not in ('', '0', 'false') for value in values)
+    return False
+
+
+class ProfilingMiddleware:
+    """Profile flagged requests from admins into ``store``."""
+
+    def __init__(self, app, store: ProfileStore, interval: float = SAMPLE_INTERVAL):
+        self.app = app
+        self.store = store
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request = ProfileRequest(threading.get_ident(), self.interval)
+
+        def name() -> str:
+            if request.name is None:
+                route = getattr(scope.get('route'), 'path', scope['path'])
+                request.name = profile_name(scope['method'], route)
+            return request.name
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start' and request.sampler is not None:
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-id', name().encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _requested.set(request)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            _requested.reset(token)
+            if request.sampler is not None:
+                self.store.save(name(), folded(request.sampler.stop()))
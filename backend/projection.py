@@ -0,0 +1,149 @@
+"""Sparse fieldsets for the list endpoints.
+
+``fields=id,stem,difficulty`` selects only those columns, and relationships
+are loaded only when named in ``include=options,tags``, with one IN query
+per relationship rather than one per row. Projected items are plain dicts
+and skip response-model validation.
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from models import Option, Question, Quiz, QuizAttempt, Tag, User, question_tags
+from dedup import chunked
+
+
+class Relation:
+    __slots__ = ('key', 'load', 'many')
+
+    def __init__(self, key: str, load: Callable[[Session, List[int]], Dict], many: bool = True):
+        self.key = key  # Column on the parent holding the related rows' key
+        self.load = load
+        self.many = many
+
+
+class Resource:
+    __slots__ = ('model', 'fields', 'relations')
+
+    def __init__(self, model, fields: Iterable[str], relations: Optional[Dict[str, Relation]] = None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.relations = relations or {}
+
+
+class Projection:
+    __slots__ = ('resource', 'fields', 'include')
+
+    def __init__(self, resource: Resource, fields: List[str], include: List[str]):
+        self.resource = resource
+        self.fields = fields
+        self.include = include
+
+
+def _load_rows(db: Session, columns, key_column, keys: List[int], order_by=()) -> List:
+    rows = []
+    for chunk in chunked(keys):
+        rows.extend(db.query(*columns).filter(key_column.in_(chunk)).order_by(*order_by).all())
+    return rows
+
+
+def load_options(db: Session, question_ids: List[int]) -> Dict[int, List[Dict]]:
+    columns = (Option.id, Option.question_id, Option.text, Option.label, Option.order_index)
+    grouped = defaultdict(list)
+    for row in _load_rows(db, columns, Option.question_id, question_ids,
+                          (Option.question_id, Option.order_index)):
+        grouped[row.question_id].append(row._asdict())
+    return grouped
+
+
+def load_tags(db: Session, question_ids: List[int]) -> Dict[int, List[str]]:
+    grouped = defaultdict(list)
+    for chunk in chunked(question_ids):
+        rows = db.query(question_tags.c.question_id, Tag.name).join(
+            Tag, Tag.id == question_tags.c.tag_id
+        ).filter(question_tags.c.question_id.in_(chunk)).order_by(Tag.name).all()
+        for question_id, name in rows:
+            grouped[question_id].append(name)
+    return grouped
+
+
+def _load_by_id(model, fields: Iterable[str]) -> Callable[[Session, List[int]], Dict[int, Dict]]:
+    columns = tuple(getattr(model, field) for field in fields)
+
+    def load(db: Session, ids: List[int]) -> Dict[int, Dict]:
+        return {row.id: row._asdict() for row in _load_rows(db, columns, model.id, ids)}
+    return load
+
+
+QUIZ_FIELDS = ('id', 'title', 'description', 'question_ids', 'time_limit_minutes', 'created_by', 'created_at')
+USER_FIELDS = ('id', 'email', 'name', 'picture', 'google_id', 'is_admin', 'created_at')
+
+QUESTION_RESOURCE = Resource(
+    Question,
+    ('id', 'stem', 'question_type', 'correct_answer', 'explanation', 'difficulty',
+     'retired', 'created_at', 'updated_at'),
+    {'options': Relation('id', load_options), 'tags': Relation('id', load_tags)}
+)
+QUIZ_RESOURCE = Resource(Quiz, QUIZ_FIELDS)
+ATTEMPT_RESOURCE = Resource(
+    QuizAttempt,
+    ('id', 'user_id', 'quiz_id', 'selected_answers', 'score', 'total_questions',
+     'correct_answers', 'started_at', 'completed_at'),
+    {
+        'quiz': Relation('quiz_id', _load_by_id(Quiz, QUIZ_FIELDS), many=False),
+        'user': Relation('user_id', _load_by_id(User, USER_FIELDS), many=False),
+    }
+)
+
+
+def _split(value: str) -> List[str]:
+    return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+def parse_projection(resource: Resource, fields: Optional[str], include: Optional[str]) -> Optional[Projection]:
+    """Validate ``fields``/``include``; None means the endpoint's full response.
+
+    Without ``fields`` every column is returned; relationships are only
+    returned when included. ``id`` is always part of the projection.
+    """
+    if fields is None and include is None:
+        return None
+
+    selected = _split(fields) if fields else list(resource.fields)
+    unknown = [name for name in selected if name not in resource.fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. "
+                         f"Available: {', '.join(resource.fields)}")
+    if 'id' not in selected:
+        selected.insert(0, 'id')
+
+    included = _split(include) if include else []
+    unknown = [name for name in included if name not in resource.relations]
+    if unknown:
+        available = ', '.join(resource.relations) or 'none'
+        raise ValueError(f"Unknown include: {', '.join(unknown)}. Available: {available}")
+    return Projection(resource, selected, included)
+
+
+def fetch_projected(db: Session, query: Query, projection: Projection) -> List[Dict]:
+    """Run ``query`` selecting only the projected columns, then attach includes."""
+    resource = projection.resource
+    relations = [(name, resource.relations[name]) for name in projection.include]
+    columns = list(dict.fromkeys(projection.fields + [relation.key for _, relation in relations]))
+
+    rows = query.with_entities(*(getattr(resource.model, column) for column in columns)).all()
+    items = [dict(zip(columns, row)) for row in rows]
+
+    for name, relation in relations:
+        keys = sorted({item[relation.key] for item in items if item[relation.key] is not None})
+        related = relation.load(db, keys) if keys else {}
+        for item in items:
+            item[name] = related.get(item[relation.key], [] if relation.many else None)
+
+    hidden = [column for column in columns if column not in projection.fields]
+    for item in items:
+        for column in hidden:
+            del item[column]
+    return items
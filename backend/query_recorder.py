@@ -0,0 +1,93 @@
+"""Record the SQL an engine runs, to hold endpoints to a query budget in tests.
+
+``QueryRecorder`` listens to an engine's ``before_cursor_execute`` events while
+it is active, so it sees every statement issued by the sessions a
+``TestClient`` request uses::
+
+    with QueryRecorder(engine, max_queries=3):
+        client.get(f"/api/questions/{question_id}")
+
+On exit it fails if more statements ran than the budget allows, or if one
+statement ran ``n_plus_one_threshold`` times or more with different parameters.
+That pattern is usually a loop issuing a query per row, for example lazy
+loading a relationship for each item of a list. Statements issued from an
+``executemany`` count once, like the round trip they are.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Repeats of one statement with different parameters that count as N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+
+class QueryBudgetError(AssertionError):
+    pass
+
+
+class RecordedQuery:
+    __slots__ = ('statement', 'parameters')
+
+    def __init__(self, statement: str, parameters):
+        self.statement = statement
+        self.parameters = parameters
+
+
+class QueryRecorder:
+    """Collects the statements executed on ``engine`` inside a ``with`` block."""
+
+    def __init__(self, engine: Engine, max_queries: Optional[int] = None,
+                 n_plus_one_threshold: Optional[int] = N_PLUS_ONE_THRESHOLD):
+        self.engine = engine
+        self.max_queries = max_queries
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.queries: List[RecordedQuery] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append(RecordedQuery(statement, parameters))
+
+    def __enter__(self) -> "QueryRecorder":
+        event.listen(self.engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        event.remove(self.engine, 'before_cursor_execute', self._record)
+        if exc_type is None:
+            self.check()
+
+    @property
+    def count(self) -> int:
+        return len(self.queries)
+
+    def repeated_statements(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statements run at least ``threshold`` times with more than one set of parameters."""
+        parameters: Dict[str, list] = defaultdict(list)
+        for query in self.queries:
+            parameters[query.statement].append(repr(query.parameters))
+        return [
+            (statement, len(values)) for statement, values in parameters.items()
+            if len(values) >= threshold and len(set(values)) > 1
+        ]
+
+    def check(self):
+        """Raise ``QueryBudgetError`` if the budget was exceeded or an N+1 loop ran."""
+        if self.max_queries is not None and self.count > self.max_queries:
+            raise QueryBudgetError(
+                f"{self.count} queries ran, more than the budget of {self.max_queries}:\n{self.describe()}"
+            )
+        if self.n_plus_one_threshold is not None:
+            repeated = self.repeated_statements(self.n_plus_one_threshold)
+            if repeated:
+                details = '\n'.join(f"  {count}x {_shorten(statement)}" for statement, count in repeated)
+                raise QueryBudgetError(f"Likely N+1 queries, one statement repeated per row:\n{details}")
+
+    def describe(self) -> str:
+        return '\n'.join(f"  {i}. {_shorten(query.statement)}" for i, query in enumerate(self.queries, start=1))
+
+
+def _shorten(statement: str, length: int = 200) -> str:
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= length else statement[:length - 3] + '...'
@@ -0,0 +1,42 @@
+"""Tag filters for question queries.
+
+Each mode is a single condition on ``questions.id``, so a question is
+returned once however many of the tags it has:
+
+* ``any``: ``id IN (SELECT question_id ... WHERE tag_id IN (...))``
+* ``all``: the same subquery, grouped by question and kept when
+  ``COUNT(*)`` equals the number of distinct tags asked for
+* ``none``: ``NOT EXISTS`` a matching ``question_tags`` row
+
+The ``any`` and ``all`` subqueries are answered from the
+``question_tags(tag_id, question_id)`` index, and SQLite then looks up each
+question by primary key. ``none`` has to visit every question but probes
+``question_tags`` by its primary key.
+"""
+
+from typing import Sequence, Union
+
+from sqlalchemy import exists, func, select
+
+from models import Question, Tag, question_tags
+
+TAG_MODES = ('any', 'all', 'none')
+
+
+def tag_condition(tags: Sequence[Union[int, str]], mode: str = 'any', by_name: bool = False):
+    """SQL condition matching questions by tag IDs (or tag names) in ``mode``."""
+    if mode not in TAG_MODES:
+        raise ValueError(f"tag_mode must be one of: {', '.join(TAG_MODES)}")
+    tags = list(dict.fromkeys(tags))
+    if by_name:
+        matching_tag = question_tags.c.tag_id.in_(select(Tag.id).where(Tag.name.in_(tags)))
+    else:
+        matching_tag = question_tags.c.tag_id.in_(tags)
+
+    if mode == 'none':
+        return ~exists().where(question_tags.c.question_id == Question.id, matching_tag)
+
+    tagged = select(question_tags.c.question_id).where(matching_tag)
+    if mode == 'all':
+        tagged = tagged.group_by(question_tags.c.question_id).having(func.count() == len(tags))
+    return Question.id.in_(tagged)
@@ -0,0 +1,424 @@
+"""Offline maintenance commands that work on the database directly.
+
+Large jobs run here instead of through the API, so they are not bound by
+request timeouts and do not tie up web workers. Every command commits in
+batches, so the server can keep running while they work.
+
+Usage:
+    python questionbank.py import [--workers N] [--user EMAIL] [--retire-removed] PATH...
+    python questionbank.py export [--format jsonl|csv|docx] [--output FILE] [filters]
+    python questionbank.py reindex
+    python questionbank.py rescore (QUESTION_ID... | --all)
+    python questionbank.py stats [--verify | --repair]
+    python questionbank.py vacuum
+    python questionbank.py seed --count N [--seed S] [--tags T] [--index]
+                                [--users U --quizzes Q --attempts A]
+
+The database is taken from ``DATABASE_URL``, as for the server. Progress is
+drawn on stderr when it is a terminal.
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, TextIO
+
+from sqlalchemy import distinct, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from models import (
+    AttemptAnswer,
+    ImportReport,
+    Option,
+    Question,
+    Quiz,
+    QuizAttempt,
+    SessionLocal,
+    Tag,
+    User,
+    create_tables,
+)
+from attempt_answers import pending_attempt_count
+from batch_import import BatchImportError, collect_paths, default_workers, describe_report, run_batch
+from dedup import reindex_questions
+from exporter import EXPORT_BATCH_SIZE, EXPORT_FORMATS, EXPORT_WRITERS, export_statement, iter_question_batches
+from item_stats import recompute_item_stats
+from question_filters import TAG_MODES
+from quiz_snapshots import committed_answer_changes
+from rescoring import rescore_question
+from seeding import (
+    SEED_BATCH_SIZE,
+    SEED_QUIZ_QUESTIONS,
+    SEED_TAG_COUNT,
+    seed_attempts,
+    seed_questions,
+    seed_quizzes,
+    seed_users,
+)
+from structured_import import import_structured_file, structured_format
+
+# Minimum seconds between redraws of a progress bar
+PROGRESS_INTERVAL = 0.1
+PROGRESS_WIDTH = 30
+
+
+class Progress:
+    """A one-line progress bar, usable as a ``progress(done, total)`` callback.
+
+    Nothing is drawn unless the stream is a terminal, so logs of scheduled
+    jobs only get the summary lines.
+    """
+
+    def __init__(self, label: str, total: Optional[int] = None, stream: Optional[TextIO] = None):
+        self.label = label
+        self.total = total
+        self.stream = stream or sys.stderr
+        self.enabled = self.stream.isatty()
+        self.started = time.perf_counter()
+        self.done = 0
+        self._drawn_at = 0.0
+
+    def __call__(self, done: int, total: Optional[int] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.perf_counter()
+        if self.enabled and now - self._drawn_at >= PROGRESS_INTERVAL:
+            self._drawn_at = now
+            self._draw(now)
+
+    def _draw(self, now: float):
+        elapsed = f"{now - self.started:.1f}s"
+        if self.total:
+            filled = min(PROGRESS_WIDTH, PROGRESS_WIDTH * self.done // self.total)
+            bar = '#' * filled + '-' * (PROGRESS_WIDTH - filled)
+            line = f"{self.label} [{bar}] {self.done}/{self.total} {elapsed}"
+        else:
+            line = f"{self.label} {self.done} {elapsed}"
+        self.stream.write('\r' + line)
+        self.stream.flush()
+
+    def close(self):
+        if self.enabled:
+            self._draw(time.perf_counter())
+            self.stream.write('\n')
+            self.stream.flush()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def find_user_id(db: Session, email: Optional[str]) -> Optional[int]:
+    if not email:
+        return None
+    user = db.query(User).filter(User.email == email).first()
+    if user is None:
+        raise ValueError(f"unknown user: {email}")
+    return user.id
+
+
+def split_import_paths(paths: Sequence[str]):
+    """DOCX documents (read into memory, as for a batch upload) and JSONL/CSV file paths.
+
+    Structured files are streamed from disk when imported. In a directory they
+    are named by their path relative to it, like the documents.
+    """
+    structured = []
+    document_paths = []
+    for path in map(Path, paths):
+        if not path.exists():
+            raise ValueError(f"no such file or directory: {path}")
+        if path.is_dir():
+            structured.extend(
+                (str(p.relative_to(path)), p) for p in sorted(path.rglob('*'))
+                if p.is_file() and structured_format(p.name)
+            )
+            document_paths.append(str(path))
+        elif structured_format(path.name):
+            structured.append((path.name, path))
+        else:
+            document_paths.append(str(path))
+    return collect_paths(document_paths) if document_paths else [], structured
+
+
+def import_command(db: Session, args) -> int:
+    created_by = find_user_id(db, args.user)
+    documents, structured = split_import_paths(args.paths)
+
+    started = time.perf_counter()
+    reports = []
+    if documents:
+        progress = Progress("Parsing", len(documents))
+        summary = run_batch(db, documents, created_by, args.retire_removed, args.workers, progress)
+        progress.close()
+        reports.extend(summary['reports'])
+
+    progress = Progress("Importing", len(structured))
+    for i, (filename, path) in enumerate(structured, start=1):
+        with open(path, 'rb') as f:
+            try:
+                reports.append(import_structured_file(
+                    db, f, filename, structured_format(filename), created_by, args.retire_removed
+                ))
+            except ValueError as e:
+                print(f"{filename}: {e}")
+        progress(i)
+    if structured:
+        progress.close()
+
+    for report in reports:
+        print(describe_report(report))
+    print(f"{len(reports)} files in {time.perf_counter() - started:.1f}s: "
+          f"{sum(r.successful_imports for r in reports)} imported, "
+          f"{sum(r.failed_imports for r in reports)} failed, "
+          f"{sum(r.duplicate_imports or 0 for r in reports)} duplicates")
+
+    # Edited documents can change correct answers; regrade those questions' attempts
+    changed = committed_answer_changes(db)
+    if changed:
+        progress = Progress("Rescoring", len(changed))
+        answers_changed = 0
+        for i, question_id in enumerate(changed, start=1):
+            answers_changed += rescore_question(db, question_id)['changed']
+            progress(i)
+        progress.close()
+        print(f"Rescored {len(changed)} questions with changed answers: {answers_changed} answers changed")
+    return 0
+
+
+def _counted(batches: Iterator[List[Dict]], progress: Callable[[int], None]) -> Iterator[List[Dict]]:
+    done = 0
+    for batch in batches:
+        done += len(batch)
+        progress(done)
+        yield batch
+
+
+def export_command(db: Session, args) -> int:
+    statement = export_statement(args.question_type, args.difficulty, args.tag, args.tag_mode, args.include_retired)
+    total = db.execute(select(func.count()).select_from(statement.order_by(None).subquery())).scalar()
+
+    progress = Progress("Exporting", total)
+    chunks = EXPORT_WRITERS[args.format](_counted(iter_question_batches(db, statement, args.batch_size), progress))
+    if args.output == '-':
+        output = sys.stdout.buffer
+        for chunk in chunks:
+            output.write(chunk)
+        output.flush()
+    else:
+        with open(args.output, 'wb') as output:
+            for chunk in chunks:
+                output.write(chunk)
+    progress.close()
+    print(f"Exported {total} questions in {progress.elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+
+def reindex_command(db: Session, args) -> int:
+    total = db.query(func.count(Question.id)).filter(Question.content_hash.is_(None)).scalar()
+    progress = Progress("Indexing", total)
+    stats = reindex_questions(db, args.batch_size, progress)
+    progress.close()
+    print(f"Indexed {stats['indexed']} questions in {progress.elapsed:.1f}s: "
+          f"{stats['duplicates']} duplicates left unindexed, {stats['near_duplicates']} near-duplicates")
+    return 0
+
+
+def rescore_command(db: Session, args) -> int:
+    if args.all:
+        question_ids = [row[0] for row in db.execute(
+            select(distinct(AttemptAnswer.question_id)).order_by(AttemptAnswer.question_id)
+        )]
+    elif args.question_ids:
+        question_ids = args.question_ids
+    else:
+        raise ValueError("give question IDs or --all")
+
+    progress = Progress("Rescoring", len(question_ids))
+    processed = changed = 0
+    for i, question_id in enumerate(question_ids, start=1):
+        result = rescore_question(db, question_id)
+        processed += result['processed']
+        changed += result['changed']
+        progress(i)
+    progress.close()
+    print(f"Rescored {len(question_ids)} questions in {progress.elapsed:.1f}s: "
+          f"{processed} answers checked, {changed} changed")
+    return 0
+
+
+def bank_counts(db: Session) -> Dict[str, int]:
+    """Row counts for the bank, read in one statement."""
+    counts = {
+        'questions': select(func.count(Question.id)).where(Question.retired == False),
+        'retired_questions': select(func.count(Question.id)).where(Question.retired == True),
+        'unindexed_questions': select(func.count(Question.id)).where(Question.content_hash.is_(None)),
+        'options': select(func.count(Option.id)),
+        'tags': select(func.count(Tag.id)),
+        'users': select(func.count(User.id)),
+        'quizzes': select(func.count(Quiz.id)),
+        'attempts': select(func.count(QuizAttempt.id)),
+        'attempt_answers': select(func.count()).select_from(AttemptAnswer),
+        'import_reports': select(func.count(ImportReport.id)),
+    }
+    row = db.execute(select(*(query.scalar_subquery().label(name) for name, query in counts.items()))).one()
+    return dict(row._mapping)
+
+
+def stats_command(db: Session, args) -> int:
+    for name, count in bank_counts(db).items():
+        print(f"{name.replace('_', ' ').capitalize()}: {count}")
+    for column in (Question.question_type, Question.difficulty):
+        rows = db.query(column, func.count(Question.id)).filter(Question.retired == False).group_by(column).all()
+        breakdown = ", ".join(f"{value}: {count}" for value, count in sorted(rows, key=lambda row: str(row[0])))
+        print(f"  by {column.key.replace('_', ' ')}: {breakdown or 'none'}")
+    pending = pending_attempt_count(db)
+    if pending:
+        print(f"{pending} attempts have no attempt answers; run attempt_answers.py to convert them")
+
+    if args.verify or args.repair:
+        result = recompute_item_stats(db, repair=args.repair)
+        if not result['mismatched']:
+            print("Item statistics match")
+        else:
+            print(f"Item statistics differ for {len(result['mismatched'])} questions" +
+                  ("; repaired" if result['repaired'] else "; run with --repair to fix them"))
+            return 0 if result['repaired'] else 1
+    return 0
+
+
+def _database_size(engine: Engine) -> Optional[int]:
+    path = engine.url.database
+    if engine.dialect.name != 'sqlite' or not path or path == ':memory:' or not os.path.exists(path):
+        return None
+    return os.path.getsize(path)
+
+
+def vacuum_database(engine: Engine):
+    """Refresh planner statistics and reclaim free space.
+
+    ``VACUUM`` cannot run inside a transaction, so an autocommit connection is
+    used. On SQLite it rewrites the whole file and blocks writers meanwhile.
+    """
+    if engine.dialect.name == 'sqlite':
+        statements = ('ANALYZE', 'VACUUM', 'PRAGMA optimize')
+    elif engine.dialect.name == 'postgresql':
+        statements = ('VACUUM ANALYZE',)
+    else:
+        raise ValueError(f"vacuum is not supported for {engine.dialect.name}")
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in statements:
+            conn.exec_driver_sql(statement)
+
+
+def vacuum_command(db: Session, args) -> int:
+    engine = db.get_bind()
+    db.close()
+    before = _database_size(engine)
+    started = time.perf_counter()
+    vacuum_database(engine)
+    after = _database_size(engine)
+    message = f"Vacuumed in {time.perf_counter() - started:.1f}s"
+    if before is not None and after is not None:
+        message += f": {before / 1e6:.1f} MB -> {after / 1e6:.1f} MB"
+    print(message)
+    return 0
+
+
+def seed_command(db: Session, args) -> int:
+    if args.attempts and not (args.users and args.quizzes):
+        raise ValueError("--attempts needs --users and --quizzes")
+
+    progress = Progress("Seeding", args.count)
+    written = seed_questions(db, args.count, args.seed, args.tags, args.batch_size, args.index, progress)
+    progress.close()
+    print(f"Seeded {written['questions']} questions ({written['options']} options, "
+          f"{written['tags']} tag links) in {progress.elapsed:.1f}s")
+    if args.count and not args.index:
+        print("Run `reindex` to add them to duplicate detection")
+
+    user_ids = seed_users(db, args.users) if args.users else []
+    quiz_ids = seed_quizzes(db, args.quizzes, seed=args.seed) if args.quizzes else []
+    if args.users or args.quizzes:
+        print(f"Seeded {len(user_ids)} users and {len(quiz_ids)} quizzes")
+    if args.attempts:
+        progress = Progress("Attempts", args.attempts)
+        written = seed_attempts(db, args.attempts, quiz_ids, user_ids, args.seed, args.batch_size, progress)
+        progress.close()
+        print(f"Seeded {written['attempts']} attempts ({written['answers']} answers) in {progress.elapsed:.1f}s")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="questionbank", description="Question bank maintenance commands")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help="import DOCX, JSONL and CSV files, zip archives or directories")
+    command.add_argument('paths', nargs='+', help=".docx, .jsonl or .csv files, .zip archives or directories")
+    command.add_argument('--workers', type=int, default=default_workers(), help="parser processes")
+    command.add_argument('--user', help="email of the user the imports are recorded for")
+    command.add_argument('--retire-removed', action='store_true',
+                         help="retire questions removed since a file's last import")
+    command.set_defaults(handler=import_command)
+
+    command = commands.add_parser('export', help="write the question bank to a file")
+    command.add_argument('--format', choices=list(EXPORT_FORMATS), default='jsonl')
+    command.add_argument('--output', '-o', default='-', help="file to write (default: stdout)")
+    command.add_argument('--question-type')
+    command.add_argument('--difficulty')
+    command.add_argument('--tag', action='append', help="tag name (repeatable)")
+    command.add_argument('--tag-mode', choices=TAG_MODES, default='any')
+    command.add_argument('--include-retired', action='store_true')
+    command.add_argument('--batch-size', type=int, default=EXPORT_BATCH_SIZE, help="questions per query")
+    command.set_defaults(handler=export_command)
+
+    command = commands.add_parser('reindex', help="add unindexed questions to duplicate detection")
+    command.add_argument('--batch-size', type=int, default=1000, help="questions per transaction")
+    command.set_defaults(handler=reindex_command)
+
+    command = commands.add_parser('rescore', help="regrade attempts against current correct answers")
+    command.add_argument('question_ids', nargs='*', type=int, metavar='QUESTION_ID')
+    command.add_argument('--all', action='store_true', help="every question with recorded answers")
+    command.set_defaults(handler=rescore_command)
+
+    command = commands.add_parser('stats', help="show row counts and check item statistics")
+    command.add_argument('--verify', action='store_true', help="recompute item statistics and compare")
+    command.add_argument('--repair', action='store_true', help="replace item statistics that do not match")
+    command.set_defaults(handler=stats_command)
+
+    command = commands.add_parser('vacuum', help="refresh planner statistics and reclaim free space")
+    command.set_defaults(handler=vacuum_command)
+
+    command = commands.add_parser('seed', help="insert synthetic questions")
+    command.add_argument('--count', type=int, required=True)
+    command.add_argument('--seed', type=int, help="random seed, for reproducible data")
+    command.add_argument('--tags', type=int, default=SEED_TAG_COUNT, help="number of seed-N tags to spread over")
+    command.add_argument('--batch-size', type=int, default=SEED_BATCH_SIZE, help="questions per transaction")
+    command.add_argument('--index', action='store_true', help="also add them to duplicate detection (slower)")
+    command.add_argument('--users', type=int, default=0, help="seed students to create")
+    command.add_argument('--quizzes', type=int, default=0, help=f"quizzes of {SEED_QUIZ_QUESTIONS} questions to create")
+    command.add_argument('--attempts', type=int, default=0, help="graded attempts spread over the users and quizzes")
+    command.set_defaults(handler=seed_command)
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None, session_factory: Callable[[], Session] = SessionLocal) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    db = session_factory()
+    create_tables(db.get_bind())
+    try:
+        return args.handler(db, args)
+    except (BatchImportError, ValueError) as e:
+        parser.error(str(e))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,271 @@
+"""Immutable snapshots of what a quiz showed when it was created.
+
+When a quiz is created its questions and options are serialized once into
+gzipped JSON, without answers or explanations. That blob is what students
+are served, as stored, from a single-column read. The answer key captured at
+the same moment is stored next to it and is what attempts are graded
+against, so later edits to a question's text or options never change an
+issued quiz.
+
+Answer corrections are the exception: a changed correct answer is copied into
+the stored keys of every quiz containing the question, and a deleted
+question is dropped from them, in the same flush as the change. Each update
+bumps the quiz's ``answer_key_version``, which tells cached keys in every
+process to recompile. This keeps snapshot grading consistent with rescoring.
+The quizzes to correct are found through ``quiz_questions``, which is written
+with each snapshot and indexed by question.
+
+Quizzes created before snapshots existed are rendered from their current
+questions on each fetch, without being stored, so fetching stays read-only.
+A backfill that can run against a live database materializes their
+snapshots, and links quizzes whose snapshot predates ``quiz_questions``:
+
+    python quiz_snapshots.py [--batch-size N]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, event, exists, insert, inspect, select, update
+from sqlalchemy.orm import Session, object_session
+
+from models import Option, Question, Quiz, QuizQuestion
+from dedup import chunked
+
+# Quizzes materialized or linked per transaction by the backfill
+BACKFILL_BATCH_SIZE = 500
+
+
+def _student_view(quiz: Quiz, questions: Dict[int, Dict]) -> Dict:
+    return {
+        'id': quiz.id,
+        'title': quiz.title,
+        'description': quiz.description,
+        'time_limit_minutes': quiz.time_limit_minutes,
+        'created_at': quiz.created_at.isoformat() if quiz.created_at else None,
+        'questions': [questions[question_id] for question_id in quiz.question_ids if question_id in questions],
+    }
+
+
+def _compress(view: Dict) -> bytes:
+    return gzip.compress(json.dumps(view, separators=(',', ':')).encode('utf-8'), mtime=0)
+
+
+def _load_questions(db: Session, quizzes: Sequence[Quiz]) -> Tuple[Dict[int, Dict], Dict[int, List[int]]]:
+    """Student views and correct answers of the quizzes' questions, loading each question once."""
+    question_ids = sorted({question_id for quiz in quizzes for question_id in quiz.question_ids})
+    questions = {}
+    answers = {}
+    for chunk in chunked(question_ids):
+        for row in db.query(Question.id, Question.stem, Question.question_type, Question.correct_answer).filter(
+            Question.id.in_(chunk)
+        ):
+            questions[row.id] = {'id': row.id, 'stem': row.stem, 'question_type': row.question_type, 'options': []}
+            answers[row.id] = row.correct_answer
+        for row in db.query(Option.question_id, Option.label, Option.text).filter(
+            Option.question_id.in_(chunk)
+        ).order_by(Option.question_id, Option.order_index):
+            questions[row.question_id]['options'].append({'label': row.label, 'text': row.text})
+    return questions, answers
+
+
+def materialize_snapshots(db: Session, quizzes: Sequence[Quiz]):
+    """Fill in the snapshot and answer key of flushed quizzes, loading each question once."""
+    questions, answers = _load_questions(db, quizzes)
+    for quiz in quizzes:
+        view = _student_view(quiz, questions)
+        quiz.snapshot = _compress(view)
+        quiz.answer_key = {str(question['id']): answers[question['id']] for question in view['questions']}
+    _link_questions(db, quizzes)
+
+
+def _link_questions(db: Session, quizzes: Sequence[Quiz]):
+    rows = [
+        {'quiz_id': quiz.id, 'question_id': int(question_id)}
+        for quiz in quizzes for question_id in quiz.answer_key or {}
+    ]
+    if rows:
+        db.execute(insert(QuizQuestion), rows)
+
+
+def quiz_snapshot(db: Session, quiz_id: int) -> Optional[bytes]:
+    """The gzipped student view of a quiz, or None if the quiz does not exist.
+
+    Quizzes without a stored snapshot are rendered from their current
+    questions; nothing is written.
+    """
+    row = db.query(Quiz.snapshot).filter(Quiz.id == quiz_id).first()
+    if row is None:
+        return None
+    if row.snapshot is not None:
+        return row.snapshot
+
+    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).one()
+    questions, _ = _load_questions(db, [quiz])
+    return _compress(_student_view(quiz, questions))
+
+
+def correct_snapshot_answers(db, answers: Dict[int, Optional[List[int]]]) -> int:
+    """Apply corrected answers (None for deleted questions) to stored answer keys.
+
+    ``db`` is a session or a connection. Returns the number of quizzes updated.
+    """
+    quizzes = Quiz.__table__
+    links = QuizQuestion.__table__
+    affected: Dict[int, List[int]] = {}
+    for chunk in chunked(sorted(answers)):
+        for quiz_id, question_id in db.execute(
+            select(links.c.quiz_id, links.c.question_id).where(links.c.question_id.in_(chunk))
+        ):
+            affected.setdefault(quiz_id, []).append(question_id)
+
+    updates = {}
+    for chunk in chunked(sorted(affected)):
+        for quiz_id, answer_key in db.execute(
+            select(quizzes.c.id, quizzes.c.answer_key).where(quizzes.c.id.in_(chunk))
+        ):
+            key = dict(answer_key or {})
+            for question_id in affected[quiz_id]:
+                if answers[question_id] is None:
+                    key.pop(str(question_id), None)
+                else:
+                    key[str(question_id)] = answers[question_id]
+            if key != answer_key:
+                updates[quiz_id] = key
+
+    if updates:
+        db.execute(
+            update(quizzes).where(quizzes.c.id == bindparam('quiz_id')).values(
+                answer_key=bindparam('key'), answer_key_version=quizzes.c.answer_key_version + 1
+            ),
+            [{'quiz_id': quiz_id, 'key': key} for quiz_id, key in updates.items()]
+        )
+    removed = [question_id for question_id, answer in answers.items() if answer is None]
+    for chunk in chunked(removed):
+        db.execute(delete(links).where(links.c.question_id.in_(chunk)))
+    return len(updates)
+
+
+# Only sessions that change an answer get listeners. Changed answers are
+# collected as each question is updated and applied once, after the flush;
+# the questions are remembered until commit for ``committed_answer_changes``.
+_PENDING_KEY = 'snapshot_answer_corrections'
+_CHANGED_KEY = 'answer_changes'
+_COMMITTED_KEY = 'committed_answer_changes'
+
+
+@event.listens_for(Question, "after_update")
+def _collect_answer_correction(mapper, connection, question):
+    if not inspect(question).attrs.correct_answer.history.has_changes():
+        return
+    session = object_session(question)
+    session.info.setdefault(_PENDING_KEY, {})[question.id] = question.correct_answer
+    if not event.contains(session, "after_flush", _apply_answer_corrections):
+        event.listen(session, "after_flush", _apply_answer_corrections)
+        event.listen(session, "after_commit", _commit_answer_changes)
+        event.listen(session, "after_rollback", _discard_answer_changes)
+
+
+def _apply_answer_corrections(session, flush_context):
+    corrections = session.info.pop(_PENDING_KEY, None)
+    if corrections:
+        correct_snapshot_answers(session, corrections)
+        session.info.setdefault(_CHANGED_KEY, set()).update(corrections)
+
+
+def _commit_answer_changes(session):
+    changed = session.info.pop(_CHANGED_KEY, None)
+    if changed:
+        session.info.setdefault(_COMMITTED_KEY, set()).update(changed)
+
+
+def _discard_answer_changes(session):
+    session.info.pop(_CHANGED_KEY, None)
+
+
+def committed_answer_changes(session: Session) -> List[int]:
+    """Questions whose correct answer this session has committed a change to since the last call."""
+    return sorted(session.info.pop(_COMMITTED_KEY, ()))
+
+
+@event.listens_for(Question, "before_delete")
+def _drop_deleted_question(mapper, connection, question):
+    # Before the row goes, so its quiz_questions rows can go first
+    correct_snapshot_answers(connection, {question.id: None})
+
+
+# Backfill
+
+def _unlinked_quizzes_query(db: Session):
+    return db.query(Quiz.id, Quiz.answer_key).filter(
+        Quiz.answer_key.isnot(None),
+        ~exists().where(QuizQuestion.quiz_id == Quiz.id)
+    )
+
+
+def backfill_snapshots(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Materialize the snapshot and answer key of quizzes created before snapshots existed.
+
+    Quizzes are materialized in id order, one transaction per batch, and
+    linked to their questions as they go. Returns the number materialized.
+    """
+    last_id = 0
+    materialized = 0
+    while True:
+        quizzes = db.query(Quiz).filter(Quiz.snapshot.is_(None), Quiz.id > last_id).order_by(Quiz.id).limit(
+            batch_size
+        ).all()
+        if not quizzes:
+            break
+        last_id = quizzes[-1].id
+        materialize_snapshots(db, quizzes)
+        db.commit()
+        materialized += len(quizzes)
+        if len(quizzes) < batch_size:
+            break
+    return materialized
+
+
+def backfill_quiz_questions(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Link quizzes that have an answer key but no ``quiz_questions`` rows.
+
+    Quizzes are linked in id order, one transaction per batch; linked
+    quizzes are skipped, so the job can be stopped and run again. Returns the
+    number of quizzes linked.
+    """
+    last_id = 0
+    linked = 0
+    while True:
+        quizzes = _unlinked_quizzes_query(db).filter(Quiz.id > last_id).order_by(Quiz.id).limit(batch_size).all()
+        if not quizzes:
+            break
+        _link_questions(db, quizzes)
+        db.commit()
+        last_id = quizzes[-1].id
+        linked += len(quizzes)
+        if len(quizzes) < batch_size:
+            break
+    return linked
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Materialize missing quiz snapshots and link them to their questions")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help="quizzes per transaction")
+    args = parser.parse_args(argv)
+
+    from models import SessionLocal, create_tables
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        print(f"Materialized {backfill_snapshots(db, args.batch_size)} snapshots")
+        print(f"Linked {backfill_quiz_questions(db, args.batch_size)} quizzes")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
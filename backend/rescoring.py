@@ -0,0 +1,277 @@
+"""Rescore existing attempts after a question's correct answer changes.
+
+Attempts that included the question are found through ``attempt_answers``
+(indexed by question), compared against the new answer in vectorized batches,
+and only attempts whose result actually changes are written back, one short
+transaction per batch. Scores are adjusted relative to their current value,
+so attempts submitted while a job runs are never overwritten; those graded
+with the new answer are simply found unchanged.
+
+Each attempt records the quiz answer key version it was graded with, and
+rescored attempts are brought up to their quiz's current version. A
+submission that read the key before the correction can still commit after
+the pass, so the job then regrades attempts with an older version than
+their quiz, and keeps looking for them for ``STALE_RECHECK_SECONDS``.
+
+Attempts recorded before ``attempt_answers`` existed are not found until the
+attempt-answers backfill has converted them.
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import AttemptAnswer, Question, QuestionStats, Quiz, QuizAttempt
+from answer_keys import answer_mask
+from item_stats import upsert_increments
+
+# Attempts examined per transaction; also bounds the IN (...) lists per batch
+RESCORE_BATCH_SIZE = 500
+
+# How long after its pass a job keeps regrading attempts graded with an older
+# answer key, and how often it looks for them
+STALE_RECHECK_SECONDS = 5.0
+STALE_RECHECK_INTERVAL = 0.5
+
+# Finished jobs kept for progress queries
+MAX_RETAINED_JOBS = 100
+
+
+class RescoreJob:
+    __slots__ = ('id', 'question_id', 'status', 'total_attempts', 'processed_attempts',
+                 'changed_attempts', 'created_at', 'started_at', 'finished_at', 'error')
+
+    def __init__(self, job_id: int, question_id: int):
+        self.id = job_id
+        self.question_id = question_id
+        self.status = 'pending'
+        self.total_attempts = 0
+        self.processed_attempts = 0
+        self.changed_attempts = 0
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+
+
+_job_ids = itertools.count(1)
+_jobs: "OrderedDict[int, RescoreJob]" = OrderedDict()
+_jobs_lock = threading.Lock()
+
+# Jobs run one at a time, so two jobs never adjust the same attempt from
+# stale reads of its score
+_run_lock = threading.Lock()
+
+
+def create_rescore_job(question_id: int) -> RescoreJob:
+    with _jobs_lock:
+        job = RescoreJob(next(_job_ids), question_id)
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_RETAINED_JOBS:
+            oldest_id, oldest = next(iter(_jobs.items()))
+            if oldest.status in ('pending', 'running'):
+                break
+            del _jobs[oldest_id]
+    return job
+
+
+def get_rescore_job(job_id: int) -> Optional[RescoreJob]:
+    return _jobs.get(job_id)
+
+
+def list_rescore_jobs(question_id: Optional[int] = None) -> List[RescoreJob]:
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    if question_id is not None:
+        jobs = [job for job in jobs if job.question_id == question_id]
+    return list(reversed(jobs))
+
+
+def run_rescore_job(job: RescoreJob, session_factory: Callable[[], Session],
+                    batch_size: int = RESCORE_BATCH_SIZE, recheck_seconds: Optional[float] = None):
+    """Run a job in its own session; used as a background task."""
+    if recheck_seconds is None:
+        recheck_seconds = STALE_RECHECK_SECONDS
+    with _run_lock:
+        db = session_factory()
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        try:
+            rescore_question(db, job.question_id, batch_size, job, recheck_seconds)
+            job.status = 'completed'
+        except Exception as e:
+            db.rollback()
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            db.close()
+
+
+def rescore_question(db: Session, question_id: int, batch_size: int = RESCORE_BATCH_SIZE,
+                     job: Optional[RescoreJob] = None, recheck_seconds: float = 0.0) -> Dict[str, int]:
+    """Regrade every recorded answer to a question against its current correct answer.
+
+    After the pass, attempts graded with an older answer key are regraded
+    again until ``recheck_seconds`` have passed.
+    """
+    question = db.query(Question.correct_answer).filter(Question.id == question_id).first()
+    if question is None:
+        raise ValueError(f"Question {question_id} not found")
+    new_mask = answer_mask(question.correct_answer)
+
+    total = db.query(func.count(AttemptAnswer.attempt_id)).filter(
+        AttemptAnswer.question_id == question_id
+    ).scalar()
+    if job:
+        job.total_attempts = total
+
+    counts = {'processed': 0, 'changed': 0}
+    _regrade(db, question_id, new_mask, batch_size, counts, job, stale_only=False)
+    deadline = time.monotonic() + recheck_seconds
+    while True:
+        _regrade(db, question_id, new_mask, batch_size, counts, job, stale_only=True)
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(STALE_RECHECK_INTERVAL)
+
+    if job:
+        # Answers recorded after the total was counted are included too
+        job.total_attempts = max(total, counts['processed'])
+    return counts
+
+
+def _regrade(db: Session, question_id: int, new_mask: int, batch_size: int, counts: Dict[str, int],
+             job: Optional[RescoreJob], stale_only: bool):
+    """Regrade the question's answers in batches, or only those graded with an older answer key."""
+    last_attempt_id = 0
+    while True:
+        query = db.query(AttemptAnswer.attempt_id, AttemptAnswer.selected_mask, AttemptAnswer.is_correct).filter(
+            AttemptAnswer.question_id == question_id,
+            AttemptAnswer.attempt_id > last_attempt_id
+        )
+        if stale_only:
+            query = query.join(QuizAttempt, QuizAttempt.id == AttemptAnswer.attempt_id).join(
+                Quiz, Quiz.id == QuizAttempt.quiz_id
+            ).filter(or_(
+                QuizAttempt.answer_key_version.is_(None),
+                QuizAttempt.answer_key_version < Quiz.answer_key_version
+            ))
+        rows = query.order_by(AttemptAnswer.attempt_id).limit(batch_size).all()
+        if not rows:
+            return
+
+        attempt_ids, masks, was_correct = (np.asarray(column) for column in zip(*rows))
+        now_correct = masks.astype(np.int64) == new_mask
+        flipped = now_correct != was_correct.astype(bool)
+        if flipped.any():
+            _apply_batch(db, question_id, attempt_ids[flipped].astype(np.int64), now_correct[flipped])
+        _mark_current(db, attempt_ids.tolist())
+        db.commit()
+
+        last_attempt_id = int(attempt_ids[-1])
+        counts['processed'] += len(rows)
+        counts['changed'] += int(flipped.sum())
+        if job:
+            job.processed_attempts = counts['processed']
+            job.changed_attempts = counts['changed']
+
+
+def _mark_current(db: Session, attempt_ids: List[int]):
+    """Record that these attempts are graded with their quiz's current answer key."""
+    attempts = QuizAttempt.__table__
+    quizzes = Quiz.__table__
+    db.execute(
+        update(attempts)
+        .where(attempts.c.id.in_(attempt_ids))
+        .values(answer_key_version=select(quizzes.c.answer_key_version)
+                .where(quizzes.c.id == attempts.c.quiz_id).scalar_subquery())
+    )
+
+
+def _apply_batch(db: Session, question_id: int, attempt_ids: np.ndarray, now_correct: np.ndarray):
+    """Write the flipped answers, their attempts' scores and the item-stat deltas."""
+    id_list = attempt_ids.tolist()
+    attempts = db.query(QuizAttempt.id, QuizAttempt.correct_answers, QuizAttempt.total_questions).filter(
+        QuizAttempt.id.in_(id_list)
+    ).all()
+    by_id = {attempt.id: attempt for attempt in attempts}
+    deltas = np.where(now_correct, 1, -1)
+    totals = np.array([max(by_id[i].total_questions, 1) for i in id_list], dtype=np.float64)
+    old_correct = np.array([by_id[i].correct_answers for i in id_list], dtype=np.float64)
+    old_scores = old_correct / totals
+    new_scores = (old_correct + deltas) / totals
+
+    answers = AttemptAnswer.__table__
+    db.execute(
+        update(answers)
+        .where(answers.c.attempt_id == bindparam('a_id'), answers.c.question_id == question_id)
+        .values(is_correct=bindparam('now_correct')),
+        [{'a_id': a_id, 'now_correct': bool(correct)} for a_id, correct in zip(id_list, now_correct)]
+    )
+    attempts_table = QuizAttempt.__table__
+    db.execute(
+        update(attempts_table)
+        .where(attempts_table.c.id == bindparam('a_id'))
+        .values(
+            correct_answers=attempts_table.c.correct_answers + bindparam('delta'),
+            score=(attempts_table.c.correct_answers + bindparam('delta')) * 100.0 / attempts_table.c.total_questions
+        ),
+        [{'a_id': a_id, 'delta': int(delta)} for a_id, delta in zip(id_list, deltas)]
+    )
+    _apply_stats_deltas(db, question_id, attempt_ids, now_correct, old_scores, new_scores)
+
+
+def _apply_stats_deltas(db: Session, question_id: int, attempt_ids: np.ndarray, now_correct: np.ndarray,
+                        old_scores: np.ndarray, new_scores: np.ndarray):
+    """Adjust question_stats for every question of the rescored attempts.
+
+    An attempt's new score moves the score sums of all its questions; the
+    rescored question's correct count moves as well.
+    """
+    rows = db.query(AttemptAnswer.attempt_id, AttemptAnswer.question_id, AttemptAnswer.is_correct).filter(
+        AttemptAnswer.attempt_id.in_(attempt_ids.tolist())
+    ).all()
+    if not rows:
+        return
+    row_attempts, row_questions, row_correct = (np.asarray(column) for column in zip(*rows))
+    position = {int(a_id): i for i, a_id in enumerate(attempt_ids)}
+    index = np.array([position[int(a_id)] for a_id in row_attempts])
+    old_y = old_scores[index]
+    new_y = new_scores[index]
+
+    # Rows were written above, so the rescored question already has its new result
+    is_target = row_questions == question_id
+    new_correct = row_correct.astype(bool)
+    old_correct = np.where(is_target, ~new_correct, new_correct)
+
+    questions, inverse = np.unique(row_questions, return_inverse=True)
+    sums = {
+        'correct': np.bincount(inverse, weights=new_correct.astype(float) - old_correct, minlength=len(questions)),
+        'sum_score': np.bincount(inverse, weights=new_y - old_y, minlength=len(questions)),
+        'sum_score_sq': np.bincount(inverse, weights=new_y * new_y - old_y * old_y, minlength=len(questions)),
+        'sum_score_correct': np.bincount(
+            inverse, weights=np.where(new_correct, new_y, 0.0) - np.where(old_correct, old_y, 0.0),
+            minlength=len(questions)
+        ),
+    }
+    upsert_increments(db, QuestionStats, [
+        {
+            'question_id': int(q_id),
+            'responses': 0,
+            'answered': 0,
+            'correct': int(round(sums['correct'][i])),
+            'sum_score': float(sums['sum_score'][i]),
+            'sum_score_sq': float(sums['sum_score_sq'][i]),
+            'sum_score_correct': float(sums['sum_score_correct'][i]),
+        }
+        for i, q_id in enumerate(questions)
+    ], key=['question_id'],
+       increments=['responses', 'answered', 'correct', 'sum_score', 'sum_score_sq', 'sum_score_correct'])
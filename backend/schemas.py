@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import List, Optional, Dict, Any, TYPE_CHECKING
-from datetime import datetime
+from datetime import date, datetime
 
 # User schemas
 class UserBase(BaseModel):
@@ -49,6 +49,7 @@ class QuestionCreate(QuestionBase):
 
 class Question(QuestionBase):
     id: int
+    retired: bool = False
     created_at: datetime
     updated_at: datetime
     options: List[Option]
@@ -109,18 +110,73 @@ class QuizAttempt(QuizAttemptBase):
     class Config:
         from_attributes = True
 
+class AttemptSummary(BaseModel):
+    id: int
+    quiz_id: int
+    quiz_title: str
+    score: float
+    total_questions: int
+    correct_answers: int
+    started_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+class ScoreTrendPoint(BaseModel):
+    period_start: date
+    attempts: int
+    average_score: float
+    best_score: float
+
+class HistorySummary(BaseModel):
+    attempts: int
+    average_score: Optional[float] = None
+    best_score: Optional[float] = None
+    total_questions: int
+    correct_answers: int
+    last_attempt_at: Optional[datetime] = None
+    bucket: str  # 'day' or 'week'
+    trend: List[ScoreTrendPoint]
+
 # Import schemas
 class ImportError(BaseModel):
     line_number: int
     content: str
     error: str
 
+class DuplicateMatch(BaseModel):
+    line_number: int
+    stem: str
+    question_id: Optional[int] = None
+    similarity: float
+    exact: bool
+
+class QuestionChange(BaseModel):
+    change: str  # 'added', 'updated', 'removed', 'retired'
+    question_id: Optional[int] = None
+    line_number: Optional[int] = None
+    stem: str
+
+class ImportDiff(BaseModel):
+    file_unchanged: bool = False
+    added: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    retired: int = 0
+    changes: List[QuestionChange] = []
+
 class ImportReportBase(BaseModel):
     filename: str
     total_lines: int
     successful_imports: int
     failed_imports: int
     errors: List[ImportError]
+    duplicate_imports: int = 0
+    duplicates: Optional[List[DuplicateMatch]] = None
+    file_hash: Optional[str] = None
+    diff: Optional[ImportDiff] = None
 
 class ImportReport(ImportReportBase):
     id: int
@@ -130,6 +186,43 @@ class ImportReport(ImportReportBase):
     class Config:
         from_attributes = True
 
+class BatchImportReport(BaseModel):
+    total_files: int
+    unchanged_files: int
+    successful_imports: int
+    failed_imports: int
+    duplicate_imports: int
+    reports: List[ImportReport]
+
+# Item analysis schemas
+class OptionStats(BaseModel):
+    option_index: int
+    selected_count: int
+
+class QuestionStats(BaseModel):
+    question_id: int
+    responses: int
+    answered: int
+    correct: int
+    p_value: Optional[float] = None  # Proportion of responses that were correct
+    point_biserial: Optional[float] = None  # Correlation of item score with attempt score
+    options: List[OptionStats]
+
+class RescoreJob(BaseModel):
+    id: int
+    question_id: int
+    status: str  # 'pending', 'running', 'completed', 'failed'
+    total_attempts: int
+    processed_attempts: int
+    changed_attempts: int
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
+
 # Auth schemas
 class Token(BaseModel):
     access_token: str
@@ -142,9 +235,45 @@ class GoogleAuthRequest(BaseModel):
     id_token: str
 
 # Quiz generation schemas
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+class TagFacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+class QuestionFacets(BaseModel):
+    total: int  # Questions matching every filter
+    enough: Optional[bool] = None  # Whether total covers the requested count
+    question_types: List[FacetCount]
+    difficulties: List[FacetCount]
+    tags: List[TagFacetCount]
+
 class QuizGenerationRequest(BaseModel):
     topic: Optional[str] = None
     question_type: Optional[str] = None
     difficulty: Optional[str] = None
     count: int = 10
-    tag_ids: Optional[List[int]] = None
\ No newline at end of file
+    tag_ids: Optional[List[int]] = None
+    tag_mode: str = 'any'  # 'any', 'all' or 'none' of tag_ids
+
+class ParallelFormsRequest(QuizGenerationRequest):
+    forms: int = 2
+    max_shared_questions: Optional[int] = None  # Most questions any two forms may share
+    seed: Optional[int] = None  # Makes the assignment reproducible
+
+class ParallelForms(BaseModel):
+    quizzes: List[Quiz]
+    strata: int  # Difficulty/type/tag groups balanced across the forms
+    max_question_uses: int
+    max_shared_questions: int
+
+class RequestProfile(BaseModel):
+    name: str  # Download from /api/profiles/{name}
+    size: int  # Bytes
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
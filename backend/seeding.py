@@ -0,0 +1,255 @@
+"""Fill the bank with synthetic questions for load tests and benchmarks.
+
+Questions, options and tag links are written with Core executemany inserts,
+one transaction per ``SEED_BATCH_SIZE`` questions, so a million questions
+take minutes rather than hours. Stems are numbered after the current highest
+question ID, so repeated runs never produce identical questions.
+
+Computing MinHash signatures dominates the cost of an import, so seeded
+questions are left out of duplicate detection unless ``index`` is set. Their
+``content_hash`` stays empty, which is what ``reindex_questions`` looks for,
+so they can be indexed later.
+
+Users, quizzes (with snapshots) and graded attempts can be added on top.
+Attempts are written with their ``attempt_answers`` rows, and item statistics
+are rebuilt from those once at the end.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from models import AttemptAnswer, Option, Question, Quiz, QuizAttempt, Tag, User, question_tags
+from answer_keys import answer_mask
+from attempt_answers import storable_mask
+from dedup import chunked, content_hash, match_and_index, minhash_signature, pack_signature
+from facets import record_question_changes
+from item_stats import recompute_item_stats
+from quiz_snapshots import materialize_snapshots
+
+SEED_BATCH_SIZE = 5000
+SEED_TAG_COUNT = 20
+SEED_QUIZ_QUESTIONS = 20
+# Attempts are spread over this many days before now, for history trends
+SEED_ATTEMPT_DAYS = 180
+
+QUESTION_TYPE_WEIGHTS = {'single': 6, 'multiple': 3, 'true_false': 1}
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+_SYLLABLES = ('ka', 'lo', 'mi', 'ra', 'te', 'su', 'vo', 'ne', 'di', 'po', 'ga', 'chi')
+VOCABULARY = [a + b + c for a in _SYLLABLES for b in _SYLLABLES[::2] for c in ('', 'n', 'r')]
+
+
+def synthetic_question(rng: random.Random, number: int, tag_ids: List[int]) -> Dict:
+    question_type = rng.choices(list(QUESTION_TYPE_WEIGHTS), weights=list(QUESTION_TYPE_WEIGHTS.values()))[0]
+    if question_type == 'true_false':
+        options = ['True', 'False']
+        correct_answer = [rng.randrange(2)]
+    else:
+        options = [' '.join(rng.choices(VOCABULARY, k=rng.randint(1, 4))) for _ in range(rng.randint(3, 5))]
+        if question_type == 'single':
+            correct_answer = [rng.randrange(len(options))]
+        else:
+            correct_answer = sorted(rng.sample(range(len(options)), rng.randint(2, len(options) - 1)))
+    return {
+        'stem': f"Seed question {number}: {' '.join(rng.choices(VOCABULARY, k=rng.randint(6, 16)))}?",
+        'question_type': question_type,
+        'difficulty': rng.choice(DIFFICULTIES),
+        'options': options,
+        'correct_answer': correct_answer,
+        'explanation': f"Synthetic question {number}",
+        'tag_ids': rng.sample(tag_ids, rng.randint(0, min(3, len(tag_ids)))),
+    }
+
+
+def seed_tags(db: Session, count: int = SEED_TAG_COUNT) -> List[int]:
+    """IDs of the ``seed-N`` tags, creating the missing ones."""
+    names = [f"seed-{i}" for i in range(1, count + 1)]
+    existing = dict(db.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+    missing = [{'name': name} for name in names if name not in existing]
+    if missing:
+        db.execute(insert(Tag), missing)
+        existing = dict(db.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+    return [existing[name] for name in names]
+
+
+def seed_questions(db: Session, count: int, seed: Optional[int] = None, tag_count: int = SEED_TAG_COUNT,
+                   batch_size: int = SEED_BATCH_SIZE, index: bool = False,
+                   progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Insert ``count`` synthetic questions, committing after each batch."""
+    rng = random.Random(seed)
+    tag_ids = seed_tags(db, tag_count) if tag_count else []
+    db.commit()
+    first_number = (db.query(func.max(Question.id)).scalar() or 0) + 1
+    questions_table = Question.__table__
+
+    written = {'questions': 0, 'options': 0, 'tags': 0}
+    for start in range(0, count, batch_size):
+        batch = [
+            synthetic_question(rng, first_number + start + i, tag_ids)
+            for i in range(min(batch_size, count - start))
+        ]
+        rows = []
+        signatures = []
+        for item in batch:
+            row = {key: item[key] for key in ('stem', 'question_type', 'difficulty', 'correct_answer', 'explanation')}
+            if index:
+                signature = minhash_signature(item['stem'], item['options'])
+                row['content_hash'] = content_hash(item['stem'], item['options'], item['correct_answer'])
+                row['minhash_signature'] = pack_signature(signature)
+                signatures.append(signature)
+            rows.append(row)
+
+        question_ids = db.execute(
+            insert(questions_table).returning(questions_table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        option_rows = [
+            {'question_id': question_id, 'text': text, 'label': chr(ord('A') + i), 'order_index': i}
+            for question_id, item in zip(question_ids, batch)
+            for i, text in enumerate(item['options'])
+        ]
+        db.execute(insert(Option), option_rows)
+        tag_rows = [
+            {'question_id': question_id, 'tag_id': tag_id}
+            for question_id, item in zip(question_ids, batch)
+            for tag_id in item['tag_ids']
+        ]
+        if tag_rows:
+            db.execute(question_tags.insert(), tag_rows)
+        if index:
+            match_and_index(db, question_ids, signatures)
+        record_question_changes(db)
+        db.commit()
+
+        written['questions'] += len(question_ids)
+        written['options'] += len(option_rows)
+        written['tags'] += len(tag_rows)
+        if progress:
+            progress(written['questions'], count)
+    return written
+
+
+def seed_users(db: Session, count: int) -> List[int]:
+    """IDs of ``count`` seed students, creating the missing ones."""
+    emails = [f"seed-user-{i}@example.com" for i in range(1, count + 1)]
+    existing = {}
+    for chunk in chunked(emails):
+        existing.update(db.query(User.email, User.id).filter(User.email.in_(chunk)).all())
+    missing = [
+        {'email': email, 'name': f"Seed User {i}", 'google_id': f"seed-user-{i}", 'is_admin': False}
+        for i, email in enumerate(emails, start=1) if email not in existing
+    ]
+    if missing:
+        db.execute(insert(User), missing)
+        for chunk in chunked(emails):
+            existing.update(db.query(User.email, User.id).filter(User.email.in_(chunk)).all())
+    db.commit()
+    return [existing[email] for email in emails]
+
+
+def seed_quizzes(db: Session, count: int, questions_per_quiz: int = SEED_QUIZ_QUESTIONS,
+                 seed: Optional[int] = None, created_by: Optional[int] = None,
+                 batch_size: int = 500) -> List[int]:
+    """Create ``count`` quizzes of random live questions, with their snapshots."""
+    rng = random.Random(seed)
+    question_ids = db.execute(select(Question.id).where(Question.retired == False)).scalars().all()
+    if len(question_ids) < questions_per_quiz:
+        raise ValueError(f"Not enough questions to seed quizzes ({len(question_ids)} available)")
+
+    quiz_ids = []
+    for start in range(0, count, batch_size):
+        quizzes = [
+            Quiz(
+                title=f"Seed quiz {start + i + 1}",
+                description=f"Generated quiz with {questions_per_quiz} questions",
+                question_ids=rng.sample(question_ids, questions_per_quiz),
+                created_by=created_by,
+            )
+            for i in range(min(batch_size, count - start))
+        ]
+        db.add_all(quizzes)
+        db.flush()
+        materialize_snapshots(db, quizzes)
+        db.commit()
+        quiz_ids.extend(quiz.id for quiz in quizzes)
+    return quiz_ids
+
+
+def seed_attempts(db: Session, count: int, quiz_ids: Sequence[int], user_ids: Sequence[int],
+                  seed: Optional[int] = None, batch_size: int = SEED_BATCH_SIZE,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+    """Insert ``count`` graded attempts at the given quizzes, then rebuild item statistics.
+
+    Each student answers correctly with their own probability, so scores and
+    item discrimination look like real data.
+    """
+    rng = random.Random(seed)
+    keys = {
+        quiz_id: {int(question_id): answer for question_id, answer in answer_key.items()}
+        for quiz_id, answer_key in db.query(Quiz.id, Quiz.answer_key).filter(Quiz.id.in_(quiz_ids))
+    }
+    question_ids = sorted({question_id for key in keys.values() for question_id in key})
+    option_counts = {}
+    for chunk in chunked(question_ids):
+        option_counts.update(db.query(Option.question_id, func.count(Option.id)).filter(
+            Option.question_id.in_(chunk)
+        ).group_by(Option.question_id).all())
+    ability = {user_id: rng.uniform(0.3, 0.95) for user_id in user_ids}
+    now = datetime.utcnow()
+    attempts_table = QuizAttempt.__table__
+
+    written = {'attempts': 0, 'answers': 0}
+    for start in range(0, count, batch_size):
+        attempts = []
+        graded_attempts = []
+        for _ in range(min(batch_size, count - start)):
+            quiz_id = rng.choice(quiz_ids)
+            user_id = rng.choice(user_ids)
+            selected = {}
+            graded = []
+            for question_id, answer in keys[quiz_id].items():
+                if rng.random() < ability[user_id]:
+                    choice = list(answer)
+                else:
+                    choice = [rng.randrange(max(option_counts.get(question_id, 1), 1))]
+                selected[str(question_id)] = choice
+                graded.append((question_id, answer_mask(choice), sorted(choice) == sorted(answer)))
+            correct = sum(1 for _, _, is_correct in graded if is_correct)
+            completed_at = now - timedelta(seconds=rng.randrange(SEED_ATTEMPT_DAYS * 86400))
+            attempts.append({
+                'user_id': user_id,
+                'quiz_id': quiz_id,
+                'selected_answers': selected,
+                'score': correct / len(graded) * 100 if graded else 0,
+                'total_questions': len(graded),
+                'correct_answers': correct,
+                'answers_recorded': True,
+                'started_at': completed_at - timedelta(minutes=rng.randint(5, 30)),
+                'completed_at': completed_at,
+            })
+            graded_attempts.append((user_id, graded))
+
+        attempt_ids = db.execute(
+            insert(attempts_table).returning(attempts_table.c.id, sort_by_parameter_order=True), attempts
+        ).scalars().all()
+        answer_rows = [
+            {'attempt_id': attempt_id, 'question_id': question_id, 'user_id': user_id,
+             'selected_mask': storable_mask(selected_mask), 'is_correct': is_correct}
+            for attempt_id, (user_id, graded) in zip(attempt_ids, graded_attempts)
+            for question_id, selected_mask, is_correct in graded
+        ]
+        if answer_rows:
+            db.execute(insert(AttemptAnswer), answer_rows)
+        db.commit()
+
+        written['attempts'] += len(attempt_ids)
+        written['answers'] += len(answer_rows)
+        if progress:
+            progress(written['attempts'], count)
+
+    if written['attempts']:
+        recompute_item_stats(db, repair=True)
+    return written
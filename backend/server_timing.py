@@ -0,0 +1,203 @@
+"""Per-request phase timings, returned in a ``Server-Timing`` response header.
+
+Browser devtools show the header in a request's Timing tab, so a slow response
+can be traced to authentication (``auth``: token check and user lookup), SQL
+(``db``, with the number of statements), parsing uploaded documents
+(``parse``), or building the response body (``serialize``: from the endpoint
+returning to the response starting, which covers response-model validation
+and JSON encoding)::
+
+    Server-Timing: auth;dur=1.9, db;dur=4.2;desc="6 queries", serialize;dur=0.8, total;dur=9.5
+
+Durations are in milliseconds. ``db`` overlaps the other phases: the user
+lookup counts towards both ``auth`` and ``db``. A streamed body is sent after
+the header, so its time is not included.
+
+The timings of a request live in a context variable, which Starlette copies
+into the threads that run sync dependencies, so ``phase()`` can be used
+anywhere in the request. Outside a request it does nothing.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterable, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Header order; any other phase follows these
+PHASES = ('auth', 'db', 'parse', 'serialize')
+
+
+class RequestTimings:
+    __slots__ = ('started', 'durations', 'queries', 'endpoint_finished')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+        self.queries = 0
+        self.endpoint_finished: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self, total: float) -> str:
+        """The ``Server-Timing`` value for the phases that ran, then the total."""
+        names = [name for name in PHASES if name in self.durations]
+        names += [name for name in self.durations if name not in PHASES]
+        entries = []
+        for name in names:
+            entry = f"{name};dur={self.durations[name] * 1000:.1f}"
+            if name == 'db':
+                entry += f';desc="{self.queries} {"query" if self.queries == 1 else "queries"}"'
+            entries.append(entry)
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(entries)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar('server_timing', default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Add the time spent in the block to ``name`` for the current request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed_iter(iterable: Iterable, name: str) -> Iterator:
+    """Yield from ``iterable``, timing only the work of producing each item."""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+# Requests
+
+class ServerTimingMiddleware:
+    """Collect the phase timings of each HTTP request and add the header.
+
+    Requests that take at least ``slow_request_ms`` are logged with their
+    breakdown as a warning; 0 turns the log off.
+    """
+
+    def __init__(self, app, slow_request_ms: float = 0):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        status = 500  # Unless a response is started
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                now = time.perf_counter()
+                if timings.endpoint_finished is not None:
+                    timings.add('serialize', now - timings.endpoint_finished)
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', timings.header(now - timings.started).encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        token = _current.set(timings)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - timings.started
+            if self.slow_request_ms and total * 1000 >= self.slow_request_ms:
+                route = getattr(scope.get('route'), 'path', scope['path'])
+                logger.warning(f"Slow request: {scope['method']} {route} {status} took {total * 1000:.0f}ms "
+                               f"({timings.header(total)})")
+
+
+class TimedRoute(APIRoute):
+    """Mark when the endpoint returns, so the middleware can time serialization."""
+
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    _mark_endpoint_finished()
+        else:
+            @wraps(endpoint)
+            def timed_endpoint(*args, **kwargs):
+                try:
+                    return endpoint(*args, **kwargs)
+                finally:
+                    _mark_endpoint_finished()
+
+        self.dependant.call = timed_endpoint
+        return super().get_route_handler()
+
+
+def _mark_endpoint_finished():
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_finished = time.perf_counter()
+
+
+# Database
+
+_STARTED_KEY = 'server_timing_query_started'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+    conn.info.setdefault(_STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info[_STARTED_KEY].pop()
+    timings = _current.get()
+    if timings is not None:
+        timings.add('db', time.perf_counter() - started)
+
+
+def _handle_error(context):
+    connection = context.connection
+    if connection is not None and connection.info.get(_STARTED_KEY):
+        started = connection.info[_STARTED_KEY].pop()
+        timings = _current.get()
+        if timings is not None:
+            timings.add('db', time.perf_counter() - started)
+
+
+def time_queries(engine: Engine):
+    """Count and time the statements ``engine`` runs during a request."""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,258 @@
+"""Import questions from JSONL or CSV files.
+
+Rows use the fields written by ``exporter``: ``stem``, ``question_type``,
+``difficulty``, ``options`` (option texts in display order),
+``correct_answer`` (option indices), ``explanation`` and ``tags`` (names).
+An ``id`` column is ignored, so an export can be imported into another bank.
+In CSV the list columns hold JSON arrays.
+
+The upload is read line by line and rows are validated in batches of
+``VALIDATION_BATCH_SIZE`` with a single ``TypeAdapter`` call. Valid rows become
+``ParsedQuestion`` objects and invalid ones become error dicts in the
+``DocxParser`` format, so both go through ``import_stream`` like a parsed
+document.
+"""
+
+import codecs
+import csv
+import hashlib
+import io
+import json
+from typing import BinaryIO, Dict, Iterator, List, Literal, Optional, Tuple, Union
+
+from pydantic import (BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, ValidationInfo,
+                      field_validator, model_validator)
+from sqlalchemy.orm import Session
+
+from models import ImportReport
+from docx_parser import ParsedQuestion
+from importer import (
+    IMPORT_CHUNK_SIZE,
+    BulkImporter,
+    finish_import,
+    import_stream,
+    latest_import_report,
+    unchanged_file_report,
+)
+
+STRUCTURED_FORMATS = ('jsonl', 'csv')
+VALIDATION_BATCH_SIZE = IMPORT_CHUNK_SIZE
+MAX_OPTIONS = 26
+
+SCAN_CHUNK_BYTES = 64 * 1024
+
+
+class QuestionRow(BaseModel):
+    model_config = ConfigDict(extra='ignore', str_strip_whitespace=True)
+
+    stem: str = Field(min_length=1)
+    question_type: Literal['single', 'multiple', 'true_false'] = 'single'
+    difficulty: Literal['easy', 'medium', 'hard'] = 'medium'
+    options: List[str] = Field(default_factory=list, max_length=MAX_OPTIONS)
+    correct_answer: List[int] = Field(min_length=1)
+    explanation: str = ''
+    tags: List[str] = Field(default_factory=list)
+
+    @field_validator('options', 'correct_answer', 'tags', mode='before')
+    @classmethod
+    def _decode_json_array(cls, value):
+        # CSV cells hold JSON arrays
+        if isinstance(value, str):
+            try:
+                return json.loads(value) if value.strip() else []
+            except ValueError:
+                raise ValueError('must be a JSON array')
+        return value
+
+    @field_validator('question_type', 'difficulty', 'explanation', mode='before')
+    @classmethod
+    def _blank_to_default(cls, value, info: ValidationInfo):
+        # Empty CSV cells and JSON nulls fall back to the default
+        if value in ('', None):
+            return cls.model_fields[info.field_name].default
+        return value
+
+    @model_validator(mode='after')
+    def _check_answers(self):
+        if self.question_type == 'true_false' and not self.options:
+            self.options = ['True', 'False']
+        if not self.options:
+            raise ValueError('Missing options for non-true/false question')
+        for answer_idx in self.correct_answer:
+            if not 0 <= answer_idx < len(self.options):
+                raise ValueError(f'Correct answer index {answer_idx} exceeds options count')
+        return self
+
+
+_rows_adapter = TypeAdapter(List[QuestionRow])
+
+
+def structured_format(filename: str) -> Optional[str]:
+    """``jsonl`` or ``csv`` from a file name, or None for other files."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return extension if extension in STRUCTURED_FORMATS else None
+
+
+def scan_upload(file: BinaryIO) -> str:
+    """Hash an uploaded file and check that it is UTF-8, then rewind it.
+
+    Runs before anything is imported, so an undecodable file is rejected
+    instead of failing halfway through.
+    """
+    digest = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        while True:
+            chunk = file.read(SCAN_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise ValueError('File is not valid UTF-8')
+    finally:
+        file.seek(0)
+    return digest.hexdigest()
+
+
+def to_parsed_question(row: QuestionRow, line_number: int, content: str) -> ParsedQuestion:
+    parsed_q = ParsedQuestion()
+    parsed_q.stem = row.stem
+    parsed_q.question_type = row.question_type
+    parsed_q.options = [{'label': chr(ord('A') + i), 'text': text} for i, text in enumerate(row.options)]
+    parsed_q.correct_answer = row.correct_answer
+    parsed_q.explanation = row.explanation
+    parsed_q.difficulty = row.difficulty
+    parsed_q.tags = list(dict.fromkeys(tag for tag in row.tags if tag))
+    parsed_q.raw_lines = [(line_number, content)]
+    return parsed_q
+
+
+def _error_message(error: Dict) -> str:
+    # Field errors are prefixed with the field path; row-level ones are not
+    location = '.'.join(str(part) for part in error['loc'])
+    message = error['msg']
+    if error['type'] == 'value_error':
+        message = message.removeprefix('Value error, ')
+    return f'{location}: {message}' if location else message
+
+
+class StructuredParser:
+    """Read questions from a JSONL or CSV upload.
+
+    Mirrors ``DocxParser.iter_questions``: questions and error dicts are
+    yielded in file order and ``total_lines`` counts the lines read.
+    """
+
+    def __init__(self, file_format: str, batch_size: int = VALIDATION_BATCH_SIZE):
+        if file_format not in STRUCTURED_FORMATS:
+            raise ValueError(f"file format must be one of: {', '.join(STRUCTURED_FORMATS)}")
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.total_lines = 0
+
+    def iter_questions(self, file: BinaryIO) -> Iterator[Union[ParsedQuestion, Dict]]:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            records = self._jsonl_records(text) if self.file_format == 'jsonl' else self._csv_records(text)
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    yield from self._validate(batch)
+                    batch = []
+            if batch:
+                yield from self._validate(batch)
+        finally:
+            # Leave the upload open for its owner
+            text.detach()
+
+    def _jsonl_records(self, text) -> Iterator[Tuple[int, str, object]]:
+        """(line number, content, decoded value or error message) per non-blank line."""
+        for line_number, line in enumerate(text, start=1):
+            self.total_lines = line_number
+            content = line.strip()
+            if not content:
+                continue
+            try:
+                yield line_number, content, json.loads(content)
+            except ValueError as e:
+                yield line_number, content, _InvalidRecord(f'Invalid JSON: {e}')
+
+    def _csv_records(self, text) -> Iterator[Tuple[int, str, object]]:
+        reader = csv.DictReader(text)
+        line_number = 1
+        for row in reader:
+            # A quoted cell may span lines; rows are numbered by their first line
+            first_line = line_number + 1
+            line_number = reader.line_num
+            self.total_lines = line_number
+            values = {key: value for key, value in row.items() if key is not None}
+            content = values.get('stem') or ','.join(value or '' for value in values.values())
+            if None in row:
+                yield first_line, content, _InvalidRecord('Row has more cells than the header')
+                continue
+            yield first_line, content, values
+        self.total_lines = max(self.total_lines, reader.line_num)
+
+    def _validate(self, batch: List[Tuple[int, str, object]]) -> List[Union[ParsedQuestion, Dict]]:
+        errors = {
+            index: value.message for index, (_, _, value) in enumerate(batch)
+            if isinstance(value, _InvalidRecord)
+        }
+        pending = [index for index in range(len(batch)) if index not in errors]
+        rows = {}
+        while pending:
+            try:
+                validated = _rows_adapter.validate_python([batch[index][2] for index in pending])
+            except ValidationError as e:
+                # Errors are located by list position; record the first per row
+                # and validate the remaining rows again
+                for error in e.errors():
+                    index = pending[error['loc'][0]]
+                    if index not in errors:
+                        errors[index] = _error_message({**error, 'loc': error['loc'][1:]})
+                pending = [index for index in pending if index not in errors]
+                continue
+            rows.update(zip(pending, validated))
+            break
+
+        results = []
+        for index, (line_number, content, _) in enumerate(batch):
+            if index in errors:
+                results.append({'line_number': line_number, 'content': content, 'error': errors[index]})
+            else:
+                results.append(to_parsed_question(rows[index], line_number, content))
+        return results
+
+
+class _InvalidRecord:
+    __slots__ = ('message',)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+def import_structured_file(db: Session, file: BinaryIO, filename: str, file_format: str,
+                           created_by: Optional[int] = None, retire_removed: bool = False) -> ImportReport:
+    """Import a seekable JSONL or CSV file and commit its report.
+
+    Like a DOCX upload, a file whose bytes match the last import of the same
+    name is not read again, and any other earlier import of it turns this one
+    into an incremental update. Raises ``ValueError`` before importing
+    anything if the file is not UTF-8.
+    """
+    file_hash = scan_upload(file)
+    previous = latest_import_report(db, filename, created_by)
+    if previous and previous.file_hash == file_hash:
+        report = unchanged_file_report(previous, created_by)
+    else:
+        parser = StructuredParser(file_format)
+        importer = BulkImporter(db, previous.fingerprints if previous else None)
+        errors = import_stream(importer, parser.iter_questions(file))
+        report = finish_import(importer, filename, parser.total_lines, errors, created_by, file_hash, retire_removed)
+    db.add(report)
+    db.commit()
+    db.refresh(report)
+    return report
@@ -0,0 +1,100 @@
+import random
+import sys
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Quiz
+from answer_keys import AnswerKey, AnswerKeyCache, answer_key_cache, answer_mask
+from conftest import add_quiz, make_quiz
+
+def count_statements(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+class TestAnswerKeys:
+
+    def test_mask_scoring_matches_set_comparison(self):
+        """Bitmask comparison gives the same result as comparing answer sets."""
+        rng = random.Random(7)
+        for _ in range(500):
+            correct = rng.sample(range(6), rng.randint(0, 3))
+            selected = [rng.randrange(-1, 6) for _ in range(rng.randint(0, 4))]
+            key = AnswerKey(1, [10], [answer_mask(correct)])
+            expected = 1 if set(correct) == set(selected) and all(i >= 0 for i in selected) else 0
+            assert key.count_correct({10: selected}) == expected
+
+    def test_cached_key_costs_one_primary_key_read(self, db, engine):
+        """After the first submission a quiz is graded from one read of its key version."""
+        _, quiz, questions = make_quiz(db, [[0], [1, 2], [3]])
+
+        first = answer_key_cache.get(db, quiz.id)
+        statements = count_statements(engine)
+        second = answer_key_cache.get(db, quiz.id)
+
+        assert second is first
+        assert len(statements) == 1
+        assert "quizzes.answer_key_version" in statements[0]
+        assert second.total_questions == 3
+        assert second.count_correct({questions[0].id: [0], questions[1].id: [2, 1]}) == 2
+
+    def test_unknown_quiz(self, db):
+        """A missing quiz has no answer key."""
+        assert answer_key_cache.get(db, 999) is None
+
+    def test_correction_from_another_session_is_used_at_once(self, db, session_factory):
+        """A correction committed anywhere bumps the key version, so no stale key is graded with."""
+        _, quiz, questions = make_quiz(db, [[0], [1]])
+        _, other_quiz, _ = make_quiz(db, [[2]])
+        first = answer_key_cache.get(db, quiz.id)
+        other = answer_key_cache.get(db, other_quiz.id)
+
+        worker = session_factory()
+        worker.get(type(questions[0]), questions[0].id).correct_answer = [3]
+        worker.commit()
+        worker.close()
+
+        key = answer_key_cache.get(db, quiz.id)
+        assert key is not first
+        assert key.version == first.version + 1
+        assert key.count_correct({questions[0].id: [3], questions[1].id: [1]}) == 2
+        assert answer_key_cache.get(db, other_quiz.id) is other
+
+    def test_rolled_back_change_keeps_key(self, db):
+        """A change that is rolled back does not invalidate anything."""
+        _, quiz, questions = make_quiz(db, [[0]])
+        key = answer_key_cache.get(db, quiz.id)
+
+        questions[0].correct_answer = [1]
+        db.flush()
+        db.rollback()
+
+        assert answer_key_cache.get(db, quiz.id) is key
+
+    def test_deleted_question_is_no_longer_graded(self, db):
+        """Deleting a question removes it from the quiz's key."""
+        _, quiz, questions = make_quiz(db, [[0], [1]])
+        assert answer_key_cache.get(db, quiz.id).total_questions == 2
+
+        db.delete(questions[1])
+        db.commit()
+
+        assert answer_key_cache.get(db, quiz.id).total_questions == 1
+
+    def test_quizzes_without_a_stored_key_are_not_cached(self, db):
+        """Keys compiled from live questions have no version to check, so they are rebuilt each time."""
+        _, snapshotted, questions = make_quiz(db, [[0]])
+        legacy = add_quiz(db, [questions[0].id])
+        cache = AnswerKeyCache()
+
+        cache.get(db, legacy.id)
+        questions[0].correct_answer = [2]
+        db.commit()
+
+        assert cache.get(db, legacy.id).count_correct({questions[0].id: [2]}) == 1
+        assert len(cache) == 0
+        assert db.get(Quiz, snapshotted.id).answer_key_version == 1
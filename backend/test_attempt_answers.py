@@ -0,0 +1,96 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import AttemptAnswer, Quiz, QuizAttempt
+from answer_keys import answer_key_cache
+from attempt_answers import backfill_attempt_answers, pending_attempt_count, record_attempt_answers
+from item_stats import get_question_stats
+from conftest import make_quiz
+
+def legacy_attempt(user, quiz, selected_answers):
+    """An attempt as stored before attempt_answers existed."""
+    return QuizAttempt(
+        user_id=user.id,
+        quiz_id=quiz.id,
+        selected_answers=selected_answers,
+        score=0,
+        total_questions=len(quiz.question_ids),
+        correct_answers=0,
+        completed_at=datetime.utcnow()
+    )
+
+class TestAttemptAnswers:
+
+    def test_rows_are_written_with_the_attempt(self, db):
+        """Every graded question gets a row, including unanswered ones."""
+        user, quiz, questions = make_quiz(db, [[0], [1], [2]])
+        selected = {questions[0].id: [0], questions[1].id: [0, 2]}
+        graded = answer_key_cache.get(db, quiz.id).grade(selected)
+
+        attempt = legacy_attempt(user, quiz, selected)
+        db.add(attempt)
+        db.flush()
+        record_attempt_answers(db, attempt, graded)
+        db.commit()
+
+        rows = {row.question_id: row for row in db.query(AttemptAnswer).filter(AttemptAnswer.attempt_id == attempt.id)}
+        assert len(rows) == 3
+        assert (rows[questions[0].id].selected_mask, rows[questions[0].id].is_correct) == (0b001, True)
+        assert (rows[questions[1].id].selected_mask, rows[questions[1].id].is_correct) == (0b101, False)
+        assert (rows[questions[2].id].selected_mask, rows[questions[2].id].is_correct) == (0, False)
+        assert all(row.user_id == user.id for row in rows.values())
+
+    def test_backfill_converts_existing_attempts_in_batches(self, db):
+        """Older attempts are converted batch by batch, and a rerun does nothing."""
+        user, quiz, questions = make_quiz(db, [[0], [1]])
+        for i in range(5):
+            # Keys are strings, as they come back from the JSON column
+            db.add(legacy_attempt(user, quiz, {str(questions[0].id): [0], str(questions[1].id): [i % 2]}))
+        db.commit()
+        assert pending_attempt_count(db) == 5
+
+        progress = []
+        result = backfill_attempt_answers(db, batch_size=2, pause=0,
+                                          progress=lambda attempts, rows: progress.append((attempts, rows)))
+
+        assert result == {'attempts': 5, 'answers': 10}
+        assert progress == [(2, 4), (4, 8), (5, 10)]
+        assert pending_attempt_count(db) == 0
+        assert db.query(AttemptAnswer).filter(AttemptAnswer.is_correct == True).count() == 5 + 2
+        assert [s['responses'] for s in get_question_stats(db, [q.id for q in questions])] == [5, 5]
+
+        assert backfill_attempt_answers(db, batch_size=2, pause=0) == {'attempts': 0, 'answers': 0}
+
+    def test_attempts_without_rows_are_not_pending_again(self, db):
+        """Attempts of a deleted or empty quiz yield no rows but are still marked converted."""
+        user, quiz, questions = make_quiz(db, [[0]])
+        empty = Quiz(title="Empty", question_ids=[])
+        db.add(empty)
+        db.commit()
+        db.add_all([legacy_attempt(user, empty, {}), legacy_attempt(user, quiz, {str(questions[0].id): [0]})])
+        db.commit()
+        gone = legacy_attempt(user, quiz, {})
+        gone.quiz_id = 999
+        db.add(gone)
+        db.commit()
+        assert pending_attempt_count(db) == 3
+
+        assert backfill_attempt_answers(db, pause=0) == {'attempts': 3, 'answers': 1}
+        assert pending_attempt_count(db) == 0
+        assert backfill_attempt_answers(db, pause=0) == {'attempts': 0, 'answers': 0}
+
+    def test_unrepresentable_selection_is_stored_as_invalid(self, db):
+        """A selected option index too large for the column is stored as -1."""
+        user, quiz, questions = make_quiz(db, [[0]])
+        db.add(legacy_attempt(user, quiz, {str(questions[0].id): [70]}))
+        db.commit()
+
+        backfill_attempt_answers(db, pause=0)
+
+        row = db.query(AttemptAnswer).one()
+        assert row.selected_mask == -1
+        assert row.is_correct is False
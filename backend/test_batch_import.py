@@ -0,0 +1,92 @@
+import pytest
+import io
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from docx_parser import create_sample_docx
+import batch_import
+from batch_import import BatchImportError, expand_uploads, parse_documents
+
+def sample_docx_bytes(stem):
+    questions_data = [
+        {
+            'stem': stem,
+            'options': ['Yes', 'No'],
+            'correct_answer': [0],
+            'question_type': 'single'
+        }
+    ]
+    with tempfile.NamedTemporaryFile(suffix='.docx') as tmp:
+        create_sample_docx(tmp.name, questions_data)
+        return Path(tmp.name).read_bytes()
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+class TestBatchImport:
+
+    def test_expand_zip_archive(self):
+        """Zip archives are flattened to their .docx members."""
+        archive = zip_bytes({
+            'week1/a.docx': b'a',
+            'week2/b.docx': b'b',
+            'notes.txt': b'ignored',
+            '__MACOSX/week1/._a.docx': b'ignored',
+            'week1/~$a.docx': b'ignored',
+        })
+        documents = expand_uploads([('course.zip', archive), ('c.docx', b'c')])
+
+        assert [name for name, _ in documents] == ['week1/a.docx', 'week2/b.docx', 'c.docx']
+
+    def test_rejects_unsupported_files(self):
+        """Anything other than .docx or .zip is rejected."""
+        with pytest.raises(BatchImportError):
+            expand_uploads([('questions.pdf', b'%PDF')])
+        with pytest.raises(BatchImportError):
+            expand_uploads([('broken.zip', b'not a zip')])
+
+    def test_rejects_duplicate_names(self):
+        """Two documents with one name would be diffed against the same previous import."""
+        archive = zip_bytes({'week1/q.docx': b'a', 'week2/q.docx': b'b'})
+        assert [name for name, _ in expand_uploads([('course.zip', archive)])] == ['week1/q.docx', 'week2/q.docx']
+        with pytest.raises(BatchImportError, match='more than once'):
+            expand_uploads([('course.zip', archive), ('other.zip', zip_bytes({'week1/q.docx': b'c'}))])
+        with pytest.raises(BatchImportError, match='more than once'):
+            expand_uploads([('q.docx', b'a'), ('q.docx', b'b')])
+
+    def test_archive_size_limit(self, monkeypatch):
+        """The limit holds for the bytes decompressed, not only the sizes the archive declares."""
+        monkeypatch.setattr(batch_import, 'MAX_ARCHIVE_BYTES', 100)
+        assert len(expand_uploads([('ok.zip', zip_bytes({'a.docx': b'x' * 60, 'b.docx': b'y' * 40}))])) == 2
+        with pytest.raises(BatchImportError, match='too large'):
+            expand_uploads([('big.zip', zip_bytes({'a.docx': b'x' * 60, 'b.docx': b'y' * 41}))])
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('bomb.docx', b'x' * 10000)
+            archive.filelist[0].file_size = 10  # Understated in the central directory
+        with pytest.raises(BatchImportError):
+            expand_uploads([('bomb.zip', buffer.getvalue())])
+
+    def test_parallel_parse_preserves_order(self):
+        """Documents parsed in the pool come back in input order."""
+        documents = [(f'{i}.docx', sample_docx_bytes(f'Is {i} a number?')) for i in range(3)]
+        documents.append(('corrupt.docx', b'not a docx'))
+
+        results = parse_documents(documents, workers=2)
+
+        assert [r['filename'] for r in results] == ['0.docx', '1.docx', '2.docx', 'corrupt.docx']
+        for i in range(3):
+            assert results[i]['questions'][0].stem == f'Is {i} a number?'
+            assert results[i]['errors'] == []
+        assert results[3]['questions'] == []
+        assert 'Could not read document' in results[3]['errors'][0]['error']
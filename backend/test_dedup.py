@@ -0,0 +1,123 @@
+import sys
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Question, Option, QuestionLSHBucket
+from dedup import content_hash, match_and_index, minhash_signature, estimate_similarity, reindex_questions
+from importer import BulkImporter
+from conftest import make_parsed
+
+class TestContentHash:
+
+    def test_formatting_differences_hash_identically(self):
+        """Whitespace, case and answer order do not change the hash."""
+        a = content_hash("What is  2 + 2?", ["3", "4"], [1, 0])
+        b = content_hash("what is 2 + 2? ", ["3 ", "4"], [0, 1])
+        assert a == b
+
+    def test_answer_change_changes_hash(self):
+        """A different correct answer is a different question."""
+        assert content_hash("Q", ["a", "b"], [0]) != content_hash("Q", ["a", "b"], [1])
+
+    def test_signature_similarity(self):
+        """Signatures of near-identical text are far closer than unrelated text."""
+        base = minhash_signature("Which planet in our solar system is known as the red planet", ["Mars", "Venus"])
+        edited = minhash_signature("Which planet in our solar system is known as the red planet?", ["Mars", "Venus", "Jupiter"])
+        other = minhash_signature("Who wrote the novel Pride and Prejudice in the nineteenth century", ["Austen", "Bronte"])
+        assert estimate_similarity(base, edited) > 0.6
+        assert estimate_similarity(base, other) < 0.2
+
+class TestBulkImporter:
+
+    def test_reimport_skips_exact_duplicates(self, db):
+        """Importing the same questions twice only stores them once."""
+        questions = [
+            make_parsed("What is the capital of France?", ["London", "Paris"], [1], 1),
+            make_parsed("Which are programming languages?", ["Python", "HTML", "Java"], [0, 2], 5),
+        ]
+        first = BulkImporter(db)
+        first.add(questions)
+        db.commit()
+
+        second = BulkImporter(db)
+        second.add(questions)
+        db.commit()
+
+        assert len(first.imported_ids) == 2
+        assert second.imported_ids == []
+        assert second.duplicate_count == 2
+        assert {d['question_id'] for d in second.duplicates} == set(first.imported_ids)
+        assert db.query(Question).count() == 2
+
+    def test_duplicates_within_one_batch(self, db):
+        """A question repeated inside one file is only inserted once."""
+        importer = BulkImporter(db)
+        importer.add([
+            make_parsed("Is water wet?", ["Yes", "No"], [0], 1),
+            make_parsed("Is  water wet?", ["yes", "no"], [0], 9),
+        ])
+        db.commit()
+
+        assert len(importer.imported_ids) == 1
+        assert importer.duplicates[0]['line_number'] == 9
+        assert importer.duplicates[0]['question_id'] == importer.imported_ids[0]
+
+    def test_near_duplicates_are_imported_and_flagged(self, db):
+        """Near-duplicates are inserted but reported with their match."""
+        stem = "In which year did the first human land on the Moon during the Apollo program"
+        importer = BulkImporter(db)
+        importer.add([make_parsed(stem, ["1965", "1969", "1972", "1975"], [1], 1)])
+        importer.add([make_parsed(stem, ["1965", "1969", "1972", "1975", "1981"], [1], 7)])
+        db.commit()
+
+        assert len(importer.imported_ids) == 2
+        assert importer.duplicate_count == 0
+        assert len(importer.duplicates) == 1
+        match = importer.duplicates[0]
+        assert match['exact'] is False
+        assert match['question_id'] == importer.imported_ids[0]
+        assert match['similarity'] >= 0.8
+
+    def test_reindex_backfills_existing_questions(self, db):
+        """Questions stored without hashes are indexed and dedup-checked."""
+        for _ in range(2):
+            question = Question(
+                stem="Legacy question",
+                question_type="single",
+                correct_answer=[0],
+                options=[Option(text="A", label="A", order_index=0), Option(text="B", label="B", order_index=1)],
+            )
+            db.add(question)
+        db.commit()
+
+        stats = reindex_questions(db)
+
+        assert stats['indexed'] == 1
+        assert stats['duplicates'] == 1
+        assert db.query(Question).filter(Question.content_hash.isnot(None)).count() == 1
+        assert db.query(QuestionLSHBucket).count() > 0
+
+    def test_candidate_lookup_seeks_the_bucket_index(self, db):
+        """Finding candidates never scans the whole LSH table."""
+        signature = minhash_signature("Which gas do plants absorb from the air", ["Carbon dioxide", "Oxygen"])
+        match_and_index(db, [1], [signature])
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('SELECT') and 'question_lsh_buckets' in statement:
+                statements.append((statement, parameters))
+
+        event.listen(db.get_bind(), 'before_cursor_execute', record)
+        try:
+            match_and_index(db, [2], [signature])
+        finally:
+            event.remove(db.get_bind(), 'before_cursor_execute', record)
+
+        assert len(statements) == 1
+        plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statements[0][0]}", statements[0][1]).all()
+        details = ' '.join(row[-1] for row in plan)
+        assert 'SCAN question_lsh_buckets' not in details
+        assert 'band=? AND bucket=?' in details
@@ -239,4 +239,42 @@ class TestDocxParser:
             assert len(parsed_questions) == 3
             assert len(errors) == 0
             
-        os.unlink(tmp.name)
\ No newline at end of file
+        os.unlink(tmp.name)
+
+    def test_iter_questions_streams_in_document_order(self):
+        """Test that iter_questions yields questions and errors as they complete."""
+        doc = Document()
+        doc.add_paragraph("1. First question")
+        doc.add_paragraph("A. Option A")
+        doc.add_paragraph("Answer: A")
+        doc.add_paragraph("2. Question without an answer")
+        doc.add_paragraph("A. Option A")
+        doc.add_paragraph("3. The sky is blue.")
+        doc.add_paragraph("Answer: True")
+        
+        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
+            doc.save(tmp.name)
+            
+            parser = DocxParser()
+            items = parser.iter_questions(tmp.name)
+            
+            first = next(items)
+            assert isinstance(first, ParsedQuestion)
+            assert first.stem == "First question"
+            assert parser.total_lines == 4  # Completed by the next question start
+            
+            rest = list(items)
+            assert rest[0]['error'] == 'Missing correct answer'
+            assert rest[0]['line_number'] == 4
+            assert rest[1].question_type == 'true_false'
+            assert parser.total_lines == 7
+            
+            # Nothing is accumulated on the parser while streaming
+            assert parser.questions == []
+            assert parser.errors == []
+            
+            parsed_questions, errors = DocxParser().parse_document(tmp.name)
+            assert [q.stem for q in parsed_questions] == [first.stem, rest[1].stem]
+            assert errors == [rest[0]]
+            
+        os.unlink(tmp.name)
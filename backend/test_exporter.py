@@ -0,0 +1,90 @@
+import csv
+import io
+import json
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Option, Question, Tag
+from docx_parser import DocxParser
+from exporter import export_questions, export_statement
+
+QUESTIONS = [
+    ('What is 2 + 2?', 'single', ['3', '4', '5'], [1], 'Basic arithmetic', 'easy'),
+    ('Which are primes?', 'multiple', ['2', '4', '7', '9'], [0, 2], None, 'hard'),
+    ('The earth is flat.', 'true_false', ['True', 'False'], [1], 'It is round', 'medium'),
+]
+
+@pytest.fixture
+def bank(db):
+    math = Tag(name="math")
+    for stem, question_type, options, answer, explanation, difficulty in QUESTIONS:
+        db.add(Question(
+            stem=stem, question_type=question_type, correct_answer=answer,
+            explanation=explanation, difficulty=difficulty,
+            options=[Option(text=text, label=chr(ord('A') + i), order_index=i) for i, text in enumerate(options)],
+            tags=[math] if question_type != 'true_false' else []
+        ))
+    db.add(Question(stem="Retired", question_type='single', correct_answer=[0], retired=True,
+                    options=[Option(text="Only", label="A", order_index=0)]))
+    db.commit()
+
+def export(session_factory, export_format, batch_size=2, **filters):
+    return b''.join(export_questions(session_factory, export_format, export_statement(**filters), batch_size))
+
+class TestExporter:
+
+    def test_jsonl(self, session_factory, bank):
+        lines = [json.loads(line) for line in export(session_factory, 'jsonl').decode().splitlines()]
+        assert [line['stem'] for line in lines] == [q[0] for q in QUESTIONS]
+        assert lines[1] == {
+            'id': 2, 'stem': 'Which are primes?', 'question_type': 'multiple', 'difficulty': 'hard',
+            'options': ['2', '4', '7', '9'], 'correct_answer': [0, 2], 'explanation': None, 'tags': ['math']
+        }
+
+    def test_csv(self, session_factory, bank):
+        rows = list(csv.DictReader(io.StringIO(export(session_factory, 'csv').decode())))
+        assert len(rows) == 3
+        assert rows[0]['stem'] == 'What is 2 + 2?'
+        assert json.loads(rows[0]['options']) == ['3', '4', '5']
+        assert json.loads(rows[2]['tags']) == []
+
+    def test_docx_round_trips_through_the_parser(self, session_factory, bank):
+        parsed, errors = DocxParser().parse_document(io.BytesIO(export(session_factory, 'docx')))
+        assert errors == []
+        assert [
+            (q.stem, q.question_type, [o['text'] for o in q.options], q.correct_answer, q.explanation or None, q.difficulty)
+            for q in parsed
+        ] == QUESTIONS
+
+    def test_filters(self, session_factory, bank):
+        assert export(session_factory, 'jsonl', tags=['math'], tag_mode='none').count(b'\n') == 1
+        assert export(session_factory, 'jsonl', difficulty='easy').count(b'\n') == 1
+        assert export(session_factory, 'jsonl', include_retired=True).count(b'\n') == 4
+
+    def test_queries_per_batch_are_constant(self, session_factory, engine, bank):
+        """Each batch costs its options and tags queries, never one per question."""
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        chunks = list(export_questions(session_factory, 'jsonl', export_statement(include_retired=True), 2))
+        assert len(chunks) == 2
+        assert len(statements) == 1 + 2 * 2
+
+    def test_session_lasts_as_long_as_the_stream(self, session_factory, bank):
+        """The export opens its own session once streaming starts and closes it when abandoned."""
+        sessions = []
+
+        def open_session():
+            sessions.append(session_factory())
+            return sessions[-1]
+
+        stream = export_questions(open_session, 'jsonl', export_statement(), 1)
+        assert sessions == []
+        next(stream)
+        assert sessions[0].in_transaction()
+        stream.close()
+        assert not sessions[0].in_transaction()
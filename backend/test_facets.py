@@ -0,0 +1,142 @@
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Base, Option, Question, Tag
+from facets import _bitmap, facet_index, record_question_changes
+
+def add_question(db, question_type, difficulty, tags=()):
+    question = Question(
+        stem=f"{question_type} {difficulty} {len(tags)}",
+        question_type=question_type,
+        correct_answer=[0],
+        difficulty=difficulty,
+        options=[Option(text="A", label="A", order_index=0)],
+        tags=list(tags)
+    )
+    db.add(question)
+    db.commit()
+    return question
+
+@pytest.fixture
+def bank(db):
+    algebra, geometry = Tag(name="algebra"), Tag(name="geometry")
+    add_question(db, 'single', 'easy', [algebra])
+    add_question(db, 'single', 'hard', [algebra, geometry])
+    add_question(db, 'multiple', 'easy', [geometry])
+    add_question(db, 'true_false', 'medium')
+    return algebra, geometry
+
+@pytest.fixture
+def file_db(tmp_path, session_factory):
+    # A file database, so the background rebuild's own connection sees the same data
+    engine = create_engine(f"sqlite:///{tmp_path / 'facets.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def as_dict(counts, key='value'):
+    return {item[key]: item['count'] for item in counts}
+
+class TestFacetIndex:
+
+    def test_bitmap_packs_ids(self):
+        assert _bitmap([1, 3, 64]) == (1 << 1) | (1 << 3) | (1 << 64)
+        assert _bitmap([]) == 0
+
+    def test_counts_without_filters(self, db, bank):
+        facets = facet_index.facets(db)
+        assert facets['total'] == 4
+        assert as_dict(facets['question_types']) == {'single': 2, 'multiple': 1, 'true_false': 1}
+        assert as_dict(facets['difficulties']) == {'easy': 2, 'hard': 1, 'medium': 1}
+        assert as_dict(facets['tags'], 'name') == {'algebra': 2, 'geometry': 2}
+
+    def test_each_facet_ignores_its_own_filter(self, db, bank):
+        """Counts show what each alternative value would give with the other filters."""
+        algebra, geometry = bank
+        facets = facet_index.facets(db, question_type='single', tag_ids=[geometry.id])
+
+        assert facets['total'] == 1
+        assert as_dict(facets['question_types']) == {'single': 1, 'multiple': 1}
+        assert as_dict(facets['difficulties']) == {'hard': 1}
+        assert as_dict(facets['tags'], 'name') == {'algebra': 2, 'geometry': 1}
+
+    def test_any_of_the_tags_matches(self, db, bank):
+        algebra, geometry = bank
+        assert facet_index.facets(db, tag_ids=[algebra.id, geometry.id])['total'] == 3
+        assert facet_index.facets(db, tag_ids=[999])['total'] == 0
+        assert facet_index.facets(db, difficulty='impossible')['total'] == 0
+
+    def test_tag_modes_match_the_question_filters(self, db, bank):
+        algebra, geometry = bank
+        assert facet_index.facets(db, tag_ids=[algebra.id, geometry.id], tag_mode='all')['total'] == 1
+        assert facet_index.facets(db, tag_ids=[algebra.id, geometry.id], tag_mode='none')['total'] == 1
+        assert facet_index.facets(db, tag_ids=[algebra.id], tag_mode='none')['total'] == 2
+
+    def test_committed_writes_are_reloaded_without_a_rebuild(self, db, bank):
+        """Edits, retirements and deletions reach the index through session events."""
+        algebra, geometry = bank
+        facet_index.facets(db)
+        built_at = facet_index.built_at
+
+        first = db.query(Question).order_by(Question.id).first()
+        first.difficulty = 'hard'
+        first.tags = [geometry]
+        db.query(Question).filter(Question.question_type == 'true_false').one().retired = True
+        db.commit()
+        db.delete(db.query(Question).filter(Question.question_type == 'multiple').one())
+        db.commit()
+        add_question(db, 'multiple', 'medium')
+
+        facets = facet_index.facets(db)
+
+        assert facet_index.built_at == built_at
+        assert facet_index._rebuild_thread is None
+        assert facets['total'] == 3
+        assert as_dict(facets['difficulties']) == {'hard': 2, 'medium': 1}
+        assert as_dict(facets['question_types']) == {'single': 2, 'multiple': 1}
+        assert as_dict(facets['tags'], 'name') == {'algebra': 1, 'geometry': 2}
+
+    def test_rolled_back_writes_are_ignored(self, db, bank):
+        facet_index.facets(db)
+        db.query(Question).first().difficulty = 'hard'
+        db.flush()
+        db.rollback()
+        assert not facet_index._stale
+
+    def test_renamed_tag_rebuilds_the_index(self, db, bank):
+        algebra, geometry = bank
+        facet_index.facets(db)
+        algebra.name = 'linear algebra'
+        db.commit()
+        assert facet_index.built_at is None
+        assert 'linear algebra' in as_dict(facet_index.facets(db)['tags'], 'name')
+
+    def test_other_workers_writes_rebuild_in_the_background(self, file_db):
+        """A counted write this process did not make is picked up by a rebuild off the request path."""
+        add_question(file_db, 'single', 'easy')
+        assert facet_index.facets(file_db)['total'] == 1
+        built_at = facet_index.built_at
+
+        # Another worker's write: no session events fire in this process
+        file_db.execute(insert(Question), [{'stem': 'elsewhere', 'question_type': 'multiple',
+                                            'correct_answer': [0], 'difficulty': 'hard'}])
+        record_question_changes(file_db)
+        file_db.commit()
+
+        facet_index.facets(file_db)
+        thread = facet_index._rebuild_thread
+        if thread is not None:  # It may already have finished
+            thread.join()
+
+        facets = facet_index.facets(file_db)
+        assert facet_index.built_at > built_at
+        assert facets['total'] == 2
+        assert as_dict(facets['question_types']) == {'single': 1, 'multiple': 1}
+        assert facet_index._rebuild_thread is None
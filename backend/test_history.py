@@ -0,0 +1,107 @@
+import pytest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import text
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Quiz, QuizAttempt, User
+from history import attempt_summaries, history_summary
+
+def add_attempts(db, user, quiz, attempts):
+    """Record (completed_at, score) pairs as 10-question attempts."""
+    for completed_at, score in attempts:
+        db.add(QuizAttempt(
+            user_id=user.id,
+            quiz_id=quiz.id,
+            selected_answers={},
+            score=score,
+            total_questions=10,
+            correct_answers=int(score / 10),
+            started_at=completed_at - timedelta(minutes=5),
+            completed_at=completed_at
+        ))
+    db.commit()
+
+@pytest.fixture
+def history(db):
+    user = User(email="student@example.com", name="Student")
+    other = User(email="other@example.com", name="Other")
+    quiz = Quiz(title="Weekly quiz", question_ids=[])
+    db.add_all([user, other, quiz])
+    db.commit()
+    # Monday 2026-03-02 is the start of the most recent week
+    monday = datetime(2026, 3, 2, 9, 0)
+    add_attempts(db, user, quiz, [
+        (monday - timedelta(days=1), 40.0),   # Sunday of the previous week
+        (monday, 60.0),
+        (monday + timedelta(hours=2), 80.0),
+        (monday + timedelta(days=6), 100.0),  # Sunday, same week
+    ])
+    add_attempts(db, other, quiz, [(monday, 10.0)])
+    return user, monday
+
+class TestHistorySummary:
+
+    def test_totals_cover_only_the_users_attempts(self, db, history):
+        """Counts, mean and best come from the user's attempts alone."""
+        user, monday = history
+        summary = history_summary(db, user.id, days=3650)
+
+        assert summary['attempts'] == 4
+        assert summary['average_score'] == pytest.approx(70.0)
+        assert summary['best_score'] == 100.0
+        assert (summary['total_questions'], summary['correct_answers']) == (40, 28)
+        assert summary['last_attempt_at'] == monday + timedelta(days=6)
+
+    def test_trend_buckets_by_week_starting_monday(self, db, history):
+        """Sunday belongs to the week that started on the Monday before it."""
+        user, monday = history
+        trend = history_summary(db, user.id, bucket='week', days=3650)['trend']
+
+        assert [point['period_start'] for point in trend] == [
+            str(monday.date() - timedelta(days=7)), str(monday.date())
+        ]
+        assert [point['attempts'] for point in trend] == [1, 3]
+        assert trend[1]['average_score'] == pytest.approx(80.0)
+        assert trend[1]['best_score'] == 100.0
+
+    def test_trend_buckets_by_day(self, db, history):
+        """Daily buckets split the week by calendar day."""
+        user, monday = history
+        trend = history_summary(db, user.id, bucket='day', days=3650)['trend']
+        assert [(point['period_start'], point['attempts']) for point in trend] == [
+            (str(monday.date() - timedelta(days=1)), 1),
+            (str(monday.date()), 2),
+            (str(monday.date() + timedelta(days=6)), 1),
+        ]
+
+    def test_empty_history(self, db):
+        """A user without attempts gets zero totals and an empty trend."""
+        summary = history_summary(db, 42)
+        assert (summary['attempts'], summary['average_score'], summary['trend']) == (0, None, [])
+
+    def test_queries_use_the_user_completed_index(self, db, history):
+        """The per-user history queries are index range scans."""
+        plan = db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT count(id), avg(score) FROM quiz_attempts "
+            "WHERE user_id = 1 AND completed_at >= '2026-01-01'"
+        )).all()
+        assert any('ix_quiz_attempts_user_completed' in row[-1] for row in plan)
+
+class TestAttemptSummaries:
+
+    def test_newest_first_with_quiz_title(self, db, history):
+        """The lean list carries the quiz title instead of the whole quiz."""
+        user, monday = history
+        rows = attempt_summaries(db, user.id, limit=2)
+
+        assert [row.score for row in rows] == [100.0, 80.0]
+        assert rows[0].quiz_title == "Weekly quiz"
+        assert set(rows[0]._fields) == {
+            'id', 'quiz_id', 'quiz_title', 'score', 'total_questions',
+            'correct_answers', 'started_at', 'completed_at'
+        }
+        assert [row.score for row in attempt_summaries(db, user.id, skip=3)] == [40.0]
@@ -0,0 +1,116 @@
+import sys
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Question
+from importer import BulkImporter, finish_import, import_stream
+from conftest import make_parsed
+
+def master_document():
+    return [
+        make_parsed("What is 2 + 2?", ["3", "4"], [1], line_number=1),
+        make_parsed("What is the boiling point of water?", ["90", "100"], [1], line_number=5),
+        make_parsed("Which planet is largest?", ["Mars", "Jupiter"], [1], line_number=9),
+    ]
+
+def import_document(db, parsed_questions, previous=None, retire_removed=False):
+    importer = BulkImporter(db, previous)
+    importer.add(parsed_questions)
+    importer.finish(retire_removed=retire_removed)
+    db.commit()
+    return importer.build_report("course.docx", 0, [])
+
+class TestIncrementalImport:
+
+    def test_first_import_adds_everything(self, db):
+        """Without a previous import every question is added and fingerprinted."""
+        report = import_document(db, master_document())
+
+        assert report.diff['added'] == 3
+        assert len(report.fingerprints) == 3
+        assert [c['change'] for c in report.diff['changes']] == ['added'] * 3
+
+    def test_unchanged_questions_are_left_alone(self, db):
+        """Re-importing the same questions changes nothing."""
+        first = import_document(db, master_document())
+        second = import_document(db, master_document(), first.fingerprints)
+
+        assert second.diff['unchanged'] == 3
+        assert second.diff['changes'] == []
+        assert second.successful_imports == 0
+        assert second.duplicate_imports == 0
+        assert db.query(Question).count() == 3
+
+    def test_edited_question_is_updated_in_place(self, db):
+        """An edited answer updates the existing row instead of inserting one."""
+        first = import_document(db, master_document())
+        edited = master_document()
+        edited[0] = make_parsed("What is 2 + 2?", ["3", "4", "5"], [1], explanation="Basic sums")
+        second = import_document(db, edited, first.fingerprints)
+
+        assert second.diff['updated'] == 1
+        assert second.diff['unchanged'] == 2
+        change = second.diff['changes'][0]
+        assert change['change'] == 'updated'
+        assert change['question_id'] == first.fingerprints[next(iter(first.fingerprints))]['question_id']
+
+        question = db.query(Question).get(change['question_id'])
+        assert [o.text for o in question.options] == ["3", "4", "5"]
+        assert question.explanation == "Basic sums"
+        assert db.query(Question).count() == 3
+
+    def test_new_and_removed_questions(self, db):
+        """Removed questions are reported, and only retired when requested."""
+        first = import_document(db, master_document())
+        changed = master_document()[:2] + [make_parsed("Who painted the Mona Lisa?", ["Da Vinci", "Monet"], [0])]
+
+        second = import_document(db, changed, first.fingerprints)
+        assert second.diff['added'] == 1
+        assert second.diff['removed'] == 1
+        assert second.diff['retired'] == 0
+        assert db.query(Question).filter(Question.retired == True).count() == 0
+
+        third = import_document(db, changed[:2], second.fingerprints, retire_removed=True)
+        assert third.diff['retired'] == 1
+        retired = db.query(Question).filter(Question.retired == True).one()
+        assert retired.stem == "Who painted the Mona Lisa?"
+
+    def test_restored_question_is_unretired(self, db):
+        """A retired question that reappears in the document is restored."""
+        first = import_document(db, master_document())
+        second = import_document(db, master_document()[:2], first.fingerprints, retire_removed=True)
+        third = import_document(db, master_document(), first.fingerprints)
+
+        assert second.diff['retired'] == 1
+        assert third.diff['updated'] == 1
+        assert db.query(Question).filter(Question.retired == True).count() == 0
+
+class TestStreamingImport:
+
+    def test_chunks_are_committed_as_they_arrive(self, db):
+        """Each full chunk is committed before the rest of the stream is read."""
+        commits = []
+        event.listen(db, "after_commit", lambda session: commits.append(1))
+        stored_counts = []
+
+        def stream():
+            for i, parsed_q in enumerate(master_document() + [make_parsed("Is 1 odd?", ["Yes", "No"], [0])]):
+                stored_counts.append(db.query(Question).count())
+                yield parsed_q
+                if i == 1:
+                    yield {'line_number': 7, 'content': '3. Broken', 'error': 'Missing correct answer'}
+
+        importer = BulkImporter(db)
+        errors = import_stream(importer, stream(), chunk_size=2)
+        report = finish_import(importer, "course.docx", 20, errors)
+        db.commit()
+
+        assert stored_counts == [0, 0, 2, 2]
+        assert len(commits) == 3
+        assert errors == [{'line_number': 7, 'content': '3. Broken', 'error': 'Missing correct answer'}]
+        assert report.successful_imports == 4
+        assert report.failed_imports == 1
+        assert len(report.fingerprints) == 4
@@ -2,7 +2,9 @@ import pytest
 import tempfile
 import os
 import json
+import re
 import sys
+import uuid
 from pathlib import Path
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
@@ -11,9 +13,12 @@ from sqlalchemy.orm import sessionmaker
 # Add parent directory to path for imports
 sys.path.append(str(Path(__file__).parent.parent))
 
-from main import app
-from models import Base, get_db, User, Question, Option
+from main import app, create_access_token, profile_store
+from models import Base, get_db, User, Question, Option, Quiz, QuizAttempt, AttemptAnswer, Tag
 from docx_parser import create_sample_docx
+from query_recorder import QueryRecorder
+from server_timing import time_queries
+import rescoring
 
 # Test database setup
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -29,11 +34,33 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+# The test client runs rescoring jobs inline, so they don't wait for late submissions
+rescoring.STALE_RECHECK_SECONDS = 0
+
 # Create test database
 Base.metadata.create_all(bind=engine)
 
 client = TestClient(app)
 
+def create_test_user(db, **kwargs):
+    """Create a user with a unique email and return it with auth headers."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    user = User(email=email, name="Test User", google_id=uuid.uuid4().hex, **kwargs)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user, {"Authorization": f"Bearer {create_access_token(data={'sub': email})}"}
+
+def attempt_payload(quiz_id, selected_answers):
+    """Build a quiz submission; the server computes the score fields itself."""
+    return {
+        'quiz_id': quiz_id,
+        'selected_answers': selected_answers,
+        'score': 0,
+        'total_questions': 0,
+        'correct_answers': 0
+    }
+
 class TestIntegration:
     
     def test_full_quiz_flow(self):
@@ -246,5 +273,536 @@ class TestIntegration:
         
         db.close()
 
+    def test_reupload_skips_duplicate_questions(self):
+        """Uploading the same questions again does not duplicate the bank."""
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        marker = uuid.uuid4().hex
+        questions_data = [
+            {
+                'stem': f'Which gas do plants absorb? ({marker})',
+                'options': ['Oxygen', 'Carbon dioxide', 'Nitrogen'],
+                'correct_answer': [1],
+                'question_type': 'single'
+            },
+            {
+                'stem': f'Water boils at 100 degrees Celsius at sea level. ({marker})',
+                'options': ['True', 'False'],
+                'correct_answer': [0],
+                'question_type': 'true_false'
+            }
+        ]
+        
+        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
+            create_sample_docx(tmp.name, questions_data)
+            tmp_file_path = tmp.name
+        
+        try:
+            reports = []
+            for filename in ["dedup.docx", "dedup-copy.docx", "dedup.docx"]:
+                with open(tmp_file_path, 'rb') as f:
+                    response = client.post(
+                        "/api/upload-docx",
+                        files={"file": (filename, f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
+                        headers=headers
+                    )
+                assert response.status_code == 200
+                reports.append(response.json())
+            
+            assert reports[0]['successful_imports'] == 2
+            assert reports[0]['duplicate_imports'] == 0
+            assert reports[1]['successful_imports'] == 0
+            assert reports[1]['duplicate_imports'] == 2
+            assert all(d['exact'] for d in reports[1]['duplicates'])
+            
+            # Same document again: short-circuits on the file hash
+            assert reports[2]['diff']['file_unchanged'] is True
+            assert reports[2]['diff']['unchanged'] == 2
+            assert reports[2]['file_hash'] == reports[0]['file_hash']
+            
+            stored = db.query(Question).filter(Question.stem.contains(marker)).count()
+            assert stored == 2
+        finally:
+            os.unlink(tmp_file_path)
+            db.close()
+
+    def test_batch_upload_zip(self):
+        """A zip of documents is imported with one report per file."""
+        import io
+        import zipfile
+        
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        marker = uuid.uuid4().hex
+        archive = io.BytesIO()
+        
+        try:
+            with zipfile.ZipFile(archive, 'w') as zf:
+                for i in range(3):
+                    with tempfile.NamedTemporaryFile(suffix='.docx') as tmp:
+                        create_sample_docx(tmp.name, [{
+                            'stem': f'Batch question {i} ({marker})',
+                            'options': ['Yes', 'No'],
+                            'correct_answer': [0],
+                            'question_type': 'single'
+                        }])
+                        zf.write(tmp.name, f'course/week{i}.docx')
+            
+            response = client.post(
+                "/api/upload-docx/batch",
+                files=[("files", ("semester.zip", archive.getvalue(), "application/zip"))],
+                headers=headers
+            )
+            assert response.status_code == 200
+            summary = response.json()
+            assert summary['total_files'] == 3
+            assert summary['successful_imports'] == 3
+            assert [r['filename'] for r in summary['reports']] == [f'course/week{i}.docx' for i in range(3)]
+            
+            # Re-uploading the same archive finds every file unchanged
+            response = client.post(
+                "/api/upload-docx/batch",
+                files=[("files", ("semester.zip", archive.getvalue(), "application/zip"))],
+                headers=headers
+            )
+            assert response.json()['unchanged_files'] == 3
+            assert db.query(Question).filter(Question.stem.contains(marker)).count() == 3
+        finally:
+            db.close()
+
+    def test_attempt_is_regraded_after_answer_change(self):
+        """Editing a question's answer changes how later attempts are graded."""
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        marker = uuid.uuid4().hex
+        
+        try:
+            question_ids = []
+            for i in range(2):
+                response = client.post("/api/questions", json={
+                    'stem': f'Answer-key question {i} ({marker})',
+                    'question_type': 'single',
+                    'correct_answer': [0],
+                    'options': [
+                        {'text': 'Yes', 'label': 'A', 'order_index': 0},
+                        {'text': 'No', 'label': 'B', 'order_index': 1}
+                    ]
+                }, headers=headers)
+                assert response.status_code == 200
+                question_ids.append(response.json()['id'])
+            
+            quiz = Quiz(title="Answer key quiz", question_ids=question_ids, created_by=user.id)
+            db.add(quiz)
+            db.commit()
+            
+            selected = {str(question_ids[0]): [0], str(question_ids[1]): [1]}
+            response = client.post(f"/api/quizzes/{quiz.id}/attempt",
+                                   json=attempt_payload(quiz.id, selected), headers=headers)
+            assert response.status_code == 200
+            assert response.json()['correct_answers'] == 1
+            assert response.json()['score'] == 50.0
+            first_attempt_id = response.json()['id']
+            
+            answers = db.query(AttemptAnswer).filter(AttemptAnswer.attempt_id == response.json()['id']).all()
+            assert sorted((a.question_id, a.is_correct) for a in answers) == [
+                (question_ids[0], True), (question_ids[1], False)
+            ]
+            
+            response = client.put(f"/api/questions/{question_ids[1]}", json={
+                'stem': f'Answer-key question 1 ({marker})',
+                'question_type': 'single',
+                'correct_answer': [1],
+                'options': [
+                    {'text': 'Yes', 'label': 'A', 'order_index': 0},
+                    {'text': 'No', 'label': 'B', 'order_index': 1}
+                ]
+            }, headers=headers)
+            assert response.status_code == 200
+            
+            response = client.post(f"/api/quizzes/{quiz.id}/attempt",
+                                   json=attempt_payload(quiz.id, selected), headers=headers)
+            assert response.json()['correct_answers'] == 2
+            assert response.json()['score'] == 100.0
+            
+            # The answer change queued a job that regraded the first attempt
+            response = client.get("/api/rescore-jobs", params={'question_id': question_ids[1]}, headers=headers)
+            job = response.json()[0]
+            assert job['status'] == 'completed'
+            assert job['changed_attempts'] == 1
+            first_attempt = db.query(QuizAttempt).filter(QuizAttempt.id == first_attempt_id).one()
+            assert (first_attempt.correct_answers, first_attempt.score) == (2, 100.0)
+            
+            response = client.get(f"/api/questions/{question_ids[1]}/stats")
+            assert response.status_code == 200
+            stats = response.json()
+            assert stats['responses'] == 2
+            assert stats['correct'] == 2  # Including the rescored first attempt
+            assert stats['options'] == [{'option_index': 1, 'selected_count': 2}]
+            
+            response = client.get("/api/questions/stats",
+                                  params={'question_ids': [question_ids[1], question_ids[0]]})
+            assert [s['question_id'] for s in response.json()] == [question_ids[1], question_ids[0]]
+            assert response.json()[1]['p_value'] == 1.0
+            
+            assert client.get("/api/questions/999999999/stats").status_code == 404
+            
+            response = client.get("/api/history/summary", params={'bucket': 'day'}, headers=headers)
+            assert response.status_code == 200
+            summary = response.json()
+            assert (summary['attempts'], summary['best_score']) == (2, 100.0)
+            assert summary['trend'][-1]['attempts'] == 2
+            assert client.get("/api/history/summary", params={'bucket': 'month'},
+                              headers=headers).status_code == 400
+            
+            response = client.get("/api/history/attempts", headers=headers)
+            assert [a['quiz_title'] for a in response.json()] == ["Answer key quiz"] * 2
+            assert 'quiz' not in response.json()[0]
+            
+            response = client.get("/api/history", params={'fields': 'score', 'include': 'quiz'}, headers=headers)
+            assert response.json()[0].keys() == {'id', 'score', 'quiz'}
+            assert response.json()[0]['quiz']['title'] == "Answer key quiz"
+            response = client.get("/api/questions", params={'fields': 'stem,difficulty', 'include': 'options'})
+            assert response.status_code == 200
+            assert all(q.keys() == {'id', 'stem', 'difficulty', 'options'} for q in response.json())
+            response = client.get("/api/quizzes", params={'fields': 'title'})
+            assert all(q.keys() == {'id', 'title'} for q in response.json())
+            assert client.get("/api/questions", params={'fields': 'content_hash'}).status_code == 400
+            
+            response = client.get("/api/questions/facets", params={'question_type': 'single', 'count': 2})
+            assert response.json()['total'] >= 2
+            assert response.json()['enough'] is True
+            assert response.json()['question_types'][0]['count'] >= 2
+            response = client.get("/api/questions/facets", params={'difficulty': 'impossible', 'count': 1})
+            assert (response.json()['total'], response.json()['enough']) == (0, False)
+            response = client.post("/api/quizzes/generate", json={'difficulty': 'impossible', 'count': 1},
+                                   headers=headers)
+            assert response.status_code == 400
+            assert response.json()['detail'] == "Not enough questions matching criteria (0 available)"
+            
+            response = client.post("/api/questions", json={
+                'stem': f'Tagged question ({marker})',
+                'question_type': 'true_false',
+                'correct_answer': [0],
+                'options': [
+                    {'text': 'True', 'label': 'A', 'order_index': 0},
+                    {'text': 'False', 'label': 'B', 'order_index': 1}
+                ],
+                'tags': [f'red-{marker}', f'blue-{marker}']
+            }, headers=headers)
+            tagged_id = response.json()['id']
+            tags = [f'red-{marker}', f'blue-{marker}']
+            for mode in ('any', 'all'):
+                response = client.get("/api/questions", params={'tag': tags, 'tag_mode': mode, 'fields': 'id'})
+                assert response.json() == [{'id': tagged_id}]
+            response = client.get("/api/questions", params={
+                'tag': tags, 'tag_mode': 'none', 'fields': 'id', 'limit': 100000
+            })
+            assert {'id': tagged_id} not in response.json()
+            assert client.get("/api/questions", params={'tag_mode': 'some'}).status_code == 400
+            
+            response = client.post("/api/quizzes/999999999/attempt",
+                                   json=attempt_payload(999999999, {}), headers=headers)
+            assert response.status_code == 404
+        finally:
+            db.close()
+
+    def test_parallel_forms(self):
+        """Forms are generated together, in one request, without sharing questions."""
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        tag = f'forms-{uuid.uuid4().hex}'
+        
+        try:
+            for i in range(6):
+                response = client.post("/api/questions", json={
+                    'stem': f'Form question {i} ({tag})',
+                    'question_type': 'single',
+                    'correct_answer': [0],
+                    'difficulty': 'easy' if i % 2 else 'hard',
+                    'options': [
+                        {'text': 'Yes', 'label': 'A', 'order_index': 0},
+                        {'text': 'No', 'label': 'B', 'order_index': 1}
+                    ],
+                    'tags': [tag]
+                }, headers=headers)
+                assert response.status_code == 200
+            tag_id = db.query(Tag).filter(Tag.name == tag).one().id
+            
+            response = client.post("/api/quizzes/generate-forms", json={
+                'forms': 3, 'count': 2, 'tag_ids': [tag_id], 'max_shared_questions': 0, 'seed': 1
+            }, headers=headers)
+            assert response.status_code == 200
+            result = response.json()
+            assert [quiz['title'] for quiz in result['quizzes']] == [
+                'Quiz - General - Form 1', 'Quiz - General - Form 2', 'Quiz - General - Form 3'
+            ]
+            assert (result['strata'], result['max_question_uses'], result['max_shared_questions']) == (2, 1, 0)
+            for quiz in result['quizzes']:
+                difficulties = {db.get(Question, qid).difficulty for qid in quiz['question_ids']}
+                assert difficulties == {'easy', 'hard'}
+            
+            # Each form is served from its snapshot, compressed and without answers
+            quiz_id = result['quizzes'][0]['id']
+            response = client.get(f"/api/quizzes/{quiz_id}/snapshot")
+            assert response.headers['content-encoding'] == 'gzip'
+            paper = response.json()
+            assert [q['id'] for q in paper['questions']] == result['quizzes'][0]['question_ids']
+            assert 'correct_answer' not in paper['questions'][0]
+            for refused in ('identity', 'gzip;q=0, identity', 'br, *;q=0'):
+                response = client.get(f"/api/quizzes/{quiz_id}/snapshot", headers={'Accept-Encoding': refused})
+                assert 'content-encoding' not in response.headers
+                assert response.json() == paper
+            response = client.get(f"/api/quizzes/{quiz_id}/snapshot", headers={'Accept-Encoding': 'br;q=1, GZIP;q=0.5'})
+            assert response.headers['content-encoding'] == 'gzip'
+            assert client.get("/api/quizzes/999999999/snapshot").status_code == 404
+            
+            response = client.post(f"/api/quizzes/{quiz_id}/attempt", json=attempt_payload(
+                quiz_id, {str(q['id']): [0] for q in paper['questions']}
+            ), headers=headers)
+            assert response.json()['correct_answers'] == 2
+            
+            response = client.post("/api/quizzes/generate-forms", json={
+                'forms': 3, 'count': 4, 'tag_ids': [tag_id], 'max_shared_questions': 0
+            }, headers=headers)
+            assert response.status_code == 400
+            assert "(6 available)" in response.json()['detail']
+            
+            response = client.post("/api/quizzes/generate-forms", json={'forms': 0}, headers=headers)
+            assert response.status_code == 400
+            
+            response = client.get("/api/questions/export", params={'format': 'csv', 'tag': tag}, headers=headers)
+            assert response.headers['content-disposition'] == 'attachment; filename="questions.csv"'
+            assert len(response.text.splitlines()) == 1 + 6
+            response = client.get("/api/questions/export", params={'tag': tag}, headers=headers)
+            assert [json.loads(line)['tags'] for line in response.text.splitlines()] == [[tag]] * 6
+            assert client.get("/api/questions/export", params={'format': 'xml'}, headers=headers).status_code == 400
+        finally:
+            db.close()
+
+    def test_structured_upload(self):
+        """JSONL uploads are imported through the bulk path and re-uploads are detected."""
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        tag = f'jsonl-{uuid.uuid4().hex}'
+        rows = [
+            {'stem': f'Structured question {i} ({tag})', 'options': ['Yes', 'No'],
+             'correct_answer': [i % 2], 'tags': [tag]}
+            for i in range(3)
+        ] + [{'stem': f'Broken ({tag})', 'options': ['Yes'], 'correct_answer': [3]}]
+        content = ''.join(json.dumps(row) + '\n' for row in rows).encode('utf-8')
+
+        try:
+            reports = []
+            for _ in range(2):
+                response = client.post(
+                    "/api/upload-questions",
+                    files={"file": (f"{tag}.jsonl", content, "application/x-ndjson")},
+                    headers=headers
+                )
+                assert response.status_code == 200
+                reports.append(response.json())
+
+            assert reports[0]['successful_imports'] == 3
+            assert reports[0]['failed_imports'] == 1
+            assert reports[0]['errors'] == [{
+                'line_number': 4, 'content': json.dumps(rows[3]),
+                'error': 'Correct answer index 3 exceeds options count'
+            }]
+            assert reports[1]['diff']['file_unchanged']
+            assert len(db.query(Tag).filter(Tag.name == tag).one().questions) == 3
+
+            response = client.post(
+                "/api/upload-questions",
+                files={"file": ("bank.xml", b"<questions/>", "application/xml")},
+                headers=headers
+            )
+            assert response.status_code == 400
+            response = client.post(
+                "/api/upload-questions",
+                files={"file": ("bank.csv", b"stem\n\xff\n", "text/csv")},
+                headers=headers
+            )
+            assert response.status_code == 400
+        finally:
+            db.close()
+
+    def test_reimported_answer_change_rescores_attempts(self):
+        """A re-upload that changes a correct answer regrades the attempts that included it."""
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        tag = f'reimport-{uuid.uuid4().hex}'
+
+        def upload(answers):
+            content = ''.join(json.dumps({
+                'stem': f'Reimported question {i} ({tag})', 'options': ['Yes', 'No'],
+                'correct_answer': answer, 'tags': [tag]
+            }) + '\n' for i, answer in enumerate(answers)).encode('utf-8')
+            response = client.post("/api/upload-questions", headers=headers,
+                                   files={"file": (f"{tag}.jsonl", content, "application/x-ndjson")})
+            assert response.status_code == 200
+            return response.json()
+
+        try:
+            upload([[0], [0]])
+            tag_id = db.query(Tag).filter(Tag.name == tag).one().id
+            quiz = client.post("/api/quizzes/generate", headers=headers,
+                               json={'count': 2, 'tag_ids': [tag_id]}).json()
+            response = client.post(f"/api/quizzes/{quiz['id']}/attempt", headers=headers,
+                                   json=attempt_payload(quiz['id'], {str(qid): [1] for qid in quiz['question_ids']}))
+            attempt_id = response.json()['id']
+            assert response.json()['correct_answers'] == 0
+
+            report = upload([[1], [0]])
+            assert report['diff']['updated'] == 1
+            changed_id = report['diff']['changes'][0]['question_id']
+
+            jobs = client.get("/api/rescore-jobs", params={'question_id': changed_id}, headers=headers).json()
+            assert [(job['status'], job['changed_attempts']) for job in jobs] == [('completed', 1)]
+            attempt = db.query(QuizAttempt).filter(QuizAttempt.id == attempt_id).one()
+            assert (attempt.correct_answers, attempt.score) == (1, 50.0)
+            assert db.query(AttemptAnswer).filter(
+                AttemptAnswer.attempt_id == attempt_id, AttemptAnswer.question_id == changed_id
+            ).one().is_correct
+        finally:
+            db.close()
+
+    def test_metrics(self):
+        """Requests, imports and cache lookups show up in the Prometheus metrics."""
+        client.get("/api/tags")
+        content = '{"stem": "Metrics question", "options": ["Yes", "No"], "correct_answer": [0]}\n'
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        db.close()
+        client.post("/api/upload-questions", headers=headers,
+                    files={"file": (f"{uuid.uuid4().hex}.jsonl", content.encode('utf-8'), "application/x-ndjson")})
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+        lines = response.text.splitlines()
+        assert any(line.startswith('questionbank_http_request_duration_seconds_count{'
+                                   'method="GET",route="/api/tags",status="200"}') for line in lines)
+        assert any(line.startswith('questionbank_import_duration_seconds_count{format="jsonl"}') for line in lines)
+        assert 'questionbank_cache_requests_total{cache="answer_keys",result="hit"}' in response.text
+        assert 'questionbank_parse_queue_depth' in response.text
+
+    def test_server_timing(self):
+        """Responses break their time down into auth, SQL and serialization."""
+        time_queries(engine)
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db)
+        db.close()
+
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.status_code == 200
+        names = [entry.split(';')[0] for entry in response.headers['server-timing'].split(', ')]
+        assert names == ['auth', 'db', 'serialize', 'total']
+        assert ';desc="1 query"' in response.headers['server-timing']
+
+    def test_request_profiles(self, tmp_path, monkeypatch):
+        """Admins can profile a request and download it; other users cannot."""
+        monkeypatch.setattr(profile_store, 'directory', tmp_path)
+        db = TestingSessionLocal()
+        admin, admin_headers = create_test_user(db, is_admin=True)
+        student, student_headers = create_test_user(db)
+        db.close()
+
+        response = client.get("/api/history", headers={**admin_headers, 'X-Profile': '1'})
+        assert response.status_code == 200
+        name = response.headers['x-profile-id']
+        assert '-GET-api_history-' in name
+        assert 'x-profile-id' not in client.get("/api/auth/me", headers={**student_headers, 'X-Profile': '1'}).headers
+
+        profiles = client.get("/api/profiles", headers=admin_headers).json()
+        assert [profile['name'] for profile in profiles] == [name]
+        download = client.get(f"/api/profiles/{name}", headers=admin_headers)
+        assert download.status_code == 200
+        assert download.headers['content-type'].startswith('text/plain')
+        assert all(re.match(r'^\S+ \d+$', line) for line in download.text.splitlines())
+        assert client.get("/api/profiles/missing.folded", headers=admin_headers).status_code == 404
+        assert client.get("/api/profiles", headers=student_headers).status_code == 403
+
+class TestQueryBudgets:
+    """Endpoints run a fixed number of queries, however many rows they return."""
+
+    @pytest.fixture(scope="class")
+    def bank(self):
+        db = TestingSessionLocal()
+        user, headers = create_test_user(db, is_admin=True)
+        tag = f'budget-{uuid.uuid4().hex}'
+        question_ids = [
+            client.post("/api/questions", headers=headers, json=question_data(
+                f"Budget question {i} ({tag})", tags=[tag, f"{tag}-{i}"]
+            )).json()['id']
+            for i in range(6)
+        ]
+        tag_id = db.query(Tag).filter(Tag.name == tag).one().id
+        quiz = client.post("/api/quizzes/generate", headers=headers, json={'count': 6, 'tag_ids': [tag_id]}).json()
+        for _ in range(3):
+            client.post(f"/api/quizzes/{quiz['id']}/attempt", headers=headers,
+                        json=attempt_payload(quiz['id'], {str(qid): [0] for qid in quiz['question_ids']}))
+        db.close()
+        return {'headers': headers, 'tag': tag, 'question_ids': question_ids, 'quiz': quiz}
+
+    def test_create_question(self, bank):
+        """Tags are looked up and created together, not one query per tag.
+
+        The question repeats a bank question with another answer, so it always
+        has a near-duplicate candidate whose signature is loaded. The write is
+        also counted for the other workers' facet indexes.
+        """
+        tag = bank['tag']
+        data = question_data(f"Budget question 0 ({tag})", tags=[tag, f"{tag}-x", f"{tag}-y", f"{tag}-x"])
+        data['correct_answer'] = [1]
+        with QueryRecorder(engine, max_queries=17) as recorder:
+            response = client.post("/api/questions", headers=bank['headers'], json=data)
+        assert response.status_code == 200
+        assert recorder.count == 17
+
+    def test_list_questions(self, bank):
+        with QueryRecorder(engine, max_queries=2):
+            response = client.get("/api/questions", params={'tag': bank['tag']})
+        assert len(response.json()) >= 6
+        assert all(question['options'] for question in response.json())
+
+        with QueryRecorder(engine, max_queries=3):
+            response = client.get("/api/questions", params={
+                'tag': bank['tag'], 'fields': 'id,stem', 'include': 'options,tags'})
+        assert len(response.json()) >= 6
+
+    def test_question_and_quiz(self, bank):
+        with QueryRecorder(engine, max_queries=2):
+            assert client.get(f"/api/questions/{bank['question_ids'][0]}").status_code == 200
+        with QueryRecorder(engine, max_queries=1):
+            assert client.get(f"/api/quizzes/{bank['quiz']['id']}").status_code == 200
+        with QueryRecorder(engine, max_queries=2):
+            response = client.get("/api/questions/stats", params={'question_ids': bank['question_ids']})
+        assert len(response.json()) == 6
+
+    def test_submit_attempt(self, bank):
+        quiz = bank['quiz']
+        with QueryRecorder(engine, max_queries=10):
+            response = client.post(f"/api/quizzes/{quiz['id']}/attempt", headers=bank['headers'],
+                                   json=attempt_payload(quiz['id'], {str(qid): [1] for qid in quiz['question_ids']}))
+        assert response.status_code == 200
+
+    def test_history(self, bank):
+        with QueryRecorder(engine, max_queries=3):
+            response = client.get("/api/history", headers=bank['headers'])
+        assert len(response.json()) >= 3
+        with QueryRecorder(engine, max_queries=2):
+            assert client.get("/api/history/attempts", headers=bank['headers']).status_code == 200
+
+def question_data(stem, tags=()):
+    return {
+        'stem': stem,
+        'question_type': 'single',
+        'correct_answer': [0],
+        'difficulty': 'easy',
+        'options': [{'text': 'Yes', 'label': 'A', 'order_index': 0},
+                    {'text': 'No', 'label': 'B', 'order_index': 1}],
+        'tags': list(tags),
+    }
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file
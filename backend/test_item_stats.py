@@ -0,0 +1,105 @@
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import QuestionStats, QuizAttempt
+from answer_keys import answer_key_cache
+from attempt_answers import record_attempt_answers
+from item_stats import get_question_stats, point_biserial, recompute_item_stats, record_item_stats
+from conftest import make_quiz
+
+def submit(db, user, quiz, selected_answers):
+    """Grade and record an attempt the way submit_quiz_attempt does."""
+    answer_key = answer_key_cache.get(db, quiz.id)
+    graded = answer_key.grade(selected_answers)
+    correct = sum(1 for _, _, is_correct in graded if is_correct)
+    attempt = QuizAttempt(
+        user_id=user.id,
+        quiz_id=quiz.id,
+        selected_answers=selected_answers,
+        score=correct / len(graded) * 100,
+        total_questions=len(graded),
+        correct_answers=correct,
+        completed_at=datetime.utcnow()
+    )
+    db.add(attempt)
+    db.flush()
+    record_attempt_answers(db, attempt, graded)
+    record_item_stats(db, graded, correct / len(graded))
+    db.commit()
+    return correct / len(graded)
+
+class TestItemStats:
+
+    def test_running_statistics(self, db):
+        """p-value, point-biserial and option counts follow each submission."""
+        user, quiz, questions = make_quiz(db, [[0], [1], [2]])
+        q0, q1, q2 = (q.id for q in questions)
+        responses = [
+            {q0: [0], q1: [1], q2: [2]},
+            {q0: [0], q1: [1], q2: [0]},
+            {q0: [0], q1: [3], q2: [0]},
+            {q0: [1], q1: [3]},
+        ]
+        scores = [submit(db, user, quiz, selected) for selected in responses]
+
+        stats = get_question_stats(db, [q0, q2])
+        assert stats[0]['responses'] == 4
+        assert stats[0]['correct'] == 3
+        assert stats[0]['p_value'] == 0.75
+        item_scores = [1, 1, 1, 0]
+        assert stats[0]['point_biserial'] == pytest.approx(np.corrcoef(item_scores, scores)[0, 1])
+        assert stats[0]['options'] == [
+            {'option_index': 0, 'selected_count': 3},
+            {'option_index': 1, 'selected_count': 1},
+        ]
+        assert stats[1]['answered'] == 3
+        assert stats[1]['options'] == [
+            {'option_index': 0, 'selected_count': 2},
+            {'option_index': 2, 'selected_count': 1},
+        ]
+
+    def test_question_without_responses(self, db):
+        """A question nobody has answered has empty statistics."""
+        _, _, questions = make_quiz(db, [[0]])
+        stats = get_question_stats(db, [questions[0].id])[0]
+        assert stats['responses'] == 0
+        assert stats['p_value'] is None
+        assert stats['point_biserial'] is None
+
+    def test_point_biserial_undefined_without_variance(self):
+        """Discrimination is undefined when every response scored the same."""
+        assert point_biserial(3, 3, 2.0, 1.5, 2.0) is None
+        assert point_biserial(2, 1, 1.0, 0.5, 0.5) is None
+        assert point_biserial(1, 1, 1.0, 1.0, 1.0) is None
+
+    def test_recompute_verifies_and_repairs(self, db):
+        """The NumPy recompute matches the running sums and repairs drift."""
+        user, quiz, questions = make_quiz(db, [[0], [1], [2]])
+        for i in range(6):
+            submit(db, user, quiz, {questions[0].id: [i % 2], questions[1].id: [1, i % 4], questions[2].id: [2]})
+
+        result = recompute_item_stats(db, chunk_size=4)
+        assert result['attempt_answers'] == 18
+        assert result['questions'] == 3
+        assert result['mismatched'] == []
+
+        before = get_question_stats(db, [q.id for q in questions])
+        db.query(QuestionStats).filter(QuestionStats.question_id == questions[1].id).update({'correct': 0})
+        db.commit()
+        assert recompute_item_stats(db)['mismatched'] == [questions[1].id]
+
+        result = recompute_item_stats(db, repair=True)
+        assert result['repaired'] is True
+        assert recompute_item_stats(db)['mismatched'] == []
+        after = get_question_stats(db, [q.id for q in questions])
+        for expected, actual in zip(before, after):
+            assert actual['correct'] == expected['correct']
+            assert actual['options'] == expected['options']
+            assert actual['point_biserial'] == pytest.approx(expected['point_biserial'])
@@ -0,0 +1,92 @@
+import pytest
+import sys
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from metrics import (
+    Counter,
+    Histogram,
+    MetricsMiddleware,
+    instrument_engine,
+    render_metrics,
+    statement_operation,
+)
+
+def sample(name, **labels):
+    """The value of one series in the rendered output, or None."""
+    selector = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    prefix = f"{name}{{{selector}}} " if labels else f"{name} "
+    for line in render_metrics().splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix):])
+    return None
+
+class TestRendering:
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_histogram_seconds', 'Test histogram.', ('kind',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, 'a')
+
+        assert sample('test_histogram_seconds_bucket', kind='a', le='0.1') == 2
+        assert sample('test_histogram_seconds_bucket', kind='a', le='1.0') == 3
+        assert sample('test_histogram_seconds_bucket', kind='a', le='+Inf') == 4
+        assert sample('test_histogram_seconds_count', kind='a') == 4
+        assert sample('test_histogram_seconds_sum', kind='a') == pytest.approx(3.65)
+        assert "# TYPE test_histogram_seconds histogram" in render_metrics()
+
+    def test_label_values_are_escaped(self):
+        counter = Counter('test_escaped_total', 'Test counter.', ('path',))
+        counter.inc('a"b\\c\nd', amount=2)
+        assert 'test_escaped_total{path="a\\"b\\\\c\\nd"} 2' in render_metrics()
+
+    def test_statement_operation(self):
+        assert statement_operation("SELECT questions.id FROM questions") == 'select'
+        assert statement_operation("INSERT INTO tags (name) VALUES (?)") == 'insert'
+        assert statement_operation("PRAGMA table_info(users)") == 'other'
+
+class TestInstrumentation:
+    def test_requests_are_labelled_by_route_template(self):
+        app = FastAPI()
+
+        @app.get("/api/things/{thing_id}")
+        async def get_thing(thing_id: int):
+            return {'id': thing_id}
+
+        app.add_middleware(MetricsMiddleware)
+        client = TestClient(app)
+        labels = {'method': 'GET', 'route': '/api/things/{thing_id}', 'status': '200'}
+        before = sample('questionbank_http_request_duration_seconds_count', **labels) or 0
+
+        for thing_id in (1, 2, 3):
+            assert client.get(f"/api/things/{thing_id}").status_code == 200
+        client.get("/no/such/path")
+
+        assert sample('questionbank_http_request_duration_seconds_count', **labels) == before + 3
+        assert sample('questionbank_http_request_duration_seconds_count',
+                      method='GET', route='unmatched', status='404') >= 1
+        assert 'route="/api/things/1"' not in render_metrics()
+        assert sample('questionbank_http_requests_in_flight') == 0
+
+    def test_queries_and_pool_waits_are_timed(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+        instrument_engine(engine)
+        instrument_engine(engine)  # A second call does not count twice
+        before = sample('questionbank_db_query_duration_seconds_count', operation='select') or 0
+        waits = sample('questionbank_db_pool_wait_seconds_count') or 0
+
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+            with pytest.raises(Exception):
+                conn.execute(text("SELECT * FROM missing_table"))
+
+        assert sample('questionbank_db_query_duration_seconds_count', operation='select') == before + 2
+        assert sample('questionbank_db_query_errors_total', operation='select') >= 1
+        assert sample('questionbank_db_pool_wait_seconds_count') == waits + 1
+        assert sample('questionbank_db_pool_connections', state='checked_out') == 0
+        engine.dispose()
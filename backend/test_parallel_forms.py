@@ -0,0 +1,84 @@
+import pytest
+import sys
+import numpy as np
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Question, Tag
+from parallel_forms import assign_forms, load_candidates, overlap_stats
+
+def pool(sizes):
+    """Question IDs numbered from 1 and a stratum per question."""
+    strata = np.repeat(np.arange(len(sizes)), sizes)
+    return np.arange(1, len(strata) + 1), strata
+
+class TestAssignForms:
+
+    def test_forms_are_full_and_without_repeats(self):
+        ids, strata = pool([30, 20, 10])
+        forms = assign_forms(ids, strata, forms=20, count=12, rng=np.random.default_rng(1))
+        assert forms.shape == (20, 12)
+        assert all(len(set(form)) == 12 for form in forms.tolist())
+
+    def test_strata_are_balanced_across_forms(self):
+        """Each form draws from every stratum in proportion to its size."""
+        ids, strata = pool([30, 20, 10])
+        stratum_of = dict(zip(ids.tolist(), strata.tolist()))
+        forms = assign_forms(ids, strata, forms=20, count=12, rng=np.random.default_rng(2))
+
+        per_form = np.array([np.bincount([stratum_of[q] for q in form], minlength=3) for form in forms.tolist()])
+        assert (per_form.max(axis=0) - per_form.min(axis=0) <= 1).all()
+        assert per_form.sum(axis=0).tolist() == [120, 80, 40]
+
+    def test_questions_are_used_evenly(self):
+        """Reuse is spread over a stratum, which keeps pairwise overlap low."""
+        ids, strata = pool([30, 20, 10])
+        forms = assign_forms(ids, strata, forms=20, count=12, rng=np.random.default_rng(3))
+        uses = Counter(forms.ravel().tolist())
+        assert set(uses.values()) == {4}
+        stats = overlap_stats(forms)
+        assert stats['max_question_uses'] == 4
+        assert stats['max_shared_questions'] <= 12
+
+    def test_disjoint_forms_when_the_pool_allows(self):
+        ids, strata = pool([9, 6, 3])
+        forms = assign_forms(ids, strata, forms=3, count=6, rng=np.random.default_rng(4))
+        assert overlap_stats(forms) == {'max_question_uses': 1, 'max_shared_questions': 0}
+
+    def test_small_strata_never_repeat_within_a_form(self):
+        ids, strata = pool([1, 1, 1, 7])
+        forms = assign_forms(ids, strata, forms=7, count=9, rng=np.random.default_rng(5))
+        assert all(len(set(form)) == 9 for form in forms.tolist())
+
+    def test_seeded_assignment_is_reproducible(self):
+        ids, strata = pool([5, 5])
+        first = assign_forms(ids, strata, 3, 4, np.random.default_rng(7))
+        assert (first == assign_forms(ids, strata, 3, 4, np.random.default_rng(7))).all()
+
+    def test_pool_smaller_than_a_form(self):
+        ids, strata = pool([2, 1])
+        with pytest.raises(ValueError, match=r"\(3 available\)"):
+            assign_forms(ids, strata, forms=2, count=4)
+
+class TestLoadCandidates:
+
+    def test_strata_follow_difficulty_type_and_requested_tag(self, db):
+        algebra, geometry = Tag(name="algebra"), Tag(name="geometry")
+        for difficulty, tags in [('easy', [algebra]), ('easy', [algebra, geometry]),
+                                 ('easy', [geometry]), ('hard', [geometry])]:
+            db.add(Question(stem=f"{difficulty} {len(tags)}", question_type='single',
+                            correct_answer=[0], difficulty=difficulty, tags=tags))
+        db.add(Question(stem="retired", question_type='single', correct_answer=[0], retired=True))
+        db.commit()
+
+        ids, strata = load_candidates(db)
+        assert ids.tolist() == [1, 2, 3, 4]
+        assert strata[0] == strata[1] != strata[2] != strata[3]
+
+        # Filtering by geometry alone makes it the primary tag of question 2
+        ids, strata = load_candidates(db, tag_ids=[geometry.id])
+        assert ids.tolist() == [2, 3, 4]
+        assert strata[0] == strata[1] != strata[2]
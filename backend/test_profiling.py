@@ -0,0 +1,87 @@
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from fastapi import Depends, FastAPI, Header
+from fastapi.testclient import TestClient
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from profiling import ProfileStore, ProfilingMiddleware, folded, profile_name, start_requested_profile
+
+def create_app(store):
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, store=store)
+
+    def current_user(x_role: str = Header('student')):
+        user = SimpleNamespace(is_admin=x_role == 'admin')
+        start_requested_profile(user)
+        return user
+
+    def busy_work():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+
+    @app.get("/api/things/{thing_id}")
+    async def get_thing(thing_id: int, user=Depends(current_user)):
+        busy_work()
+        return {'id': thing_id}
+
+    return app
+
+def profiler_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'request-profiler']
+
+class TestProfiling:
+    def test_flagged_admin_request_is_profiled(self, tmp_path):
+        store = ProfileStore(tmp_path / 'profiles')
+        client = TestClient(create_app(store))
+
+        response = client.get("/api/things/1", headers={'X-Profile': '1', 'X-Role': 'admin'})
+        assert response.status_code == 200
+        name = response.headers['x-profile-id']
+        assert '-GET-api_things_thing_id-' in name
+        assert [info.name for info in store.list()] == [name]
+
+        lines = store.path(name).read_text().splitlines()
+        samples = {}
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            samples[stack] = int(count)
+        assert sum(count for stack, count in samples.items() if 'busy_work' in stack) >= 3
+        assert not profiler_threads()
+
+    def test_query_flag(self, tmp_path):
+        store = ProfileStore(tmp_path / 'profiles')
+        client = TestClient(create_app(store))
+        assert 'x-profile-id' in client.get("/api/things/1?profile=1", headers={'X-Role': 'admin'}).headers
+        assert 'x-profile-id' not in client.get("/api/things/1?profile=0", headers={'X-Role': 'admin'}).headers
+        assert len(store.list()) == 1
+
+    def test_unflagged_and_non_admin_requests_are_not_profiled(self, tmp_path):
+        store = ProfileStore(tmp_path / 'profiles')
+        client = TestClient(create_app(store))
+
+        assert 'x-profile-id' not in client.get("/api/things/1", headers={'X-Role': 'admin'}).headers
+        assert 'x-profile-id' not in client.get("/api/things/1", headers={'X-Profile': '1'}).headers
+        assert store.list() == []
+        assert not (tmp_path / 'profiles').exists()
+
+    def test_store_keeps_the_newest_profiles(self, tmp_path):
+        store = ProfileStore(tmp_path, max_profiles=2)
+        names = [profile_name('GET', f'/api/things/{i}') for i in range(3)]
+        for name in names:
+            store.save(name, "main.get_thing 1\n")
+            time.sleep(0.01)
+
+        assert [info.name for info in store.list()] == [names[2], names[1]]
+        assert store.path(names[0]) is None
+        assert store.path('../secrets.folded') is None
+        assert sorted(path.name for path in tmp_path.iterdir()) == sorted(names[1:])
+
+    def test_folded_format(self):
+        stacks = {('main.a', 'main.b'): 3, ('main.a',): 1}
+        assert folded(stacks) == "main.a 1\nmain.a;main.b 3\n"
@@ -0,0 +1,96 @@
+import pytest
+import sys
+from datetime import datetime
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Option, Question, Quiz, QuizAttempt, Tag, User
+from projection import ATTEMPT_RESOURCE, QUESTION_RESOURCE, QUIZ_RESOURCE, fetch_projected, parse_projection
+
+@pytest.fixture
+def statements(engine):
+    """SQL statements executed while a test runs."""
+    executed = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: executed.append(statement))
+    return executed
+
+def add_questions(db, count):
+    algebra = Tag(name="algebra")
+    for i in range(count):
+        db.add(Question(
+            stem=f"Question {i}",
+            question_type='single',
+            correct_answer=[0],
+            explanation="Long explanation",
+            difficulty='easy' if i % 2 else 'hard',
+            # Inserted out of order; includes return options by order_index
+            options=[Option(text="B", label="B", order_index=1), Option(text="A", label="A", order_index=0)],
+            tags=[algebra] if i % 2 else []
+        ))
+    db.commit()
+
+class TestProjection:
+
+    def test_fields_select_only_those_columns(self, db, statements):
+        """Only the requested columns are selected, and no relationship is loaded."""
+        add_questions(db, 3)
+        statements.clear()
+        projection = parse_projection(QUESTION_RESOURCE, 'stem,difficulty', None)
+        items = fetch_projected(db, db.query(Question).order_by(Question.id), projection)
+
+        assert items[0] == {'id': 1, 'stem': 'Question 0', 'difficulty': 'hard'}
+        assert len(statements) == 1
+        assert 'explanation' not in statements[0]
+        assert 'options' not in statements[0]
+
+    def test_includes_load_in_one_query_per_relationship(self, db, statements):
+        """Options and tags are loaded with one IN query each, not one per row."""
+        add_questions(db, 4)
+        statements.clear()
+        projection = parse_projection(QUESTION_RESOURCE, 'stem', 'options,tags')
+        items = fetch_projected(db, db.query(Question).order_by(Question.id), projection)
+
+        assert len(statements) == 3
+        assert [option['label'] for option in items[0]['options']] == ['A', 'B']
+        assert [item['tags'] for item in items] == [[], ['algebra'], [], ['algebra']]
+        assert set(items[0]) == {'id', 'stem', 'options', 'tags'}
+
+    def test_include_alone_keeps_every_column(self, db):
+        """Without fields, every column is returned alongside the includes."""
+        add_questions(db, 1)
+        projection = parse_projection(QUESTION_RESOURCE, None, 'tags')
+        item = fetch_projected(db, db.query(Question), projection)[0]
+        assert set(item) == set(QUESTION_RESOURCE.fields) | {'tags'}
+
+    def test_relation_key_is_hidden_unless_requested(self, db):
+        """A foreign key needed for an include is selected but not returned."""
+        user = User(email="student@example.com", name="Student")
+        quiz = Quiz(title="Quiz", question_ids=[])
+        db.add_all([user, quiz])
+        db.flush()
+        db.add(QuizAttempt(user_id=user.id, quiz_id=quiz.id, selected_answers={}, score=50.0,
+                           total_questions=2, correct_answers=1, completed_at=datetime.utcnow()))
+        db.commit()
+
+        projection = parse_projection(ATTEMPT_RESOURCE, 'score', 'quiz')
+        items = fetch_projected(db, db.query(QuizAttempt), projection)
+        assert items == [{'id': 1, 'score': 50.0, 'quiz': {
+            'id': quiz.id, 'title': 'Quiz', 'description': None, 'question_ids': [],
+            'time_limit_minutes': None, 'created_by': None, 'created_at': quiz.created_at
+        }}]
+
+    def test_no_parameters_means_full_response(self):
+        assert parse_projection(QUESTION_RESOURCE, None, None) is None
+
+    @pytest.mark.parametrize("resource,fields,include,message", [
+        (QUESTION_RESOURCE, 'stem,content_hash', None, 'Unknown fields: content_hash'),
+        (QUESTION_RESOURCE, None, 'lsh_buckets', 'Unknown include: lsh_buckets'),
+        (QUIZ_RESOURCE, None, 'attempts', 'Available: none'),
+    ])
+    def test_unknown_names_are_rejected(self, resource, fields, include, message):
+        with pytest.raises(ValueError, match=message):
+            parse_projection(resource, fields, include)
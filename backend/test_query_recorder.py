@@ -0,0 +1,53 @@
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy.orm import selectinload
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Option, Question
+from query_recorder import QueryBudgetError, QueryRecorder
+
+@pytest.fixture
+def db(db):
+    for i in range(5):
+        db.add(Question(stem=f"Question {i}", question_type='single', correct_answer=[0],
+                        options=[Option(text="Yes", label="A", order_index=0)]))
+    db.commit()
+    db.expunge_all()
+    return db
+
+class TestQueryRecorder:
+    def test_lazy_loading_in_a_loop_is_reported(self, engine, db):
+        with pytest.raises(QueryBudgetError, match="Likely N\\+1") as error:
+            with QueryRecorder(engine):
+                for question in db.query(Question).all():
+                    question.options
+        assert "5x SELECT options" in str(error.value)
+
+    def test_eager_loading_passes(self, engine, db):
+        with QueryRecorder(engine, max_queries=2) as recorder:
+            for question in db.query(Question).options(selectinload(Question.options)).all():
+                question.options
+        assert recorder.count == 2
+
+    def test_budget(self, engine, db):
+        with pytest.raises(QueryBudgetError, match="2 queries ran, more than the budget of 1"):
+            with QueryRecorder(engine, max_queries=1):
+                db.query(Question).count()
+                db.query(Option).count()
+
+    def test_identical_repeats_are_not_n_plus_one(self, engine, db):
+        """The same query with the same parameters is wasteful but not a per-row loop"""
+        with QueryRecorder(engine) as recorder:
+            for _ in range(3):
+                db.query(Question).filter(Question.id == 1).all()
+        assert recorder.count == 3
+        assert recorder.repeated_statements() == []
+
+    def test_listener_is_removed(self, engine, db):
+        with QueryRecorder(engine, n_plus_one_threshold=None) as recorder:
+            db.query(Question).count()
+        db.query(Question).count()
+        assert recorder.count == 1
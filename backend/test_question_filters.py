@@ -0,0 +1,80 @@
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import text
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Question, Tag
+from question_filters import tag_condition
+
+@pytest.fixture
+def tags(db):
+    algebra, geometry, calculus = Tag(name="algebra"), Tag(name="geometry"), Tag(name="calculus")
+    tagged = {
+        'both': [algebra, geometry],
+        'algebra': [algebra],
+        'geometry': [geometry, calculus],
+        'untagged': [],
+    }
+    for stem, question_tags in tagged.items():
+        db.add(Question(stem=stem, question_type='single', correct_answer=[0], tags=question_tags))
+    db.commit()
+    return algebra, geometry, calculus
+
+def stems(db, condition):
+    return sorted(q.stem for q in db.query(Question).filter(condition))
+
+def query_plan(db, condition):
+    statement = db.query(Question).filter(Question.retired == False, condition).limit(20).statement
+    sql = str(statement.compile(dialect=db.get_bind().dialect, compile_kwargs={'literal_binds': True}))
+    return [row[-1] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+class TestTagCondition:
+
+    def test_any_returns_each_question_once(self, db, tags):
+        """A question with several of the tags is not repeated."""
+        algebra, geometry, _ = tags
+        questions = db.query(Question).filter(tag_condition([algebra.id, geometry.id], 'any')).all()
+        assert sorted(q.stem for q in questions) == ['algebra', 'both', 'geometry']
+
+    def test_all_requires_every_tag(self, db, tags):
+        algebra, geometry, _ = tags
+        assert stems(db, tag_condition([algebra.id, geometry.id], 'all')) == ['both']
+        # Repeating a tag does not change the count needed
+        assert stems(db, tag_condition([algebra.id, algebra.id], 'all')) == ['algebra', 'both']
+
+    def test_none_excludes_every_tag(self, db, tags):
+        algebra, _, calculus = tags
+        assert stems(db, tag_condition([algebra.id, calculus.id], 'none')) == ['untagged']
+
+    def test_tags_by_name(self, db, tags):
+        assert stems(db, tag_condition(['geometry', 'calculus'], 'all', by_name=True)) == ['geometry']
+        # An unknown name can never be matched in full
+        assert stems(db, tag_condition(['algebra', 'missing'], 'all', by_name=True)) == []
+        assert stems(db, tag_condition(['algebra', 'missing'], 'any', by_name=True)) == ['algebra', 'both']
+
+    def test_unknown_mode_is_rejected(self):
+        with pytest.raises(ValueError, match="tag_mode"):
+            tag_condition([1], 'some')
+
+class TestTagConditionPlans:
+
+    @pytest.mark.parametrize("mode", ['any', 'all'])
+    def test_any_and_all_use_the_tag_index(self, db, tags, mode):
+        """Questions are found through the tag index and fetched by primary key."""
+        plan = query_plan(db, tag_condition([1, 2], mode))
+        assert any('ix_question_tags_tag_question' in step for step in plan)
+        assert not any(step.startswith('SCAN') for step in plan)
+
+    def test_any_by_name_uses_the_tag_index(self, db, tags):
+        plan = query_plan(db, tag_condition(['algebra'], 'any', by_name=True))
+        assert any('ix_question_tags_tag_question' in step for step in plan)
+        assert not any(step.startswith('SCAN') for step in plan)
+
+    def test_none_probes_question_tags_by_key(self, db, tags):
+        """Excluding tags visits each question once, but never scans question_tags."""
+        plan = query_plan(db, tag_condition([1, 2], 'none'))
+        assert not any(step.startswith('SCAN question_tags') for step in plan)
+        assert any(step.startswith('SEARCH question_tags') for step in plan)
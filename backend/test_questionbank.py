@@ -0,0 +1,209 @@
+import io
+import json
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Base, Question, Tag, Quiz, QuizAttempt, AttemptAnswer, QuestionStats
+from questionbank import Progress, bank_counts, main
+from seeding import seed_attempts, seed_questions, seed_quizzes, seed_users
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'bank.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+def run(session_factory, *argv):
+    return main(list(argv), session_factory=session_factory)
+
+class TestSeed:
+    def test_seed_writes_questions_in_bulk(self, session_factory):
+        """Seeded questions have options, tags and valid answers"""
+        db = session_factory()
+        written = seed_questions(db, 250, seed=1, tag_count=5, batch_size=100)
+
+        assert written['questions'] == 250
+        questions = db.query(Question).all()
+        assert len(questions) == 250
+        assert len({q.stem for q in questions}) == 250
+        for question in questions:
+            assert question.options
+            assert all(0 <= index < len(question.options) for index in question.correct_answer)
+            assert question.content_hash is None
+        assert db.query(Tag).count() == 5
+        db.close()
+
+    def test_repeated_seeds_do_not_repeat_questions(self, session_factory):
+        """A second run with the same seed numbers its stems after the first"""
+        db = session_factory()
+        seed_questions(db, 20, seed=1, index=True)
+        seed_questions(db, 20, seed=1, index=True)
+        assert db.query(Question).filter(Question.content_hash.isnot(None)).count() == 40
+        db.close()
+
+    def test_seed_quizzes_and_graded_attempts(self, session_factory):
+        """Seeded attempts are graded against quiz answer keys and feed item statistics"""
+        db = session_factory()
+        seed_questions(db, 60, seed=2)
+        user_ids = seed_users(db, 8)
+        assert seed_users(db, 8) == user_ids
+        quiz_ids = seed_quizzes(db, 5, questions_per_quiz=10, seed=2)
+        assert all(quiz.snapshot for quiz in db.query(Quiz).all())
+
+        written = seed_attempts(db, 40, quiz_ids, user_ids, seed=2, batch_size=15)
+        assert written == {'attempts': 40, 'answers': 400}
+        for attempt in db.query(QuizAttempt).all():
+            answers = db.query(AttemptAnswer).filter(AttemptAnswer.attempt_id == attempt.id).all()
+            assert attempt.correct_answers == sum(answer.is_correct for answer in answers)
+        assert db.query(QuestionStats).count() > 0
+        db.close()
+
+        with pytest.raises(ValueError):
+            seed_quizzes(session_factory(), 1, questions_per_quiz=100)
+
+class TestCommands:
+    def test_seed_reindex_and_stats(self, session_factory, capsys):
+        """Seeded questions are picked up by reindex and counted by stats"""
+        assert run(session_factory, 'seed', '--count', '50', '--seed', '3', '--tags', '4') == 0
+        assert "Seeded 50 questions" in capsys.readouterr().out
+
+        db = session_factory()
+        assert bank_counts(db)['unindexed_questions'] == 50
+        db.close()
+
+        assert run(session_factory, 'reindex') == 0
+        assert "Indexed 50 questions" in capsys.readouterr().out
+
+        assert run(session_factory, 'stats', '--verify') == 0
+        out = capsys.readouterr().out
+        assert "Questions: 50" in out
+        assert "Unindexed questions: 0" in out
+        assert "Tags: 4" in out
+        assert "Item statistics match" in out
+
+    def test_seed_attempts_command(self, session_factory, capsys):
+        assert run(session_factory, 'seed', '--count', '40', '--users', '5', '--quizzes', '3',
+                   '--attempts', '12') == 0
+        assert run(session_factory, 'stats', '--verify') == 0
+        out = capsys.readouterr().out
+        assert "Attempts: 12" in out
+        assert "Item statistics match" in out
+
+        with pytest.raises(SystemExit):
+            run(session_factory, 'seed', '--count', '1', '--attempts', '5')
+
+    def test_export_and_import_round_trip(self, session_factory, tmp_path, capsys):
+        """An exported file imports into another bank through the import command"""
+        run(session_factory, 'seed', '--count', '30', '--seed', '5')
+        export_path = tmp_path / 'bank.csv'
+        assert run(session_factory, 'export', '--format', 'csv', '--output', str(export_path)) == 0
+        assert len(export_path.read_text(encoding='utf-8').splitlines()) >= 31
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'copy.db'}")
+        copy_factory = sessionmaker(bind=engine)
+        capsys.readouterr()
+        assert run(copy_factory, 'import', str(tmp_path)) == 0
+        out = capsys.readouterr().out
+        assert "bank.csv: 30 imported, 0 failed, 0 duplicates" in out
+
+        db = copy_factory()
+        assert db.query(Question).count() == 30
+        assert db.query(Question).filter(Question.content_hash.is_(None)).count() == 0
+        db.close()
+
+        # A second import of the same file is recognized as unchanged
+        run(copy_factory, 'import', str(export_path))
+        assert "bank.csv: unchanged" in capsys.readouterr().out
+        engine.dispose()
+
+    def test_export_filters_to_stdout(self, session_factory, capsysbinary):
+        run(session_factory, 'seed', '--count', '40', '--seed', '7', '--tags', '2')
+        capsysbinary.readouterr()
+        assert run(session_factory, 'export', '--tag', 'seed-1', '--tag-mode', 'none') == 0
+        lines = capsysbinary.readouterr().out.decode('utf-8').splitlines()
+
+        db = session_factory()
+        tagged = db.query(Tag).filter(Tag.name == 'seed-1').one()
+        assert len(lines) == 40 - len(tagged.questions)
+        assert all('seed-1' not in json.loads(line)['tags'] for line in lines)
+        db.close()
+
+    def test_rescore_all(self, session_factory, capsys):
+        """Recorded answers are regraded against changed correct answers"""
+        run(session_factory, 'seed', '--count', '5', '--seed', '9')
+        db = session_factory()
+        question = db.query(Question).filter(Question.question_type == 'true_false').first() or \
+            db.query(Question).first()
+        attempt = QuizAttempt(user_id=1, quiz_id=1, selected_answers={}, correct_answers=0,
+                              total_questions=1, score=0.0)
+        db.add(attempt)
+        db.flush()
+        db.add(AttemptAnswer(attempt_id=attempt.id, question_id=question.id, user_id=1,
+                             selected_mask=1 << question.correct_answer[0], is_correct=False))
+        db.commit()
+
+        assert run(session_factory, 'rescore', '--all') == 0
+        assert "1 answers checked, 1 changed" in capsys.readouterr().out
+        db.refresh(attempt)
+        assert attempt.correct_answers == 1
+        db.close()
+
+    def test_import_rescores_changed_answers(self, session_factory, tmp_path, capsys):
+        """Re-importing a file with a changed answer regrades the attempts that included it"""
+        db = session_factory()
+        seed_users(db, 1)
+        db.close()
+        bank = tmp_path / 'bank.jsonl'
+        row = {'stem': 'What is 2 + 2?', 'options': ['3', '4'], 'correct_answer': [0]}
+        bank.write_text(json.dumps(row) + '\n')
+        assert run(session_factory, 'import', '--user', 'seed-user-1@example.com', str(bank)) == 0
+
+        db = session_factory()
+        user_ids = seed_users(db, 1)
+        quiz_ids = seed_quizzes(db, 1, questions_per_quiz=1, seed=1)
+        seed_attempts(db, 5, quiz_ids, user_ids, seed=1)
+        correct_before = sum(attempt.correct_answers for attempt in db.query(QuizAttempt))
+        db.close()
+
+        bank.write_text(json.dumps({**row, 'correct_answer': [1]}) + '\n')
+        capsys.readouterr()
+        assert run(session_factory, 'import', '--user', 'seed-user-1@example.com', str(bank)) == 0
+        assert "Rescored 1 questions with changed answers: 5 answers changed" in capsys.readouterr().out
+
+        db = session_factory()
+        assert sum(attempt.correct_answers for attempt in db.query(QuizAttempt)) == 5 - correct_before
+        db.close()
+
+    def test_vacuum(self, session_factory, capsys):
+        run(session_factory, 'seed', '--count', '10')
+        assert run(session_factory, 'vacuum') == 0
+        assert "MB ->" in capsys.readouterr().out
+
+    def test_errors_exit_with_usage(self, session_factory):
+        with pytest.raises(SystemExit):
+            run(session_factory, 'rescore')
+        with pytest.raises(SystemExit):
+            run(session_factory, 'import', 'notes.txt')
+
+class TestProgress:
+    def test_draws_only_on_terminals(self):
+        stream = io.StringIO()
+        progress = Progress("Work", 4, stream)
+        progress(2)
+        progress.close()
+        assert stream.getvalue() == ''
+
+        stream.isatty = lambda: True
+        progress = Progress("Work", 4, stream)
+        progress(2)
+        progress.close()
+        assert "Work [" in stream.getvalue()
+        assert "2/4" in stream.getvalue()
+        assert stream.getvalue().endswith('\n')
@@ -0,0 +1,188 @@
+import gzip
+import json
+import sys
+from pathlib import Path
+from sqlalchemy import event
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Option, Question, Quiz, QuizQuestion
+from answer_keys import answer_key_cache
+from quiz_snapshots import (
+    _apply_answer_corrections,
+    backfill_quiz_questions,
+    backfill_snapshots,
+    correct_snapshot_answers,
+    quiz_snapshot,
+)
+from conftest import add_quiz
+
+def add_questions(db, count):
+    questions = [
+        Question(
+            stem=f"Question {i}",
+            question_type='single',
+            correct_answer=[i % 2],
+            explanation="Because",
+            options=[Option(text="Second", label="B", order_index=1), Option(text="First", label="A", order_index=0)]
+        )
+        for i in range(count)
+    ]
+    db.add_all(questions)
+    db.commit()
+    return questions
+
+def student_view(db, quiz_id):
+    return json.loads(gzip.decompress(quiz_snapshot(db, quiz_id)))
+
+class TestQuizSnapshots:
+
+    def test_student_view_has_no_answers(self, db):
+        """Questions keep the quiz's order and options their display order."""
+        questions = add_questions(db, 3)
+        quiz = add_quiz(db, [questions[2].id, questions[0].id], snapshot=True)
+
+        view = student_view(db, quiz.id)
+        assert view['title'] == "Quiz"
+        assert [q['id'] for q in view['questions']] == [questions[2].id, questions[0].id]
+        assert view['questions'][0] == {
+            'id': questions[2].id, 'stem': 'Question 2', 'question_type': 'single',
+            'options': [{'label': 'A', 'text': 'First'}, {'label': 'B', 'text': 'Second'}]
+        }
+        assert quiz.answer_key == {str(questions[2].id): [0], str(questions[0].id): [0]}
+
+    def test_edits_after_issue_do_not_change_the_snapshot(self, db):
+        questions = add_questions(db, 2)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+        snapshot = quiz_snapshot(db, quiz.id)
+
+        questions[0].stem = "Rewritten"
+        questions[0].options[0].text = "Changed"
+        db.commit()
+
+        assert quiz_snapshot(db, quiz.id) == snapshot
+
+    def test_grading_uses_the_stored_key(self, db):
+        """Answers come from the quiz row, not from the live questions."""
+        questions = add_questions(db, 2)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+        db.query(Quiz).filter(Quiz.id == quiz.id).update({'answer_key': {str(questions[0].id): [1]}})
+        db.commit()
+
+        key = answer_key_cache.get(db, quiz.id)
+        assert list(key.question_ids) == [questions[0].id]
+        assert key.count_correct({questions[0].id: [1]}) == 1
+
+    def test_answer_corrections_reach_stored_keys(self, db):
+        """A corrected answer is copied into every quiz with the question, in the same commit."""
+        questions = add_questions(db, 13)
+        quiz = add_quiz(db, [questions[0].id, questions[11].id], snapshot=True)
+        other = add_quiz(db, [questions[1].id, questions[12].id], snapshot=True)
+        assert answer_key_cache.get(db, quiz.id).count_correct({questions[0].id: [1]}) == 0
+
+        questions[0].correct_answer = [1]
+        db.commit()
+
+        db.refresh(quiz)
+        db.refresh(other)
+        assert quiz.answer_key[str(questions[0].id)] == [1]
+        assert other.answer_key == {str(questions[1].id): [1], str(questions[12].id): [0]}
+        assert answer_key_cache.get(db, quiz.id).count_correct({questions[0].id: [1]}) == 1
+
+    def test_deleted_questions_are_no_longer_graded(self, db):
+        questions = add_questions(db, 2)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+
+        db.delete(questions[1])
+        db.commit()
+
+        db.refresh(quiz)
+        assert quiz.answer_key == {str(questions[0].id): [0]}
+        assert len(student_view(db, quiz.id)['questions']) == 2
+
+    def test_corrections_are_discarded_on_rollback(self, db):
+        questions = add_questions(db, 1)
+        quiz = add_quiz(db, [questions[0].id], snapshot=True)
+        questions[0].correct_answer = [1]
+        db.flush()
+        db.rollback()
+        db.commit()
+        db.refresh(quiz)
+        assert quiz.answer_key == {str(questions[0].id): [0]}
+
+    def test_correcting_several_questions_of_one_quiz(self, db):
+        questions = add_questions(db, 3)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+        updated = correct_snapshot_answers(db, {questions[0].id: [1], questions[2].id: None, 999: [0]})
+        db.commit()
+        db.refresh(quiz)
+        assert updated == 1
+        assert quiz.answer_key == {str(questions[0].id): [1], str(questions[1].id): [1]}
+
+    def test_older_quizzes_are_served_read_only_until_backfilled(self, db):
+        questions = add_questions(db, 2)
+        quiz = Quiz(title="Legacy", question_ids=[q.id for q in questions] + [999])
+        db.add(quiz)
+        db.commit()
+
+        assert [q['id'] for q in student_view(db, quiz.id)['questions']] == [q.id for q in questions]
+        assert not db.dirty and not db.new
+        db.refresh(quiz)
+        assert (quiz.snapshot, quiz.answer_key) == (None, None)
+        assert quiz_snapshot(db, 999) is None
+
+        assert backfill_snapshots(db, batch_size=1) == 1
+        assert backfill_snapshots(db) == 0
+        db.refresh(quiz)
+        assert quiz.answer_key == {str(questions[0].id): [0], str(questions[1].id): [1]}
+        assert quiz_snapshot(db, quiz.id) == quiz.snapshot
+        assert db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).count() == 2
+
+    def test_quizzes_are_found_through_the_link_index(self, db):
+        """Corrections look up quiz_questions by question instead of scanning quizzes."""
+        questions = add_questions(db, 2)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+        assert sorted(db.query(QuizQuestion.question_id).filter(QuizQuestion.quiz_id == quiz.id).all()) == \
+            [(questions[0].id,), (questions[1].id,)]
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(db.get_bind(), 'before_cursor_execute', record)
+        try:
+            correct_snapshot_answers(db, {questions[0].id: [1]})
+        finally:
+            event.remove(db.get_bind(), 'before_cursor_execute', record)
+
+        for statement, parameters in statements:
+            plan = ' '.join(row[-1] for row in db.connection().exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters).all())
+            assert 'SCAN' not in plan
+
+    def test_only_sessions_that_change_answers_are_watched(self, db):
+        questions = add_questions(db, 1)
+        questions[0].stem = "Reworded"
+        db.commit()
+        assert not event.contains(db, 'after_flush', _apply_answer_corrections)
+
+        questions[0].correct_answer = [1]
+        db.commit()
+        assert event.contains(db, 'after_flush', _apply_answer_corrections)
+
+    def test_backfill_links_older_snapshots(self, db):
+        questions = add_questions(db, 2)
+        quiz = add_quiz(db, [q.id for q in questions], snapshot=True)
+        legacy = add_quiz(db, [questions[0].id], snapshot=True)
+        db.query(QuizQuestion).delete()
+        db.commit()
+
+        assert backfill_quiz_questions(db, batch_size=1) == 2
+        assert backfill_quiz_questions(db) == 0
+        assert db.query(QuizQuestion).filter(QuizQuestion.quiz_id == quiz.id).count() == 2
+        questions[0].correct_answer = [1]
+        db.commit()
+        db.refresh(legacy)
+        assert legacy.answer_key == {str(questions[0].id): [1]}
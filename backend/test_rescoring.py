@@ -0,0 +1,131 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+import rescoring
+from models import AttemptAnswer, QuizAttempt
+from answer_keys import answer_key_cache
+from attempt_answers import record_attempt_answers
+from item_stats import get_question_stats, recompute_item_stats, record_item_stats
+from rescoring import create_rescore_job, get_rescore_job, rescore_question, run_rescore_job
+from conftest import make_quiz
+
+def submit(db, user, quiz, selected_answers, key=None):
+    """Grade and record an attempt the way submit_quiz_attempt does."""
+    key = key or answer_key_cache.get(db, quiz.id)
+    graded = key.grade(selected_answers)
+    correct = sum(1 for _, _, is_correct in graded if is_correct)
+    attempt = QuizAttempt(
+        user_id=user.id,
+        quiz_id=quiz.id,
+        selected_answers=selected_answers,
+        score=correct / len(graded) * 100,
+        total_questions=len(graded),
+        correct_answers=correct,
+        answer_key_version=key.version,
+        completed_at=datetime.utcnow()
+    )
+    db.add(attempt)
+    db.flush()
+    record_attempt_answers(db, attempt, graded)
+    record_item_stats(db, graded, correct / len(graded))
+    db.commit()
+    return attempt
+
+class TestRescoring:
+
+    def test_fixed_answer_regrades_attempts(self, db):
+        """Attempts are regraded in batches, and the item statistics follow."""
+        user, quiz, questions = make_quiz(db, [[0], [1]])
+        q0, q1 = (q.id for q in questions)
+        attempts = [submit(db, user, quiz, {q0: [i % 3], q1: [1]}) for i in range(7)]
+        assert [a.correct_answers for a in attempts] == [2, 1, 1, 2, 1, 1, 2]
+
+        questions[0].correct_answer = [1]
+        db.commit()
+        result = rescore_question(db, q0, batch_size=3)
+
+        assert result == {'processed': 7, 'changed': 5}
+        for attempt in attempts:
+            db.refresh(attempt)
+        assert [a.correct_answers for a in attempts] == [1, 2, 1, 1, 2, 1, 1]
+        assert [a.score for a in attempts] == [50.0, 100.0, 50.0, 50.0, 100.0, 50.0, 50.0]
+        assert db.query(AttemptAnswer).filter(
+            AttemptAnswer.question_id == q0, AttemptAnswer.is_correct == True
+        ).count() == 2
+
+        assert get_question_stats(db, [q0])[0]['correct'] == 2
+        assert recompute_item_stats(db)['mismatched'] == []
+
+        # Nothing left to change on a second run
+        assert rescore_question(db, q0) == {'processed': 7, 'changed': 0}
+
+    def test_attempts_graded_with_the_new_answer_are_untouched(self, db):
+        """Submissions arriving after the fix already carry the right result."""
+        user, quiz, questions = make_quiz(db, [[0], [1]])
+        q0, q1 = (q.id for q in questions)
+        old = submit(db, user, quiz, {q0: [2], q1: [1]})
+
+        questions[0].correct_answer = [2]
+        db.commit()
+        new = submit(db, user, quiz, {q0: [2], q1: [0]})
+        assert new.correct_answers == 1
+
+        assert rescore_question(db, q0) == {'processed': 2, 'changed': 1}
+        db.refresh(old)
+        db.refresh(new)
+        assert (old.correct_answers, new.correct_answers) == (2, 1)
+        assert recompute_item_stats(db)['mismatched'] == []
+
+    def test_late_attempt_graded_with_the_old_key_is_regraded(self, db, session_factory, monkeypatch):
+        """A submission that read the key before the fix but commits after the pass is still regraded."""
+        user, quiz, questions = make_quiz(db, [[0]])
+        q0 = questions[0].id
+        early = submit(db, user, quiz, {q0: [0]})
+        old_key = answer_key_cache.get(db, quiz.id)
+        questions[0].correct_answer = [1]
+        db.commit()
+
+        late = []
+        def sleep(seconds):
+            # The late submission commits while the job waits between checks
+            if not late:
+                late.append(submit(db, user, quiz, {q0: [0]}, key=old_key))
+        monkeypatch.setattr(rescoring.time, 'sleep', sleep)
+
+        job = create_rescore_job(q0)
+        run_rescore_job(job, session_factory, recheck_seconds=0.2)
+
+        assert job.status == 'completed'
+        assert (job.processed_attempts, job.changed_attempts) == (2, 2)
+        for attempt in (early, *late):
+            db.refresh(attempt)
+            assert (attempt.correct_answers, attempt.answer_key_version) == (0, quiz.answer_key_version)
+        assert recompute_item_stats(db)['mismatched'] == []
+
+    def test_background_job_reports_progress(self, db, session_factory):
+        """A job runs in its own session and records its progress."""
+        user, quiz, questions = make_quiz(db, [[0]])
+        for i in range(4):
+            submit(db, user, quiz, {questions[0].id: [i % 2]})
+        questions[0].correct_answer = [1]
+        db.commit()
+
+        job = create_rescore_job(questions[0].id)
+        assert job.status == 'pending'
+        run_rescore_job(job, session_factory, batch_size=3, recheck_seconds=0)
+
+        assert get_rescore_job(job.id) is job
+        assert job.status == 'completed'
+        assert (job.total_attempts, job.processed_attempts, job.changed_attempts) == (4, 4, 4)
+        assert job.finished_at >= job.started_at
+
+    def test_job_for_missing_question_fails(self, session_factory):
+        """A job for a deleted question fails with an error instead of raising."""
+        job = create_rescore_job(999)
+        run_rescore_job(job, session_factory, recheck_seconds=0)
+        assert job.status == 'failed'
+        assert 'not found' in job.error
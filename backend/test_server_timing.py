@@ -0,0 +1,85 @@
+import logging
+import re
+import sys
+import time
+from pathlib import Path
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server_timing import RequestTimings, ServerTimingMiddleware, TimedRoute, phase, time_queries, timed_iter
+
+def parse_server_timing(value):
+    """``{name: (milliseconds, description)}`` from a Server-Timing header."""
+    entries = {}
+    for entry in value.split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        entries[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return entries
+
+def create_app(engine, slow_request_ms=0):
+    app = FastAPI()
+    app.router.route_class = TimedRoute
+    app.add_middleware(ServerTimingMiddleware, slow_request_ms=slow_request_ms)
+    time_queries(engine)
+
+    def authenticate():
+        with phase('auth'):
+            time.sleep(0.01)
+
+    @app.get("/api/things", dependencies=[Depends(authenticate)])
+    async def list_things():
+        with engine.connect() as conn:
+            for i in range(3):
+                conn.execute(text(f"SELECT {i}"))
+        items = list(timed_iter((time.sleep(0.005) or i for i in range(2)), 'parse'))
+        return {'items': items}
+
+    @app.get("/api/plain")
+    async def plain():
+        return {}
+
+    return app
+
+class TestServerTiming:
+    def test_header_breaks_down_the_request(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'timing.db'}")
+        client = TestClient(create_app(engine))
+
+        response = client.get("/api/things")
+        assert response.status_code == 200
+        timings = parse_server_timing(response.headers['server-timing'])
+        assert list(timings) == ['auth', 'db', 'parse', 'serialize', 'total']
+        assert timings['auth'][0] >= 10
+        assert timings['db'][1] == '3 queries'
+        assert timings['parse'][0] >= 10
+        assert timings['total'][0] >= timings['auth'][0] + timings['parse'][0]
+        engine.dispose()
+
+    def test_phases_that_did_not_run_are_left_out(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'timing.db'}")
+        client = TestClient(create_app(engine))
+
+        timings = parse_server_timing(client.get("/api/plain").headers['server-timing'])
+        assert list(timings) == ['serialize', 'total']
+        assert 'total;dur=' in client.get("/no/such/path").headers['server-timing']
+        engine.dispose()
+
+    def test_slow_requests_are_logged(self, tmp_path, caplog):
+        engine = create_engine(f"sqlite:///{tmp_path / 'timing.db'}")
+        client = TestClient(create_app(engine, slow_request_ms=5))
+
+        with caplog.at_level(logging.WARNING, logger='server_timing'):
+            client.get("/api/things")
+        assert len(caplog.records) == 1
+        assert re.match(r'Slow request: GET /api/things 200 took \d+ms \(auth;dur=', caplog.records[0].getMessage())
+        engine.dispose()
+
+    def test_phase_outside_a_request_does_nothing(self):
+        with phase('auth'):
+            pass
+        assert RequestTimings().header(0.0125) == 'total;dur=12.5'
@@ -0,0 +1,210 @@
+import io
+import json
+import pytest
+import sys
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Add parent directory to path for imports
+sys.path.append(str(Path(__file__).parent.parent))
+
+from models import Base, Option, Question, Tag
+from docx_parser import ParsedQuestion
+from exporter import export_questions, export_statement
+from importer import BulkImporter, finish_import, import_stream
+from structured_import import StructuredParser, scan_upload, structured_format
+
+def jsonl(*rows):
+    return io.BytesIO(''.join(
+        (row if isinstance(row, str) else json.dumps(row)) + '\n' for row in rows
+    ).encode('utf-8'))
+
+def parse(file_format, data, batch_size=500):
+    parser = StructuredParser(file_format, batch_size=batch_size)
+    return parser, list(parser.iter_questions(data))
+
+def import_file(db, file_format, data, previous=None):
+    parser = StructuredParser(file_format)
+    importer = BulkImporter(db, previous.fingerprints if previous else None)
+    errors = import_stream(importer, parser.iter_questions(data))
+    report = finish_import(importer, f'bank.{file_format}', parser.total_lines, errors)
+    db.commit()
+    return report
+
+class TestStructuredParser:
+    def test_jsonl_rows_become_parsed_questions(self):
+        """Rows in the export format are read with labels assigned to their options"""
+        parser, items = parse('jsonl', jsonl(
+            {'id': 7, 'stem': 'What is 2 + 2?', 'question_type': 'single', 'difficulty': 'easy',
+             'options': ['3', '4'], 'correct_answer': [1], 'explanation': None, 'tags': ['math']},
+        ))
+
+        assert len(items) == 1
+        question = items[0]
+        assert isinstance(question, ParsedQuestion)
+        assert question.stem == 'What is 2 + 2?'
+        assert question.options == [{'label': 'A', 'text': '3'}, {'label': 'B', 'text': '4'}]
+        assert question.correct_answer == [1]
+        assert question.explanation == ''
+        assert question.difficulty == 'easy'
+        assert question.tags == ['math']
+        assert question.raw_lines[0][0] == 1
+        assert parser.total_lines == 1
+
+    def test_invalid_rows_are_reported_with_line_numbers(self):
+        """Each bad row gets one error in the DOCX parser's format and the rest still import"""
+        parser, items = parse('jsonl', jsonl(
+            {'stem': 'Valid one', 'options': ['a', 'b'], 'correct_answer': [0]},
+            '{not json',
+            {'stem': 'Out of range', 'options': ['a', 'b'], 'correct_answer': [2]},
+            '',
+            {'stem': 'Bad type', 'question_type': 'essay', 'options': ['a'], 'correct_answer': [0]},
+            {'options': ['a'], 'correct_answer': [0]},
+            {'stem': 'Valid two', 'question_type': 'true_false', 'correct_answer': [1]},
+        ))
+
+        questions = [item for item in items if isinstance(item, ParsedQuestion)]
+        errors = [item for item in items if not isinstance(item, ParsedQuestion)]
+        assert [q.stem for q in questions] == ['Valid one', 'Valid two']
+        assert questions[1].options == [{'label': 'A', 'text': 'True'}, {'label': 'B', 'text': 'False'}]
+        assert [error['line_number'] for error in errors] == [2, 3, 5, 6]
+        assert errors[0]['error'].startswith('Invalid JSON')
+        assert errors[0]['content'] == '{not json'
+        assert errors[1]['error'] == 'Correct answer index 2 exceeds options count'
+        assert errors[2]['error'].startswith('question_type:')
+        assert errors[3]['error'] == 'stem: Field required'
+        assert parser.total_lines == 7
+
+    def test_batches_do_not_change_results(self):
+        """Validation in small batches gives the same questions and errors"""
+        rows = [
+            {'stem': f'Question {i}', 'options': ['a', 'b'], 'correct_answer': [i % 3]}
+            for i in range(10)
+        ]
+        _, whole = parse('jsonl', jsonl(*rows))
+        _, batched = parse('jsonl', jsonl(*rows), batch_size=3)
+
+        def summary(items):
+            return [item.stem if isinstance(item, ParsedQuestion) else item['line_number'] for item in items]
+
+        assert summary(whole) == summary(batched)
+        assert summary(whole).count('Question 0') == 1
+        assert [item for item in summary(whole) if isinstance(item, int)] == [3, 6, 9]
+
+    def test_csv_list_cells_and_multiline_rows(self):
+        """CSV list columns are JSON arrays; rows are numbered by their first line"""
+        data = io.BytesIO((
+            'stem,question_type,difficulty,options,correct_answer,explanation,tags\n'
+            '"Line one\nline two",multiple,,"[""x"",""y"",""z""]","[0, 2]",,"[""a"", ""b""]"\n'
+            'Broken,single,medium,not-json,[0],,[]\n'
+        ).encode('utf-8'))
+        parser, items = parse('csv', data)
+
+        question, error = items
+        assert question.stem == 'Line one\nline two'
+        assert question.difficulty == 'medium'
+        assert [option['text'] for option in question.options] == ['x', 'y', 'z']
+        assert question.correct_answer == [0, 2]
+        assert question.tags == ['a', 'b']
+        assert error['line_number'] == 4
+        assert error['content'] == 'Broken'
+        assert error['error'] == 'options: must be a JSON array'
+        assert parser.total_lines == 4
+
+    def test_upload_is_left_open(self):
+        """Reading through a text wrapper does not close the caller's file"""
+        data = jsonl({'stem': 'Q', 'options': ['a'], 'correct_answer': [0]})
+        parse('jsonl', data)
+        assert not data.closed
+
+class TestScanUpload:
+    def test_hashes_and_rewinds(self):
+        data = io.BytesIO('stem\né\n'.encode('utf-8'))
+        first = scan_upload(data)
+        assert data.tell() == 0
+        assert first == scan_upload(data)
+
+    def test_rejects_invalid_utf8(self):
+        with pytest.raises(ValueError):
+            scan_upload(io.BytesIO(b'\xff\xfe bad'))
+
+    def test_structured_format(self):
+        assert structured_format('bank.JSONL') == 'jsonl'
+        assert structured_format('bank.csv') == 'csv'
+        assert structured_format('bank.docx') is None
+        assert structured_format('jsonl') is None
+
+class TestStructuredImport:
+    def test_import_creates_questions_and_tags(self, db):
+        """Valid rows go through the bulk importer, reusing existing tags"""
+        db.add(Tag(name='math'))
+        db.commit()
+        report = import_file(db, 'jsonl', jsonl(
+            {'stem': 'What is 2 + 2?', 'options': ['3', '4'], 'correct_answer': [1], 'tags': ['math', 'easy']},
+            {'stem': 'What is 3 + 3?', 'options': ['6', '7'], 'correct_answer': [0], 'tags': ['math']},
+            {'stem': 'What is 2 + 2?', 'options': ['3', '4'], 'correct_answer': [1]},
+            {'stem': 'Broken', 'options': [], 'correct_answer': [0]},
+        ))
+
+        assert report.successful_imports == 2
+        assert report.duplicate_imports == 1
+        assert report.failed_imports == 1
+        assert report.errors[0]['line_number'] == 4
+        assert sorted(tag.name for tag in db.query(Tag)) == ['easy', 'math']
+        math = db.query(Tag).filter(Tag.name == 'math').one()
+        assert len(math.questions) == 2
+
+    def test_skipped_duplicates_do_not_create_tags(self, db):
+        """Tags are only created for rows that are inserted"""
+        row = {'stem': 'What is 2 + 2?', 'options': ['3', '4'], 'correct_answer': [1], 'tags': ['math']}
+        report = import_file(db, 'jsonl', jsonl(row, {**row, 'tags': ['copy']}))
+
+        assert report.duplicate_imports == 1
+        assert [tag.name for tag in db.query(Tag)] == ['math']
+
+    def test_reimport_replaces_changed_tags(self, db):
+        """A row whose only change is its tags is updated, not left unchanged"""
+        row = {'stem': 'What is 2 + 2?', 'options': ['3', '4'], 'correct_answer': [1], 'tags': ['math']}
+        first = import_file(db, 'jsonl', jsonl(row))
+        second = import_file(db, 'jsonl', jsonl({**row, 'tags': ['arithmetic', 'easy']}), previous=first)
+
+        assert second.diff['updated'] == 1
+        assert second.diff['unchanged'] == 0
+        question = db.query(Question).one()
+        assert sorted(tag.name for tag in question.tags) == ['arithmetic', 'easy']
+
+        third = import_file(db, 'jsonl', jsonl({**row, 'tags': ['easy', 'arithmetic']}), previous=second)
+        assert third.diff['unchanged'] == 1
+
+    @pytest.mark.parametrize('file_format', ['jsonl', 'csv'])
+    def test_export_round_trip(self, db, session_factory, file_format):
+        """An export imports into an empty bank unchanged"""
+        source = db
+        math = Tag(name='math')
+        source.add_all([
+            Question(stem='What is 2 + 2?', question_type='single', correct_answer=[1], difficulty='easy',
+                     explanation='Basic arithmetic', tags=[math],
+                     options=[Option(label='A', text='3', order_index=0), Option(label='B', text='4', order_index=1)]),
+            Question(stem='Which are "primes",\nreally?', question_type='multiple', correct_answer=[0, 1],
+                     difficulty='hard',
+                     options=[Option(label='A', text='2', order_index=0), Option(label='B', text='3', order_index=1),
+                              Option(label='C', text='4', order_index=2)]),
+        ])
+        source.commit()
+        data = io.BytesIO(b''.join(export_questions(session_factory, file_format, export_statement())))
+
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=engine)
+        target = sessionmaker(bind=engine)()
+        report = import_file(target, file_format, data)
+
+        assert report.successful_imports == 2
+        assert report.errors == []
+        imported = target.query(Question).order_by(Question.id).all()
+        assert [q.stem for q in imported] == ['What is 2 + 2?', 'Which are "primes",\nreally?']
+        assert [[o.text for o in q.options] for q in imported] == [['3', '4'], ['2', '3', '4']]
+        assert [q.correct_answer for q in imported] == [[1], [0, 1]]
+        assert [q.difficulty for q in imported] == ['easy', 'hard']
+        assert [[t.name for t in q.tags] for q in imported] == [['math'], []]
+        target.close()
@@ -17,8 +17,10 @@ from pathlib import Path
 # Add backend to path
 sys.path.append(str(Path(__file__).parent / "backend"))
 
-from backend.models import create_tables, SessionLocal, User, Question, Option, Tag
-from backend.docx_parser import DocxParser
+from models import create_tables, SessionLocal, User, Question, Option, Tag
+from docx_parser import DocxParser
+from importer import BulkImporter, import_stream
+from dedup import reindex_questions
 
 def setup_database():
     """Initialize the database tables"""
@@ -77,6 +79,8 @@ def load_sample_questions():
     
     db = SessionLocal()
     try:
+        # Hash questions loaded by older versions so they are deduplicated too
+        reindex_questions(db)
         total_loaded = 0
         
         for file_path in sample_files:
@@ -86,41 +90,16 @@ def load_sample_questions():
             
             print(f"📄 Parsing {file_path.name}...")
             
-            # Parse the DOCX file
+            # Parse the DOCX file, saving questions in chunks as they are parsed;
+            # questions already in the bank are skipped
             parser = DocxParser()
-            questions, errors = parser.parse_document(str(file_path))
+            importer = BulkImporter(db)
+            errors = import_stream(importer, parser.iter_questions(str(file_path)))
             
-            print(f"   📊 Found {len(questions)} questions, {len(errors)} errors")
-            
-            # Save questions to database
-            for parsed_q in questions:
-                # Check if question already exists (by stem)
-                existing = db.query(Question).filter(Question.stem == parsed_q.stem).first()
-                if existing:
-                    continue
-                
-                # Create question
-                db_question = Question(
-                    stem=parsed_q.stem,
-                    question_type=parsed_q.question_type,
-                    correct_answer=parsed_q.correct_answer,
-                    explanation=parsed_q.explanation,
-                    difficulty=parsed_q.difficulty
-                )
-                db.add(db_question)
-                db.flush()  # Get the ID
-                
-                # Add options
-                for i, option in enumerate(parsed_q.options):
-                    db_option = Option(
-                        question_id=db_question.id,
-                        text=option['text'],
-                        label=option['label'],
-                        order_index=i
-                    )
-                    db.add(db_option)
-                
-                total_loaded += 1
+            print(f"   📊 Imported {len(importer.imported_ids)} questions, {len(errors)} errors")
+            total_loaded += len(importer.imported_ids)
+            if importer.duplicate_count:
+                print(f"   ♻️  Skipped {importer.duplicate_count} duplicate questions")
             
             # Show errors
             if errors:
@@ -22,8 +22,8 @@ const Dashboard: React.FC = () => {
 
   const { data: stats } = useQuery<Stats>('dashboard-stats', async () => {
     const [questionsRes, historyRes] = await Promise.all([
-      axios.get('/api/questions'),
-      axios.get('/api/history?limit=10'),
+      axios.get('/api/questions?fields=id'),
+      axios.get('/api/history/attempts?limit=10'),
     ])
 
     const questions = questionsRes.data
@@ -40,7 +40,7 @@ const Dashboard: React.FC = () => {
   })
 
   const { data: recentHistory } = useQuery('recent-history', () =>
-    axios.get('/api/history?limit=5').then(res => res.data)
+    axios.get('/api/history/attempts?limit=5').then(res => res.data)
   )
 
   return (
@@ -198,7 +198,7 @@ const Dashboard: React.FC = () => {
                       </div>
                       <div className="flex-1 min-w-0">
                         <p className="text-sm font-medium text-gray-900 truncate">
-                          {attempt.quiz.title}
+                          {attempt.quiz_title}
                         </p>
                         <p className="text-sm text-gray-500">
                           {attempt.correct_answers}/{attempt.total_questions} correct
@@ -9,25 +9,33 @@ import {
 } from '@heroicons/react/24/outline'
 import axios from 'axios'
 
-interface QuizAttempt {
+interface AttemptSummary {
   id: number
-  quiz: {
-    id: number
-    title: string
-    description?: string
-  }
+  quiz_id: number
+  quiz_title: string
   score: number
   total_questions: number
   correct_answers: number
   started_at: string
   completed_at: string
-  selected_answers: Record<number, number[]>
+}
+
+interface HistorySummary {
+  attempts: number
+  average_score: number | null
+  best_score: number | null
+  total_questions: number
+  correct_answers: number
 }
 
 const History: React.FC = () => {
-  const { data: attempts, isLoading } = useQuery<QuizAttempt[]>(
+  const { data: attempts, isLoading } = useQuery<AttemptSummary[]>(
     'history',
-    () => axios.get('/api/history').then(res => res.data)
+    () => axios.get('/api/history/attempts').then(res => res.data)
+  )
+  const { data: summary } = useQuery<HistorySummary>(
+    'history-summary',
+    () => axios.get('/api/history/summary').then(res => res.data)
   )
 
   const getScoreColor = (score: number) => {
@@ -64,7 +72,7 @@ const History: React.FC = () => {
                 <TrophyIcon className="h-8 w-8 text-yellow-500 mr-3" />
                 <div>
                   <p className="text-sm font-medium text-gray-500">Total Quizzes</p>
-                  <p className="text-2xl font-bold text-gray-900">{attempts.length}</p>
+                  <p className="text-2xl font-bold text-gray-900">{summary?.attempts ?? 0}</p>
                 </div>
               </div>
             </div>
@@ -75,9 +83,7 @@ const History: React.FC = () => {
                 <div>
                   <p className="text-sm font-medium text-gray-500">Average Score</p>
                   <p className="text-2xl font-bold text-gray-900">
-                    {attempts.length > 0
-                      ? (attempts.reduce((sum, a) => sum + a.score, 0) / attempts.length).toFixed(1)
-                      : 0}%
+                    {(summary?.average_score ?? 0).toFixed(1)}%
                   </p>
                 </div>
               </div>
@@ -89,7 +95,7 @@ const History: React.FC = () => {
                 <div>
                   <p className="text-sm font-medium text-gray-500">Total Questions</p>
                   <p className="text-2xl font-bold text-gray-900">
-                    {attempts.reduce((sum, a) => sum + a.total_questions, 0)}
+                    {summary?.total_questions ?? 0}
                   </p>
                 </div>
               </div>
@@ -101,7 +107,7 @@ const History: React.FC = () => {
                 <div>
                   <p className="text-sm font-medium text-gray-500">Correct Answers</p>
                   <p className="text-2xl font-bold text-gray-900">
-                    {attempts.reduce((sum, a) => sum + a.correct_answers, 0)}
+                    {summary?.correct_answers ?? 0}
                   </p>
                 </div>
               </div>
@@ -146,15 +152,8 @@ const History: React.FC = () => {
                       return (
                         <tr key={attempt.id} className="hover:bg-gray-50">
                           <td className="px-6 py-4 whitespace-nowrap">
-                            <div>
-                              <div className="text-sm font-medium text-gray-900">
-                                {attempt.quiz.title}
-                              </div>
-                              {attempt.quiz.description && (
-                                <div className="text-sm text-gray-500">
-                                  {attempt.quiz.description}
-                                </div>
-                              )}
+                            <div className="text-sm font-medium text-gray-900">
+                              {attempt.quiz_title}
                             </div>
                           </td>
                           
@@ -8,12 +8,21 @@ interface Tag {
   name: string
 }
 
+interface QuestionFacets {
+  total: number
+  enough?: boolean
+  question_types: Array<{ value: string; count: number }>
+  difficulties: Array<{ value: string; count: number }>
+  tags: Array<{ id: number; name: string; count: number }>
+}
+
 interface QuizGenerationRequest {
   topic?: string
   question_type?: string
   difficulty?: string
   count: number
   tag_ids?: number[]
+  tag_mode?: 'any' | 'all' | 'none'
 }
 
 const QuizGenerator: React.FC = () => {
@@ -27,6 +36,22 @@ const QuizGenerator: React.FC = () => {
     axios.get('/api/tags').then(res => res.data)
   )
 
+  // Availability for the current criteria, so impossible requests are caught before generating
+  const { data: facets } = useQuery<QuestionFacets>(
+    ['question-facets', formData.question_type, formData.difficulty, formData.tag_ids, formData.tag_mode, formData.count],
+    () => {
+      const params = new URLSearchParams()
+      if (formData.question_type) params.append('question_type', formData.question_type)
+      if (formData.difficulty) params.append('difficulty', formData.difficulty)
+      formData.tag_ids?.forEach(id => params.append('tag_ids', String(id)))
+      if (formData.tag_mode) params.append('tag_mode', formData.tag_mode)
+      params.append('count', String(formData.count))
+      return axios.get(`/api/questions/facets?${params}`).then(res => res.data)
+    },
+    { keepPreviousData: true }
+  )
+  const tagCounts = new Map(facets?.tags.map(tag => [tag.id, tag.count]))
+
   const generateMutation = useMutation(
     (request: QuizGenerationRequest) => axios.post('/api/quizzes/generate', request),
     {
@@ -135,9 +160,21 @@ const QuizGenerator: React.FC = () => {
           {/* Tags */}
           {tags && tags.length > 0 && (
             <div>
-              <label className="block text-sm font-medium text-gray-700 mb-2">
-                Tags (Optional)
-              </label>
+              <div className="flex items-center justify-between mb-2">
+                <label className="block text-sm font-medium text-gray-700">
+                  Tags (Optional)
+                </label>
+                <select
+                  name="tag_mode"
+                  value={formData.tag_mode || 'any'}
+                  onChange={handleInputChange}
+                  className="border-gray-300 rounded-md shadow-sm focus:ring-indigo-500 focus:border-indigo-500 text-sm"
+                >
+                  <option value="any">Any selected tag</option>
+                  <option value="all">All selected tags</option>
+                  <option value="none">None of the selected tags</option>
+                </select>
+              </div>
               <div className="space-y-2 max-h-48 overflow-y-auto border border-gray-200 rounded-md p-3">
                 {tags.map((tag) => (
                   <label key={tag.id} className="flex items-center">
@@ -160,7 +197,10 @@ const QuizGenerator: React.FC = () => {
                         }
                       }}
                     />
-                    <span className="ml-2 text-sm text-gray-700">{tag.name}</span>
+                    <span className="ml-2 text-sm text-gray-700">
+                      {tag.name}
+                      {facets && <span className="text-gray-400"> ({tagCounts.get(tag.id) || 0})</span>}
+                    </span>
                   </label>
                 ))}
               </div>
@@ -168,10 +208,13 @@ const QuizGenerator: React.FC = () => {
           )}
 
           {/* Submit Button */}
-          <div className="flex justify-end">
+          <div className="flex items-center justify-between">
+            <p className={`text-sm ${facets?.enough === false ? 'text-red-600' : 'text-gray-500'}`}>
+              {facets && `${facets.total} question${facets.total !== 1 ? 's' : ''} match these criteria`}
+            </p>
             <button
               type="submit"
-              disabled={generateMutation.isLoading}
+              disabled={generateMutation.isLoading || facets?.enough === false}
               className="inline-flex items-center px-4 py-2 border border-transparent text-sm font-medium rounded-md shadow-sm text-white bg-indigo-600 hover:bg-indigo-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-indigo-500 disabled:opacity-50 disabled:cursor-not-allowed"
             >
               {generateMutation.isLoading ? 'Generating...' : 'Generate Quiz'}
@@ -8,17 +8,18 @@ interface Question {
   stem: string
   question_type: 'single' | 'multiple' | 'true_false'
   options: Array<{
-    id: number
     text: string
     label: string
   }>
 }
 
-interface Quiz {
+// The quiz as issued, without answers
+interface QuizSnapshot {
   id: number
   title: string
   description?: string
-  question_ids: number[]
+  time_limit_minutes?: number
+  questions: Question[]
 }
 
 const QuizTaker: React.FC = () => {
@@ -28,27 +29,15 @@ const QuizTaker: React.FC = () => {
   const [selectedAnswers, setSelectedAnswers] = useState<Record<number, number[]>>({})
   const [quizStartTime] = useState(new Date())
 
-  const { data: quiz } = useQuery<Quiz>(
-    ['quiz', quizId],
-    () => axios.get(`/api/quizzes/${quizId}`).then(res => res.data),
+  const { data: quiz } = useQuery<QuizSnapshot>(
+    ['quiz-snapshot', quizId],
+    () => axios.get(`/api/quizzes/${quizId}/snapshot`).then(res => res.data),
     {
       enabled: !!quizId,
+      staleTime: Infinity,
     }
   )
-
-  const { data: questions } = useQuery<Question[]>(
-    ['quiz-questions', quiz?.question_ids],
-    async () => {
-      if (!quiz?.question_ids) return []
-      const promises = quiz.question_ids.map(id =>
-        axios.get(`/api/questions/${id}`).then(res => res.data)
-      )
-      return Promise.all(promises)
-    },
-    {
-      enabled: !!quiz?.question_ids,
-    }
-  )
+  const questions = quiz?.questions
 
   const submitMutation = useMutation(
     (data: { quizId: number; selectedAnswers: Record<number, number[]> }) =>
@@ -169,7 +158,7 @@ const QuizTaker: React.FC = () => {
           <div className="space-y-3">
             {currentQuestion.options.map((option, optionIndex) => (
               <div
-                key={option.id}
+                key={option.label}
                 onClick={() => handleAnswerSelect(currentQuestion.id, optionIndex)}
                 className={`p-4 border-2 rounded-lg cursor-pointer transition-all ${
                   isAnswerSelected(currentQuestion.id, optionIndex)
@@ -19,6 +19,15 @@ interface ImportReport {
     content: string
     error: string
   }>
+  duplicate_imports: number
+  diff?: {
+    file_unchanged: boolean
+    added: number
+    updated: number
+    unchanged: number
+    removed: number
+    retired: number
+  }
   created_at: string
 }
 
@@ -26,15 +35,19 @@ const UploadDocx: React.FC = () => {
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
   const [uploadStatus, setUploadStatus] = useState<'idle' | 'uploading' | 'success' | 'error'>('idle')
   const [uploadResult, setUploadResult] = useState<ImportReport | null>(null)
+  const [retireRemoved, setRetireRemoved] = useState(false)
 
   const queryClient = useQueryClient()
 
   const uploadMutation = useMutation(
-    (formData: FormData) => axios.post('/api/upload-docx', formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data',
-      },
-    }),
+    (formData: FormData) => {
+      const isDocx = (formData.get('file') as File).name.endsWith('.docx')
+      return axios.post(isDocx ? '/api/upload-docx' : '/api/upload-questions', formData, {
+        headers: {
+          'Content-Type': 'multipart/form-data',
+        },
+      })
+    },
     {
       onSuccess: (response) => {
         setUploadResult(response.data)
@@ -49,12 +62,12 @@ const UploadDocx: React.FC = () => {
 
   const handleFileSelect = (event: React.ChangeEvent<HTMLInputElement>) => {
     const file = event.target.files?.[0]
-    if (file && file.name.endsWith('.docx')) {
+    if (file && /\.(docx|jsonl|csv)$/.test(file.name)) {
       setSelectedFile(file)
       setUploadStatus('idle')
       setUploadResult(null)
     } else {
-      alert('Please select a valid .docx file')
+      alert('Please select a .docx, .jsonl or .csv file')
     }
   }
 
@@ -63,6 +76,7 @@ const UploadDocx: React.FC = () => {
 
     const formData = new FormData()
     formData.append('file', selectedFile)
+    formData.append('retire_removed', String(retireRemoved))
 
     setUploadStatus('uploading')
     uploadMutation.mutate(formData)
@@ -132,19 +146,31 @@ const UploadDocx: React.FC = () => {
                             name="file-input"
                             type="file"
                             className="sr-only"
-                            accept=".docx"
+                            accept=".docx,.jsonl,.csv"
                             onChange={handleFileSelect}
                           />
                         </label>
                         <p className="pl-1">or drag and drop</p>
                       </div>
-                      <p className="text-xs text-gray-500">DOCX files only</p>
+                      <p className="text-xs text-gray-500">DOCX, JSONL or CSV files</p>
                     </>
                   )}
                 </div>
               </div>
             </label>
 
+            {selectedFile && (
+              <label className="mt-4 flex items-center text-sm text-gray-700">
+                <input
+                  type="checkbox"
+                  checked={retireRemoved}
+                  onChange={(e) => setRetireRemoved(e.target.checked)}
+                  className="h-4 w-4 text-indigo-600 border-gray-300 rounded mr-2"
+                />
+                Retire questions removed since the last upload of this file
+              </label>
+            )}
+
             {selectedFile && (
               <div className="mt-4 flex space-x-3">
                 <button
@@ -190,6 +216,16 @@ const UploadDocx: React.FC = () => {
               </div>
             </div>
 
+            {uploadResult.diff && (
+              <p className="text-sm text-gray-600 mb-6">
+                {uploadResult.diff.file_unchanged
+                  ? 'This file is unchanged since its last upload; nothing was imported.'
+                  : `${uploadResult.diff.added} added, ${uploadResult.diff.updated} updated, ` +
+                    `${uploadResult.diff.unchanged} unchanged, ${uploadResult.diff.removed} removed` +
+                    (uploadResult.duplicate_imports ? `, ${uploadResult.duplicate_imports} duplicates skipped` : '')}
+              </p>
+            )}
+
             {uploadResult.errors && uploadResult.errors.length > 0 && (
               <div>
                 <h4 className="text-md font-medium text-gray-900 mb-3">Import Errors:</h4>